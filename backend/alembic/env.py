@@ -12,7 +12,16 @@ sys.path.append(str(Path(__file__).resolve().parents[1]))
 
 from app.db.base import Base
 from app.models.user import User  # noqa: F401 - Ensure all models are imported
-from app.models.workflow import WorkflowTemplate, WorkflowStep, WorkflowInstance, WorkflowHistory, Attachment  # noqa: F401
+from app.models.workflow import (  # noqa: F401
+    WorkflowTemplate, WorkflowTemplateVersion, WorkflowStep, WorkflowInstance, WorkflowHistory, Attachment, WorkflowTombstone,
+)
+from app.models.idempotency import IdempotencyKey  # noqa: F401
+from app.models.upload import UploadPart, UploadSession  # noqa: F401
+from app.models.maintenance import MaintenanceCursor  # noqa: F401
+from app.models.job import Job  # noqa: F401
+from app.models.role import Role, RoleMember  # noqa: F401
+from app.models.org import OrgClosure  # noqa: F401
+from app.models.delegation import Delegation  # noqa: F401
 
 
 # this is the Alembic Config object, which provides
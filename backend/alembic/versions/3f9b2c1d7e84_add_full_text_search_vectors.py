@@ -0,0 +1,60 @@
+"""Add full-text search vectors
+
+Revision ID: 3f9b2c1d7e84
+Revises: c1ad53bfa692
+Create Date: 2026-10-19 10:12:41.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f9b2c1d7e84'
+down_revision: Union[str, Sequence[str], None] = 'c1ad53bfa692'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Выражения зафиксированы здесь, а не импортируются из моделей:
+# миграция должна воспроизводить схему на момент своего создания.
+def _tsvector(*weighted_columns: tuple[str, str]) -> str:
+    parts = []
+    for column, weight in weighted_columns:
+        text = f"regexp_replace(coalesce({column}, ''), '(\\w)-(\\d)', '\\1 \\2', 'g')"
+        for config in ("russian", "english"):
+            parts.append(f"setweight(to_tsvector('{config}'::regconfig, {text}), '{weight}')")
+    return " || ".join(parts)
+
+
+SEARCH_COLUMNS = {
+    'workflow_templates': (("name", "A"), ("description", "B")),
+    'workflow_instances': (("reference_id", "A"),),
+    'workflow_history': (("comment", "B"),),
+    'attachments': (("filename", "A"),),
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table, columns in SEARCH_COLUMNS.items():
+        op.add_column(table, sa.Column(
+            'search_vector',
+            postgresql.TSVECTOR(),
+            sa.Computed(_tsvector(*columns), persisted=True),
+            nullable=True,
+        ))
+        op.create_index(
+            f'ix_{table}_search_vector', table, ['search_vector'],
+            unique=False, postgresql_using='gin',
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in reversed(list(SEARCH_COLUMNS)):
+        op.drop_index(f'ix_{table}_search_vector', table_name=table)
+        op.drop_column(table, 'search_vector')
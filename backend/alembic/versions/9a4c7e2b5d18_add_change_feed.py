@@ -0,0 +1,55 @@
+"""Add change feed sequence and tombstones
+
+Revision ID: 9a4c7e2b5d18
+Revises: 7d2e4a9c1b35
+Create Date: 2026-10-19 16:40:03.915227
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9a4c7e2b5d18'
+down_revision: Union[str, Sequence[str], None] = '7d2e4a9c1b35'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+CHANGE_SEQ = "pg_current_xact_id()::text::bigint"
+TRACKED_TABLES = ('workflow_instances', 'workflow_history')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Существующие строки получают номер транзакции миграции: первая
+    # синхронизация клиента все равно выгружает все
+    for table in TRACKED_TABLES:
+        op.add_column(table, sa.Column(
+            'change_seq', sa.BigInteger(), server_default=sa.text(CHANGE_SEQ), nullable=False,
+        ))
+        op.create_index(f'ix_{table}_change_seq', table, ['change_seq', 'id'], unique=False)
+
+    op.create_table(
+        'workflow_tombstones',
+        sa.Column('id', sa.BigInteger(), nullable=False),
+        sa.Column('entity', sa.String(), nullable=False),
+        sa.Column('entity_id', sa.Integer(), nullable=False),
+        sa.Column('change_seq', sa.BigInteger(), server_default=sa.text(CHANGE_SEQ), nullable=False),
+        sa.Column('deleted_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(
+        'ix_workflow_tombstones_change_seq', 'workflow_tombstones', ['change_seq', 'id'], unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_workflow_tombstones_change_seq', table_name='workflow_tombstones')
+    op.drop_table('workflow_tombstones')
+    for table in reversed(TRACKED_TABLES):
+        op.drop_index(f'ix_{table}_change_seq', table_name=table)
+        op.drop_column(table, 'change_seq')
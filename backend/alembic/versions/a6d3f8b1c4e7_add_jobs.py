@@ -0,0 +1,63 @@
+"""Add jobs
+
+Revision ID: a6d3f8b1c4e7
+Revises: f3a7c1e9b5d2
+Create Date: 2026-10-20 03:22:17.504161
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a6d3f8b1c4e7'
+down_revision: Union[str, Sequence[str], None] = 'f3a7c1e9b5d2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'jobs',
+        sa.Column('id', sa.UUID(), nullable=False),
+        sa.Column('type', sa.String(length=64), nullable=False),
+        sa.Column('status', sa.String(length=16), nullable=False),
+        sa.Column('params', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+        sa.Column('processed', sa.Integer(), nullable=False),
+        sa.Column('total', sa.Integer(), nullable=True),
+        sa.Column('checkpoint', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+        sa.Column('result', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('cancel_requested', sa.Boolean(), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('locked_by', sa.String(length=64), nullable=True),
+        sa.Column('locked_until', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('created_by_id', sa.UUID(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('started_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('tenant_id', sa.String(length=64), server_default='default', nullable=False),
+        sa.ForeignKeyConstraint(['created_by_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(
+        'ix_jobs_queued', 'jobs', ['type', 'created_at'],
+        unique=False, postgresql_where=sa.text("status = 'queued'"),
+    )
+    op.create_index(
+        'ix_jobs_running', 'jobs', ['type', 'locked_until'],
+        unique=False, postgresql_where=sa.text("status = 'running'"),
+    )
+    op.create_index('ix_jobs_tenant_created_by', 'jobs', ['tenant_id', 'created_by_id', 'created_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_jobs_tenant_created_by', table_name='jobs')
+    op.drop_index('ix_jobs_running', table_name='jobs')
+    op.drop_index('ix_jobs_queued', table_name='jobs')
+    op.drop_table('jobs')
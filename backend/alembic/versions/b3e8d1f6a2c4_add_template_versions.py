@@ -0,0 +1,61 @@
+"""Add immutable template versions
+
+Revision ID: b3e8d1f6a2c4
+Revises: 9a4c7e2b5d18
+Create Date: 2026-10-19 18:22:47.104553
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3e8d1f6a2c4'
+down_revision: Union[str, Sequence[str], None] = '9a4c7e2b5d18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'workflow_template_versions',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('template_id', sa.Integer(), nullable=False),
+        sa.Column('version', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.Column('published_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('published_by_id', sa.UUID(), nullable=False),
+        sa.ForeignKeyConstraint(['template_id'], ['workflow_templates.id']),
+        sa.ForeignKeyConstraint(['published_by_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('template_id', 'version', name='uq_workflow_template_versions_template_version'),
+    )
+    op.create_index(op.f('ix_workflow_template_versions_id'), 'workflow_template_versions', ['id'], unique=False)
+
+    # Существующие шаги остаются черновиками шаблонов, а существующие
+    # экземпляры — без версии: они продолжают идти по черновику
+    op.add_column('workflow_steps', sa.Column('version_id', sa.Integer(), nullable=True))
+    op.create_index(op.f('ix_workflow_steps_version_id'), 'workflow_steps', ['version_id'], unique=False)
+    op.create_foreign_key(
+        'workflow_steps_version_id_fkey', 'workflow_steps', 'workflow_template_versions', ['version_id'], ['id'],
+    )
+    op.add_column('workflow_instances', sa.Column('template_version_id', sa.Integer(), nullable=True))
+    op.create_foreign_key(
+        'workflow_instances_template_version_id_fkey', 'workflow_instances', 'workflow_template_versions',
+        ['template_version_id'], ['id'],
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('workflow_instances_template_version_id_fkey', 'workflow_instances', type_='foreignkey')
+    op.drop_column('workflow_instances', 'template_version_id')
+    op.drop_constraint('workflow_steps_version_id_fkey', 'workflow_steps', type_='foreignkey')
+    op.drop_index(op.f('ix_workflow_steps_version_id'), table_name='workflow_steps')
+    op.drop_column('workflow_steps', 'version_id')
+    op.drop_index(op.f('ix_workflow_template_versions_id'), table_name='workflow_template_versions')
+    op.drop_table('workflow_template_versions')
@@ -0,0 +1,86 @@
+"""Add roles as step assignees
+
+Revision ID: b9e2c5a7d3f4
+Revises: a6d3f8b1c4e7
+Create Date: 2026-10-20 05:41:09.183527
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b9e2c5a7d3f4'
+down_revision: Union[str, Sequence[str], None] = 'a6d3f8b1c4e7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'roles',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=255), nullable=False),
+        sa.Column('kind', sa.String(length=16), nullable=False),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.Column('tenant_id', sa.String(length=64), server_default='default', nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('tenant_id', 'name', name='uq_roles_tenant_name'),
+    )
+    op.create_table(
+        'role_members',
+        sa.Column('role_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.UUID(), nullable=False),
+        sa.Column('tenant_id', sa.String(length=64), server_default='default', nullable=False),
+        sa.ForeignKeyConstraint(['role_id'], ['roles.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('role_id', 'user_id'),
+    )
+    op.create_index(op.f('ix_role_members_user_id'), 'role_members', ['user_id'], unique=False)
+    op.add_column('users', sa.Column('permissions_version', sa.Integer(), server_default='0', nullable=False))
+
+    op.add_column('workflow_steps', sa.Column('assignee_role_id', sa.Integer(), nullable=True))
+    op.create_foreign_key(
+        'workflow_steps_assignee_role_id_fkey', 'workflow_steps', 'roles', ['assignee_role_id'], ['id']
+    )
+    op.add_column('workflow_instances', sa.Column('assignee_id', sa.UUID(), nullable=True))
+    op.add_column('workflow_instances', sa.Column('assignee_role_id', sa.Integer(), nullable=True))
+    op.create_foreign_key(
+        'workflow_instances_assignee_id_fkey', 'workflow_instances', 'users', ['assignee_id'], ['id']
+    )
+    op.create_foreign_key(
+        'workflow_instances_assignee_role_id_fkey', 'workflow_instances', 'roles', ['assignee_role_id'], ['id']
+    )
+    # Исполнитель текущего шага копируется в экземпляр
+    op.execute(
+        "UPDATE workflow_instances AS i SET assignee_id = s.assignee_id "
+        "FROM workflow_steps AS s "
+        "WHERE s.id = i.current_step_id AND i.status = 'in_progress' AND s.assignee_id IS NOT NULL"
+    )
+    op.create_index(
+        'ix_workflow_instances_tenant_assignee', 'workflow_instances', ['tenant_id', 'assignee_id'],
+        unique=False, postgresql_where=sa.text("status = 'in_progress' AND assignee_id IS NOT NULL"),
+    )
+    op.create_index(
+        'ix_workflow_instances_tenant_assignee_role', 'workflow_instances', ['tenant_id', 'assignee_role_id'],
+        unique=False, postgresql_where=sa.text("status = 'in_progress' AND assignee_role_id IS NOT NULL"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_workflow_instances_tenant_assignee_role', table_name='workflow_instances')
+    op.drop_index('ix_workflow_instances_tenant_assignee', table_name='workflow_instances')
+    op.drop_constraint('workflow_instances_assignee_role_id_fkey', 'workflow_instances', type_='foreignkey')
+    op.drop_constraint('workflow_instances_assignee_id_fkey', 'workflow_instances', type_='foreignkey')
+    op.drop_column('workflow_instances', 'assignee_role_id')
+    op.drop_column('workflow_instances', 'assignee_id')
+    op.drop_constraint('workflow_steps_assignee_role_id_fkey', 'workflow_steps', type_='foreignkey')
+    op.drop_column('workflow_steps', 'assignee_role_id')
+    op.drop_column('users', 'permissions_version')
+    op.drop_index(op.f('ix_role_members_user_id'), table_name='role_members')
+    op.drop_table('role_members')
+    op.drop_table('roles')
@@ -0,0 +1,45 @@
+"""Add org hierarchy closure table
+
+Revision ID: c4f8a2d6e1b3
+Revises: b9e2c5a7d3f4
+Create Date: 2026-10-20 09:12:47.530194
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4f8a2d6e1b3'
+down_revision: Union[str, Sequence[str], None] = 'b9e2c5a7d3f4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('users', sa.Column('manager_id', sa.UUID(), nullable=True))
+    op.create_foreign_key('users_manager_id_fkey', 'users', 'users', ['manager_id'], ['id'])
+    op.create_table(
+        'org_closure',
+        sa.Column('descendant_id', sa.UUID(), nullable=False),
+        sa.Column('depth', sa.Integer(), nullable=False),
+        sa.Column('ancestor_id', sa.UUID(), nullable=False),
+        sa.Column('tenant_id', sa.String(length=64), server_default='default', nullable=False),
+        sa.ForeignKeyConstraint(['ancestor_id'], ['users.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['descendant_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('descendant_id', 'depth'),
+    )
+    op.create_index('ix_org_closure_ancestor_depth', 'org_closure', ['ancestor_id', 'depth'], unique=False)
+    op.add_column('workflow_steps', sa.Column('assignee_manager_level', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('workflow_steps', 'assignee_manager_level')
+    op.drop_index('ix_org_closure_ancestor_depth', table_name='org_closure')
+    op.drop_table('org_closure')
+    op.drop_constraint('users_manager_id_fkey', 'users', type_='foreignkey')
+    op.drop_column('users', 'manager_id')
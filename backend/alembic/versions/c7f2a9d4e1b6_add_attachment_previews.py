@@ -0,0 +1,33 @@
+"""Add attachment content hash and preview status
+
+Revision ID: c7f2a9d4e1b6
+Revises: b3e8d1f6a2c4
+Create Date: 2026-10-19 20:05:31.482190
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7f2a9d4e1b6'
+down_revision: Union[str, Sequence[str], None] = 'b3e8d1f6a2c4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # У загруженных раньше вложений статус NULL: превью для них не строятся
+    op.add_column('attachments', sa.Column('content_hash', sa.String(length=64), nullable=True))
+    op.add_column('attachments', sa.Column('preview_status', sa.String(), nullable=True))
+    op.create_index(op.f('ix_attachments_content_hash'), 'attachments', ['content_hash'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_attachments_content_hash'), table_name='attachments')
+    op.drop_column('attachments', 'preview_status')
+    op.drop_column('attachments', 'content_hash')
@@ -0,0 +1,56 @@
+"""Add resumable upload sessions
+
+Revision ID: d5a1c8e3f7b2
+Revises: c7f2a9d4e1b6
+Create Date: 2026-10-19 21:12:08.663417
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5a1c8e3f7b2'
+down_revision: Union[str, Sequence[str], None] = 'c7f2a9d4e1b6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'upload_sessions',
+        sa.Column('id', sa.UUID(), nullable=False),
+        sa.Column('object_name', sa.String(), nullable=False),
+        sa.Column('upload_id', sa.String(), nullable=False),
+        sa.Column('filename', sa.String(), nullable=False),
+        sa.Column('content_type', sa.String(), nullable=False),
+        sa.Column('size', sa.BigInteger(), nullable=False),
+        sa.Column('chunk_size', sa.Integer(), nullable=False),
+        sa.Column('instance_id', sa.Integer(), nullable=True),
+        sa.Column('created_by_id', sa.UUID(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('expires_at', sa.DateTime(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(['created_by_id'], ['users.id']),
+        sa.ForeignKeyConstraint(['instance_id'], ['workflow_instances.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(op.f('ix_upload_sessions_expires_at'), 'upload_sessions', ['expires_at'], unique=False)
+    op.create_table(
+        'upload_parts',
+        sa.Column('session_id', sa.UUID(), nullable=False),
+        sa.Column('part_number', sa.Integer(), nullable=False),
+        sa.Column('etag', sa.String(), nullable=False),
+        sa.Column('size', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['session_id'], ['upload_sessions.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('session_id', 'part_number'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('upload_parts')
+    op.drop_index(op.f('ix_upload_sessions_expires_at'), table_name='upload_sessions')
+    op.drop_table('upload_sessions')
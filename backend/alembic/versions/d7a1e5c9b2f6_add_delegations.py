@@ -0,0 +1,49 @@
+"""Add out-of-office delegations
+
+Revision ID: d7a1e5c9b2f6
+Revises: c4f8a2d6e1b3
+Create Date: 2026-10-20 13:27:05.861412
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd7a1e5c9b2f6'
+down_revision: Union[str, Sequence[str], None] = 'c4f8a2d6e1b3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'delegations',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('delegator_id', sa.UUID(), nullable=False),
+        sa.Column('delegate_id', sa.UUID(), nullable=False),
+        sa.Column('template_id', sa.Integer(), nullable=True),
+        sa.Column('period', postgresql.TSTZRANGE(), nullable=False),
+        sa.Column('comment', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('tenant_id', sa.String(length=64), server_default='default', nullable=False),
+        sa.ForeignKeyConstraint(['delegate_id'], ['users.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['delegator_id'], ['users.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['template_id'], ['workflow_templates.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(op.f('ix_delegations_delegate_id'), 'delegations', ['delegate_id'], unique=False)
+    op.create_index(op.f('ix_delegations_delegator_id'), 'delegations', ['delegator_id'], unique=False)
+    op.create_index('ix_delegations_period', 'delegations', ['period'], unique=False, postgresql_using='gist')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_delegations_period', table_name='delegations', postgresql_using='gist')
+    op.drop_index(op.f('ix_delegations_delegator_id'), table_name='delegations')
+    op.drop_index(op.f('ix_delegations_delegate_id'), table_name='delegations')
+    op.drop_table('delegations')
@@ -0,0 +1,40 @@
+"""Add maintenance cursors
+
+Revision ID: e8b4d2a6c9f1
+Revises: d5a1c8e3f7b2
+Create Date: 2026-10-19 23:05:41.208316
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e8b4d2a6c9f1'
+down_revision: Union[str, Sequence[str], None] = 'd5a1c8e3f7b2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'maintenance_cursors',
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('value', sa.String(), server_default='', nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('name'),
+    )
+    # Вложения без экземпляра ищутся по возрасту
+    op.create_index(
+        'ix_attachments_unlinked_uploaded_at', 'attachments', ['uploaded_at'],
+        unique=False, postgresql_where=sa.text('instance_id IS NULL'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_attachments_unlinked_uploaded_at', table_name='attachments')
+    op.drop_table('maintenance_cursors')
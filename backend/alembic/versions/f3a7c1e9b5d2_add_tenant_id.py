@@ -0,0 +1,68 @@
+"""Add tenant_id to users and workflow tables
+
+Revision ID: f3a7c1e9b5d2
+Revises: e8b4d2a6c9f1
+Create Date: 2026-10-20 01:14:52.730914
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3a7c1e9b5d2'
+down_revision: Union[str, Sequence[str], None] = 'e8b4d2a6c9f1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TENANT_TABLES = (
+    'users',
+    'workflow_templates',
+    'workflow_template_versions',
+    'workflow_steps',
+    'workflow_instances',
+    'workflow_history',
+    'attachments',
+    'workflow_tombstones',
+)
+# Индексы ленты изменений, которые теперь начинаются с tenant_id
+CHANGE_SEQ_TABLES = ('workflow_instances', 'workflow_history', 'workflow_tombstones')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Постоянный DEFAULT не переписывает таблицы (Postgres 11+): существующие строки — тенант "default"
+    for table in TENANT_TABLES:
+        op.add_column(table, sa.Column('tenant_id', sa.String(length=64), server_default='default', nullable=False))
+
+    op.drop_index('ix_users_email', table_name='users')
+    op.create_index('ix_users_email', 'users', ['email'], unique=False)
+    op.create_unique_constraint('uq_users_tenant_email', 'users', ['tenant_id', 'email'])
+    op.drop_constraint('workflow_templates_name_key', 'workflow_templates', type_='unique')
+    op.create_unique_constraint('uq_workflow_templates_tenant_name', 'workflow_templates', ['tenant_id', 'name'])
+
+    for table in CHANGE_SEQ_TABLES:
+        op.drop_index(f'ix_{table}_change_seq', table_name=table)
+        op.create_index(f'ix_{table}_tenant_change_seq', table, ['tenant_id', 'change_seq', 'id'], unique=False)
+    op.create_index('ix_workflow_history_tenant_instance', 'workflow_history', ['tenant_id', 'instance_id'], unique=False)
+    op.create_index('ix_attachments_tenant_instance', 'attachments', ['tenant_id', 'instance_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_attachments_tenant_instance', table_name='attachments')
+    op.drop_index('ix_workflow_history_tenant_instance', table_name='workflow_history')
+    for table in CHANGE_SEQ_TABLES:
+        op.drop_index(f'ix_{table}_tenant_change_seq', table_name=table)
+        op.create_index(f'ix_{table}_change_seq', table, ['change_seq', 'id'], unique=False)
+
+    op.drop_constraint('uq_workflow_templates_tenant_name', 'workflow_templates', type_='unique')
+    op.create_unique_constraint('workflow_templates_name_key', 'workflow_templates', ['name'])
+    op.drop_constraint('uq_users_tenant_email', 'users', type_='unique')
+    op.drop_index('ix_users_email', table_name='users')
+    op.create_index('ix_users_email', 'users', ['email'], unique=True)
+
+    for table in TENANT_TABLES:
+        op.drop_column(table, 'tenant_id')
@@ -9,6 +9,8 @@ from jose.exceptions import JWTError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.config import settings
+from app.core.metrics import AUTH_REQUESTS
+from app.core.tracing import traced
 from app.core.security import verify_password
 from app.crud.user import get_user_by_email, get_user
 from app.schemas.token import Token, TokenData
@@ -46,6 +48,7 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None) -> s
     return encoded_jwt
 
 
+@traced("auth.get_current_user")
 async def get_current_user(
     token: Annotated[str, Depends(oauth2_scheme)],
     db: AsyncSession = Depends(get_async_session)
@@ -73,16 +76,29 @@ async def get_current_user(
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
         user_id: str = payload.get("sub")
         if user_id is None:
+            AUTH_REQUESTS.labels("invalid_token").inc()
             raise credentials_exception
         token_data = TokenData(user_id=user_id)
     except JWTError:
+        AUTH_REQUESTS.labels("invalid_token").inc()
         raise credentials_exception
     user = await get_user(db, uuid.UUID(token_data.user_id))
     if user is None:
+        AUTH_REQUESTS.labels("unknown_user").inc()
         raise credentials_exception
+    AUTH_REQUESTS.labels("ok").inc()
     return user
 
 
+def require_superuser(current_user: User = Depends(get_current_user)) -> User:
+    """
+    Зависимость: действие доступно только администраторам (роли, оргструктура).
+    """
+    if not current_user.is_superuser:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Недостаточно прав.")
+    return current_user
+
+
 @router.post("/token", response_model=Token)
 async def login_for_access_token(
     form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
@@ -90,6 +106,7 @@ async def login_for_access_token(
 ):
     """
     Эндпоинт для получения JWT токена доступа.
+    Пользователь ищется в тенанте хоста запроса (TENANT_HOSTS, иначе "default").
 
     Args:
         form_data (OAuth2PasswordRequestForm): Данные формы (username, password).
@@ -110,7 +127,8 @@ async def login_for_access_token(
         )
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": str(user.id)}, expires_delta=access_token_expires
+        # Тенант в токене определяет шард и видимые данные всех следующих запросов
+        data={"sub": str(user.id), "tenant": user.tenant_id}, expires_delta=access_token_expires
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
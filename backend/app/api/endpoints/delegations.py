@@ -0,0 +1,82 @@
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from pydantic import AwareDatetime
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.endpoints.auth import get_current_user
+from app.crud import delegations as crud_delegations
+from app.db.session import get_async_session, get_read_session
+from app.schemas.delegation import DelegationCreate, DelegationRead
+from app.schemas.user import UserRead
+
+router = APIRouter()
+
+
+@router.post(
+    "",
+    response_model=DelegationRead,
+    status_code=status.HTTP_201_CREATED,
+    summary="Назначить заместителя на время отсутствия",
+    description=(
+        "Пока период действует, заместитель видит шаги сотрудника во входящих и может их выполнить; "
+        "с `template_id` — только шаги этого шаблона. Замещения одного сотрудника по тем же шагам "
+        "не должны пересекаться."
+    ),
+)
+async def create_delegation(
+    delegation_in: DelegationCreate,
+    db: AsyncSession = Depends(get_async_session),
+    current_user: UserRead = Depends(get_current_user),
+):
+    delegator_id = delegation_in.delegator_id or current_user.id
+    if delegator_id != current_user.id and not current_user.is_superuser:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Недостаточно прав.")
+    if delegator_id == delegation_in.delegate_id:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_CONTENT, detail="Нельзя назначить заместителем самого себя."
+        )
+    try:
+        return await crud_delegations.create_delegation(db, delegation_in, delegator_id=delegator_id)
+    except LookupError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_CONTENT, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+
+
+@router.get(
+    "",
+    response_model=List[DelegationRead],
+    summary="Замещения",
+    description=(
+        "Замещения, где пользователь отсутствует или замещает; администратор видит все. "
+        "С `active_at` — действующие в этот момент, иначе — еще не закончившиеся."
+    ),
+)
+async def list_delegations(
+    active_at: Optional[AwareDatetime] = Query(None, description="Момент времени"),
+    db: AsyncSession = Depends(get_read_session),
+    current_user: UserRead = Depends(get_current_user),
+):
+    user_id = None if current_user.is_superuser else current_user.id
+    return await crud_delegations.get_delegations(db, user_id=user_id, active_at=active_at)
+
+
+@router.delete(
+    "/{delegation_id}",
+    status_code=status.HTTP_204_NO_CONTENT,
+    summary="Отменить замещение",
+    description="Отменить может замещаемый сотрудник или администратор, например при досрочном возвращении.",
+)
+async def delete_delegation(
+    delegation_id: int,
+    db: AsyncSession = Depends(get_async_session),
+    current_user: UserRead = Depends(get_current_user),
+):
+    delegation = await crud_delegations.get_delegation(db, delegation_id)
+    if delegation is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Замещение не найдено.")
+    if delegation.delegator_id != current_user.id and not current_user.is_superuser:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Недостаточно прав.")
+    await crud_delegations.delete_delegation(db, delegation)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
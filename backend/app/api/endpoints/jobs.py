@@ -0,0 +1,105 @@
+import uuid
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.encoders import jsonable_encoder
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.endpoints.auth import get_current_user
+from app.core.events import publish_job_event
+from app.core.jobs import FINISHED_STATUSES, JOB_CANCELLED
+from app.crud import job_handlers  # noqa: F401 - регистрирует типы задач
+from app.crud import jobs as crud_jobs
+from app.db.session import get_async_session, get_read_session
+from app.schemas.job import JobCreate, JobRead
+from app.schemas.user import UserRead
+
+router = APIRouter()
+
+
+@router.post(
+    "",
+    response_model=JobRead,
+    status_code=status.HTTP_202_ACCEPTED,
+    summary="Поставить задачу в очередь",
+    description=(
+        "Долгие операции выполняются фоновыми воркерами: ответ приходит сразу, "
+        "адрес задачи — в заголовке `Location`. Статус и прогресс — `GET /jobs/{id}` "
+        "или события `job` в потоке `GET /workflow/events`."
+    )
+)
+async def submit_job(
+    job_in: JobCreate,
+    response: Response,
+    db: AsyncSession = Depends(get_async_session),
+    current_user: UserRead = Depends(get_current_user),
+):
+    try:
+        job = await crud_jobs.submit_job(db, job_in, created_by_id=current_user.id)
+    except LookupError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_CONTENT, detail=str(e))
+    except ValidationError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
+            detail=jsonable_encoder(e.errors(include_url=False, include_context=False, include_input=False)),
+        )
+    response.headers["Location"] = f"/jobs/{job.id}"
+    return job
+
+
+@router.get(
+    "",
+    response_model=List[JobRead],
+    summary="Задачи пользователя",
+    description="Возвращает задачи текущего пользователя, сначала новые."
+)
+async def list_jobs(
+    job_status: Optional[str] = Query(None, alias="status", description="Фильтр по статусу"),
+    limit: int = Query(50, ge=1, le=200),
+    db: AsyncSession = Depends(get_read_session),
+    current_user: UserRead = Depends(get_current_user),
+):
+    return await crud_jobs.list_jobs(db, current_user.id, status=job_status, limit=limit)
+
+
+@router.get(
+    "/{job_id}",
+    response_model=JobRead,
+    summary="Статус и результат задачи",
+)
+async def get_job(
+    job_id: uuid.UUID,
+    db: AsyncSession = Depends(get_read_session),
+    current_user: UserRead = Depends(get_current_user),
+):
+    job = await crud_jobs.get_job(db, job_id, current_user.id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Задача не найдена.")
+    return job
+
+
+@router.post(
+    "/{job_id}/cancel",
+    response_model=JobRead,
+    summary="Отменить задачу",
+    description=(
+        "Ожидающая задача отменяется сразу. Выполняющаяся останавливается, когда "
+        "воркер заметит отмену (при отчете о прогрессе или продлении аренды); "
+        "уже сделанная ею работа не откатывается."
+    )
+)
+async def cancel_job(
+    job_id: uuid.UUID,
+    db: AsyncSession = Depends(get_async_session),
+    current_user: UserRead = Depends(get_current_user),
+):
+    job = await crud_jobs.get_job(db, job_id, current_user.id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Задача не найдена.")
+    if job.status in FINISHED_STATUSES:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Задача уже завершена.")
+    job = await crud_jobs.cancel_job(db, job)
+    if job.status == JOB_CANCELLED:
+        await publish_job_event(job.id, job.type, job.status, job.processed, job.total, job.created_by_id)
+    return job
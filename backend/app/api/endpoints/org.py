@@ -0,0 +1,95 @@
+import uuid
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.endpoints.auth import get_current_user, require_superuser
+from app.crud import org as crud_org
+from app.db.session import get_async_session, get_read_session
+from app.schemas.org import (
+    ManagerAssign,
+    OrgManagers,
+    OrgReorganization,
+    OrgReorganizationResult,
+    OrgSubordinate,
+)
+from app.schemas.user import UserRead
+
+router = APIRouter()
+
+
+@router.put(
+    "/users/{user_id}/manager",
+    response_model=OrgManagers,
+    summary="Назначить руководителя",
+    description="Переносит пользователя вместе со всеми подчиненными под нового руководителя.",
+)
+async def set_manager(
+    user_id: uuid.UUID,
+    assign_in: ManagerAssign,
+    db: AsyncSession = Depends(get_async_session),
+    current_user: UserRead = Depends(require_superuser),
+):
+    try:
+        await crud_org.reorganize(db, {user_id: assign_in.manager_id})
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_CONTENT, detail=str(e))
+    return OrgManagers(user_id=user_id, manager_ids=await crud_org.get_managers(db, user_id))
+
+
+@router.post(
+    "/reorganize",
+    response_model=OrgReorganizationResult,
+    summary="Реорганизация",
+    description=(
+        "Применяет все перемещения в одной транзакции: структура не бывает "
+        "видна наполовину перестроенной. Цикл в цепочке руководителей отменяет всю реорганизацию."
+    ),
+)
+async def reorganize(
+    reorganization: OrgReorganization,
+    db: AsyncSession = Depends(get_async_session),
+    current_user: UserRead = Depends(require_superuser),
+):
+    moves = {move.user_id: move.manager_id for move in reorganization.moves}
+    if len(moves) != len(reorganization.moves):
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_CONTENT, detail="Пользователь перемещается несколько раз."
+        )
+    try:
+        moved = await crud_org.reorganize(db, moves)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_CONTENT, detail=str(e))
+    return OrgReorganizationResult(moved=moved)
+
+
+@router.get(
+    "/users/{user_id}/managers",
+    response_model=OrgManagers,
+    summary="Цепочка руководителей",
+)
+async def get_managers(
+    user_id: uuid.UUID,
+    db: AsyncSession = Depends(get_read_session),
+    current_user: UserRead = Depends(get_current_user),
+):
+    return OrgManagers(user_id=user_id, manager_ids=await crud_org.get_managers(db, user_id))
+
+
+@router.get(
+    "/users/{user_id}/subordinates",
+    response_model=List[OrgSubordinate],
+    summary="Подчиненные",
+    description="Прямые и косвенные подчиненные; `max_depth=1` — только прямые.",
+)
+async def get_subordinates(
+    user_id: uuid.UUID,
+    max_depth: Optional[int] = Query(None, ge=1),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    db: AsyncSession = Depends(get_read_session),
+    current_user: UserRead = Depends(get_current_user),
+):
+    subordinates = await crud_org.get_subordinates(db, user_id, max_depth=max_depth, skip=skip, limit=limit)
+    return [OrgSubordinate(user_id=subordinate_id, depth=depth) for subordinate_id, depth in subordinates]
@@ -0,0 +1,119 @@
+import uuid
+from typing import List
+
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.endpoints.auth import get_current_user, require_superuser
+from app.crud import roles as crud_roles
+from app.db.session import get_async_session, get_read_session
+from app.schemas.role import RoleCreate, RoleMembers, RoleRead
+from app.schemas.user import UserRead
+
+router = APIRouter()
+
+
+async def _get_role_or_404(db: AsyncSession, role_id: int):
+    role = await crud_roles.get_role(db, role_id)
+    if role is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Роль не найдена.")
+    return role
+
+
+@router.post(
+    "",
+    response_model=RoleRead,
+    status_code=status.HTTP_201_CREATED,
+    summary="Создать роль или группу",
+)
+async def create_role(
+    role_in: RoleCreate,
+    db: AsyncSession = Depends(get_async_session),
+    current_user: UserRead = Depends(require_superuser),
+):
+    try:
+        return await crud_roles.create_role(db, role_in)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+
+
+@router.get(
+    "",
+    response_model=List[RoleRead],
+    summary="Роли и группы организации",
+)
+async def list_roles(
+    db: AsyncSession = Depends(get_read_session),
+    current_user: UserRead = Depends(get_current_user),
+):
+    return await crud_roles.get_roles(db)
+
+
+@router.delete(
+    "/{role_id}",
+    status_code=status.HTTP_204_NO_CONTENT,
+    summary="Удалить роль",
+    description="Роль, назначенную исполнителем шагов, удалить нельзя.",
+)
+async def delete_role(
+    role_id: int,
+    db: AsyncSession = Depends(get_async_session),
+    current_user: UserRead = Depends(require_superuser),
+):
+    role = await _get_role_or_404(db, role_id)
+    try:
+        await crud_roles.delete_role(db, role)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
+@router.get(
+    "/{role_id}/members",
+    response_model=RoleMembers,
+    summary="Участники роли",
+)
+async def get_role_members(
+    role_id: int,
+    db: AsyncSession = Depends(get_read_session),
+    current_user: UserRead = Depends(get_current_user),
+):
+    await _get_role_or_404(db, role_id)
+    return RoleMembers(user_ids=await crud_roles.get_role_members(db, role_id))
+
+
+@router.post(
+    "/{role_id}/members",
+    response_model=RoleMembers,
+    summary="Добавить участников роли",
+    description="Права участников обновляются сразу: кэш прав привязан к версии прав пользователя.",
+)
+async def add_role_members(
+    role_id: int,
+    members_in: RoleMembers,
+    db: AsyncSession = Depends(get_async_session),
+    current_user: UserRead = Depends(require_superuser),
+):
+    role = await _get_role_or_404(db, role_id)
+    try:
+        await crud_roles.add_role_members(db, role, members_in.user_ids)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_CONTENT, detail=str(e))
+    return RoleMembers(user_ids=await crud_roles.get_role_members(db, role_id))
+
+
+@router.delete(
+    "/{role_id}/members/{user_id}",
+    status_code=status.HTTP_204_NO_CONTENT,
+    summary="Исключить участника из роли",
+)
+async def remove_role_member(
+    role_id: int,
+    user_id: uuid.UUID,
+    db: AsyncSession = Depends(get_async_session),
+    current_user: UserRead = Depends(require_superuser),
+):
+    role = await _get_role_or_404(db, role_id)
+    if not await crud_roles.remove_role_member(db, role, user_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Пользователь не состоит в роли.")
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
@@ -1,28 +1,55 @@
+import uuid
 from datetime import datetime
-from typing import List, Optional
+from typing import List, Literal, Optional
 from pydantic import BaseModel, Field
 
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Response
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, status, UploadFile, File, Response, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
 from sqlalchemy import select
 
-from app.db.session import get_async_session
+from app.db.session import get_async_session, get_read_session
 from app.api.endpoints.auth import get_current_user
 from app.schemas.user import UserRead
+from app.schemas.upload import UploadSessionCreate, UploadSessionRead
 from app.schemas.workflow import (
     WorkflowTemplateCreate,
     WorkflowTemplateRead,
     WorkflowStepCreate,
     WorkflowStepRead,
+    WorkflowTemplateVersionInfo,
+    WorkflowTemplateVersionRead,
+    TemplateCatalog,
+    TemplateCatalogImportResult,
     WorkflowInstanceCreate,
     WorkflowInstanceRead,
+    WorkflowInstanceSummary,
     AttachmentRead,
     AttachmentCreate,
+    SearchPage,
+    ChangesPage,
 )
 from app.crud import workflow as crud_workflow
+from app.crud import search as crud_search
+from app.crud import changes as crud_changes
+from app.crud import template_versions as crud_versions
+from app.crud import template_catalog as crud_catalog
+from app.crud import uploads as crud_uploads
+from app.crud.permissions import get_permissions
 from app.models.workflow import WorkflowTemplate, WorkflowInstance, WorkflowStep, Attachment
 from app.core.minio_client import minio_client # Импортируем Minio клиент
+from app.core.config import settings
+from app.core.events import EventStreamResponse, instance_topic, publish_instance_event, role_topic, user_topic
+from app.core.http_cache import etag_matches
+from app.core.services import services
+from app.core.archive import ArchiveMember, stream_zip, unique_member_names
+from app.core.previews import (
+    PREVIEW_CONTENT_TYPE,
+    PREVIEW_PENDING,
+    PREVIEW_READY,
+    initial_preview_status,
+    preview_object_name,
+)
 
 
 router = APIRouter()
@@ -34,7 +61,8 @@ router = APIRouter()
     response_model=WorkflowTemplateRead,
     status_code=status.HTTP_201_CREATED,
     summary="Создать новый шаблон рабочего процесса",
-    description="Создает новый шаблон рабочего процесса с указанным названием и описанием."
+    description="Создает новый шаблон рабочего процесса с указанным названием и описанием. "
+                "Шаги можно передать сразу в `steps`: шаблон и шаги создаются в одной транзакции."
 )
 async def create_template(
     template_in: WorkflowTemplateCreate,
@@ -48,10 +76,44 @@ async def create_template(
             detail="Шаблон с таким названием уже существует."
         )
     
-    db_template = await crud_workflow.create_workflow_template(db, template_in=template_in)
+    try:
+        db_template = await crud_workflow.create_workflow_template(db, template_in=template_in)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_CONTENT, detail=str(e))
     return db_template
 
 
+@router.get(
+    "/workflow_templates/export",
+    response_model=TemplateCatalog,
+    summary="Выгрузить каталог шаблонов",
+    description="Возвращает все шаблоны с шагами в формате для переноса между окружениями. "
+                "Исполнители шагов указываются почтой."
+)
+async def export_templates(
+    db: AsyncSession = Depends(get_read_session),
+    current_user: UserRead = Depends(get_current_user),
+):
+    return await crud_catalog.export_template_catalog(db)
+
+
+@router.post(
+    "/workflow_templates/import",
+    response_model=TemplateCatalogImportResult,
+    summary="Загрузить каталог шаблонов",
+    description="Создает шаблоны из каталога одной транзакцией. Шаблоны с уже занятыми названиями пропускаются."
+)
+async def import_templates(
+    catalog: TemplateCatalog,
+    db: AsyncSession = Depends(get_async_session),
+    current_user: UserRead = Depends(get_current_user),
+):
+    try:
+        return await crud_catalog.import_template_catalog(db, catalog)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_CONTENT, detail=str(e))
+
+
 @router.get(
     "/workflow_templates/{template_id}",
     response_model=WorkflowTemplateRead,
@@ -60,12 +122,12 @@ async def create_template(
 )
 async def get_template(
     template_id: int,
-    db: AsyncSession = Depends(get_async_session),
+    db: AsyncSession = Depends(get_read_session),
     current_user: UserRead = Depends(get_current_user),
 ):
     template = await db.execute(
         select(WorkflowTemplate)
-        .options(selectinload(WorkflowTemplate.steps))
+        .options(*crud_workflow.TEMPLATE_READ_OPTIONS)
         .where(WorkflowTemplate.id == template_id)
     )
     db_template = template.scalar_one_or_none()
@@ -86,7 +148,7 @@ async def get_template(
 async def list_templates(
     skip: int = 0,
     limit: int = 100,
-    db: AsyncSession = Depends(get_async_session),
+    db: AsyncSession = Depends(get_read_session),
     current_user: UserRead = Depends(get_current_user),
 ):
     templates = await crud_workflow.get_workflow_templates(db, skip=skip, limit=limit)
@@ -114,10 +176,95 @@ async def add_step_to_template(
             detail="Шаблон рабочего процесса не найден."
         )
     
-    db_step = await crud_workflow.create_workflow_step(db, step_in=step_in, template_id=template_id)
+    try:
+        db_step = await crud_workflow.create_workflow_step(db, step_in=step_in, template_id=template_id)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_CONTENT, detail=str(e))
     return db_step
 
 
+# --- Template Versions ---
+# Опубликованная версия никогда не меняется: клиент и прокси могут хранить ее сколько угодно
+IMMUTABLE_CACHE_CONTROL = "private, max-age=31536000, immutable"
+
+
+def _version_response(version: crud_versions.CompiledVersion, status_code: int = status.HTTP_200_OK) -> Response:
+    return Response(
+        content=version.body,
+        status_code=status_code,
+        media_type="application/json",
+        headers={"Cache-Control": IMMUTABLE_CACHE_CONTROL, "ETag": version.etag},
+    )
+
+
+@router.post(
+    "/workflow_templates/{template_id}/publish",
+    response_model=WorkflowTemplateVersionRead,
+    status_code=status.HTTP_201_CREATED,
+    summary="Опубликовать версию шаблона",
+    description=(
+        "Фиксирует текущий черновик шаблона (название, описание, шаги) как следующую "
+        "неизменяемую версию. Новые экземпляры запускаются по последней версии; уже "
+        "запущенные остаются на своей. Черновик после публикации можно дальше редактировать."
+    )
+)
+async def publish_template(
+    template_id: int,
+    db: AsyncSession = Depends(get_async_session),
+    current_user: UserRead = Depends(get_current_user),
+):
+    try:
+        version = await crud_versions.publish_template_version(db, template_id, published_by_id=current_user.id)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_CONTENT, detail=str(e))
+    if version is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Шаблон рабочего процесса не найден."
+        )
+    return _version_response(version, status.HTTP_201_CREATED)
+
+
+@router.get(
+    "/workflow_templates/{template_id}/versions",
+    response_model=List[WorkflowTemplateVersionInfo],
+    summary="Список опубликованных версий шаблона",
+)
+async def list_template_versions(
+    template_id: int,
+    db: AsyncSession = Depends(get_read_session),
+    current_user: UserRead = Depends(get_current_user),
+):
+    return await crud_versions.list_template_versions(db, template_id)
+
+
+@router.get(
+    "/workflow_templates/{template_id}/versions/{version}",
+    response_model=WorkflowTemplateVersionRead,
+    summary="Получить опубликованную версию шаблона",
+    description="Версия неизменяема: ответ кэшируется клиентом навсегда (`Cache-Control: immutable`, `ETag`).",
+)
+async def get_template_version(
+    template_id: int,
+    version: int,
+    request: Request,
+    db: AsyncSession = Depends(get_read_session),
+    current_user: UserRead = Depends(get_current_user),
+):
+    compiled = await crud_versions.get_compiled_version_by_number(db, template_id, version)
+    if compiled is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Версия шаблона не найдена."
+        )
+    if etag_matches(request.headers.get("if-none-match"), compiled.etag):
+        return Response(
+            status_code=status.HTTP_304_NOT_MODIFIED,
+            headers={"Cache-Control": IMMUTABLE_CACHE_CONTROL, "ETag": compiled.etag},
+        )
+    return _version_response(compiled)
+
+
 @router.get(
     "/workflow_steps/{step_id}",
     response_model=WorkflowStepRead,
@@ -126,7 +273,7 @@ async def add_step_to_template(
 )
 async def get_step(
     step_id: int,
-    db: AsyncSession = Depends(get_async_session),
+    db: AsyncSession = Depends(get_read_session),
     current_user: UserRead = Depends(get_current_user),
 ):
     step = await crud_workflow.get_workflow_step(db, step_id=step_id)
@@ -158,9 +305,15 @@ async def create_instance(
             detail="Шаблон рабочего процесса не найден."
         )
     
-    db_instance = await crud_workflow.create_workflow_instance(
-        db, instance_in=instance_in, created_by_id=current_user.id
-    )
+    try:
+        db_instance = await crud_workflow.create_workflow_instance(
+            db, instance_in=instance_in, created_by_id=current_user.id
+        )
+    except LookupError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_CONTENT, detail=str(e))
+    await publish_instance_event(db_instance, action="create", actor_id=current_user.id)
     return db_instance
 
 
@@ -172,18 +325,12 @@ async def create_instance(
 )
 async def get_instance(
     instance_id: int,
-    db: AsyncSession = Depends(get_async_session),
+    db: AsyncSession = Depends(get_read_session),
     current_user: UserRead = Depends(get_current_user),
 ):
     instance = await db.execute(
         select(WorkflowInstance)
-        .options(
-            selectinload(WorkflowInstance.template),
-            selectinload(WorkflowInstance.current_step),
-            selectinload(WorkflowInstance.created_by),
-            selectinload(WorkflowInstance.history),
-            selectinload(WorkflowInstance.attachments),
-        )
+        .options(*crud_workflow.INSTANCE_READ_OPTIONS)
         .where(WorkflowInstance.id == instance_id)
     )
     db_instance = instance.scalar_one_or_none()
@@ -195,6 +342,41 @@ async def get_instance(
     return db_instance
 
 
+@router.get(
+    "/workflow_instances/{instance_id}/attachments.zip",
+    response_class=StreamingResponse,
+    responses={200: {"content": {"application/zip": {}}}},
+    summary="Скачать все вложения экземпляра одним архивом",
+    description="Отдает ZIP со всеми вложениями экземпляра. Архив собирается на лету из хранилища "
+                "и начинает передаваться сразу; размер архива не ограничен."
+)
+async def download_instance_attachments(
+    instance_id: int,
+    db: AsyncSession = Depends(get_read_session),
+    current_user: UserRead = Depends(get_current_user),
+):
+    instance = await crud_workflow.get_workflow_instance(db, instance_id=instance_id)
+    if not instance:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Экземпляр рабочего процесса не найден."
+        )
+    files = await crud_workflow.get_attachment_files(db, instance_id)
+    archive_name = f"{instance.reference_id or f'INST-{instance.id:06d}'}.zip"
+    # Передача архива может длиться долго: соединение с БД возвращаем в пул сразу
+    await db.close()
+
+    members = [
+        ArchiveMember(name=name, object_name=s3_path, modified=uploaded_at)
+        for name, (_, s3_path, uploaded_at) in zip(unique_member_names([f[0] for f in files]), files)
+    ]
+    return StreamingResponse(
+        stream_zip(members, minio_client.stream_file, settings.ARCHIVE_PREFETCH),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{archive_name}"'},
+    )
+
+
 # --- Attachments ---
 @router.post(
     "/attachments/upload",
@@ -219,10 +401,146 @@ async def upload_attachment(
         s3_path=file_path_in_minio,
         uploaded_by_id=current_user.id,
         instance_id=instance_id,
+        preview_status=initial_preview_status(file.content_type) if settings.PREVIEWS_ENABLED else None,
+    )
+    _schedule_preview(db_attachment)
+    return db_attachment
+
+
+def _schedule_preview(attachment: Attachment) -> None:
+    # Превью строятся в фоне: ответ на загрузку их не ждет
+    if attachment.preview_status == PREVIEW_PENDING:
+        services.get("preview_pipeline").schedule(attachment.id)
+
+
+# --- Resumable uploads ---
+async def _get_upload_or_404(db: AsyncSession, upload_id: uuid.UUID, current_user: UserRead):
+    upload = await crud_uploads.get_upload_session(db, upload_id, current_user.id)
+    if upload is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Сессия загрузки не найдена или истекла.")
+    return upload
+
+
+@router.post(
+    "/uploads",
+    response_model=UploadSessionRead,
+    status_code=status.HTTP_201_CREATED,
+    summary="Начать возобновляемую загрузку",
+    description="Создает сессию загрузки большого файла по частям. Части размером `chunk_size` отправляются "
+                "`PATCH /uploads/{id}` с заголовком `Upload-Offset`, параллельно и в любом порядке; "
+                "после всех частей загрузка завершается `POST /uploads/{id}/complete`."
+)
+async def create_upload(
+    upload_in: UploadSessionCreate,
+    response: Response,
+    db: AsyncSession = Depends(get_async_session),
+    current_user: UserRead = Depends(get_current_user),
+):
+    try:
+        upload = await crud_uploads.create_upload_session(db, minio_client, upload_in, current_user.id)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_413_CONTENT_TOO_LARGE, detail=str(e))
+    response.headers["Location"] = f"/workflow/uploads/{upload.id}"
+    return crud_uploads.describe_upload(upload, {})
+
+
+@router.get(
+    "/uploads/{upload_id}",
+    response_model=UploadSessionRead,
+    summary="Состояние загрузки",
+    description="Возвращает принятое смещение и смещения недостающих частей, чтобы продолжить загрузку."
+)
+async def get_upload(
+    upload_id: uuid.UUID,
+    response: Response,
+    db: AsyncSession = Depends(get_async_session),
+    current_user: UserRead = Depends(get_current_user),
+):
+    upload = await _get_upload_or_404(db, upload_id, current_user)
+    state = crud_uploads.describe_upload(upload, await crud_uploads.get_received_parts(db, upload.id))
+    response.headers["Upload-Offset"] = str(state.offset)
+    return state
+
+
+@router.patch(
+    "/uploads/{upload_id}",
+    status_code=status.HTTP_204_NO_CONTENT,
+    summary="Загрузить часть файла",
+    description="Тело запроса — часть файла, начинающаяся со смещения `Upload-Offset` (кратного `chunk_size`)."
+)
+async def upload_chunk(
+    upload_id: uuid.UUID,
+    request: Request,
+    upload_offset: int = Header(..., alias="Upload-Offset"),
+    db: AsyncSession = Depends(get_async_session),
+    current_user: UserRead = Depends(get_current_user),
+):
+    upload = await _get_upload_or_404(db, upload_id, current_user)
+    # Часть читается целиком (не больше chunk_size): так ее принимает хранилище
+    data = bytearray()
+    async for piece in request.stream():
+        data += piece
+        if len(data) > upload.chunk_size:
+            raise HTTPException(
+                status_code=status.HTTP_413_CONTENT_TOO_LARGE, detail=f"Часть больше {upload.chunk_size} байт."
+            )
+    try:
+        await crud_uploads.put_part(db, minio_client, upload, upload_offset, bytes(data))
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
+@router.post(
+    "/uploads/{upload_id}/complete",
+    response_model=AttachmentRead,
+    status_code=status.HTTP_201_CREATED,
+    summary="Завершить загрузку",
+    description="Собирает файл из принятых частей и создает вложение."
+)
+async def complete_upload(
+    upload_id: uuid.UUID,
+    db: AsyncSession = Depends(get_async_session),
+    current_user: UserRead = Depends(get_current_user),
+):
+    upload = await _get_upload_or_404(db, upload_id, current_user)
+    # Запись о вложении появляется в транзакции до сборки объекта и
+    # фиксируется вместе с удалением сессии
+    db_attachment = await crud_workflow.create_attachment(
+        db,
+        attachment_in=AttachmentCreate(filename=upload.filename, content_type=upload.content_type),
+        s3_path=upload.object_name,
+        uploaded_by_id=current_user.id,
+        instance_id=upload.instance_id,
+        preview_status=initial_preview_status(upload.content_type) if settings.PREVIEWS_ENABLED else None,
+        commit=False,
     )
+    try:
+        await crud_uploads.complete_upload(db, minio_client, upload)
+    except ValueError as e:
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    await db.refresh(db_attachment)
+    _schedule_preview(db_attachment)
     return db_attachment
 
 
+@router.delete(
+    "/uploads/{upload_id}",
+    status_code=status.HTTP_204_NO_CONTENT,
+    summary="Отменить загрузку",
+    description="Удаляет сессию и уже загруженные части."
+)
+async def abort_upload(
+    upload_id: uuid.UUID,
+    db: AsyncSession = Depends(get_async_session),
+    current_user: UserRead = Depends(get_current_user),
+):
+    upload = await _get_upload_or_404(db, upload_id, current_user)
+    await crud_uploads.abort_upload(db, minio_client, upload)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
 @router.get(
     "/attachments/{attachment_id}/download",
     summary="Скачать файл вложения",
@@ -230,7 +548,7 @@ async def upload_attachment(
 )
 async def download_attachment(
     attachment_id: int,
-    db: AsyncSession = Depends(get_async_session),
+    db: AsyncSession = Depends(get_read_session),
     current_user: UserRead = Depends(get_current_user),
 ):
     attachment = await crud_workflow.get_attachment(db, attachment_id=attachment_id)
@@ -244,6 +562,144 @@ async def download_attachment(
     return Response(content=file_content, media_type=attachment.content_type)
 
 
+@router.get(
+    "/attachments/{attachment_id}/preview",
+    response_class=Response,
+    responses={200: {"content": {PREVIEW_CONTENT_TYPE: {}}}, 304: {}},
+    summary="Превью вложения",
+    description="Отдает JPEG-превью первой страницы (`kind=preview`) или миниатюру (`kind=thumbnail`). "
+                "Превью строятся в фоне после загрузки; пока они не готовы, ответ — 404."
+)
+async def get_attachment_preview(
+    attachment_id: int,
+    request: Request,
+    kind: Literal["preview", "thumbnail"] = "thumbnail",
+    db: AsyncSession = Depends(get_read_session),
+    current_user: UserRead = Depends(get_current_user),
+):
+    attachment = await crud_workflow.get_attachment(db, attachment_id=attachment_id)
+    if not attachment:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Вложение не найдено.")
+    if attachment.preview_status != PREVIEW_READY:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Превью недоступно.")
+
+    # Превью определяется содержимым файла и никогда не меняется
+    headers = {"Cache-Control": IMMUTABLE_CACHE_CONTROL, "ETag": f'"{attachment.content_hash}-{kind}"'}
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    content = await minio_client.download_file(preview_object_name(attachment.content_hash, kind))
+    return Response(content=content, media_type=PREVIEW_CONTENT_TYPE, headers=headers)
+
+
+# --- Search ---
+@router.get(
+    "/search",
+    response_model=SearchPage,
+    summary="Полнотекстовый поиск",
+    description=(
+        "Ищет по названиям и описаниям шаблонов, номерам экземпляров, комментариям "
+        "истории и именам файлов вложений. Результаты ранжированы по релевантности; "
+        "следующая страница запрашивается по `next_cursor`."
+    )
+)
+async def search(
+    q: str = Query(..., min_length=1, max_length=256, description="Поисковый запрос"),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_session),
+    current_user: UserRead = Depends(get_current_user),
+):
+    try:
+        items, next_cursor = await crud_search.search_workflow(db, query=q, limit=limit, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return SearchPage(items=items, next_cursor=next_cursor)
+
+
+# --- Change Feed ---
+@router.get(
+    "/changes",
+    response_model=ChangesPage,
+    summary="Изменения экземпляров и истории с момента прошлой синхронизации",
+    description=(
+        "Отдает экземпляры (без вложенных объектов), записи истории и удаления, "
+        "появившиеся после токена `since`. Первый запрос — без `since`; затем передавайте "
+        "`next_token` из ответа. При `has_more` следующую страницу можно запросить сразу. "
+        "Объект может прийти повторно — применяйте изменения как upsert по `id`."
+    )
+)
+async def list_changes(
+    since: Optional[str] = Query(None, max_length=256, description="Токен из предыдущего ответа"),
+    limit: int = Query(500, ge=1, le=1000),
+    db: AsyncSession = Depends(get_read_session),
+    current_user: UserRead = Depends(get_current_user),
+):
+    try:
+        instances, history, deleted, next_token, has_more = await crud_changes.get_changes(
+            db, since=since, limit=limit
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return ChangesPage(
+        instances=instances, history=history, deleted=deleted, next_token=next_token, has_more=has_more
+    )
+
+
+@router.get(
+    "/inbox",
+    response_model=List[WorkflowInstanceSummary],
+    summary="Входящие: экземпляры, ожидающие решения пользователя",
+    description="Экземпляры в работе, текущий шаг которых назначен пользователю, одной из его ролей "
+                "или сотруднику, которого он сейчас замещает; сначала ждущие дольше всех."
+)
+async def get_inbox(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=500),
+    db: AsyncSession = Depends(get_async_session),
+    read_db: AsyncSession = Depends(get_read_session),
+    current_user: UserRead = Depends(get_current_user),
+):
+    # Роли и замещения читаются с основной базы: версия прав пользователя взята оттуда же
+    permissions = await get_permissions(db, current_user)
+    return await crud_workflow.get_inbox(read_db, permissions, skip=skip, limit=limit)
+
+
+# --- Events ---
+@router.get(
+    "/events",
+    response_class=Response,
+    responses={200: {"content": {"text/event-stream": {}}, "description": "Поток событий"}},
+    summary="Поток изменений экземпляров (Server-Sent Events)",
+    description=(
+        "Держит соединение открытым и присылает события `instance` об изменениях "
+        "экземпляров, которые пользователь создал, на шаге которых исполнитель он, его роль "
+        "или коллега, которого он замещает на момент подключения, или которые перечислены "
+        "в `instance_id`, а также события `job` о статусе и "
+        "прогрессе фоновых задач пользователя. Событие `resync` означает, что часть "
+        "событий пропущена и состояние нужно перечитать; после переподключения тоже."
+    )
+)
+async def instance_events(
+    instance_id: List[int] = Query([], max_length=100, description="Экземпляры для наблюдения"),
+    db: AsyncSession = Depends(get_async_session),
+    current_user: UserRead = Depends(get_current_user),
+):
+    # Соединение с БД нужно только для проверки токена и ролей: возвращаем его
+    # в пул сейчас, иначе каждый открытый поток держал бы соединение до разрыва
+    permissions = await get_permissions(db, current_user)
+    await db.close()
+    tenant = current_user.tenant_id
+    topics = (
+        [user_topic(current_user.id)]
+        + [user_topic(delegator_id) for delegator_id in sorted(
+            {grant.delegator_id for grant in permissions.active_delegations()}
+        )]
+        + [role_topic(role_id, tenant) for role_id in sorted(permissions.role_ids)]
+        + [instance_topic(i, tenant) for i in instance_id]
+    )
+    return EventStreamResponse(services.get("event_broker"), topics, settings.EVENTS_PING_INTERVAL)
+
+
 # --- Workflow Actions ---
 class WorkflowActionRequest(BaseModel):
     comment: Optional[str] = Field(None, description="Комментарий к действию")
@@ -263,9 +719,15 @@ async def approve_step(
     if not instance:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Экземпляр не найден.")
 
-    updated_instance = await crud_workflow.advance_workflow_instance(
-        db, instance=instance, user=current_user, action="approve", comment=action_in.comment
-    )
+    try:
+        updated_instance = await crud_workflow.advance_workflow_instance(
+            db, instance=instance, user=current_user, action="approve", comment=action_in.comment
+        )
+    except PermissionError as e:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    await publish_instance_event(updated_instance, action="approve", actor_id=current_user.id)
     return updated_instance
 
 
@@ -284,7 +746,13 @@ async def reject_step(
     if not instance:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Экземпляр не найден.")
 
-    updated_instance = await crud_workflow.advance_workflow_instance(
-        db, instance=instance, user=current_user, action="reject", comment=action_in.comment
-    )
+    try:
+        updated_instance = await crud_workflow.advance_workflow_instance(
+            db, instance=instance, user=current_user, action="reject", comment=action_in.comment
+        )
+    except PermissionError as e:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    await publish_instance_event(updated_instance, action="reject", actor_id=current_user.id)
     return updated_instance
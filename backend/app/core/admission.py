@@ -0,0 +1,241 @@
+import asyncio
+import collections
+import json
+import math
+import time
+from dataclasses import dataclass
+from typing import Deque, Dict, Optional
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.metrics import ADMISSION_IN_FLIGHT, ADMISSION_LIMIT, ADMISSION_QUEUE_WAIT, ADMISSION_SHED
+from app.db.routing import WRITE_METHODS
+
+# Служебные эндпоинты не ограничиваются: пробы и сбор метрик должны
+# отвечать именно тогда, когда сервис перегружен. Поток событий живет
+# часами и не держит соединение с БД — слот лимитера он занимал бы зря.
+EXEMPT_PREFIXES = ("/health/", "/metrics", "/workflow/events")
+ARCHIVE_SUFFIX = "/attachments.zip"
+
+
+class Overloaded(Exception):
+    def __init__(self, retry_after: float):
+        super().__init__(f"overloaded, retry after {retry_after:.2f} s")
+        self.retry_after = retry_after
+
+
+class AdaptiveLimiter:
+    """
+    Ограничитель параллелизма одного класса маршрутов с очередью ожидания.
+
+    Лимит подстраивается под измеренную длительность обработки (градиентный
+    алгоритм, как в Netflix concurrency-limits): пока короткое среднее
+    времени ответа близко к долгосрочному, лимит растет на sqrt(limit); когда
+    ответы замедляются (очередь в пуле БД, блокировки), лимит уменьшается
+    пропорционально замедлению. Так лишние запросы ждут здесь, с дедлайном,
+    а не в пуле соединений, где они задерживают всех.
+
+    Запрос, которому по прогнозу придется ждать дольше `max_wait`, сразу
+    получает отказ с оценкой, когда стоит повторить.
+    """
+
+    def __init__(self, name: str, initial_limit: int, min_limit: int, max_limit: int, max_wait: float,
+                 tolerance: float = 2.0, smoothing: float = 0.2):
+        self.name = name
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.max_wait = max_wait
+        self.tolerance = tolerance
+        self.smoothing = smoothing
+        self.in_flight = 0
+        self.short_rtt: Optional[float] = None
+        self.long_rtt: Optional[float] = None
+        self._waiters: Deque[asyncio.Future] = collections.deque()
+        ADMISSION_LIMIT.labels(name).set(self.limit)
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def predicted_wait(self) -> float:
+        # Очередь рассасывается со скоростью limit / rtt запросов в секунду
+        rtt = self.short_rtt if self.short_rtt is not None else 0.05
+        return (self.queued + 1) * rtt / max(int(self.limit), 1)
+
+    async def acquire(self) -> None:
+        if self.in_flight < int(self.limit) and not self._waiters:
+            self._admit()
+            return
+        predicted = self.predicted_wait()
+        if predicted > self.max_wait:
+            ADMISSION_SHED.labels(self.name, "predicted").inc()
+            raise Overloaded(predicted)
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(future, self.max_wait)
+        except asyncio.TimeoutError:
+            self._discard(future)
+            ADMISSION_SHED.labels(self.name, "deadline").inc()
+            raise Overloaded(self.predicted_wait())
+        except asyncio.CancelledError:
+            # Клиент ушел: если слот уже был выдан, возвращаем его
+            self._discard(future)
+            if future.done() and not future.cancelled():
+                self.release(None)
+            raise
+        ADMISSION_QUEUE_WAIT.labels(self.name).observe(time.perf_counter() - started)
+
+    def release(self, latency: Optional[float]) -> None:
+        """
+        Освобождает слот; `latency` — время обработки без ожидания в очереди.
+        """
+        self.in_flight -= 1
+        ADMISSION_IN_FLIGHT.labels(self.name).dec()
+        if latency is not None:
+            self._update_limit(latency)
+        while self._waiters and self.in_flight < int(self.limit):
+            future = self._waiters.popleft()
+            if not future.done():
+                self._admit()
+                future.set_result(None)
+
+    def _admit(self) -> None:
+        self.in_flight += 1
+        ADMISSION_IN_FLIGHT.labels(self.name).inc()
+
+    def _discard(self, future: asyncio.Future) -> None:
+        try:
+            self._waiters.remove(future)
+        except ValueError:
+            pass
+
+    def _update_limit(self, rtt: float) -> None:
+        if self.short_rtt is None:
+            self.short_rtt = self.long_rtt = rtt
+            return
+        self.short_rtt += 0.1 * (rtt - self.short_rtt)
+        self.long_rtt += 0.002 * (rtt - self.long_rtt)
+        # Долгосрочный ориентир не должен "привыкать" к деградации быстрее, чем она исправляется
+        if self.short_rtt < self.long_rtt:
+            self.long_rtt = self.short_rtt
+        gradient = max(0.5, min(1.0, self.tolerance * self.long_rtt / self.short_rtt))
+        # Запас на рост добавляется только без очереди: иначе limit * 0.5 + sqrt(limit)
+        # сходится к 4 и при устойчивой деградации лимит не опускается до минимума
+        headroom = math.sqrt(self.limit) if gradient >= 1.0 else 0.0
+        target = self.limit * gradient + headroom
+        limit = self.limit * (1 - self.smoothing) + target * self.smoothing
+        self.limit = max(float(self.min_limit), min(float(self.max_limit), limit))
+        ADMISSION_LIMIT.labels(self.name).set(self.limit)
+
+
+@dataclass
+class RouteClass:
+    name: str
+    share: float  # вес класса среди классов того же пула БД
+    min_limit: int
+    max_wait: float  # бюджет ожидания в очереди, секунды
+    replica: bool = False  # работает с пулом реплики, если она настроена
+
+
+# Чтения идут на реплику; без нее делят основной пул с записями, и доли
+# нормируются так, чтобы сумма лимитов не превышала пул. Записи не
+# занимают больше половины основного пула, поэтому даже при шторме записей
+# auth и загрузки получают соединения. Хеширование паролей в auth нагружает CPU, а не БД.
+ROUTE_CLASSES = (
+    RouteClass("reads", share=1.0, min_limit=2, max_wait=0.5, replica=True),
+    RouteClass("writes", share=0.5, min_limit=1, max_wait=2.0),
+    RouteClass("auth", share=0.25, min_limit=1, max_wait=2.0),
+    RouteClass("uploads", share=0.25, min_limit=1, max_wait=5.0),
+)
+
+
+def classify(scope: Scope) -> Optional[str]:
+    path: str = scope["path"]
+    if path.startswith(EXEMPT_PREFIXES):
+        return None
+    # Архив вложений скачивается минутами, а с БД работает только в начале
+    if path.endswith(ARCHIVE_SUFFIX):
+        return None
+    if path.startswith("/auth/") or path == "/users/register":
+        return "auth"
+    if path.startswith(("/workflow/attachments/upload", "/workflow/uploads")):
+        return "uploads"
+    return "writes" if scope["method"] in WRITE_METHODS else "reads"
+
+
+def build_limiters(pool_capacity: int, replica_capacity: Optional[int] = None) -> Dict[str, AdaptiveLimiter]:
+    """
+    Лимитеры классов маршрутов для процесса с основным пулом из
+    `pool_capacity` соединений и пулом реплики из `replica_capacity` (None —
+    реплики нет). Сумма лимитов классов одного пула не превышает его размер.
+    """
+    def uses_replica(route_class: RouteClass) -> bool:
+        return route_class.replica and replica_capacity is not None
+
+    limiters = {}
+    for route_class in ROUTE_CLASSES:
+        same_pool = [c for c in ROUTE_CLASSES if uses_replica(c) == uses_replica(route_class)]
+        share = route_class.share / max(1.0, sum(c.share for c in same_pool))
+        capacity = replica_capacity if uses_replica(route_class) else pool_capacity
+        max_limit = max(route_class.min_limit, int(capacity * share))
+        limiters[route_class.name] = AdaptiveLimiter(
+            route_class.name,
+            initial_limit=max(route_class.min_limit, max_limit // 2),
+            min_limit=route_class.min_limit,
+            max_limit=max_limit,
+            max_wait=route_class.max_wait,
+        )
+    return limiters
+
+
+class AdmissionControlMiddleware:
+    """
+    ASGI-middleware: пропускает запросы через лимитер их класса и отвечает
+    503 с `Retry-After`, если запрос не дождется обработки в пределах бюджета.
+    """
+
+    def __init__(self, app: ASGIApp, limiters: Dict[str, AdaptiveLimiter]):
+        self.app = app
+        self.limiters = limiters
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        route_class = classify(scope) if scope["type"] == "http" else None
+        limiter = self.limiters.get(route_class) if route_class else None
+        if limiter is None:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            await limiter.acquire()
+        except Overloaded as e:
+            await self._shed(send, e.retry_after)
+            return
+
+        started = time.perf_counter()
+        failed = False
+        try:
+            await self.app(scope, receive, send)
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            # Время упавшего запроса не говорит о нагрузке — лимит по нему не меняем
+            limiter.release(None if failed else time.perf_counter() - started)
+
+    async def _shed(self, send: Send, retry_after: float) -> None:
+        body = json.dumps({"detail": "Сервис перегружен, повторите запрос позже."}, ensure_ascii=False).encode()
+        start: Message = {
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+            ],
+        }
+        await send(start)
+        await send({"type": "http.response.body", "body": body})
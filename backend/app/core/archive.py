@@ -0,0 +1,125 @@
+import asyncio
+import zipfile
+from dataclasses import dataclass
+from datetime import datetime
+from typing import AsyncIterator, Callable, List, Optional, Set
+
+# Чанков одного файла, прочитанных из хранилища, но еще не записанных в архив
+MEMBER_BUFFER_CHUNKS = 2
+
+OpenStream = Callable[[str], AsyncIterator[bytes]]
+
+
+@dataclass
+class ArchiveMember:
+    name: str  # имя внутри архива
+    object_name: str  # объект в хранилище
+    modified: datetime
+
+
+class _Sink:
+    """
+    Приемник, в который пишет ZipFile. У него нет seek/tell, поэтому ZipFile
+    пишет в потоковом режиме: размеры и CRC — в data descriptor после данных.
+    """
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def unique_member_names(filenames: List[str]) -> List[str]:
+    """
+    Имена файлов внутри архива: без путей и без повторов ("акт.pdf", "акт (2).pdf").
+    """
+    seen: Set[str] = set()
+    names = []
+    for filename in filenames:
+        name = filename.replace("/", "_").replace("\\", "_").strip() or "file"
+        if name in (".", ".."):
+            name = "file"
+        stem, dot, extension = name.rpartition(".")
+        if not stem:
+            stem, dot, extension = name, "", ""
+        candidate, copy = name, 1
+        while candidate.lower() in seen:
+            copy += 1
+            candidate = f"{stem} ({copy}){dot}{extension}"
+        seen.add(candidate.lower())
+        names.append(candidate)
+    return names
+
+
+async def _prefetch(open_stream: OpenStream, object_name: str, queue: asyncio.Queue) -> None:
+    try:
+        async for chunk in open_stream(object_name):
+            await queue.put(chunk)
+        await queue.put(None)
+    except Exception as e:
+        await queue.put(e)
+
+
+async def stream_zip(members: List[ArchiveMember], open_stream: OpenStream, prefetch: int) -> AsyncIterator[bytes]:
+    """
+    Собирает ZIP на лету и отдает его по частям.
+
+    Ничего не сохраняется ни в памяти целиком, ни на диске: файлы читаются
+    из хранилища чанками и сразу пишутся в архив без сжатия (вложения —
+    PDF, изображения, офисные документы — уже сжаты). Пока пишется текущий
+    файл, следующие `prefetch - 1` уже читаются параллельно, каждый в
+    ограниченный буфер, поэтому память не зависит от размера архива. ZIP64
+    включен для всех файлов: их размер заранее неизвестен и может превышать 4 ГБ.
+
+    Args:
+        members (List[ArchiveMember]): Файлы архива в нужном порядке.
+        open_stream (Callable): Открывает объект хранилища как асинхронный поток чанков.
+        prefetch (int): Сколько файлов читается из хранилища одновременно.
+    """
+    queues: List[Optional[asyncio.Queue]] = [None] * len(members)
+    tasks: List[asyncio.Task] = []
+
+    def start(index: int) -> None:
+        if index < len(members):
+            queues[index] = asyncio.Queue(maxsize=MEMBER_BUFFER_CHUNKS)
+            tasks.append(asyncio.create_task(_prefetch(open_stream, members[index].object_name, queues[index])))
+
+    for index in range(max(1, prefetch)):
+        start(index)
+
+    sink = _Sink()
+    archive = zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_STORED)
+    try:
+        for index, member in enumerate(members):
+            info = zipfile.ZipInfo(member.name, date_time=member.modified.timetuple()[:6])
+            info.external_attr = 0o644 << 16
+            with archive.open(info, mode="w", force_zip64=True) as destination:
+                while True:
+                    chunk = await queues[index].get()
+                    if chunk is None:
+                        break
+                    if isinstance(chunk, Exception):
+                        raise chunk
+                    # CRC32 считается в потоке: zlib отпускает GIL, а event
+                    # loop не стоит на многогигабайтных файлах
+                    await asyncio.to_thread(destination.write, chunk)
+                    yield sink.drain()
+            queues[index] = None
+            start(index + max(1, prefetch))
+            # Data descriptor этого файла уйдет вместе с первым чанком следующего
+        archive.close()
+        yield sink.drain()
+    finally:
+        # Клиент оборвал скачивание: останавливаем чтения из хранилища
+        for task in tasks:
+            task.cancel()
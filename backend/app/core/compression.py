@@ -0,0 +1,276 @@
+import asyncio
+import gzip
+import zlib
+from typing import Dict, List, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli  # type: ignore
+except ImportError:  # pragma: no cover - зависит от окружения
+    brotli = None
+
+try:
+    import zstandard  # type: ignore
+except ImportError:  # pragma: no cover - зависит от окружения
+    zstandard = None
+
+# Типы, которые сжимаются всегда (кроме исключений ниже); text/* и
+# суффиксы +json/+xml — тоже. Картинки, PDF, архивы уже сжаты.
+COMPRESSIBLE_TYPES = frozenset({
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "application/x-ndjson",
+    "image/svg+xml",
+})
+COMPRESSIBLE_SUFFIXES = ("+json", "+xml")
+# SSE нельзя буферизовать и сжимать: события должны уходить клиенту сразу
+EXCLUDED_TYPES = frozenset({"text/event-stream"})
+
+
+def is_compressible(content_type: str) -> bool:
+    media_type = content_type.split(";", 1)[0].strip().lower()
+    if not media_type or media_type in EXCLUDED_TYPES:
+        return False
+    return (
+        media_type in COMPRESSIBLE_TYPES
+        or media_type.startswith("text/")
+        or media_type.endswith(COMPRESSIBLE_SUFFIXES)
+    )
+
+
+class _ZlibStream:
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits=31 — формат gzip
+
+    def write(self, data: bytes) -> bytes:
+        # Z_SYNC_FLUSH: клиент может распаковать все, что уже получил
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class GzipCodec:
+    name = "gzip"
+
+    def __init__(self, level: int):
+        self.level = level
+
+    def compress(self, data: bytes) -> bytes:
+        return gzip.compress(data, self.level, mtime=0)
+
+    def stream(self) -> _ZlibStream:
+        return _ZlibStream(self.level)
+
+
+class _BrotliStream:
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def write(self, data: bytes) -> bytes:
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+class BrotliCodec:
+    name = "br"
+
+    def __init__(self, quality: int):
+        self.quality = quality
+
+    def compress(self, data: bytes) -> bytes:
+        return brotli.compress(data, quality=self.quality)
+
+    def stream(self) -> _BrotliStream:
+        return _BrotliStream(self.quality)
+
+
+class _ZstdStream:
+    def __init__(self, level: int):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def write(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class ZstdCodec:
+    name = "zstd"
+
+    def __init__(self, level: int):
+        self.level = level
+
+    def compress(self, data: bytes) -> bytes:
+        return zstandard.ZstdCompressor(level=self.level).compress(data)
+
+    def stream(self) -> _ZstdStream:
+        return _ZstdStream(self.level)
+
+
+def build_codecs(gzip_level: int = 6, brotli_quality: int = 4, zstd_level: int = 3) -> List:
+    """
+    Доступные кодеки в порядке предпочтения сервера: zstd и brotli быстрее
+    и плотнее gzip, но есть только при установленных `zstandard`/`brotli`.
+    """
+    codecs: List = []
+    if zstandard is not None:
+        codecs.append(ZstdCodec(zstd_level))
+    if brotli is not None:
+        codecs.append(BrotliCodec(brotli_quality))
+    codecs.append(GzipCodec(gzip_level))
+    return codecs
+
+
+def _parse_accept_encoding(value: str) -> Dict[str, float]:
+    weights: Dict[str, float] = {}
+    for item in value.split(","):
+        name, _, params = item.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            key, _, raw = param.strip().partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    q = float(raw)
+                except ValueError:
+                    q = 0.0
+        weights[name] = q
+    return weights
+
+
+def negotiate(accept_encoding: str, codecs: List) -> Optional[object]:
+    """
+    Выбирает кодек по `Accept-Encoding`: наибольший q, при равенстве —
+    порядок `codecs`. `*` относится ко всем не перечисленным кодировкам.
+
+    Returns:
+        Кодек или None, если клиент не принимает ни один из доступных.
+    """
+    weights = _parse_accept_encoding(accept_encoding)
+    best, best_q = None, 0.0
+    for codec in codecs:
+        q = weights.get(codec.name, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = codec, q
+    return best
+
+
+class CompressionMiddleware:
+    """
+    ASGI-middleware: сжимает ответы кодеком, выбранным по `Accept-Encoding`.
+
+    Не сжимаются ответы меньше `minimum_size`, несжимаемых типов (вложения
+    в PDF, картинки, ZIP), уже закодированные, частичные (206) и SSE.
+    Тела от `offload_size` байт сжимаются в пуле потоков, чтобы не держать
+    event loop; потоковые ответы сжимаются по частям. Сильный ETag сжатого
+    ответа ослабляется (`W/`), `Vary: Accept-Encoding` ставится на все
+    ответы сжимаемых типов и на 304.
+    """
+    def __init__(self, app: ASGIApp, codecs: List, minimum_size: int = 1024, offload_size: int = 128 * 1024):
+        self.app = app
+        self.codecs = codecs
+        self.minimum_size = minimum_size
+        self.offload_size = offload_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        # Без подходящего кодека ответ не сжимается, но Vary все равно ставится
+        codec = negotiate(Headers(scope=scope).get("accept-encoding", ""), self.codecs)
+        responder = _CompressingResponder(send, codec, self.minimum_size, self.offload_size)
+        await self.app(scope, receive, responder.send)
+
+
+def _weaken_etag(headers: MutableHeaders) -> None:
+    # Сжатое тело отличается от исходного побайтно, поэтому сильный ETag
+    # исходного представления становится слабым: If-None-Match сравнивает
+    # теги слабо и по-прежнему совпадает, а Range и If-Match — нет
+    etag = headers.get("etag")
+    if etag and not etag.startswith("W/"):
+        headers["ETag"] = "W/" + etag
+
+
+class _CompressingResponder:
+    def __init__(self, send: Send, codec: Optional[object], minimum_size: int, offload_size: int):
+        self._send = send
+        self.codec = codec
+        self.minimum_size = minimum_size
+        self.offload_size = offload_size
+        self.start: Optional[Message] = None
+        self.passthrough = False
+        self.stream = None
+
+    async def _run(self, func, data: bytes) -> bytes:
+        if len(data) >= self.offload_size:
+            return await asyncio.to_thread(func, data)
+        return func(data)
+
+    async def send(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            self.start = message
+            headers = MutableHeaders(scope=message)
+            if message["status"] == 304:
+                # Тела у 304 нет, сожмется ли 200 — неизвестно; слабый ETag
+                # совпадает с тегом и сжатого, и несжатого ответа
+                self.passthrough = True
+                headers.add_vary_header("Accept-Encoding")
+                if self.codec is not None:
+                    _weaken_etag(headers)
+                await self._send(message)
+                return
+            self.passthrough = (
+                message["status"] in (204, 206)
+                or "content-encoding" in headers
+                or not is_compressible(headers.get("content-type", ""))
+            )
+            if not self.passthrough:
+                # Представление зависит от Accept-Encoding, даже если этот ответ не сожмется
+                headers.add_vary_header("Accept-Encoding")
+                self.passthrough = self.codec is None
+            if self.passthrough:
+                await self._send(message)
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.start is not None:
+            start, self.start = self.start, None
+            headers = MutableHeaders(scope=start)
+            if not more_body:
+                if len(body) < self.minimum_size:
+                    self.passthrough = True
+                    await self._send(start)
+                    await self._send(message)
+                    return
+                compressed = await self._run(self.codec.compress, body)
+                headers["Content-Encoding"] = self.codec.name
+                headers["Content-Length"] = str(len(compressed))
+                _weaken_etag(headers)
+                await self._send(start)
+                await self._send({"type": "http.response.body", "body": compressed})
+                return
+            # Потоковый ответ: итоговый размер заранее неизвестен
+            self.stream = self.codec.stream()
+            headers["Content-Encoding"] = self.codec.name
+            del headers["Content-Length"]
+            _weaken_etag(headers)
+            await self._send(start)
+
+        chunk = await self._run(self.stream.write, body) if body else b""
+        if not more_body:
+            chunk += self.stream.finish()
+        await self._send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
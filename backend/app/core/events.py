@@ -0,0 +1,292 @@
+import asyncio
+import collections
+import json
+import logging
+from typing import Deque, Dict, Iterable, List, Optional, Set
+
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.metrics import EVENT_STREAMS, EVENTS_PUBLISHED
+from app.core.services import services
+from app.models.workflow import WorkflowInstance
+
+logger = logging.getLogger(__name__)
+
+REDIS_CHANNEL = "soglasovach:events"
+PING_FRAME = b": ping\n\n"
+# Подписчик не успевал читать и события были отброшены: клиент должен
+# перечитать состояние интересующих его экземпляров
+RESYNC_FRAME = b"event: resync\ndata: {}\n\n"
+
+
+# Целочисленные ID в разных шардах совпадают, поэтому в их темах есть тенант
+def instance_topic(instance_id: int, tenant: str) -> str:
+    return f"instance:{tenant}:{instance_id}"
+
+
+def role_topic(role_id: int, tenant: str) -> str:
+    return f"role:{tenant}:{role_id}"
+
+
+def user_topic(user_id) -> str:
+    return f"user:{user_id}"
+
+
+def encode_frame(event: str, payload: dict) -> bytes:
+    data = json.dumps(payload, ensure_ascii=False, separators=(",", ":"), default=str)
+    return f"event: {event}\ndata: {data}\n\n".encode()
+
+
+class Subscription:
+    """
+    Очередь событий одного SSE-соединения.
+
+    Кадры кодируются один раз при публикации и разделяются всеми
+    подписчиками; простаивающая подписка — это пустой deque и Event.
+    """
+
+    def __init__(self, topics: Iterable[str], max_pending: int):
+        self.topics = frozenset(topics)
+        self.closed = False
+        self._max_pending = max_pending
+        self._pending: Deque[bytes] = collections.deque()
+        self._lagged = False
+        self._wakeup = asyncio.Event()
+
+    def push(self, frame: bytes) -> None:
+        if self._lagged:
+            return
+        if len(self._pending) >= self._max_pending:
+            self._pending.clear()
+            self._pending.append(RESYNC_FRAME)
+            self._lagged = True
+        else:
+            self._pending.append(frame)
+        self._wakeup.set()
+
+    def close(self) -> None:
+        self.closed = True
+        self._wakeup.set()
+
+    async def wait(self) -> List[bytes]:
+        await self._wakeup.wait()
+        self._wakeup.clear()
+        frames = list(self._pending)
+        self._pending.clear()
+        self._lagged = False
+        return frames
+
+
+class InProcessBroker:
+    """
+    Рассылка событий подписчикам текущего процесса. Подходит для одного
+    воркера; при нескольких воркерах нужен `RedisBroker`.
+    """
+
+    def __init__(self, max_pending: int = 100):
+        self.max_pending = max_pending
+        self._by_topic: Dict[str, Set[Subscription]] = {}
+
+    def subscribe(self, topics: Iterable[str]) -> Subscription:
+        subscription = Subscription(topics, self.max_pending)
+        for topic in subscription.topics:
+            self._by_topic.setdefault(topic, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        for topic in subscription.topics:
+            subscribers = self._by_topic.get(topic)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._by_topic[topic]
+
+    async def publish(self, topics: List[str], frame: bytes) -> None:
+        self._deliver(topics, frame)
+
+    def _deliver(self, topics: Iterable[str], frame: bytes) -> None:
+        # Подписчик, совпавший по нескольким темам, получает кадр один раз
+        recipients: Set[Subscription] = set()
+        for topic in topics:
+            recipients.update(self._by_topic.get(topic, ()))
+        for subscription in recipients:
+            subscription.push(frame)
+
+    def _broadcast(self, frame: bytes) -> None:
+        for subscription in {s for subscribers in self._by_topic.values() for s in subscribers}:
+            subscription.push(frame)
+
+    async def close(self) -> None:
+        for subscribers in list(self._by_topic.values()):
+            for subscription in subscribers:
+                subscription.close()
+        self._by_topic.clear()
+
+
+class RedisBroker(InProcessBroker):
+    """
+    Рассылка между воркерами через Redis pub/sub.
+
+    Каждый процесс держит одно соединение-подписку на общий канал и сам
+    раздает события своим SSE-клиентам, поэтому число соединений с Redis не
+    зависит от числа клиентов. События, опубликованные этим же процессом,
+    тоже приходят через Redis — локальной доставки нет, дублей тоже.
+    """
+
+    def __init__(self, redis, max_pending: int = 100, channel: str = REDIS_CHANNEL):
+        super().__init__(max_pending)
+        self.redis = redis
+        self.channel = channel
+        self._listener: Optional[asyncio.Task] = None
+
+    def subscribe(self, topics: Iterable[str]) -> Subscription:
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.create_task(self._listen())
+        return super().subscribe(topics)
+
+    async def publish(self, topics: List[str], frame: bytes) -> None:
+        await self.redis.publish(self.channel, json.dumps({"topics": topics, "frame": frame.decode()}))
+
+    async def _listen(self) -> None:
+        reconnecting = False
+        while True:
+            pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(self.channel)
+                if reconnecting:
+                    # Пока подписки не было, события могли потеряться
+                    self._broadcast(RESYNC_FRAME)
+                    reconnecting = False
+                async for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    data = json.loads(message["data"])
+                    self._deliver(data["topics"], data["frame"].encode())
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Event broker lost Redis subscription, reconnecting")
+                reconnecting = True
+                await asyncio.sleep(1.0)
+            finally:
+                await pubsub.aclose()
+
+    async def close(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+        await super().close()
+
+
+def build_broker():
+    """
+    Создает брокер по EVENTS_BACKEND (фабрика для реестра сервисов).
+    """
+    if settings.EVENTS_BACKEND == "redis":
+        return RedisBroker(services.get("redis"), settings.EVENTS_MAX_PENDING)
+    if settings.EVENTS_BACKEND == "memory":
+        return InProcessBroker(settings.EVENTS_MAX_PENDING)
+    raise ValueError(f"Unknown events backend: {settings.EVENTS_BACKEND}")
+
+
+async def publish_instance_event(instance: WorkflowInstance, action: str, actor_id) -> None:
+    """
+    Сообщает об изменении состояния экземпляра наблюдающим за ним, автору и
+    исполнителю текущего шага (или участникам его роли). Вызывается после
+    коммита; ошибка доставки не отменяет уже выполненное действие, клиенты
+    догонят состояние при переподключении.
+    """
+    frame = encode_frame("instance", {
+        "id": instance.id,
+        "reference_id": instance.reference_id,
+        "action": action,
+        "status": instance.status,
+        "current_step_id": instance.current_step_id,
+        "assignee_id": instance.assignee_id,
+        "assignee_role_id": instance.assignee_role_id,
+        "actor_id": actor_id,
+        "updated_at": instance.updated_at.isoformat(),
+    })
+    topics = [
+        instance_topic(instance.id, instance.tenant_id), user_topic(instance.created_by_id), user_topic(actor_id),
+    ]
+    if instance.assignee_id is not None:
+        topics.append(user_topic(instance.assignee_id))
+    if instance.assignee_role_id is not None:
+        topics.append(role_topic(instance.assignee_role_id, instance.tenant_id))
+    try:
+        await services.get("event_broker").publish(sorted(set(topics)), frame)
+        EVENTS_PUBLISHED.labels(action).inc()
+    except Exception:
+        logger.exception("Failed to publish event for instance %s", instance.id)
+
+
+async def publish_job_event(job_id, job_type: str, status: str, processed: int,
+                            total: Optional[int], user_id) -> None:
+    """
+    Сообщает автору фоновой задачи о смене ее статуса или прогрессе.
+    """
+    frame = encode_frame("job", {
+        "id": job_id,
+        "type": job_type,
+        "status": status,
+        "processed": processed,
+        "total": total,
+    })
+    try:
+        await services.get("event_broker").publish([user_topic(user_id)], frame)
+        EVENTS_PUBLISHED.labels("job").inc()
+    except Exception:
+        logger.exception("Failed to publish event for job %s", job_id)
+
+
+class EventStreamResponse(Response):
+    """
+    Поток Server-Sent Events из подписки брокера.
+
+    Реализован напрямую поверх ASGI, чтобы простаивающее соединение стоило
+    одну корутину, одну задачу ожидания разрыва и подписку. Раз в
+    `ping_interval` секунд отправляется комментарий: прокси не закрывают
+    соединение по таймауту.
+    """
+
+    media_type = "text/event-stream"
+
+    def __init__(self, broker: InProcessBroker, topics: Iterable[str], ping_interval: float,
+                 retry_ms: int = 5000):
+        # Как в StreamingResponse: без body, иначе появится content-length: 0
+        self.status_code = 200
+        self.background = None
+        self.init_headers({"cache-control": "no-cache", "x-accel-buffering": "no"})
+        self.broker = broker
+        self.topics = list(topics)
+        self.ping_interval = ping_interval
+        self.retry_ms = retry_ms
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        subscription = self.broker.subscribe(self.topics)
+        watcher = asyncio.create_task(self._close_on_disconnect(receive, subscription))
+        EVENT_STREAMS.inc()
+        try:
+            await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+            await send({"type": "http.response.body", "body": f"retry: {self.retry_ms}\n\n".encode(), "more_body": True})
+            while not subscription.closed:
+                try:
+                    async with asyncio.timeout(self.ping_interval):
+                        frames = await subscription.wait()
+                except TimeoutError:
+                    frames = [PING_FRAME]
+                if frames:
+                    await send({"type": "http.response.body", "body": b"".join(frames), "more_body": True})
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+        finally:
+            EVENT_STREAMS.dec()
+            watcher.cancel()
+            self.broker.unsubscribe(subscription)
+
+    @staticmethod
+    async def _close_on_disconnect(receive: Receive, subscription: Subscription) -> None:
+        while (await receive())["type"] != "http.disconnect":
+            pass
+        subscription.close()
@@ -0,0 +1,27 @@
+import re
+from typing import Optional
+
+# entity-tag = [ "W/" ] DQUOTE *etagc DQUOTE; запятая допустима внутри тега,
+# поэтому список разбирается по кавычкам, а не по запятым
+_ENTITY_TAG = re.compile(r'(?:W/)?"[^"]*"')
+
+
+def _opaque_tag(etag: str) -> str:
+    return etag[2:] if etag.startswith("W/") else etag
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Проверяет `If-None-Match` по RFC 9110 (13.1.2): заголовок — `*` или
+    список тегов, сравнение слабое (префикс `W/` не учитывается ни у одной
+    из сторон), поэтому тег, ослабленный при сжатии ответа, тоже совпадает.
+
+    Returns:
+        bool: True, если можно ответить 304.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    expected = _opaque_tag(etag)
+    return any(_opaque_tag(tag) == expected for tag in _ENTITY_TAG.findall(if_none_match))
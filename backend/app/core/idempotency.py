@@ -0,0 +1,442 @@
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+
+from jose import jwt  # type: ignore
+from jose.exceptions import JWTError
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.metrics import IDEMPOTENCY_REQUESTS
+from app.core.services import services
+from app.db.routing import WRITE_METHODS
+from app.db.session import AsyncSessionLocal
+from app.models.idempotency import IdempotencyKey
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_HEADER = b"idempotency-key"
+MAX_KEY_LENGTH = 255
+# Заголовки ответа, которые сохраняются и отдаются при повторе
+REPLAYED_HEADERS = (b"content-type", b"location")
+# Потоковые тела (файлы) не буферизуются ради отпечатка: ключ занимается по
+# адресу и длине тела, а хеш тела считается, пока оно проходит к эндпоинту
+STREAMING_CONTENT_TYPES = (b"multipart/", b"application/octet-stream", b"application/offset+octet-stream")
+# Сколько раз занять ключ, который исчезает между вставкой и чтением
+CLAIM_ATTEMPTS = 3
+
+
+@dataclass
+class StoredResponse:
+    status_code: int
+    headers: List[Tuple[str, str]]
+    body: bytes
+
+
+@dataclass
+class StoredRecord:
+    request_hash: str
+    response: Optional[StoredResponse]  # None — исходный запрос еще выполняется
+
+
+class PostgresIdempotencyStore:
+    """
+    Хранилище ключей в таблице `idempotency_keys` основной базы.
+    """
+
+    def __init__(self, session_factory):
+        self.session_factory = session_factory
+
+    async def claim(self, principal: str, key: str, request_hash: str,
+                    lock_seconds: float, ttl_seconds: float) -> Optional[StoredRecord]:
+        """
+        Пытается занять ключ. Возвращает None, если ключ теперь наш (новый,
+        истекший или брошенный упавшим обработчиком), иначе — существующую запись.
+        """
+        now = datetime.now(timezone.utc)
+        stmt = insert(IdempotencyKey).values(
+            principal=principal,
+            key=key,
+            request_hash=request_hash,
+            locked_until=now + timedelta(seconds=lock_seconds),
+            expires_at=now + timedelta(seconds=ttl_seconds),
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[IdempotencyKey.principal, IdempotencyKey.key],
+            set_={
+                "request_hash": stmt.excluded.request_hash,
+                "status_code": None,
+                "response_headers": None,
+                "response_body": None,
+                "locked_until": stmt.excluded.locked_until,
+                "expires_at": stmt.excluded.expires_at,
+            },
+            where=(IdempotencyKey.expires_at < now)
+            | (IdempotencyKey.status_code.is_(None) & (IdempotencyKey.locked_until < now)),
+        ).returning(IdempotencyKey.principal)
+
+        for _ in range(CLAIM_ATTEMPTS):
+            async with self.session_factory() as db:
+                claimed = (await db.execute(stmt)).first() is not None
+                await db.commit()
+                if claimed:
+                    return None
+                row = (await db.execute(
+                    select(IdempotencyKey).where(IdempotencyKey.principal == principal, IdempotencyKey.key == key)
+                )).scalar_one_or_none()
+            if row is not None:
+                break
+            # Владелец успел освободить ключ между запросами — пробуем снова
+        else:
+            # Ключ все время кто-то перехватывает: считаем, что запрос выполняется
+            return StoredRecord(request_hash=request_hash, response=None)
+        response = None
+        if row.status_code is not None:
+            response = StoredResponse(row.status_code, [tuple(h) for h in row.response_headers], row.response_body)
+        return StoredRecord(request_hash=row.request_hash, response=response)
+
+    async def complete(self, principal: str, key: str, response: StoredResponse, ttl_seconds: float,
+                       request_hash: Optional[str] = None) -> None:
+        """
+        Сохраняет ответ; `request_hash` уточняет отпечаток, если тело запроса
+        стало известно только после выполнения.
+        """
+        async with self.session_factory() as db:
+            row = await db.get(IdempotencyKey, (principal, key))
+            if row is not None:
+                if request_hash is not None:
+                    row.request_hash = request_hash
+                row.status_code = response.status_code
+                row.response_headers = [list(h) for h in response.headers]
+                row.response_body = response.body
+                row.expires_at = datetime.now(timezone.utc) + timedelta(seconds=ttl_seconds)
+                await db.commit()
+
+    async def release(self, principal: str, key: str) -> None:
+        async with self.session_factory() as db:
+            await db.execute(
+                delete(IdempotencyKey).where(
+                    IdempotencyKey.principal == principal,
+                    IdempotencyKey.key == key,
+                    IdempotencyKey.status_code.is_(None),
+                )
+            )
+            await db.commit()
+
+    async def purge_expired(self) -> int:
+        async with self.session_factory() as db:
+            result = await db.execute(
+                delete(IdempotencyKey).where(IdempotencyKey.expires_at < datetime.now(timezone.utc))
+            )
+            await db.commit()
+            return result.rowcount
+
+
+class RedisIdempotencyStore:
+    """
+    Хранилище ключей в Redis: срок жизни записей обеспечивает сам Redis.
+    Пока запрос выполняется, TTL записи равен времени блокировки, поэтому
+    брошенная запись исчезает сама.
+    """
+
+    def __init__(self, redis, prefix: str = "idempotency:"):
+        self.redis = redis
+        self.prefix = prefix
+
+    def _key(self, principal: str, key: str) -> str:
+        return f"{self.prefix}{principal}:{key}"
+
+    async def claim(self, principal: str, key: str, request_hash: str,
+                    lock_seconds: float, ttl_seconds: float) -> Optional[StoredRecord]:
+        name = self._key(principal, key)
+        pending = json.dumps({"request_hash": request_hash})
+        for _ in range(CLAIM_ATTEMPTS):
+            if await self.redis.set(name, pending, nx=True, px=int(lock_seconds * 1000)):
+                return None
+            raw = await self.redis.get(name)
+            if raw is not None:
+                break
+        else:
+            return StoredRecord(request_hash=request_hash, response=None)
+        data = json.loads(raw)
+        response = None
+        if "status_code" in data:
+            response = StoredResponse(
+                data["status_code"], [tuple(h) for h in data["headers"]], base64.b64decode(data["body"])
+            )
+        return StoredRecord(request_hash=data["request_hash"], response=response)
+
+    async def complete(self, principal: str, key: str, response: StoredResponse, ttl_seconds: float,
+                       request_hash: Optional[str] = None) -> None:
+        name = self._key(principal, key)
+        raw = await self.redis.get(name)
+        if raw is None:
+            return
+        data = json.loads(raw)
+        if request_hash is not None:
+            data["request_hash"] = request_hash
+        data.update(
+            status_code=response.status_code,
+            headers=[list(h) for h in response.headers],
+            body=base64.b64encode(response.body).decode("ascii"),
+        )
+        await self.redis.set(name, json.dumps(data), px=int(ttl_seconds * 1000))
+
+    async def release(self, principal: str, key: str) -> None:
+        await self.redis.delete(self._key(principal, key))
+
+
+def build_store():
+    """
+    Создает хранилище по IDEMPOTENCY_BACKEND (фабрика для реестра сервисов).
+    """
+    if settings.IDEMPOTENCY_BACKEND == "redis":
+        return RedisIdempotencyStore(services.get("redis"))
+    if settings.IDEMPOTENCY_BACKEND == "postgres":
+        return PostgresIdempotencyStore(AsyncSessionLocal)
+    raise ValueError(f"Unknown idempotency backend: {settings.IDEMPOTENCY_BACKEND}")
+
+
+def _principal(scope: Scope) -> Optional[str]:
+    """
+    Пользователь из Bearer-токена (без похода в БД): ключ принадлежит
+    пользователю, а не токену, поэтому повтор после обновления токена тоже узнается.
+    """
+    for name, value in scope["headers"]:
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() != "bearer":
+                return None
+            try:
+                return jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]).get("sub")
+            except JWTError:
+                return None
+    return None
+
+
+async def _json_response(send: Send, status_code: int, detail: str) -> None:
+    body = json.dumps({"detail": detail}, ensure_ascii=False).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status_code,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _hash_body(receive: Receive, digest) -> bool:
+    # Дочитывает тело в `digest`, не сохраняя его; False — клиент отключился
+    while True:
+        message = await receive()
+        if message["type"] != "http.request":
+            return False
+        digest.update(message.get("body", b""))
+        if not message.get("more_body"):
+            return True
+
+
+def _with_body(request_hash: str, body_digest) -> str:
+    return hashlib.sha256(f"{request_hash}:{body_digest.hexdigest()}".encode()).hexdigest()
+
+
+class IdempotencyMiddleware:
+    """
+    ASGI-middleware для заголовка `Idempotency-Key` на изменяющих запросах.
+
+    Первый запрос с ключом выполняется, и его ответ сохраняется. Повтор с тем
+    же ключом и телом получает сохраненный ответ (с заголовком
+    `Idempotent-Replayed: true`) без повторного выполнения. Повтор, пришедший
+    пока первый запрос еще выполняется, ждет его завершения. Тот же ключ с
+    другим телом — 422. Ответы 5xx не сохраняются: их можно повторить.
+
+    Тело запроса читается до выполнения (нужен отпечаток), поэтому тела
+    больше `max_body_bytes` отклоняются с 413. Файлы (`STREAMING_CONTENT_TYPES`)
+    не буферизуются: ключ занимается по методу, адресу и `Content-Length`, хеш
+    тела считается по мере чтения эндпоинтом и сохраняется вместе с ответом;
+    повтор дочитывает свое тело и получает сохраненный ответ, только если
+    хеши совпали. Ответ больше `max_body_bytes` отдается клиенту потоком, но
+    не сохраняется: повтор выполнится заново.
+
+    Хранилище берется из реестра сервисов (`idempotency_store`).
+    """
+
+    def __init__(self, app: ASGIApp, ttl: float, lock_timeout: float, wait_timeout: float,
+                 max_body_bytes: int = 1024 * 1024):
+        self.app = app
+        self.ttl = ttl
+        self.lock_timeout = lock_timeout
+        self.wait_timeout = wait_timeout
+        self.max_body_bytes = max_body_bytes
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] not in WRITE_METHODS:
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope["headers"])
+        key = headers.get(IDEMPOTENCY_HEADER, b"").decode("latin-1") or None
+        principal = _principal(scope) if key else None
+        streaming = headers.get(b"content-type", b"").lower().startswith(STREAMING_CONTENT_TYPES)
+        if not key or principal is None:
+            # Без ключа или без валидного токена (ответит 401 сам эндпоинт) — как обычно
+            await self.app(scope, receive, send)
+            return
+        if len(key) > MAX_KEY_LENGTH:
+            await _json_response(send, 400, f"Idempotency-Key длиннее {MAX_KEY_LENGTH} символов.")
+            return
+        too_large = f"Тело запроса с Idempotency-Key должно быть не больше {self.max_body_bytes} байт."
+        content_length = headers.get(b"content-length", b"")
+        if not streaming and content_length.isdigit() and int(content_length) > self.max_body_bytes:
+            await _json_response(send, 413, too_large)
+            return
+
+        digest = hashlib.sha256()
+        for part in (scope["method"].encode(), scope["path"].encode(), scope.get("query_string", b"")):
+            digest.update(part)
+            digest.update(b"\0")
+        body = b""
+        if streaming:
+            # Файл идет к эндпоинту потоком; отпечаток до выполнения — адрес и
+            # длина, хеш тела добавляется к нему при сохранении ответа
+            digest.update(b"stream\0" + content_length)
+        else:
+            # Тело читается целиком: отпечаток запроса нужен до решения, выполнять ли его
+            chunks, size = [], 0
+            while True:
+                message = await receive()
+                chunk = message.get("body", b"")
+                size += len(chunk)
+                if size > self.max_body_bytes:
+                    await _json_response(send, 413, too_large)
+                    return
+                chunks.append(chunk)
+                if not message.get("more_body"):
+                    break
+            body = b"".join(chunks)
+            digest.update(body)
+            digest.update(b"\0")
+        request_hash = digest.hexdigest()
+
+        store = services.get("idempotency_store")
+
+        deadline = time.monotonic() + self.wait_timeout
+        delay = 0.05
+        while True:
+            record = await store.claim(principal, key, request_hash, self.lock_timeout, self.ttl)
+            if record is None:
+                break
+            expected = request_hash
+            if record.response is not None and streaming:
+                # Отпечаток сохраненного ответа включает тело: повтор дочитывает свое
+                body_digest = hashlib.sha256()
+                if not await _hash_body(receive, body_digest):
+                    return
+                expected = _with_body(request_hash, body_digest)
+            if record.request_hash != expected:
+                IDEMPOTENCY_REQUESTS.labels("mismatch").inc()
+                await _json_response(send, 422, "Idempotency-Key уже использован для другого запроса.")
+                return
+            if record.response is not None:
+                IDEMPOTENCY_REQUESTS.labels("replayed").inc()
+                await self._replay(record.response, send)
+                return
+            if time.monotonic() >= deadline:
+                IDEMPOTENCY_REQUESTS.labels("in_flight").inc()
+                await _json_response(send, 409, "Запрос с этим Idempotency-Key еще выполняется.")
+                return
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.5)
+
+        IDEMPOTENCY_REQUESTS.labels("executed").inc()
+        body_sent = False
+        body_digest = hashlib.sha256()
+        body_complete = not streaming
+
+        async def replay_receive() -> Message:
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        async def hashing_receive() -> Message:
+            nonlocal body_complete
+            message = await receive()
+            if message["type"] == "http.request" and not body_complete:
+                body_digest.update(message.get("body", b""))
+                body_complete = not message.get("more_body", False)
+            return message
+
+        status_code = 500
+        response_headers: List[Tuple[str, str]] = []
+        response_chunks: Optional[List[bytes]] = []
+        response_size = 0
+
+        async def send_and_capture(message: Message) -> None:
+            nonlocal status_code, response_headers, response_chunks, response_size
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                response_headers = [
+                    (name.decode("latin-1"), value.decode("latin-1"))
+                    for name, value in message.get("headers", [])
+                    if name.lower() in REPLAYED_HEADERS
+                ]
+            elif message["type"] == "http.response.body" and response_chunks is not None:
+                chunk = message.get("body", b"")
+                response_size += len(chunk)
+                # Слишком большой ответ не копится в памяти и не сохраняется
+                if response_size <= self.max_body_bytes:
+                    response_chunks.append(chunk)
+                else:
+                    response_chunks = None
+            await send(message)
+
+        try:
+            await self.app(scope, hashing_receive if streaming else replay_receive, send_and_capture)
+            if not body_complete:
+                # Эндпоинт ответил, не дочитав тело: хеш нужен целиком
+                body_complete = await _hash_body(receive, body_digest)
+        except BaseException:
+            await store.release(principal, key)
+            raise
+        if status_code >= 500 or response_chunks is None or not body_complete:
+            if response_chunks is None:
+                IDEMPOTENCY_REQUESTS.labels("too_large").inc()
+            await store.release(principal, key)
+        else:
+            await store.complete(
+                principal, key, StoredResponse(status_code, response_headers, b"".join(response_chunks)), self.ttl,
+                request_hash=_with_body(request_hash, body_digest) if streaming else None,
+            )
+
+    async def _replay(self, response: StoredResponse, send: Send) -> None:
+        headers = [(name.encode("latin-1"), value.encode("latin-1")) for name, value in response.headers]
+        headers += [
+            (b"content-length", str(len(response.body)).encode()),
+            (b"idempotent-replayed", b"true"),
+        ]
+        await send({"type": "http.response.start", "status": response.status_code, "headers": headers})
+        await send({"type": "http.response.body", "body": response.body})
+
+
+async def purge_expired_keys(interval: float) -> None:
+    """
+    Фоновая задача: удаляет истекшие ключи из Postgres (Redis удаляет их сам).
+    """
+    while True:
+        await asyncio.sleep(interval)
+        store = services.get("idempotency_store")
+        if isinstance(store, PostgresIdempotencyStore):
+            try:
+                removed = await store.purge_expired()
+                if removed:
+                    logger.info("Purged %s expired idempotency keys", removed)
+            except Exception:
+                logger.exception("Failed to purge expired idempotency keys")
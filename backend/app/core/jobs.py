@@ -0,0 +1,409 @@
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Awaitable, Callable, Dict, Iterator, List, Optional, Tuple, Type
+
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.events import publish_job_event
+from app.core.metrics import JOBS_FINISHED, JOBS_RUNNING
+from app.db.sharding import Shard, shard_scope
+from app.db.tenancy import tenant_scope
+from app.models.job import Job
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+FINISHED_STATUSES = (JOB_SUCCEEDED, JOB_FAILED, JOB_CANCELLED)
+
+
+class JobCancelled(Exception):
+    """Пользователь отменил задачу; выбрасывается из `JobContext.report`."""
+
+
+class LeaseLost(Exception):
+    """Аренда истекла и задачу забрал другой воркер; этот должен молча остановиться."""
+
+
+@dataclass
+class JobType:
+    name: str
+    handler: Callable[["JobContext"], Awaitable[Optional[dict]]]
+    params: Type[BaseModel]
+    # Сколько задач типа выполняется одновременно на всех воркерах; None — без ограничения
+    max_concurrency: Optional[int] = None
+
+
+class JobRegistry:
+    """
+    Типы фоновых задач. Обработчик получает `JobContext` и возвращает
+    JSON-совместимый результат; параметры проверяются схемой типа еще при
+    постановке в очередь.
+    """
+
+    def __init__(self):
+        self._types: Dict[str, JobType] = {}
+
+    def register(self, name: str, params: Type[BaseModel], max_concurrency: Optional[int] = None):
+        def decorator(handler):
+            self._types[name] = JobType(name, handler, params, max_concurrency)
+            return handler
+        return decorator
+
+    def get(self, name: str) -> Optional[JobType]:
+        return self._types.get(name)
+
+    def __iter__(self) -> Iterator[JobType]:
+        return iter(list(self._types.values()))
+
+    def __len__(self) -> int:
+        return len(self._types)
+
+    @staticmethod
+    def concurrency_limit(job_type: JobType) -> Optional[int]:
+        return settings.JOBS_TYPE_CONCURRENCY.get(job_type.name, job_type.max_concurrency)
+
+
+job_types = JobRegistry()
+
+
+class JobContext:
+    """
+    То, что обработчик знает о своей задаче: параметры, контрольная точка
+    прошлой попытки и автор. Сессии обработчик открывает сам через
+    `session_factory` — короткими транзакциями, а не одной на всю задачу.
+    """
+
+    def __init__(self, worker: "JobWorker", job_type: JobType, job: Row):
+        self.id: uuid.UUID = job.id
+        self.type = job_type.name
+        self.params = job_type.params.model_validate(job.params)
+        self.checkpoint: Optional[dict] = job.checkpoint
+        self.user_id: uuid.UUID = job.created_by_id
+        self.tenant_id: str = job.tenant_id
+        self.processed: int = job.processed
+        self.total: Optional[int] = job.total
+        self.session_factory = worker.shard.session_factory
+        self.cancel_requested = False
+        self.lease_lost = False
+        self._worker = worker
+        self._published_at = 0.0
+
+    async def report(
+        self, processed: int, total: Optional[int] = None, checkpoint: Optional[dict] = None,
+        db: Optional[AsyncSession] = None,
+    ) -> None:
+        """
+        Сохраняет прогресс и, если передана, контрольную точку: после сбоя
+        воркера следующая попытка начнется с нее. Заодно продлевает аренду.
+        С `db` запись идет в транзакции обработчика и фиксируется его
+        коммитом вместе с результатом шага, иначе — сразу.
+
+        Raises:
+            JobCancelled: Задачу отменили — обработчик должен прекратить работу.
+            LeaseLost: Задачу уже выполняет другой воркер.
+        """
+        self.processed = processed
+        if total is not None:
+            self.total = total
+        values = {"processed": processed, "total": self.total}
+        if checkpoint is not None:
+            values["checkpoint"] = checkpoint
+            self.checkpoint = checkpoint
+        cancel_requested = await self._worker.extend_lease(self.id, db=db, **values)
+        if cancel_requested is None:
+            self.lease_lost = True
+            raise LeaseLost()
+        if cancel_requested:
+            self.cancel_requested = True
+            raise JobCancelled()
+        if time.monotonic() - self._published_at >= settings.JOBS_PROGRESS_INTERVAL:
+            await self.publish(JOB_RUNNING)
+
+    async def publish(self, status: str) -> None:
+        self._published_at = time.monotonic()
+        await publish_job_event(self.id, self.type, status, self.processed, self.total, self.user_id)
+
+
+class JobWorker:
+    """
+    Выполняет задачи одного шарда. Воркеры всех процессов разбирают общую
+    очередь в Postgres: задачи захватываются `FOR UPDATE SKIP LOCKED` на
+    время аренды, которую воркер продлевает, пока задача выполняется.
+    Задача упавшего воркера по истечении аренды достается другому и
+    продолжается с последней контрольной точки.
+    """
+
+    def __init__(
+        self,
+        shard: Shard,
+        registry: JobRegistry = job_types,
+        concurrency: int = settings.JOBS_WORKER_CONCURRENCY,
+        lease_seconds: float = settings.JOBS_LEASE_SECONDS,
+        max_attempts: int = settings.JOBS_MAX_ATTEMPTS,
+    ):
+        self.id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.shard = shard
+        self.registry = registry
+        self.concurrency = concurrency
+        self.lease = timedelta(seconds=lease_seconds)
+        self.max_attempts = max_attempts
+        self._running: Dict[uuid.UUID, Tuple[asyncio.Task, JobContext]] = {}
+        self._round = 0
+
+    @property
+    def session_factory(self):
+        return self.shard.session_factory
+
+    async def run(self, poll_interval: float = settings.JOBS_POLL_INTERVAL) -> None:
+        """
+        Фоновая задача: опрашивает очередь и занимает свободные слоты.
+        """
+        while True:
+            try:
+                with shard_scope(self.shard):
+                    await self.run_once()
+            except Exception:
+                logger.exception("Failed to claim jobs in shard %s", self.shard.name)
+            await asyncio.sleep(poll_interval)
+
+    async def run_once(self) -> int:
+        """
+        Захватывает задачи на свободные слоты и запускает их.
+
+        Returns:
+            int: Сколько задач запущено.
+        """
+        job_type_list = list(self.registry)
+        if not job_type_list:
+            return 0
+        # Типы обходятся по кругу, чтобы длинная очередь одного не занимала все слоты
+        start = self._round % len(job_type_list)
+        self._round += 1
+        started = 0
+        for job_type in job_type_list[start:] + job_type_list[:start]:
+            free = self.concurrency - len(self._running)
+            if free <= 0:
+                break
+            for job in await self._claim(job_type, free):
+                self._start(job_type, job)
+                started += 1
+        return started
+
+    def _claimable(self, job_type: JobType):
+        return and_(
+            Job.type == job_type.name,
+            or_(Job.status == JOB_QUEUED, and_(Job.status == JOB_RUNNING, Job.locked_until < func.now())),
+        )
+
+    async def _claim(self, job_type: JobType, limit: int) -> List[Row]:
+        async with self.session_factory() as db:
+            max_concurrency = self.registry.concurrency_limit(job_type)
+            if max_concurrency is not None:
+                # Воркеры разных процессов считают выполняющиеся задачи по очереди,
+                # иначе двое одновременно увидят одно свободное место
+                await db.execute(select(func.pg_advisory_xact_lock(func.hashtext(f"jobs:{job_type.name}"))))
+                running = await db.scalar(
+                    select(func.count()).select_from(Job)
+                    .where(Job.type == job_type.name, Job.status == JOB_RUNNING, Job.locked_until >= func.now())
+                )
+                limit = min(limit, max_concurrency - running)
+                if limit <= 0:
+                    await db.rollback()
+                    return []
+
+            candidates = (await db.execute(
+                select(Job.id, Job.attempts, Job.cancel_requested)
+                .where(self._claimable(job_type))
+                .order_by(Job.created_at)
+                .limit(limit)
+                .with_for_update(skip_locked=True)
+            )).all()
+            # Задачи упавшего воркера, которые успели отменить, не перезапускаются;
+            # задача, на которой воркеры падают раз за разом, считается неудачной
+            cancelled = [c.id for c in candidates if c.cancel_requested]
+            exhausted = [c.id for c in candidates if not c.cancel_requested and c.attempts >= self.max_attempts]
+            claim = [c.id for c in candidates if c.id not in cancelled and c.id not in exhausted]
+            for ids, status, error in (
+                (cancelled, JOB_CANCELLED, None),
+                (exhausted, JOB_FAILED, f"Воркер прерывался {self.max_attempts} раз(а), задача остановлена"),
+            ):
+                if ids:
+                    await db.execute(
+                        update(Job)
+                        .where(Job.id.in_(ids))
+                        .values(status=status, error=error, finished_at=func.now(), locked_by=None, locked_until=None)
+                        .execution_options(synchronize_session=False)
+                    )
+            jobs = []
+            if claim:
+                jobs = (await db.execute(
+                    update(Job)
+                    .where(Job.id.in_(claim))
+                    .values(
+                        status=JOB_RUNNING,
+                        attempts=Job.attempts + 1,
+                        locked_by=self.id,
+                        locked_until=func.now() + self.lease,
+                        started_at=func.coalesce(Job.started_at, func.now()),
+                    )
+                    .returning(
+                        Job.id, Job.params, Job.checkpoint, Job.processed, Job.total,
+                        Job.created_by_id, Job.tenant_id,
+                    )
+                    .execution_options(synchronize_session=False)
+                )).all()
+            await db.commit()
+        return jobs
+
+    def _start(self, job_type: JobType, job: Row) -> None:
+        try:
+            context = JobContext(self, job_type, job)
+        except ValidationError as e:
+            # Схема параметров изменилась после постановки задачи в очередь
+            task = asyncio.create_task(self._fail_invalid(job_type, job, str(e)))
+            self._running[job.id] = (task, None)
+            task.add_done_callback(lambda _: self._running.pop(job.id, None))
+            return
+        task = asyncio.create_task(self._execute(job_type, context))
+        self._running[job.id] = (task, context)
+        task.add_done_callback(lambda _: self._running.pop(job.id, None))
+
+    async def _execute(self, job_type: JobType, context: JobContext) -> None:
+        JOBS_RUNNING.labels(job_type.name).inc()
+        with tenant_scope(context.tenant_id), shard_scope(self.shard):
+            heartbeat = asyncio.create_task(self._heartbeat(context, asyncio.current_task()))
+            try:
+                await context.publish(JOB_RUNNING)
+                try:
+                    result = await job_type.handler(context)
+                except JobCancelled:
+                    await self._finish(context, JOB_CANCELLED)
+                except LeaseLost:
+                    logger.warning("Job %s was taken over by another worker", context.id)
+                except asyncio.CancelledError:
+                    if not (context.cancel_requested or context.lease_lost):
+                        raise  # Воркер останавливается: задачу вернет в очередь close()
+                    asyncio.current_task().uncancel()
+                    if context.cancel_requested:
+                        await self._finish(context, JOB_CANCELLED)
+                except Exception as e:
+                    logger.exception("Job %s (%s) failed", context.id, job_type.name)
+                    await self._finish(context, JOB_FAILED, error=str(e) or type(e).__name__)
+                else:
+                    await self._finish(context, JOB_SUCCEEDED, result=result)
+            finally:
+                heartbeat.cancel()
+                JOBS_RUNNING.labels(job_type.name).dec()
+
+    async def _heartbeat(self, context: JobContext, task: asyncio.Task) -> None:
+        # Продлевает аренду, даже если обработчик долго не сообщает о прогрессе,
+        # и прерывает его, когда задачу отменили
+        while True:
+            await asyncio.sleep(self.lease.total_seconds() / 3)
+            try:
+                cancel_requested = await self.extend_lease(context.id)
+            except Exception:
+                logger.exception("Failed to extend lease of job %s", context.id)
+                continue
+            if cancel_requested is None:
+                context.lease_lost = True
+            elif cancel_requested:
+                context.cancel_requested = True
+            else:
+                continue
+            task.cancel()
+            return
+
+    async def extend_lease(self, job_id: uuid.UUID, db: Optional[AsyncSession] = None, **values) -> Optional[bool]:
+        """
+        Продлевает аренду задачи и сохраняет `values`. С `db` изменение
+        остается в ее транзакции без коммита.
+
+        Returns:
+            Optional[bool]: Запрошена ли отмена; None, если задача больше не
+            принадлежит этому воркеру.
+        """
+        query = (
+            update(Job)
+            .where(Job.id == job_id, Job.locked_by == self.id)
+            .values(locked_until=func.now() + self.lease, **values)
+            .returning(Job.cancel_requested)
+            .execution_options(synchronize_session=False)
+        )
+        if db is not None:
+            return await db.scalar(query)
+        async with self.session_factory() as db:
+            cancel_requested = await db.scalar(query)
+            await db.commit()
+        return cancel_requested
+
+    async def _finish(self, context: JobContext, status: str, result: Optional[dict] = None,
+                      error: Optional[str] = None) -> None:
+        async with self.session_factory() as db:
+            finished = await db.scalar(
+                update(Job)
+                .where(Job.id == context.id, Job.locked_by == self.id)
+                .values(
+                    status=status, result=result, error=error,
+                    processed=context.processed, total=context.total,
+                    finished_at=func.now(), locked_by=None, locked_until=None,
+                )
+                .returning(Job.id)
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+        if finished is None:
+            logger.warning("Job %s was taken over by another worker", context.id)
+            return
+        JOBS_FINISHED.labels(context.type, status).inc()
+        await context.publish(status)
+
+    async def _fail_invalid(self, job_type: JobType, job: Row, error: str) -> None:
+        async with self.session_factory() as db:
+            await db.execute(
+                update(Job)
+                .where(Job.id == job.id, Job.locked_by == self.id)
+                .values(status=JOB_FAILED, error=error, finished_at=func.now(), locked_by=None, locked_until=None)
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+        JOBS_FINISHED.labels(job_type.name, JOB_FAILED).inc()
+        await publish_job_event(job.id, job_type.name, JOB_FAILED, job.processed, job.total, job.created_by_id)
+
+    async def close(self) -> None:
+        """
+        Прерывает выполняющиеся задачи и возвращает их в очередь: другой
+        воркер продолжит их с последней контрольной точки, не дожидаясь
+        истечения аренды.
+        """
+        running = dict(self._running)
+        for task, _ in running.values():
+            task.cancel()
+        await asyncio.gather(*(task for task, _ in running.values()), return_exceptions=True)
+        if not running:
+            return
+        async with self.session_factory() as db:
+            released = (await db.execute(
+                update(Job)
+                .where(Job.id.in_(list(running)), Job.locked_by == self.id)
+                .values(status=JOB_QUEUED, locked_by=None, locked_until=None, attempts=Job.attempts - 1)
+                .returning(Job.type)
+                .execution_options(synchronize_session=False)
+            )).scalars().all()
+            await db.commit()
+        for job_type in released:
+            JOBS_FINISHED.labels(job_type, "released").inc()
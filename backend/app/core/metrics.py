@@ -0,0 +1,292 @@
+import asyncio
+import os
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    REGISTRY,
+    generate_latest,
+)
+from prometheus_client import multiprocess
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+# Под несколькими воркерами uvicorn/gunicorn каждый процесс пишет метрики в
+# mmap-файлы каталога PROMETHEUS_MULTIPROC_DIR, а /metrics агрегирует их.
+# Каталог нужно очищать перед стартом сервера (см. entrypoint.sh).
+MULTIPROCESS = "PROMETHEUS_MULTIPROC_DIR" in os.environ
+
+# Границы бакетов подобраны под API: большая часть запросов укладывается в 5-250 мс.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Время обработки HTTP-запроса",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+HTTP_REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress",
+    "Запросы в обработке",
+    ["method"],
+    multiprocess_mode="livesum",
+)
+
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Ожидание соединения из пула SQLAlchemy",
+    ["pool"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0, 30.0),
+)
+DB_POOL_SIZE = Gauge(
+    "db_pool_size",
+    "Настроенный размер пула соединений",
+    ["pool"],
+    multiprocess_mode="livesum",
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out",
+    "Соединения, выданные из пула",
+    ["pool"],
+    multiprocess_mode="livesum",
+)
+DB_POOL_OVERFLOW = Gauge(
+    "db_pool_overflow",
+    "Соединения сверх размера пула (overflow)",
+    ["pool"],
+    multiprocess_mode="livesum",
+)
+
+STORAGE_OPERATION_DURATION = Histogram(
+    "storage_operation_duration_seconds",
+    "Длительность операций с объектным хранилищем (MinIO)",
+    ["operation"],
+    buckets=LATENCY_BUCKETS,
+)
+STORAGE_BYTES = Counter(
+    "storage_bytes_total",
+    "Объем данных, переданных в объектное хранилище и из него",
+    ["operation"],
+)
+
+AUTH_REQUESTS = Counter(
+    "auth_requests_total",
+    "Проверки токена в get_current_user по результату",
+    ["result"],
+)
+AUTH_CACHE = Counter(
+    "auth_cache_requests_total",
+    "Обращения к кэшам авторизации",
+    ["cache", "result"],
+)
+
+TEMPLATE_VERSION_CACHE = Counter(
+    "template_version_cache_requests_total",
+    "Обращения к кэшу скомпилированных версий шаблонов",
+    ["result"],
+)
+
+PREVIEW_RENDERS = Counter(
+    "preview_renders_total",
+    "Обработка превью вложений по исходу: rendered, deduplicated, unsupported, failed",
+    ["result"],
+)
+
+ATTACHMENT_GC_REMOVED = Counter(
+    "attachment_gc_removed_total",
+    "Удаленные сборкой мусора объекты: unlinked — вложения без экземпляра, orphaned — объекты без записи в БД",
+    ["kind"],
+)
+
+JOBS_RUNNING = Gauge(
+    "jobs_running",
+    "Фоновые задачи, выполняющиеся в процессе",
+    ["type"],
+    multiprocess_mode="livesum",
+)
+JOBS_FINISHED = Counter(
+    "jobs_finished_total",
+    "Завершенные фоновые задачи по исходу: succeeded, failed, cancelled, released",
+    ["type", "status"],
+)
+
+IDEMPOTENCY_REQUESTS = Counter(
+    "idempotency_requests_total",
+    "Запросы с Idempotency-Key по исходу: executed, replayed, in_flight, mismatch",
+    ["result"],
+)
+
+ADMISSION_LIMIT = Gauge(
+    "admission_concurrency_limit",
+    "Текущий адаптивный лимит параллельных запросов класса маршрутов",
+    ["route_class"],
+    multiprocess_mode="livesum",
+)
+ADMISSION_IN_FLIGHT = Gauge(
+    "admission_in_flight",
+    "Запросы класса маршрутов, допущенные к обработке",
+    ["route_class"],
+    multiprocess_mode="livesum",
+)
+ADMISSION_QUEUE_WAIT = Histogram(
+    "admission_queue_wait_seconds",
+    "Ожидание в очереди admission control перед обработкой",
+    ["route_class"],
+    buckets=LATENCY_BUCKETS,
+)
+ADMISSION_SHED = Counter(
+    "admission_shed_total",
+    "Отклоненные с 503 запросы: predicted — прогноз ожидания больше бюджета, deadline — бюджет истек в очереди",
+    ["route_class", "reason"],
+)
+
+EVENT_STREAMS = Gauge(
+    "event_streams_open",
+    "Открытые SSE-соединения /workflow/events",
+    multiprocess_mode="livesum",
+)
+EVENTS_PUBLISHED = Counter(
+    "events_published_total",
+    "Опубликованные события экземпляров по действию",
+    ["action"],
+)
+
+EVENT_LOOP_LAG = Histogram(
+    "event_loop_lag_seconds",
+    "Задержка event loop относительно запланированного пробуждения",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+
+
+def render_metrics() -> tuple[bytes, str]:
+    """
+    Возвращает метрики в текстовом формате Prometheus и их content-type.
+    """
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+@contextmanager
+def observe_storage(operation: str) -> Iterator[None]:
+    """
+    Замеряет длительность операции с хранилищем.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        STORAGE_OPERATION_DURATION.labels(operation).observe(time.perf_counter() - started)
+
+
+class InstrumentedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """
+    Пул соединений, замеряющий время ожидания `connect()`.
+
+    Имя пула для меток задается атрибутом `metrics_name` (см. `instrument_pool`)
+    и переносится в пересозданный пул после `engine.dispose()`.
+    """
+    metrics_name = "default"
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            DB_POOL_CHECKOUT_WAIT.labels(self.metrics_name).observe(time.perf_counter() - started)
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.metrics_name = self.metrics_name
+        return pool
+
+
+def instrument_pool(engine: AsyncEngine, name: str) -> None:
+    """
+    Подключает метрики пула соединений движка.
+
+    Args:
+        engine (AsyncEngine): Движок, созданный с `poolclass=InstrumentedAsyncQueuePool`.
+        name (str): Значение метки `pool`.
+    """
+    pool = engine.sync_engine.pool
+    if isinstance(pool, InstrumentedAsyncQueuePool):
+        pool.metrics_name = name
+    if hasattr(pool, "size"):
+        DB_POOL_SIZE.labels(name).set(pool.size())
+
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        DB_POOL_CHECKED_OUT.labels(name).inc()
+        # Пул может быть пересоздан после dispose(), поэтому читаем актуальный
+        overflow = getattr(engine.sync_engine.pool, "overflow", None)
+        if overflow is not None:
+            DB_POOL_OVERFLOW.labels(name).set(max(overflow(), 0))
+
+    def on_checkin(dbapi_connection, connection_record):
+        DB_POOL_CHECKED_OUT.labels(name).dec()
+
+    event.listen(engine.sync_engine, "checkout", on_checkout)
+    event.listen(engine.sync_engine, "checkin", on_checkin)
+
+
+async def monitor_event_loop_lag(interval: float) -> None:
+    """
+    Фоновая задача: раз в `interval` секунд измеряет, насколько позже
+    запланированного просыпается корутина. Рост значения означает, что loop
+    заблокирован синхронным кодом.
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG.observe(max(loop.time() - started - interval, 0.0))
+
+
+class MetricsMiddleware:
+    """
+    ASGI-middleware: гистограмма длительности запросов по шаблону маршрута
+    (`/workflow/workflow_instances/{instance_id}`, а не конкретному URL),
+    чтобы число временных рядов не зависело от числа объектов.
+    """
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+        started = time.perf_counter()
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        in_progress = HTTP_REQUESTS_IN_PROGRESS.labels(method)
+        in_progress.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            in_progress.dec()
+            # Роутер Starlette записывает найденный маршрут в scope
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or "unmatched"
+            HTTP_REQUEST_DURATION.labels(method, route_path, str(status_code)).observe(
+                time.perf_counter() - started
+            )
@@ -1,10 +1,16 @@
-from minio import Minio
-from minio.error import S3Error
 from app.core.config import settings
+from app.core.metrics import STORAGE_BYTES, observe_storage
+from app.core.tracing import start_span
+from app.db.sharding import current_shard
 from fastapi import UploadFile
 import uuid
 import logging
 import io
+import os
+import asyncio
+import itertools
+from datetime import datetime
+from typing import AsyncIterator, List, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
@@ -13,25 +19,52 @@ class MinioClient:
     Класс-клиент для взаимодействия с MinIO.
     """
     def __init__(self):
-        self.client = Minio(
-            settings.MINIO_ENDPOINT,
-            access_key=settings.MINIO_ACCESS_KEY,
-            secret_key=settings.MINIO_SECRET_KEY,
-            secure=False # Используйте True, если ваш MinIO настроен с SSL/TLS
-        )
-        self.bucket_name = settings.MINIO_BUCKET
+        self._client = None
+        self._pid = None
+
+    @property
+    def bucket_name(self) -> str:
+        """
+        Бакет шарда текущего запроса (см. `TenantMiddleware`), вне запроса — MINIO_BUCKET.
+        """
+        shard = current_shard()
+        return shard.bucket if shard is not None else settings.MINIO_BUCKET
+
+    @property
+    def client(self):
+        """
+        Клиент MinIO текущего процесса. Пул соединений urllib3 нельзя делить
+        между процессами, поэтому после fork (воркеры gunicorn) клиент
+        создается заново. SDK импортируется при первом обращении: это заметная
+        часть времени импорта приложения.
+        """
+        if self._client is None or self._pid != os.getpid():
+            from minio import Minio
+
+            self._client = Minio(
+                settings.MINIO_ENDPOINT,
+                access_key=settings.MINIO_ACCESS_KEY,
+                secret_key=settings.MINIO_SECRET_KEY,
+                secure=False # Используйте True, если ваш MinIO настроен с SSL/TLS
+            )
+            self._pid = os.getpid()
+        return self._client
 
     async def ensure_bucket_exists(self):
         """
         Проверяет существование бакета и создает его, если он не существует.
         """
         try:
-            if not self.client.bucket_exists(self.bucket_name):
-                self.client.make_bucket(self.bucket_name)
+            # Синхронный SDK выполняется в потоке: вызов не блокирует event loop,
+            # и проверку готовности можно прервать по таймауту
+            with observe_storage("bucket_exists"), start_span("storage.bucket_exists"):
+                exists = await asyncio.to_thread(self.client.bucket_exists, self.bucket_name)
+            if not exists:
+                await asyncio.to_thread(self.client.make_bucket, self.bucket_name)
                 logger.info(f"MinIO bucket '{self.bucket_name}' created successfully.")
             else:
                 logger.info(f"MinIO bucket '{self.bucket_name}' already exists.")
-        except S3Error as e:
+        except Exception as e:
             logger.error(f"Error ensuring MinIO bucket exists: {e}")
             raise
 
@@ -49,22 +82,154 @@ class MinioClient:
         try:
             # Читаем содержимое файла асинхронно
             contents = await file.read()
-            self.client.put_object(
-                self.bucket_name,
-                object_name,
-                data=io.BytesIO(contents),
-                length=len(contents),
-                content_type=file.content_type
-            )
+            with observe_storage("put_object"), start_span("storage.put_object", object_name=object_name):
+                self.client.put_object(
+                    self.bucket_name,
+                    object_name,
+                    data=io.BytesIO(contents),
+                    length=len(contents),
+                    content_type=file.content_type
+                )
+            STORAGE_BYTES.labels("put_object").inc(len(contents))
             logger.info(f"File '{file.filename}' uploaded to MinIO as '{object_name}'.")
             return object_name
-        except S3Error as e:
+        except Exception as e:
             logger.error(f"Error uploading file to MinIO: {e}")
             raise
         finally:
             # Важно закрыть файл
             await file.close()
 
+    async def upload_bytes(self, object_name: str, data: bytes, content_type: str) -> None:
+        """
+        Записывает готовые данные (например, превью) под заданным именем.
+        """
+        with observe_storage("put_object"), start_span("storage.put_object", object_name=object_name):
+            await asyncio.to_thread(
+                self.client.put_object,
+                self.bucket_name,
+                object_name,
+                data=io.BytesIO(data),
+                length=len(data),
+                content_type=content_type,
+            )
+        STORAGE_BYTES.labels("put_object").inc(len(data))
+
+    async def stream_file(self, object_name: str, chunk_size: int = settings.ARCHIVE_CHUNK_SIZE) -> AsyncIterator[bytes]:
+        """
+        Читает объект чанками, не загружая его в память целиком. Каждое
+        чтение выполняется в потоке, event loop не блокируется.
+        """
+        with observe_storage("get_object"), start_span("storage.get_object", object_name=object_name):
+            response = await asyncio.to_thread(self.client.get_object, self.bucket_name, object_name)
+        try:
+            while chunk := await asyncio.to_thread(response.read, chunk_size):
+                STORAGE_BYTES.labels("get_object").inc(len(chunk))
+                yield chunk
+        finally:
+            response.close()
+            response.release_conn()
+
+    # --- Multipart upload (возобновляемые загрузки) ---
+    # В SDK нет публичного API для частей, поэтому используются его
+    # низкоуровневые методы S3 API, на которых построен put_object
+
+    async def create_multipart_upload(self, object_name: str, content_type: str) -> str:
+        with observe_storage("create_multipart_upload"):
+            return await asyncio.to_thread(
+                self.client._create_multipart_upload, self.bucket_name, object_name, {"Content-Type": content_type}
+            )
+
+    async def upload_part(self, object_name: str, upload_id: str, part_number: int, data: bytes) -> str:
+        """
+        Returns:
+            str: ETag части, нужен для завершения загрузки.
+        """
+        with observe_storage("upload_part"), start_span("storage.upload_part", object_name=object_name):
+            etag = await asyncio.to_thread(
+                self.client._upload_part, self.bucket_name, object_name, data, None, upload_id, part_number
+            )
+        STORAGE_BYTES.labels("upload_part").inc(len(data))
+        return etag
+
+    async def complete_multipart_upload(self, object_name: str, upload_id: str, parts: List[Tuple[int, str]]) -> None:
+        from minio.datatypes import Part
+
+        with observe_storage("complete_multipart_upload"):
+            await asyncio.to_thread(
+                self.client._complete_multipart_upload,
+                self.bucket_name,
+                object_name,
+                upload_id,
+                [Part(part_number, etag) for part_number, etag in parts],
+            )
+
+    async def abort_multipart_upload(self, object_name: str, upload_id: str) -> None:
+        with observe_storage("abort_multipart_upload"):
+            await asyncio.to_thread(self.client._abort_multipart_upload, self.bucket_name, object_name, upload_id)
+
+    async def list_multipart_uploads(self, initiated_before: datetime) -> List[Tuple[str, str]]:
+        """
+        Незавершенные multipart upload бакета, начатые раньше `initiated_before`.
+
+        Returns:
+            List[Tuple[str, str]]: Пары (объект, upload_id).
+        """
+        stale, key_marker, upload_id_marker = [], None, None
+        while True:
+            with observe_storage("list_multipart_uploads"):
+                result = await asyncio.to_thread(
+                    self.client._list_multipart_uploads,
+                    self.bucket_name,
+                    key_marker=key_marker,
+                    upload_id_marker=upload_id_marker,
+                )
+            stale += [
+                (upload.object_name, upload.upload_id)
+                for upload in result.uploads
+                if upload.initiated_time is not None and upload.initiated_time < initiated_before
+            ]
+            if not result.is_truncated:
+                return stale
+            key_marker, upload_id_marker = result.next_key_marker, result.next_upload_id_marker
+
+    async def list_objects(self, start_after: Optional[str], limit: int) -> List[Tuple[str, datetime]]:
+        """
+        Страница объектов бакета в лексикографическом порядке имен.
+
+        Returns:
+            List[Tuple[str, datetime]]: Пары (объект, время изменения), не больше `limit`.
+        """
+        def page():
+            objects = self.client.list_objects(
+                self.bucket_name, recursive=True, start_after=start_after or None
+            )
+            return [(obj.object_name, obj.last_modified) for obj in itertools.islice(objects, limit)]
+
+        with observe_storage("list_objects"):
+            return await asyncio.to_thread(page)
+
+    async def remove_objects(self, object_names: List[str]) -> List[str]:
+        """
+        Удаляет объекты пакетными запросами DeleteObjects (до 1000 имен в
+        запросе) вместо запроса на каждый объект.
+
+        Returns:
+            List[str]: Объекты, которые удалить не удалось.
+        """
+        from minio.deleteobjects import DeleteObject
+
+        def remove():
+            # Ошибки отдаются ленивым итератором: запросы уходят только при его обходе
+            errors = self.client.remove_objects(self.bucket_name, [DeleteObject(name) for name in object_names])
+            return [error.name for error in errors]
+
+        with observe_storage("remove_objects"):
+            failed = await asyncio.to_thread(remove)
+        for name in failed:
+            logger.error("Failed to remove object '%s' from MinIO", name)
+        return failed
+
     async def download_file(self, object_name: str) -> bytes:
         """
         Скачивает файл из MinIO.
@@ -76,11 +241,13 @@ class MinioClient:
             bytes: Содержимое файла.
         """
         try:
-            response = self.client.get_object(self.bucket_name, object_name)
-            file_content = response.read()
+            with observe_storage("get_object"), start_span("storage.get_object", object_name=object_name):
+                response = self.client.get_object(self.bucket_name, object_name)
+                file_content = response.read()
+            STORAGE_BYTES.labels("get_object").inc(len(file_content))
             logger.info(f"File '{object_name}' downloaded from MinIO.")
             return file_content
-        except S3Error as e:
+        except Exception as e:
             logger.error(f"Error downloading file from MinIO: {e}")
             raise
         finally:
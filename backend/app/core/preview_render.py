@@ -0,0 +1,80 @@
+# Рендеринг превью вложений. Модуль выполняется в процессах пула, поэтому не
+# импортирует ничего из приложения: дочерний процесс стартует быстро.
+# Pillow (изображения) и pypdfium2 (PDF) — необязательные зависимости: без них
+# превью для соответствующих типов просто не строятся.
+import io
+from typing import Dict, Tuple
+
+IMAGE_TYPES = frozenset({"image/png", "image/jpeg", "image/gif", "image/webp", "image/bmp", "image/tiff"})
+PDF_TYPES = frozenset({"application/pdf"})
+SUPPORTED_TYPES = IMAGE_TYPES | PDF_TYPES
+
+# Разрешение, с которым растеризуется первая страница PDF
+PDF_RENDER_DPI = 144
+
+
+class PreviewUnsupported(Exception):
+    """Для этого файла превью не строится: тип не поддерживается или нет библиотеки."""
+
+
+def _first_page(content: bytes, content_type: str):
+    if content_type in PDF_TYPES:
+        try:
+            import pypdfium2
+        except ImportError:
+            raise PreviewUnsupported("pypdfium2 не установлен") from None
+        document = pypdfium2.PdfDocument(content)
+        try:
+            if len(document) == 0:
+                raise PreviewUnsupported("В PDF нет страниц")
+            return document[0].render(scale=PDF_RENDER_DPI / 72).to_pil()
+        finally:
+            document.close()
+
+    from PIL import Image
+    image = Image.open(io.BytesIO(content))
+    # Первый кадр GIF/TIFF; draft ускоряет декодирование больших JPEG
+    image.seek(0)
+    image.draft("RGB", (4096, 4096))
+    return image
+
+
+def render_previews(content: bytes, content_type: str, sizes: Dict[str, Tuple[int, int]]) -> Dict[str, bytes]:
+    """
+    Строит JPEG-превью первой страницы (кадра) файла для каждого размера.
+
+    Args:
+        content (bytes): Исходный файл.
+        content_type (str): MIME-тип файла.
+        sizes (Dict[str, Tuple[int, int]]): Вид превью -> максимальные ширина и высота.
+
+    Returns:
+        Dict[str, bytes]: Вид превью -> JPEG.
+
+    Raises:
+        PreviewUnsupported: Если превью для файла не строится.
+    """
+    if content_type not in SUPPORTED_TYPES:
+        raise PreviewUnsupported(f"Тип {content_type} не поддерживается")
+    try:
+        from PIL import Image
+    except ImportError:
+        raise PreviewUnsupported("Pillow не установлен") from None
+
+    page = _first_page(content, content_type)
+    if page.mode not in ("RGB", "L"):
+        # Прозрачность накладывается на белый фон: в JPEG альфа-канала нет
+        background = Image.new("RGB", page.size, "white")
+        rgba = page.convert("RGBA")
+        background.paste(rgba, mask=rgba.getchannel("A"))
+        page = background
+
+    renders = {}
+    # От большего размера к меньшему: каждый следующий уменьшается из предыдущего
+    for kind, size in sorted(sizes.items(), key=lambda item: item[1], reverse=True):
+        page = page.copy()
+        page.thumbnail(size, Image.Resampling.LANCZOS)
+        output = io.BytesIO()
+        page.save(output, format="JPEG", quality=82, optimize=True, progressive=True)
+        renders[kind] = output.getvalue()
+    return renders
@@ -0,0 +1,233 @@
+import asyncio
+import concurrent.futures
+import contextlib
+import contextvars
+import functools
+import hashlib
+import logging
+import multiprocessing
+import os
+from typing import Awaitable, Callable, Dict, Optional, Set
+
+from sqlalchemy import select, update
+
+from app.core.config import settings
+from app.core.metrics import PREVIEW_RENDERS
+from app.core.preview_render import SUPPORTED_TYPES, PreviewUnsupported, render_previews
+from app.core.tracing import attach_context, inject_context, start_span
+from app.db.sharding import Shard, current_shard, shard_scope
+from app.models.workflow import Attachment
+
+logger = logging.getLogger(__name__)
+
+PREVIEW_KINDS = ("preview", "thumbnail")
+PREVIEW_CONTENT_TYPE = "image/jpeg"
+
+# Статусы превью вложения. NULL — вложение загружено до появления превью
+PREVIEW_PENDING = "pending"
+PREVIEW_READY = "ready"
+PREVIEW_UNSUPPORTED = "unsupported"
+PREVIEW_FAILED = "failed"
+
+Render = Callable[[bytes, str], Awaitable[Dict[str, bytes]]]
+
+
+def initial_preview_status(content_type: Optional[str]) -> str:
+    return PREVIEW_PENDING if content_type in SUPPORTED_TYPES else PREVIEW_UNSUPPORTED
+
+
+PREVIEW_PREFIX = "previews/"
+
+
+def preview_object_name(content_hash: str, kind: str) -> str:
+    """
+    Превью лежат в том же бакете под хэшем содержимого: одинаковые файлы,
+    загруженные несколько раз, разделяют одни и те же превью.
+    """
+    return f"{PREVIEW_PREFIX}{content_hash}/{kind}.jpg"
+
+
+class PreviewPipeline:
+    """
+    Фоновое построение превью и миниатюр вложений.
+
+    Загрузка файла только ставит вложение в очередь (`schedule`). Скачивание
+    и запись в хранилище идут в event loop, а декодирование и масштабирование —
+    в пуле процессов: тяжелый рендеринг не занимает ни event loop, ни GIL
+    воркера. Превью строятся один раз на содержимое (SHA-256): повторная
+    загрузка того же файла получает готовые превью без рендеринга, а
+    одновременные загрузки в одном процессе ждут один рендер.
+    """
+
+    def __init__(
+        self,
+        session_factory,
+        storage,
+        render: Optional[Render] = None,
+        max_workers: int = settings.PREVIEW_WORKERS,
+        max_source_bytes: int = settings.PREVIEW_MAX_SOURCE_BYTES,
+    ):
+        self._session_factory = session_factory
+        self._storage = storage
+        self._render = render or self._render_in_pool
+        self._max_workers = max_workers
+        self._max_source_bytes = max_source_bytes
+        self._sizes = {
+            "preview": (settings.PREVIEW_SIZE, settings.PREVIEW_SIZE),
+            "thumbnail": (settings.THUMBNAIL_SIZE, settings.THUMBNAIL_SIZE),
+        }
+        # Не больше вложений в работе, чем процессов в пуле: иначе исходники
+        # ждущих рендера файлов копились бы в памяти воркера
+        self._slots = asyncio.Semaphore(max_workers)
+        self._tasks: Set[asyncio.Task] = set()
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self._pool: Optional[concurrent.futures.ProcessPoolExecutor] = None
+        self._pid: Optional[int] = None
+
+    @property
+    def pool(self) -> concurrent.futures.ProcessPoolExecutor:
+        """
+        Пул создается при первом рендере и заново после fork. Процессы
+        запускаются через spawn: fork процесса с event loop и потоками
+        SDK хранилища может унаследовать захваченные блокировки.
+        """
+        if self._pool is None or self._pid != os.getpid():
+            self._pool = concurrent.futures.ProcessPoolExecutor(
+                max_workers=self._max_workers, mp_context=multiprocessing.get_context("spawn")
+            )
+            self._pid = os.getpid()
+        return self._pool
+
+    async def _render_in_pool(self, content: bytes, content_type: str) -> Dict[str, bytes]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.pool, functools.partial(render_previews, content, content_type, self._sizes)
+        )
+
+    def schedule(self, attachment_id: int) -> None:
+        """
+        Ставит построение превью вложения в очередь и сразу возвращает управление.
+        """
+        carrier = inject_context()
+        # Задача запускается в пустом контексте: ее SQL не должен попадать в
+        # Server-Timing запроса загрузки, а спан связывается с запросом явно.
+        # Шард запроса передается явно: вложение лежит в его базе и бакете
+        task = asyncio.get_running_loop().create_task(
+            self._generate(attachment_id, carrier, current_shard()), context=contextvars.Context()
+        )
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def drain(self) -> None:
+        """
+        Ждет завершения всех поставленных задач (тесты, остановка приложения).
+        """
+        while self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def close(self, timeout: float = 10.0) -> None:
+        """
+        Дает текущим рендерам завершиться за `timeout`, остальные отменяет.
+        Отмененные вложения остаются в статусе pending.
+        """
+        if self._tasks:
+            _, pending = await asyncio.wait(set(self._tasks), timeout=timeout)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        if self._pool is not None and self._pid == os.getpid():
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    async def _generate(self, attachment_id: int, carrier: dict, shard: Optional[Shard] = None) -> None:
+        session_factory = self._session_factory
+        if shard is not None and not shard.is_default:
+            session_factory = shard.session_factory
+        with attach_context(carrier), start_span("previews.generate", attachment_id=attachment_id), \
+                shard_scope(shard) if shard is not None else contextlib.nullcontext():
+            try:
+                async with self._slots, session_factory() as db:
+                    attachment = await db.get(Attachment, attachment_id)
+                    if attachment is None or attachment.preview_status != PREVIEW_PENDING:
+                        return
+                    content = await self._storage.download_file(attachment.s3_path)
+                    # hashlib отпускает GIL, но хэширование большого файла все
+                    # равно не должно выполняться в event loop
+                    content_hash = await asyncio.to_thread(lambda: hashlib.sha256(content).hexdigest())
+                    preview_status = await self._render_once(db, content_hash, content, attachment.content_type)
+                    await db.execute(
+                        update(Attachment)
+                        .where(Attachment.id == attachment_id)
+                        .values(content_hash=content_hash, preview_status=preview_status)
+                    )
+                    await db.commit()
+            except Exception:
+                PREVIEW_RENDERS.labels(PREVIEW_FAILED).inc()
+                logger.exception("Preview generation for attachment %s failed", attachment_id)
+
+    async def _render_once(self, db, content_hash: str, content: bytes, content_type: str) -> str:
+        future = self._in_flight.get(content_hash)
+        if future is not None:
+            PREVIEW_RENDERS.labels("deduplicated").inc()
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[content_hash] = future
+        try:
+            preview_status = await self._render_and_store(db, content_hash, content, content_type)
+            future.set_result(preview_status)
+            return preview_status
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Ожидающих может не быть: исключение уже доставлено вызывающему
+            future.exception()
+            raise
+        finally:
+            del self._in_flight[content_hash]
+
+    async def _render_and_store(self, db, content_hash: str, content: bytes, content_type: str) -> str:
+        # Тот же файл уже обрабатывали (возможно, другой воркер): превью в хранилище
+        known = (await db.execute(
+            select(Attachment.preview_status)
+            .where(
+                Attachment.content_hash == content_hash,
+                Attachment.preview_status.in_((PREVIEW_READY, PREVIEW_UNSUPPORTED)),
+            )
+            .limit(1)
+        )).scalar_one_or_none()
+        if known is not None:
+            PREVIEW_RENDERS.labels("deduplicated").inc()
+            return known
+
+        if len(content) > self._max_source_bytes:
+            PREVIEW_RENDERS.labels(PREVIEW_UNSUPPORTED).inc()
+            return PREVIEW_UNSUPPORTED
+        try:
+            with start_span("previews.render", content_type=content_type, size=len(content)):
+                renders = await self._render(content, content_type)
+        except PreviewUnsupported as e:
+            logger.info("No preview for %s content: %s", content_type, e)
+            PREVIEW_RENDERS.labels(PREVIEW_UNSUPPORTED).inc()
+            return PREVIEW_UNSUPPORTED
+        except Exception:
+            logger.exception("Rendering %s content %s failed", content_type, content_hash)
+            PREVIEW_RENDERS.labels(PREVIEW_FAILED).inc()
+            return PREVIEW_FAILED
+
+        for kind, data in renders.items():
+            await self._storage.upload_bytes(preview_object_name(content_hash, kind), data, PREVIEW_CONTENT_TYPE)
+        PREVIEW_RENDERS.labels("rendered").inc()
+        return PREVIEW_READY
+
+
+def build_preview_pipeline() -> PreviewPipeline:
+    """
+    Фабрика для реестра сервисов.
+    """
+    from app.core.minio_client import minio_client
+    from app.db.session import AsyncSessionLocal
+
+    return PreviewPipeline(AsyncSessionLocal, minio_client)
@@ -0,0 +1,111 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Iterator, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+@dataclass
+class QueryStats:
+    """
+    Счетчики SQL-запросов в пределах одного HTTP-запроса (или блока `track_queries`).
+    """
+    statements: int = 0
+    rows: int = 0
+    db_time: float = 0.0  # секунды
+    # Тексты запросов сохраняются только по требованию (в тестах),
+    # чтобы не держать их в памяти на каждом запросе в продакшене.
+    record: bool = False
+    recorded: List[str] = field(default_factory=list)
+
+    def server_timing(self) -> str:
+        """
+        Возвращает значение для заголовка `Server-Timing`.
+        """
+        return f'db;dur={self.db_time * 1000:.2f};desc="{self.statements} queries, {self.rows} rows"'
+
+
+_current_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+def current_query_stats() -> Optional[QueryStats]:
+    """
+    Возвращает счетчики текущего запроса или None, если учет не ведется.
+    """
+    return _current_stats.get()
+
+
+@contextmanager
+def track_queries(record: bool = False) -> Iterator[QueryStats]:
+    """
+    Ведет учет SQL-запросов, выполненных внутри блока.
+
+    Args:
+        record (bool): Сохранять ли тексты запросов (для диагностики в тестах).
+
+    Yields:
+        QueryStats: Счетчики, заполняемые по мере выполнения запросов.
+    """
+    stats = QueryStats(record=record)
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_stats.get() is not None:
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current_stats.get()
+    if stats is None:
+        return
+    started = conn.info["query_start_time"].pop()
+    stats.statements += 1
+    stats.db_time += time.perf_counter() - started
+    if cursor.rowcount > 0:
+        stats.rows += cursor.rowcount
+    if stats.record:
+        stats.recorded.append(statement)
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    """
+    Подключает учет запросов к движку SQLAlchemy.
+
+    Слушатели работают на синхронном движке: SQLAlchemy выполняет их в greenlet,
+    который наследует контекст корутины, поэтому `ContextVar` виден внутри них.
+    """
+    event.listen(engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine.sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class QueryStatsMiddleware:
+    """
+    ASGI-middleware: считает SQL-запросы каждого HTTP-запроса и отдает итог
+    в заголовке `Server-Timing` (виден во вкладке Network браузера).
+    """
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with track_queries() as stats:
+            async def send_with_timing(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    headers = MutableHeaders(scope=message)
+                    headers.append("Server-Timing", stats.server_timing())
+                await send(message)
+
+            await self.app(scope, receive, send_with_timing)
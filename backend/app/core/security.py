@@ -1,10 +1,13 @@
 from passlib.context import CryptContext  # type: ignore
 
+from app.core.tracing import traced
+
 # Контекст для хеширования паролей.
 # Используем алгоритм sha256_crypt, который является рекомендуемым для хеширования паролей.
 pwd_context = CryptContext(schemes=["sha256_crypt"], deprecated="auto")
 
 
+@traced("security.verify_password")
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """
     Проверяет, соответствует ли введенный пароль хешированному.
@@ -19,6 +22,7 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
+@traced("security.get_password_hash")
 def get_password_hash(password: str) -> str:
     """
     Хеширует пароль.
@@ -0,0 +1,119 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ServiceStatus:
+    name: str
+    ok: bool
+    required: bool
+    duration_ms: float
+    error: Optional[str] = None
+
+
+@dataclass
+class _Service:
+    factory: Optional[Callable[[], Any]]
+    check: Optional[Callable[[], Awaitable[None]]]
+    required: bool
+
+
+class ServiceRegistry:
+    """
+    Реестр внешних зависимостей приложения (БД, хранилище, Redis...).
+
+    Клиенты создаются фабриками при первом обращении (`get`), а не при
+    импорте модулей, поэтому холодный старт не платит за клиентов, которые
+    процессу могут и не понадобиться. Проверки доступности выполняются
+    параллельно и ограничены таймаутом (`check_all`).
+    """
+
+    def __init__(self):
+        self._services: Dict[str, _Service] = {}
+        self._instances: Dict[str, Any] = {}
+
+    def register(
+        self,
+        name: str,
+        factory: Optional[Callable[[], Any]] = None,
+        check: Optional[Callable[[], Awaitable[None]]] = None,
+        required: bool = True,
+    ) -> None:
+        """
+        Регистрирует зависимость.
+
+        Args:
+            name (str): Имя зависимости в реестре и в ответе readiness.
+            factory (Callable | None): Создает клиента при первом `get(name)`.
+            check (Callable | None): Корутина-проверка доступности; исключение — недоступна.
+            required (bool): Влияет ли недоступность на готовность приложения.
+        """
+        self._services[name] = _Service(factory=factory, check=check, required=required)
+        self._instances.pop(name, None)
+
+    def get(self, name: str) -> Any:
+        if name not in self._instances:
+            factory = self._services[name].factory
+            if factory is None:
+                raise KeyError(f"Service '{name}' has no factory")
+            self._instances[name] = factory()
+        return self._instances[name]
+
+    def is_created(self, name: str) -> bool:
+        """
+        Создан ли уже клиент (чтобы при остановке не создавать его ради закрытия).
+        """
+        return name in self._instances
+
+    def override(self, name: str, instance: Any) -> None:
+        """
+        Подменяет клиента готовым объектом (тесты, бенчмарки).
+        """
+        self._instances[name] = instance
+
+    async def _check(self, name: str, service: _Service, timeout: float) -> ServiceStatus:
+        started = time.perf_counter()
+        error = None
+        try:
+            await asyncio.wait_for(service.check(), timeout)
+        except asyncio.TimeoutError:
+            error = f"timed out after {timeout} s"
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        return ServiceStatus(
+            name=name,
+            ok=error is None,
+            required=service.required,
+            duration_ms=round((time.perf_counter() - started) * 1000, 1),
+            error=error,
+        )
+
+    async def check_all(self, timeout: float) -> List[ServiceStatus]:
+        """
+        Проверяет все зависимости одновременно: общее время не превышает `timeout`.
+        """
+        return list(await asyncio.gather(*(
+            self._check(name, service, timeout)
+            for name, service in self._services.items()
+            if service.check is not None
+        )))
+
+
+def is_ready(statuses: List[ServiceStatus]) -> bool:
+    return all(status.ok for status in statuses if status.required)
+
+
+def log_statuses(statuses: List[ServiceStatus]) -> None:
+    for status in statuses:
+        if status.ok:
+            logger.info("Dependency '%s' is available (%.1f ms)", status.name, status.duration_ms)
+        else:
+            logger.warning("Dependency '%s' is unavailable: %s", status.name, status.error)
+
+
+services = ServiceRegistry()
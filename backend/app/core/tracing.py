@@ -0,0 +1,177 @@
+import functools
+import inspect
+import logging
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from opentelemetry import context as otel_context
+from opentelemetry import propagate, trace
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import (
+    BatchSpanProcessor,
+    ConsoleSpanExporter,
+    SimpleSpanProcessor,
+)
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+from opentelemetry.trace import SpanKind, Status, StatusCode
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+logger = logging.getLogger(__name__)
+
+# Трассировщик получаем через API OpenTelemetry: пока провайдер не настроен,
+# это no-op, и инструментированный код не платит за трассировку ничего.
+# Корневой спан HTTP-запроса (с продолжением входящего `traceparent`) и спаны
+# зависимостей, эндпоинта и фоновых задач создает сам FastAPI (>= 0.142)
+# через глобальный провайдер, который настраивает `setup_tracing`.
+tracer = trace.get_tracer("soglasovach")
+
+_memory_exporter: Optional[InMemorySpanExporter] = None
+
+# Тексты SQL обрезаются, чтобы огромные IN (...) не раздували спаны
+MAX_STATEMENT_LENGTH = 2000
+
+
+def setup_tracing(exporter: str, sample_ratio: float, service_name: str = "soglasovach-api") -> None:
+    """
+    Настраивает провайдер трассировки.
+
+    Args:
+        exporter (str): "none", "console", "memory" (для тестов) или "otlp"
+            (адрес коллектора берется из стандартной OTEL_EXPORTER_OTLP_ENDPOINT).
+        sample_ratio (float): Доля трасс, записываемых в корне (0..1). Решение
+            о записи наследуется от входящего `traceparent`, поэтому трасса,
+            начатая на фронтенде или в другом сервисе, не рвется.
+        service_name (str): Имя сервиса в атрибутах ресурса.
+    """
+    global _memory_exporter
+    if exporter == "none":
+        return
+
+    provider = TracerProvider(
+        resource=Resource.create({"service.name": service_name}),
+        sampler=ParentBased(TraceIdRatioBased(sample_ratio)),
+    )
+    if exporter == "console":
+        provider.add_span_processor(SimpleSpanProcessor(ConsoleSpanExporter()))
+    elif exporter == "memory":
+        _memory_exporter = InMemorySpanExporter()
+        provider.add_span_processor(SimpleSpanProcessor(_memory_exporter))
+    elif exporter == "otlp":
+        try:
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        except ImportError:
+            logger.error("TRACING_EXPORTER=otlp requires opentelemetry-exporter-otlp-proto-http; tracing disabled.")
+            return
+        # Пакетная отправка в отдельном потоке: экспорт не задерживает запросы
+        provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+    else:
+        raise ValueError(f"Unknown tracing exporter: {exporter}")
+    trace.set_tracer_provider(provider)
+
+
+def get_memory_exporter() -> Optional[InMemorySpanExporter]:
+    """
+    Возвращает экспортер "memory" (для проверок в тестах) или None.
+    """
+    return _memory_exporter
+
+
+@contextmanager
+def start_span(name: str, **attributes) -> Iterator[trace.Span]:
+    """
+    Открывает дочерний спан текущего контекста.
+    """
+    with tracer.start_as_current_span(name, attributes=attributes or None) as span:
+        yield span
+
+
+def traced(name: str):
+    """
+    Декоратор: выполняет функцию (синхронную или корутину) внутри спана.
+
+    Контекст OpenTelemetry хранится в contextvars, поэтому фоновые задачи
+    (`BackgroundTasks`, `asyncio.create_task`, `run_in_threadpool`) автоматически
+    становятся дочерними спанами запроса, который их запустил.
+    """
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with tracer.start_as_current_span(name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with tracer.start_as_current_span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def inject_context() -> dict:
+    """
+    Сериализует текущий контекст трассировки (W3C traceparent) для передачи
+    туда, куда contextvars не доходят: в другой процесс или очередь задач.
+    """
+    carrier: dict = {}
+    propagate.inject(carrier)
+    return carrier
+
+
+@contextmanager
+def attach_context(carrier: dict) -> Iterator[None]:
+    """
+    Восстанавливает контекст, сохраненный `inject_context`.
+    """
+    token = otel_context.attach(propagate.extract(carrier))
+    try:
+        yield
+    finally:
+        otel_context.detach(token)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Если запрос не попал в выборку, не создаем даже no-op спан
+    if not trace.get_current_span().is_recording():
+        return
+    span = tracer.start_span(
+        statement.split(None, 1)[0].upper() if statement else "SQL",
+        kind=SpanKind.CLIENT,
+        attributes={
+            "db.system": "postgresql",
+            "db.statement": statement[:MAX_STATEMENT_LENGTH],
+        },
+    )
+    context._otel_span = span
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    span = getattr(context, "_otel_span", None)
+    if span is not None:
+        if cursor.rowcount >= 0:
+            span.set_attribute("db.rows", cursor.rowcount)
+        span.end()
+        context._otel_span = None
+
+
+def _handle_error(exception_context):
+    span = getattr(exception_context.execution_context, "_otel_span", None)
+    if span is not None:
+        span.record_exception(exception_context.original_exception)
+        span.set_status(Status(StatusCode.ERROR))
+        span.end()
+        exception_context.execution_context._otel_span = None
+
+
+def trace_engine(engine: AsyncEngine) -> None:
+    """
+    Создает спан на каждый SQL-запрос движка.
+    """
+    event.listen(engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine.sync_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine.sync_engine, "handle_error", _handle_error)
+
@@ -0,0 +1,184 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import List, Tuple
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.metrics import ATTACHMENT_GC_REMOVED
+from app.core.previews import PREVIEW_PREFIX
+from app.db.sharding import shard_scope
+from app.models.maintenance import MaintenanceCursor
+from app.models.upload import UploadSession
+from app.models.workflow import Attachment
+
+logger = logging.getLogger(__name__)
+
+# Имя последнего просмотренного объекта бакета
+OBJECTS_CURSOR = "attachment_gc.objects"
+
+
+class RateLimiter:
+    """
+    Ограничивает среднюю скорость операций: каждая партия занимает
+    `count / rate` секунд, следующая ждет, пока это время не пройдет.
+    """
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self._next = time.monotonic()
+
+    async def acquire(self, count: int) -> None:
+        if self.rate <= 0:
+            return
+        now = time.monotonic()
+        start = max(self._next, now)
+        self._next = start + count / self.rate
+        if start > now:
+            await asyncio.sleep(start - now)
+
+
+def _cutoff() -> datetime:
+    return datetime.now(timezone.utc) - timedelta(seconds=settings.ATTACHMENT_GC_TTL_SECONDS)
+
+
+async def remove_unlinked_attachments(db: AsyncSession, storage, batch_size: int) -> int:
+    """
+    Удаляет партию вложений, которые так и не привязали к экземпляру за
+    ATTACHMENT_GC_TTL_SECONDS, вместе с их файлами. Курсор не нужен:
+    удаленные строки больше не попадают в выборку.
+
+    Returns:
+        int: Сколько вложений удалено.
+    """
+    # SKIP LOCKED: воркеры, запустившие сборку одновременно, делят строки между собой
+    rows = (await db.execute(
+        select(Attachment.id, Attachment.s3_path)
+        .where(Attachment.instance_id.is_(None), Attachment.uploaded_at < _cutoff())
+        .order_by(Attachment.uploaded_at)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )).all()
+    if rows:
+        await db.execute(delete(Attachment).where(Attachment.id.in_([row.id for row in rows])))
+    await db.commit()
+    if rows:
+        # Сначала строка, потом файл: если хранилище не ответит, файл станет
+        # объектом без записи и его удалит обход бакета
+        await storage.remove_objects([row.s3_path for row in rows])
+        ATTACHMENT_GC_REMOVED.labels("unlinked").inc(len(rows))
+    return len(rows)
+
+
+async def _unreferenced(db: AsyncSession, object_names: List[str]) -> List[str]:
+    previews = {name: name[len(PREVIEW_PREFIX):].split("/", 1)[0] for name in object_names
+                if name.startswith(PREVIEW_PREFIX)}
+    files = [name for name in object_names if name not in previews]
+    referenced = set()
+    if files:
+        referenced.update((await db.execute(
+            select(Attachment.s3_path).where(Attachment.s3_path.in_(files))
+        )).scalars())
+        # Файл загрузки по частям собирается до коммита, удаляющего сессию и создающего вложение
+        referenced.update((await db.execute(
+            select(UploadSession.object_name).where(UploadSession.object_name.in_(files))
+        )).scalars())
+    if previews:
+        # Превью общие для всех вложений с тем же содержимым
+        hashes = set((await db.execute(
+            select(Attachment.content_hash).where(Attachment.content_hash.in_(set(previews.values())))
+        )).scalars())
+        referenced.update(name for name, content_hash in previews.items() if content_hash in hashes)
+    return [name for name in object_names if name not in referenced]
+
+
+async def remove_orphaned_objects(db: AsyncSession, storage, batch_size: int) -> Tuple[int, bool]:
+    """
+    Проверяет следующую страницу бакета после сохраненного курсора и удаляет
+    объекты старше ATTACHMENT_GC_TTL_SECONDS, на которые нет записи в БД
+    (файлы удаленных вложений, превью, загрузки, не дошедшие до записи).
+
+    Returns:
+        Tuple[int, bool]: Сколько объектов удалено и закончен ли обход
+        (бакет пройден до конца или шаг уже выполняет другой воркер).
+    """
+    await db.execute(insert(MaintenanceCursor).values(name=OBJECTS_CURSOR).on_conflict_do_nothing())
+    cursor = (await db.execute(
+        select(MaintenanceCursor).where(MaintenanceCursor.name == OBJECTS_CURSOR).with_for_update(skip_locked=True)
+    )).scalar_one_or_none()
+    if cursor is None:
+        await db.rollback()
+        return 0, True
+
+    page = await storage.list_objects(cursor.value or None, batch_size)
+    cutoff = _cutoff()
+    orphans = await _unreferenced(db, [name for name, modified in page if modified < cutoff])
+    removed = 0
+    if orphans:
+        failed = await storage.remove_objects(orphans)
+        removed = len(orphans) - len(failed)
+        ATTACHMENT_GC_REMOVED.labels("orphaned").inc(removed)
+
+    finished = len(page) < batch_size
+    # После конца бакета следующий обход начнется сначала
+    cursor.value = "" if finished else page[-1][0]
+    cursor.updated_at = func.now()
+    await db.commit()
+    return removed, finished
+
+
+async def collect_garbage(session_factory, storage, batch_size: int, rate: float) -> Tuple[int, int]:
+    """
+    Полный проход: непривязанные вложения, затем бакет от курсора до конца.
+    Каждый шаг — отдельная короткая транзакция; скорость ограничена `rate`
+    удалений (но не меньше одного шага) в секунду, чтобы не мешать запросам
+    пользователей.
+
+    Returns:
+        Tuple[int, int]: Удалено вложений и объектов без записи.
+    """
+    limiter = RateLimiter(rate)
+    unlinked = orphaned = 0
+    while True:
+        async with session_factory() as db:
+            removed = await remove_unlinked_attachments(db, storage, batch_size)
+        unlinked += removed
+        if removed < batch_size:
+            break
+        await limiter.acquire(removed)
+    finished = False
+    while not finished:
+        await limiter.acquire(1)
+        async with session_factory() as db:
+            removed, finished = await remove_orphaned_objects(db, storage, batch_size)
+        orphaned += removed
+        await limiter.acquire(removed)
+    return unlinked, orphaned
+
+
+async def collect_attachment_garbage(interval: float) -> None:
+    """
+    Фоновая задача: периодически удаляет неиспользуемые вложения и объекты.
+    """
+    from app.core.minio_client import minio_client
+    from app.db.session import shard_router
+
+    while True:
+        await asyncio.sleep(interval)
+        # У каждого шарда своя база, бакет и курсор обхода
+        for shard in shard_router.shards.values():
+            try:
+                with shard_scope(shard):
+                    unlinked, orphaned = await collect_garbage(
+                        shard.session_factory, minio_client,
+                        settings.ATTACHMENT_GC_BATCH_SIZE, settings.ATTACHMENT_GC_RATE,
+                    )
+                if unlinked or orphaned:
+                    logger.info("Removed %s unlinked attachments and %s orphaned objects in shard %s",
+                                unlinked, orphaned, shard.name)
+            except Exception:
+                logger.exception("Failed to collect attachment garbage in shard %s", shard.name)
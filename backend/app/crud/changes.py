@@ -0,0 +1,134 @@
+import base64
+import json
+from typing import Iterable, List, Optional, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import BigInteger, Text, cast, func, insert, literal, select, tuple_, union_all
+
+from app.models.workflow import WorkflowHistory, WorkflowInstance, WorkflowTombstone
+
+
+Position = Tuple[int, str, int]
+
+# Токен "с самого начала": первая синхронизация выгружает все
+INITIAL_POSITION: Position = (0, "", 0)
+
+
+def encode_token(change_seq: int, kind: str, id: int) -> str:
+    """
+    Кодирует позицию последнего отданного изменения в непрозрачный токен.
+    """
+    raw = json.dumps([change_seq, kind, id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_token(token: str) -> Position:
+    """
+    Декодирует токен, выданный `encode_token`.
+
+    Raises:
+        ValueError: Если токен поврежден.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        change_seq, kind, id = json.loads(raw)
+        return int(change_seq), str(kind), int(id)
+    except (ValueError, TypeError) as e:
+        raise ValueError("Некорректный токен изменений.") from e
+
+
+def _stable_horizon():
+    # Самая старая транзакция, активная на момент запроса. Строки с меньшим
+    # номером уже закоммичены (или откачены) и видны целиком.
+    return cast(cast(func.pg_snapshot_xmin(func.pg_current_snapshot()), Text), BigInteger)
+
+
+def _branch(kind: str, change_seq, id, position: Position, limit: int):
+    stmt = select(
+        literal(kind).label("kind"),
+        id.label("id"),
+        change_seq.label("change_seq"),
+    ).where(change_seq < _stable_horizon())
+
+    # Keyset-пагинация по (change_seq, kind, id): kind в ветке постоянен,
+    # поэтому сравнение кортежа сводится к условию на (change_seq, id).
+    position_seq, position_kind, position_id = position
+    if kind > position_kind:
+        stmt = stmt.where(change_seq >= position_seq)
+    elif kind == position_kind:
+        stmt = stmt.where(tuple_(change_seq, id) > tuple_(position_seq, position_id))
+    else:
+        stmt = stmt.where(change_seq > position_seq)
+    return stmt.order_by(change_seq, id).limit(limit)
+
+
+async def get_changes(
+    db: AsyncSession, since: Optional[str] = None, limit: int = 500
+) -> Tuple[List[WorkflowInstance], List[WorkflowHistory], List[WorkflowTombstone], str, bool]:
+    """
+    Изменения экземпляров и истории после позиции `since`.
+
+    Изменения упорядочены по номеру изменившей строку транзакции. Строка,
+    измененная повторно, получает новый номер и придет снова; удаления
+    приходят отметками из `workflow_tombstones`.
+
+    Args:
+        db (AsyncSession): Асинхронная сессия базы данных.
+        since (Optional[str]): Токен из предыдущего ответа; None — с начала.
+        limit (int): Максимум изменений в ответе.
+
+    Returns:
+        Tuple: Экземпляры, записи истории, удаления, токен следующего
+        запроса и признак того, что изменения еще остались.
+
+    Raises:
+        ValueError: Если токен поврежден.
+    """
+    position = decode_token(since) if since else INITIAL_POSITION
+    fetch = limit + 1
+
+    branches = union_all(
+        _branch("history", WorkflowHistory.change_seq, WorkflowHistory.id, position, fetch),
+        _branch("instance", WorkflowInstance.change_seq, WorkflowInstance.id, position, fetch),
+        _branch("tombstone", WorkflowTombstone.change_seq, WorkflowTombstone.id, position, fetch),
+    ).subquery()
+    result = await db.execute(
+        select(branches)
+        .order_by(branches.c.change_seq, branches.c.kind, branches.c.id)
+        .limit(fetch)
+    )
+    keys = result.all()
+
+    has_more = len(keys) > limit
+    keys = keys[:limit]
+    if not keys:
+        return [], [], [], encode_token(*position), False
+
+    ids = {"history": [], "instance": [], "tombstone": []}
+    for kind, id, _ in keys:
+        ids[kind].append(id)
+
+    # Строка могла измениться между запросами: тогда придет более новая
+    # версия (и еще раз позже), а удаленная — отметкой об удалении.
+    async def load(model, kind):
+        if not ids[kind]:
+            return []
+        rows = await db.execute(select(model).where(model.id.in_(ids[kind])).order_by(model.change_seq, model.id))
+        return rows.scalars().all()
+
+    instances = await load(WorkflowInstance, "instance")
+    history = await load(WorkflowHistory, "history")
+    tombstones = await load(WorkflowTombstone, "tombstone")
+
+    last_kind, last_id, last_seq = keys[-1]
+    return instances, history, tombstones, encode_token(last_seq, last_kind, last_id), has_more
+
+
+async def record_tombstones(db: AsyncSession, entity: str, ids: Iterable[int]) -> None:
+    """
+    Добавляет в транзакцию `db` отметки об удалении для ленты изменений.
+    Вызывается CRUD-функциями удаления рядом с DELETE; коммит — за ними.
+    """
+    rows = [{"entity": entity, "entity_id": entity_id} for entity_id in ids]
+    if rows:
+        await db.execute(insert(WorkflowTombstone), rows)
@@ -0,0 +1,94 @@
+import uuid
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import func, or_, select
+from sqlalchemy.dialects.postgresql import Range
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.crud.permissions import bump_permissions_version
+from app.models.delegation import Delegation
+from app.models.user import User
+from app.models.workflow import WorkflowTemplate
+from app.schemas.delegation import DelegationCreate
+
+
+async def create_delegation(
+    db: AsyncSession, delegation_in: DelegationCreate, delegator_id: uuid.UUID
+) -> Delegation:
+    """
+    Заводит замещение. Кэш прав заместителя сбрасывается сменой его версии
+    прав, начало и конец периода учитываются при проверке без сброса.
+
+    Raises:
+        LookupError: Если пользователя или шаблона нет.
+        ValueError: Если у сотрудника уже есть замещение тех же шагов на
+            пересекающийся период.
+    """
+    requested = {delegator_id, delegation_in.delegate_id}
+    found = set((await db.execute(select(User.id).where(User.id.in_(requested)))).scalars())
+    missing = sorted(str(user_id) for user_id in requested - found)
+    if missing:
+        raise LookupError(f"Пользователи не найдены: {', '.join(missing)}.")
+    if delegation_in.template_id is not None and (await db.execute(
+        select(WorkflowTemplate.id).where(WorkflowTemplate.id == delegation_in.template_id)
+    )).scalar_one_or_none() is None:
+        raise LookupError("Шаблон рабочего процесса не найден.")
+
+    period = Range(delegation_in.starts_at, delegation_in.ends_at, bounds="[)")
+    # Проверка пересечения и вставка не должны разойтись с параллельным запросом
+    await db.execute(select(func.pg_advisory_xact_lock(func.hashtext(f"delegation:{delegator_id}"))))
+    overlapping = await db.execute(
+        select(Delegation.id)
+        .where(
+            Delegation.delegator_id == delegator_id,
+            Delegation.template_id.is_not_distinct_from(delegation_in.template_id),
+            Delegation.period.overlaps(period),
+        )
+        .limit(1)
+    )
+    if overlapping.scalar_one_or_none() is not None:
+        await db.rollback()
+        raise ValueError("На этот период у сотрудника уже есть замещение тех же шагов.")
+
+    delegation = Delegation(
+        delegator_id=delegator_id,
+        delegate_id=delegation_in.delegate_id,
+        template_id=delegation_in.template_id,
+        period=period,
+        comment=delegation_in.comment,
+    )
+    db.add(delegation)
+    await bump_permissions_version(db, [delegation_in.delegate_id])
+    await db.commit()
+    await db.refresh(delegation)
+    return delegation
+
+
+async def get_delegation(db: AsyncSession, delegation_id: int) -> Optional[Delegation]:
+    return await db.get(Delegation, delegation_id)
+
+
+async def get_delegations(
+    db: AsyncSession, user_id: Optional[uuid.UUID] = None, active_at: Optional[datetime] = None
+) -> List[Delegation]:
+    """
+    Замещения, где пользователь отсутствует или замещает (без `user_id` — все).
+    С `active_at` — действующие в этот момент, иначе — еще не закончившиеся.
+    """
+    query = select(Delegation)
+    if user_id is not None:
+        query = query.where(or_(Delegation.delegator_id == user_id, Delegation.delegate_id == user_id))
+    if active_at is not None:
+        query = query.where(Delegation.period.contains(active_at))
+    else:
+        query = query.where(or_(func.upper_inf(Delegation.period), func.upper(Delegation.period) > func.now()))
+    result = await db.execute(query.order_by(func.lower(Delegation.period), Delegation.id))
+    return result.scalars().all()
+
+
+async def delete_delegation(db: AsyncSession, delegation: Delegation) -> None:
+    delegate_id = delegation.delegate_id
+    await db.delete(delegation)
+    await bump_permissions_version(db, [delegate_id])
+    await db.commit()
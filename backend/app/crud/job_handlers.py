@@ -0,0 +1,71 @@
+from typing import Dict, List
+
+from pydantic import BaseModel, Field
+
+from app.core.events import publish_instance_event
+from app.core.jobs import JobContext, job_types
+from app.crud.template_catalog import export_template_catalog
+from app.crud.workflow import create_workflow_instance, get_workflow_template
+from app.schemas.workflow import WorkflowInstanceCreate
+
+
+class BulkLaunchParams(BaseModel):
+    instances: List[WorkflowInstanceCreate] = Field(
+        ..., min_length=1, max_length=10_000, description="Экземпляры для запуска"
+    )
+
+
+class TemplateExportParams(BaseModel):
+    pass
+
+
+@job_types.register("bulk_launch", BulkLaunchParams, max_concurrency=4)
+async def bulk_launch(context: JobContext) -> dict:
+    """
+    Запускает экземпляры по списку. Ошибка одного экземпляра (нет шаблона,
+    версии) не останавливает остальные и попадает в `errors` результата.
+    Контрольная точка фиксируется в одной транзакции с каждым экземпляром,
+    поэтому после падения воркера запуски не повторяются.
+    """
+    instances = context.params.instances
+    state = context.checkpoint or {"next": 0, "instance_ids": [], "errors": []}
+    templates: Dict[int, bool] = {}
+    await context.report(state["next"], len(instances))
+    for index in range(state["next"], len(instances)):
+        instance_in = instances[index]
+        instance = None
+        async with context.session_factory() as db:
+            if instance_in.template_id not in templates:
+                templates[instance_in.template_id] = await get_workflow_template(db, instance_in.template_id) is not None
+            try:
+                if not templates[instance_in.template_id]:
+                    raise LookupError("Шаблон рабочего процесса не найден.")
+                instance = await create_workflow_instance(
+                    db, instance_in=instance_in, created_by_id=context.user_id, commit=False
+                )
+            except (LookupError, ValueError) as e:
+                # Недописанный экземпляр откатывается здесь: транзакция наша
+                await db.rollback()
+                state["errors"].append({"index": index, "detail": str(e)})
+            else:
+                state["instance_ids"].append(instance.id)
+            state["next"] = index + 1
+            # Отмена или потеря аренды выбрасывают исключение до коммита:
+            # экземпляр откатывается вместе с контрольной точкой
+            await context.report(state["next"], checkpoint=state, db=db)
+            await db.commit()
+        if instance is not None:
+            await publish_instance_event(instance, action="create", actor_id=context.user_id)
+    return {"instance_ids": state["instance_ids"], "errors": state["errors"]}
+
+
+@job_types.register("template_export", TemplateExportParams, max_concurrency=2)
+async def template_export(context: JobContext) -> dict:
+    """
+    Выгружает каталог шаблонов (как GET /workflow/workflow_templates/export)
+    в результат задачи.
+    """
+    async with context.session_factory() as db:
+        catalog = await export_template_catalog(db)
+    await context.report(len(catalog.templates), len(catalog.templates))
+    return catalog.model_dump(mode="json")
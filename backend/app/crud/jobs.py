@@ -0,0 +1,73 @@
+import uuid
+from typing import List, Optional
+
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.jobs import JOB_CANCELLED, JOB_QUEUED, JOB_RUNNING, job_types
+from app.models.job import Job
+from app.schemas.job import JobCreate
+
+
+async def submit_job(db: AsyncSession, job_in: JobCreate, created_by_id: uuid.UUID) -> Job:
+    """
+    Ставит задачу в очередь. Параметры проверяются схемой типа сейчас, а не
+    когда до задачи дойдет воркер.
+
+    Raises:
+        LookupError: Неизвестный тип задачи.
+        pydantic.ValidationError: Параметры не подходят типу.
+    """
+    job_type = job_types.get(job_in.type)
+    if job_type is None:
+        raise LookupError(f"Неизвестный тип задачи: {job_in.type}")
+    params = job_type.params.model_validate(job_in.params)
+    job = Job(
+        type=job_type.name,
+        status=JOB_QUEUED,
+        params=params.model_dump(mode="json"),
+        created_by_id=created_by_id,
+    )
+    db.add(job)
+    await db.commit()
+    await db.refresh(job)
+    return job
+
+
+async def get_job(db: AsyncSession, job_id: uuid.UUID, user_id: uuid.UUID) -> Optional[Job]:
+    result = await db.execute(select(Job).where(Job.id == job_id, Job.created_by_id == user_id))
+    return result.scalar_one_or_none()
+
+
+async def list_jobs(
+    db: AsyncSession, user_id: uuid.UUID, status: Optional[str] = None, limit: int = 50
+) -> List[Job]:
+    query = select(Job).where(Job.created_by_id == user_id)
+    if status is not None:
+        query = query.where(Job.status == status)
+    result = await db.execute(query.order_by(Job.created_at.desc()).limit(limit))
+    return result.scalars().all()
+
+
+async def cancel_job(db: AsyncSession, job: Job) -> Job:
+    """
+    Ожидающая задача отменяется сразу. У выполняющейся ставится флаг: воркер
+    прервет ее при следующем продлении аренды или отчете о прогрессе.
+    """
+    # Условные UPDATE: задачу могли захватить или завершить после чтения
+    result = await db.execute(
+        update(Job)
+        .where(Job.id == job.id, Job.status == JOB_QUEUED)
+        .values(status=JOB_CANCELLED, cancel_requested=True, finished_at=func.now())
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 0:
+        await db.execute(
+            update(Job)
+            .where(Job.id == job.id, Job.status == JOB_RUNNING)
+            .values(cancel_requested=True)
+            .execution_options(synchronize_session=False)
+        )
+    await db.commit()
+    await db.refresh(job)
+    return job
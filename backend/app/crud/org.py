@@ -0,0 +1,223 @@
+import collections
+import time
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, func, insert, literal, or_, select, text, true, union_all, update
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.metrics import AUTH_CACHE
+from app.db.tenancy import tenant_or_default
+from app.models.org import OrgClosure
+from app.models.user import User
+
+# Пересборка замыкания: цепочки руководителей всех сотрудников тенанта
+# одним рекурсивным запросом вместо переноса поддеревьев по одному
+_REBUILD_CLOSURE = text("""
+    WITH RECURSIVE chain(descendant_id, ancestor_id, depth) AS (
+        SELECT id, manager_id, 1 FROM users WHERE tenant_id = :tenant AND manager_id IS NOT NULL
+        UNION ALL
+        SELECT chain.descendant_id, users.manager_id, chain.depth + 1
+        FROM chain JOIN users ON users.id = chain.ancestor_id
+        WHERE users.manager_id IS NOT NULL
+    )
+    INSERT INTO org_closure (tenant_id, descendant_id, depth, ancestor_id)
+    SELECT :tenant, descendant_id, depth, ancestor_id FROM chain
+""")
+
+
+class ManagerRouteCache:
+    """
+    LRU-кэш руководителей, найденных для шагов «руководитель инициатора
+    N-го уровня»: массовый запуск от одного инициатора обращается к
+    оргструктуре один раз. Реорганизация очищает кэш своего процесса,
+    остальные процессы видят ее не позже чем через `ttl` секунд.
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "collections.OrderedDict[Tuple[str, uuid.UUID, int], Tuple[float, uuid.UUID]]" = (
+            collections.OrderedDict()
+        )
+
+    def get(self, user_id: uuid.UUID, level: int) -> Optional[uuid.UUID]:
+        key = (tenant_or_default(), user_id, level)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] < time.monotonic():
+            del self._entries[key]
+            entry = None
+        if entry is not None:
+            self._entries.move_to_end(key)
+        AUTH_CACHE.labels("org_routes", "hit" if entry is not None else "miss").inc()
+        return entry[1] if entry is not None else None
+
+    def put(self, user_id: uuid.UUID, level: int, manager_id: uuid.UUID) -> None:
+        key = (tenant_or_default(), user_id, level)
+        self._entries[key] = (time.monotonic() + self.ttl, manager_id)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+manager_routes = ManagerRouteCache(settings.ORG_ROUTE_CACHE_SIZE, settings.ORG_ROUTE_CACHE_TTL)
+
+
+async def resolve_manager(db: AsyncSession, user_id: uuid.UUID, level: int) -> Optional[uuid.UUID]:
+    """
+    Руководитель пользователя `level`-го уровня (1 — непосредственный). Если
+    цепочка короче, шаг достается руководителю верхнего уровня. Одно чтение
+    по первичному ключу `org_closure` или кэш.
+
+    Returns:
+        Optional[uuid.UUID]: None, если руководителя у пользователя нет.
+    """
+    manager_id = manager_routes.get(user_id, level)
+    if manager_id is None:
+        manager_id = (await db.execute(
+            select(OrgClosure.ancestor_id)
+            .where(OrgClosure.descendant_id == user_id, OrgClosure.depth <= level)
+            .order_by(OrgClosure.depth.desc())
+            .limit(1)
+        )).scalar_one_or_none()
+        if manager_id is not None:
+            manager_routes.put(user_id, level, manager_id)
+    return manager_id
+
+
+async def get_managers(db: AsyncSession, user_id: uuid.UUID) -> List[uuid.UUID]:
+    """
+    Цепочка руководителей пользователя снизу вверх.
+    """
+    result = await db.execute(
+        select(OrgClosure.ancestor_id).where(OrgClosure.descendant_id == user_id).order_by(OrgClosure.depth)
+    )
+    return list(result.scalars())
+
+
+async def get_subordinates(
+    db: AsyncSession, user_id: uuid.UUID, max_depth: Optional[int] = None, skip: int = 0, limit: int = 100
+) -> List[Tuple[uuid.UUID, int]]:
+    """
+    Подчиненные пользователя (прямые и косвенные) с уровнем подчинения,
+    ближние первыми.
+    """
+    query = select(OrgClosure.descendant_id, OrgClosure.depth).where(OrgClosure.ancestor_id == user_id)
+    if max_depth is not None:
+        query = query.where(OrgClosure.depth <= max_depth)
+    result = await db.execute(
+        query.order_by(OrgClosure.depth, OrgClosure.descendant_id).offset(skip).limit(limit)
+    )
+    return [(row.descendant_id, row.depth) for row in result]
+
+
+async def _move_subtree(db: AsyncSession, user_id: uuid.UUID, manager_id: Optional[uuid.UUID]) -> None:
+    # Пути от прежних руководителей к поддереву удаляются, от новых — добавляются
+    # декартовым произведением «новый руководитель и его цепочка» × «поддерево»
+    subtree = select(OrgClosure.descendant_id).where(OrgClosure.ancestor_id == user_id)
+    await db.execute(
+        delete(OrgClosure)
+        .where(
+            or_(OrgClosure.descendant_id == user_id, OrgClosure.descendant_id.in_(subtree)),
+            OrgClosure.ancestor_id != user_id,
+            OrgClosure.ancestor_id.not_in(subtree),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    if manager_id is None:
+        return
+    above = union_all(
+        select(literal(manager_id, UUID).label("ancestor_id"), literal(0).label("depth")),
+        select(OrgClosure.ancestor_id, OrgClosure.depth).where(OrgClosure.descendant_id == manager_id),
+    ).subquery()
+    below = union_all(
+        select(literal(user_id, UUID).label("descendant_id"), literal(0).label("depth")),
+        select(OrgClosure.descendant_id, OrgClosure.depth).where(OrgClosure.ancestor_id == user_id),
+    ).subquery()
+    await db.execute(
+        insert(OrgClosure).from_select(
+            ["tenant_id", "ancestor_id", "descendant_id", "depth"],
+            select(
+                literal(tenant_or_default()), above.c.ancestor_id, below.c.descendant_id,
+                above.c.depth + below.c.depth + 1,
+            ).select_from(above.join(below, true())),
+        )
+    )
+
+
+async def _check_no_cycles(db: AsyncSession, tenant: str, moves: Dict[uuid.UUID, Optional[uuid.UUID]]) -> None:
+    # Структура до перемещений ациклична, поэтому цикл может пройти только
+    # через перемещенного пользователя
+    managers = dict((await db.execute(select(User.id, User.manager_id).where(User.tenant_id == tenant))).all())
+    managers.update(moves)
+    for user_id in moves:
+        seen = {user_id}
+        manager_id = managers.get(user_id)
+        while manager_id is not None:
+            if manager_id in seen:
+                raise ValueError(f"Перемещение {user_id} замыкает цепочку руководителей в цикл.")
+            seen.add(manager_id)
+            manager_id = managers.get(manager_id)
+
+
+async def reorganize(db: AsyncSession, moves: Dict[uuid.UUID, Optional[uuid.UUID]]) -> int:
+    """
+    Назначает пользователям новых руководителей (None — вершина структуры)
+    в одной транзакции. Небольшие изменения переносят поддеревья в таблице
+    замыкания; начиная с ORG_REBUILD_THRESHOLD перемещений таблица тенанта
+    пересобирается одним запросом. Реорганизации тенанта выполняются по
+    очереди.
+
+    Returns:
+        int: Число пользователей, у которых сменился руководитель.
+
+    Raises:
+        ValueError: Если пользователя нет, он назначен руководителем сам
+            себе или перемещение создает цикл.
+    """
+    if any(user_id == manager_id for user_id, manager_id in moves.items()):
+        raise ValueError("Пользователь не может быть руководителем сам себе.")
+    requested = set(moves) | {manager_id for manager_id in moves.values() if manager_id is not None}
+    current = dict((await db.execute(
+        select(User.id, User.manager_id).where(User.id.in_(requested))
+    )).all())
+    missing = sorted(str(user_id) for user_id in requested - set(current))
+    if missing:
+        raise ValueError(f"Пользователи не найдены: {', '.join(missing)}.")
+    moves = {user_id: manager_id for user_id, manager_id in moves.items() if current[user_id] != manager_id}
+    if not moves:
+        return 0
+
+    tenant = tenant_or_default()
+    await db.execute(select(func.pg_advisory_xact_lock(func.hashtext(f"org:{tenant}"))))
+    try:
+        if len(moves) >= settings.ORG_REBUILD_THRESHOLD:
+            await _check_no_cycles(db, tenant, moves)
+            await db.execute(
+                update(User), [{"id": user_id, "manager_id": manager_id} for user_id, manager_id in moves.items()]
+            )
+            await db.execute(
+                delete(OrgClosure).where(OrgClosure.tenant_id == tenant).execution_options(synchronize_session=False)
+            )
+            await db.execute(_REBUILD_CLOSURE, {"tenant": tenant})
+        else:
+            for user_id, manager_id in moves.items():
+                if manager_id is not None and (await db.execute(
+                    select(OrgClosure.depth).where(
+                        OrgClosure.ancestor_id == user_id, OrgClosure.descendant_id == manager_id
+                    )
+                )).scalar_one_or_none() is not None:
+                    raise ValueError(f"Перемещение {user_id} замыкает цепочку руководителей в цикл.")
+                await db.execute(update(User).where(User.id == user_id).values(manager_id=manager_id))
+                await _move_subtree(db, user_id, manager_id)
+    except Exception:
+        await db.rollback()
+        raise
+    await db.commit()
+    manager_routes.clear()
+    return len(moves)
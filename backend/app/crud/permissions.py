@@ -0,0 +1,145 @@
+import collections
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import FrozenSet, List, Optional, Tuple
+
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.metrics import AUTH_CACHE
+from app.db.tenancy import tenant_or_default
+from app.models.delegation import Delegation
+from app.models.role import RoleMember
+from app.models.user import User
+
+
+@dataclass(frozen=True)
+class DelegationGrant:
+    """Замещение, по которому пользователь выполняет шаги отсутствующего коллеги."""
+    delegator_id: uuid.UUID
+    template_id: Optional[int]
+    starts_at: datetime
+    ends_at: Optional[datetime]
+
+    def is_active(self, at: datetime) -> bool:
+        return self.starts_at <= at and (self.ends_at is None or at < self.ends_at)
+
+    def covers(self, template_id: Optional[int], at: datetime) -> bool:
+        return self.is_active(at) and self.template_id in (None, template_id)
+
+
+@dataclass(frozen=True)
+class PermissionSet:
+    """
+    Все, от чьего имени пользователь выполняет шаги: он сам, его роли и
+    коллеги, которых он замещает. Проверка шага и фильтр входящих строятся
+    из этого набора без запросов к таблицам ролей и замещений. Замещения
+    хранятся вместе с периодом и проверяются на момент обращения, поэтому
+    начало и конец отсутствия не требуют сбрасывать кэш.
+    """
+    user_id: uuid.UUID
+    role_ids: FrozenSet[int]
+    delegations: Tuple[DelegationGrant, ...] = ()
+
+    def can_act(
+        self,
+        assignee_id: Optional[uuid.UUID],
+        assignee_role_id: Optional[int],
+        template_id: Optional[int] = None,
+        at: Optional[datetime] = None,
+    ) -> bool:
+        if assignee_id is None and assignee_role_id is None:
+            # Шаг без исполнителя может выполнить любой пользователь тенанта
+            return True
+        if assignee_id == self.user_id or assignee_role_id in self.role_ids:
+            return True
+        at = at or datetime.now(timezone.utc)
+        return assignee_id is not None and any(
+            grant.delegator_id == assignee_id and grant.covers(template_id, at) for grant in self.delegations
+        )
+
+    def active_delegations(self, at: Optional[datetime] = None) -> List[DelegationGrant]:
+        at = at or datetime.now(timezone.utc)
+        return [grant for grant in self.delegations if grant.is_active(at)]
+
+
+class PermissionCache:
+    """
+    LRU-кэш наборов прав. Ключ включает `User.permissions_version`, которую
+    увеличивает каждое изменение участников ролей и замещений пользователя:
+    после изменения запись со
+    старой версией больше не запрашивается и вытесняется, а процессам не
+    нужно сообщать друг другу об инвалидации.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: "collections.OrderedDict[Tuple[str, uuid.UUID, int], PermissionSet]" = (
+            collections.OrderedDict()
+        )
+
+    def get(self, user: User) -> Optional[PermissionSet]:
+        key = (tenant_or_default(), user.id, user.permissions_version)
+        permissions = self._entries.get(key)
+        if permissions is not None:
+            self._entries.move_to_end(key)
+        AUTH_CACHE.labels("permissions", "hit" if permissions is not None else "miss").inc()
+        return permissions
+
+    def put(self, user: User, permissions: PermissionSet) -> None:
+        key = (tenant_or_default(), user.id, user.permissions_version)
+        self._entries[key] = permissions
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+permission_cache = PermissionCache(settings.PERMISSION_CACHE_SIZE)
+
+
+async def bump_permissions_version(db: AsyncSession, user_ids) -> None:
+    """
+    Кэшированные наборы прав этих пользователей больше не совпадут по версии.
+    """
+    await db.execute(
+        update(User)
+        .where(User.id.in_(user_ids))
+        .values(permissions_version=User.permissions_version + 1)
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def get_permissions(db: AsyncSession, user: User) -> PermissionSet:
+    """
+    Набор прав пользователя: из кэша или запросами к `role_members` и к
+    незавершенным замещениям, где пользователь — заместитель.
+    """
+    permissions = permission_cache.get(user)
+    if permissions is None:
+        role_ids = (await db.execute(select(RoleMember.role_id).where(RoleMember.user_id == user.id))).scalars()
+        delegations = (await db.execute(
+            select(Delegation).where(
+                Delegation.delegate_id == user.id,
+                or_(func.upper_inf(Delegation.period), func.upper(Delegation.period) > func.now()),
+            )
+        )).scalars()
+        permissions = PermissionSet(
+            user_id=user.id,
+            role_ids=frozenset(role_ids),
+            delegations=tuple(
+                DelegationGrant(
+                    delegator_id=delegation.delegator_id,
+                    template_id=delegation.template_id,
+                    starts_at=delegation.starts_at,
+                    ends_at=delegation.ends_at,
+                )
+                for delegation in delegations
+            ),
+        )
+        permission_cache.put(user, permissions)
+    return permissions
@@ -0,0 +1,94 @@
+import uuid
+from typing import List, Optional
+
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.crud.permissions import bump_permissions_version
+from app.models.role import Role, RoleMember
+from app.models.user import User
+from app.models.workflow import WorkflowStep
+from app.schemas.role import RoleCreate
+
+
+async def create_role(db: AsyncSession, role_in: RoleCreate) -> Role:
+    """
+    Raises:
+        ValueError: Если роль с таким названием уже есть.
+    """
+    existing = await db.execute(select(Role.id).where(Role.name == role_in.name))
+    if existing.scalar_one_or_none() is not None:
+        raise ValueError("Роль с таким названием уже существует.")
+    role = Role(**role_in.model_dump())
+    db.add(role)
+    await db.commit()
+    await db.refresh(role)
+    return role
+
+
+async def get_role(db: AsyncSession, role_id: int) -> Optional[Role]:
+    return await db.get(Role, role_id)
+
+
+async def get_roles(db: AsyncSession) -> List[Role]:
+    result = await db.execute(select(Role).order_by(Role.name))
+    return result.scalars().all()
+
+
+async def get_role_members(db: AsyncSession, role_id: int) -> List[uuid.UUID]:
+    result = await db.execute(
+        select(RoleMember.user_id).where(RoleMember.role_id == role_id).order_by(RoleMember.user_id)
+    )
+    return result.scalars().all()
+
+
+async def add_role_members(db: AsyncSession, role: Role, user_ids: List[uuid.UUID]) -> None:
+    """
+    Добавляет участников роли; уже состоящие в ней пропускаются.
+
+    Raises:
+        ValueError: Если пользователей нет.
+    """
+    requested = set(user_ids)
+    found = set((await db.execute(select(User.id).where(User.id.in_(requested)))).scalars())
+    missing = sorted(str(user_id) for user_id in requested - found)
+    if missing:
+        raise ValueError(f"Пользователи не найдены: {', '.join(missing)}.")
+    added = (await db.execute(
+        insert(RoleMember)
+        .values([{"role_id": role.id, "user_id": user_id, "tenant_id": role.tenant_id} for user_id in requested])
+        .on_conflict_do_nothing()
+        .returning(RoleMember.user_id)
+    )).scalars().all()
+    if added:
+        await bump_permissions_version(db, added)
+    await db.commit()
+
+
+async def remove_role_member(db: AsyncSession, role: Role, user_id: uuid.UUID) -> bool:
+    removed = (await db.execute(
+        delete(RoleMember)
+        .where(RoleMember.role_id == role.id, RoleMember.user_id == user_id)
+        .returning(RoleMember.user_id)
+        .execution_options(synchronize_session=False)
+    )).scalar_one_or_none()
+    if removed is not None:
+        await bump_permissions_version(db, [removed])
+    await db.commit()
+    return removed is not None
+
+
+async def delete_role(db: AsyncSession, role: Role) -> None:
+    """
+    Raises:
+        ValueError: Если роль назначена шагам.
+    """
+    in_use = await db.execute(select(WorkflowStep.id).where(WorkflowStep.assignee_role_id == role.id).limit(1))
+    if in_use.scalar_one_or_none() is not None:
+        raise ValueError("Роль назначена исполнителем шагов, ее нельзя удалить.")
+    members = await get_role_members(db, role.id)
+    await db.delete(role)
+    if members:
+        await bump_permissions_version(db, members)
+    await db.commit()
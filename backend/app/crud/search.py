@@ -0,0 +1,146 @@
+import base64
+import json
+import re
+from typing import List, Optional, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import Float, Integer, and_, cast, func, literal, null, or_, select, union_all
+
+from app.models.workflow import (
+    SEARCH_CONFIGS,
+    WorkflowTemplate,
+    WorkflowInstance,
+    WorkflowHistory,
+    Attachment,
+)
+
+
+# Та же нормализация, что и в генерируемых колонках: `INST-000123` -> `INST 000123`
+_WORD_DASH_DIGIT = re.compile(r"(\w)-(\d)")
+
+Cursor = Tuple[float, str, int]
+
+
+def encode_cursor(rank: float, kind: str, id: int) -> str:
+    """
+    Кодирует позицию последнего результата страницы в непрозрачный курсор.
+    """
+    raw = json.dumps([rank, kind, id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Cursor:
+    """
+    Декодирует курсор, выданный `encode_cursor`.
+
+    Raises:
+        ValueError: Если курсор поврежден.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        rank, kind, id = json.loads(raw)
+        return float(rank), str(kind), int(id)
+    except (ValueError, TypeError) as e:
+        raise ValueError("Некорректный курсор поиска.") from e
+
+
+def _tsquery(query: str):
+    normalized = _WORD_DASH_DIGIT.sub(r"\1 \2", query)
+    tsquery = None
+    for config in SEARCH_CONFIGS:
+        part = func.websearch_to_tsquery(config, normalized)
+        tsquery = part if tsquery is None else tsquery.op("||")(part)
+    return tsquery
+
+
+def _branch(kind: str, model, tsquery, cursor: Optional[Cursor], limit: int, instance_id, template_id, title):
+    matches = select(
+        literal(kind).label("kind"),
+        model.id.label("id"),
+        instance_id.label("instance_id"),
+        template_id.label("template_id"),
+        title.label("title"),
+        cast(func.ts_rank(model.search_vector, tsquery), Float).label("rank"),
+    ).where(model.search_vector.op("@@")(tsquery)).subquery()
+
+    stmt = select(matches)
+    if cursor is not None:
+        # Keyset-пагинация по (rank DESC, kind, id): kind в ветке постоянен,
+        # поэтому сравнение кортежа сводится к простому условию на id.
+        cursor_rank, cursor_kind, cursor_id = cursor
+        if kind > cursor_kind:
+            tie = matches.c.rank == cursor_rank
+        elif kind == cursor_kind:
+            tie = and_(matches.c.rank == cursor_rank, matches.c.id > cursor_id)
+        else:
+            tie = literal(False)
+        stmt = stmt.where(or_(matches.c.rank < cursor_rank, tie))
+
+    # Каждая ветка отдает не больше `limit` лучших строк: глобальный топ
+    # страницы всегда содержится в объединении локальных топов.
+    return stmt.order_by(matches.c.rank.desc(), matches.c.id).limit(limit)
+
+
+async def search_workflow(
+    db: AsyncSession, query: str, limit: int = 20, cursor: Optional[str] = None
+) -> Tuple[List[dict], Optional[str]]:
+    """
+    Ранжированный полнотекстовый поиск по шаблонам, экземплярам, комментариям
+    истории и именам файлов вложений.
+
+    Args:
+        db (AsyncSession): Асинхронная сессия базы данных.
+        query (str): Поисковая строка в синтаксисе websearch (кавычки, `or`, `-`).
+        limit (int): Размер страницы.
+        cursor (Optional[str]): Курсор из предыдущей страницы.
+
+    Returns:
+        Tuple[List[dict], Optional[str]]: Результаты страницы и курсор следующей страницы.
+
+    Raises:
+        ValueError: Если курсор поврежден.
+    """
+    position = decode_cursor(cursor) if cursor else None
+    tsquery = _tsquery(query)
+    fetch = limit + 1
+
+    branches = union_all(
+        _branch(
+            "attachment", Attachment, tsquery, position, fetch,
+            instance_id=Attachment.instance_id,
+            template_id=cast(null(), Integer),
+            title=Attachment.filename,
+        ),
+        _branch(
+            "comment", WorkflowHistory, tsquery, position, fetch,
+            instance_id=WorkflowHistory.instance_id,
+            template_id=cast(null(), Integer),
+            title=WorkflowHistory.comment,
+        ),
+        _branch(
+            "instance", WorkflowInstance, tsquery, position, fetch,
+            instance_id=WorkflowInstance.id,
+            template_id=WorkflowInstance.template_id,
+            title=WorkflowInstance.reference_id,
+        ),
+        _branch(
+            "template", WorkflowTemplate, tsquery, position, fetch,
+            instance_id=cast(null(), Integer),
+            template_id=WorkflowTemplate.id,
+            title=WorkflowTemplate.name,
+        ),
+    ).subquery()
+
+    result = await db.execute(
+        select(branches)
+        .order_by(branches.c.rank.desc(), branches.c.kind, branches.c.id)
+        .limit(fetch)
+    )
+    rows = [dict(row) for row in result.mappings().all()]
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(last["rank"], last["kind"], last["id"])
+    return rows, next_cursor
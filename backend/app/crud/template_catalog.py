@@ -0,0 +1,118 @@
+from collections import Counter
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+
+from app.crud.workflow import check_step_orders, insert_templates
+from app.models.role import Role
+from app.models.user import User
+from app.models.workflow import WorkflowStep, WorkflowTemplate
+from app.schemas.workflow import (
+    CatalogStep,
+    CatalogTemplate,
+    TemplateCatalog,
+    TemplateCatalogImportResult,
+)
+
+
+async def export_template_catalog(db: AsyncSession) -> TemplateCatalog:
+    """
+    Выгружает все шаблоны с черновиками шагов в переносимом формате.
+    """
+    result = await db.execute(
+        select(WorkflowTemplate)
+        .options(
+            selectinload(WorkflowTemplate.steps).selectinload(WorkflowStep.assignee),
+            selectinload(WorkflowTemplate.steps).selectinload(WorkflowStep.assignee_role),
+        )
+        .order_by(WorkflowTemplate.id)
+    )
+    return TemplateCatalog(templates=[
+        CatalogTemplate(
+            name=template.name,
+            description=template.description,
+            steps=[
+                CatalogStep(
+                    name=step.name,
+                    description=step.description,
+                    order=step.order,
+                    assignee_email=step.assignee.email if step.assignee else None,
+                    assignee_role=step.assignee_role.name if step.assignee_role else None,
+                    assignee_manager_level=step.assignee_manager_level,
+                )
+                for step in template.steps
+            ],
+        )
+        for template in result.scalars()
+    ])
+
+
+async def import_template_catalog(db: AsyncSession, catalog: TemplateCatalog) -> TemplateCatalogImportResult:
+    """
+    Загружает каталог шаблонов одной транзакцией: либо создаются все новые
+    шаблоны, либо ни одного. Шаблоны, название которых уже занято, пропускаются,
+    поэтому повторный импорт того же каталога ничего не меняет.
+
+    Raises:
+        ValueError: Если названия в каталоге повторяются, номера шагов шаблона
+            повторяются, исполнитель с указанной почтой или роль не найдены.
+    """
+    repeated = sorted(name for name, count in Counter(t.name for t in catalog.templates).items() if count > 1)
+    if repeated:
+        raise ValueError(f"Названия шаблонов в каталоге повторяются: {', '.join(repeated)}.")
+    for template in catalog.templates:
+        check_step_orders(step.order for step in template.steps)
+        assignees = (
+            (step.assignee_email, step.assignee_role, step.assignee_manager_level) for step in template.steps
+        )
+        if any(sum(bool(assignee) for assignee in step_assignees) > 1 for step_assignees in assignees):
+            raise ValueError(f"У шага шаблона «{template.name}» указано несколько исполнителей.")
+
+    names = [template.name for template in catalog.templates]
+    existing = set()
+    if names:
+        result = await db.execute(select(WorkflowTemplate.name).where(WorkflowTemplate.name.in_(names)))
+        existing = set(result.scalars())
+    new_templates = [template for template in catalog.templates if template.name not in existing]
+
+    # Исполнители всех шаблонов разрешаются одним запросом
+    emails = {step.assignee_email for template in new_templates for step in template.steps if step.assignee_email}
+    users = {}
+    if emails:
+        result = await db.execute(select(User.email, User.id).where(User.email.in_(emails)))
+        users = dict(result.tuples().all())
+    missing = sorted(emails - users.keys())
+    if missing:
+        raise ValueError(f"Исполнители не найдены: {', '.join(missing)}.")
+    role_names = {step.assignee_role for template in new_templates for step in template.steps if step.assignee_role}
+    roles = {}
+    if role_names:
+        result = await db.execute(select(Role.name, Role.id).where(Role.name.in_(role_names)))
+        roles = dict(result.tuples().all())
+    missing = sorted(role_names - roles.keys())
+    if missing:
+        raise ValueError(f"Роли не найдены: {', '.join(missing)}.")
+
+    await insert_templates(db, [
+        (
+            {"name": template.name, "description": template.description},
+            [
+                {
+                    "name": step.name,
+                    "description": step.description,
+                    "order": step.order,
+                    "assignee_id": users.get(step.assignee_email),
+                    "assignee_role_id": roles.get(step.assignee_role),
+                    "assignee_manager_level": step.assignee_manager_level,
+                }
+                for step in template.steps
+            ],
+        )
+        for template in new_templates
+    ])
+    await db.commit()
+    return TemplateCatalogImportResult(
+        created=[template.name for template in new_templates],
+        skipped=[name for name in names if name in existing],
+    )
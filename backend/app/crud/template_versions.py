@@ -0,0 +1,238 @@
+import collections
+import uuid
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple, Union
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, select
+from sqlalchemy.orm import selectinload
+
+from app.core.config import settings
+from app.core.metrics import TEMPLATE_VERSION_CACHE
+from app.db.tenancy import tenant_or_default
+from app.models.workflow import WorkflowStep, WorkflowTemplate, WorkflowTemplateVersion
+from app.schemas.workflow import WorkflowTemplateVersionRead
+
+
+@dataclass(frozen=True)
+class CompiledVersion:
+    """
+    Готовое к использованию представление опубликованной версии: порядок
+    шагов, переходы и сериализованный ответ API.
+    """
+    id: int
+    tenant_id: str
+    template_id: int
+    version: int
+    step_ids: Tuple[int, ...]
+    assignees: Dict[int, Optional[uuid.UUID]]
+    assignee_roles: Dict[int, Optional[int]]
+    manager_levels: Dict[int, Optional[int]]
+    body: bytes
+
+    @property
+    def etag(self) -> str:
+        return f'"tv-{self.id}"'
+
+    def first_step_id(self) -> Optional[int]:
+        return self.step_ids[0] if self.step_ids else None
+
+    def next_step_id(self, step_id: int) -> Optional[int]:
+        """
+        Шаг после `step_id`; None — это был последний шаг.
+
+        Raises:
+            ValueError: Если шаг не принадлежит версии.
+        """
+        position = self.step_ids.index(step_id)
+        return self.step_ids[position + 1] if position + 1 < len(self.step_ids) else None
+
+
+class CompiledVersionCache:
+    """
+    LRU-кэш скомпилированных версий процесса. Версии неизменяемы, поэтому
+    инвалидации нет: размер ограничен только ради памяти. Ключи включают
+    тенант: кэш не должен отдавать версию мимо фильтра тенанта, а ID в
+    разных шардах совпадают.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: "collections.OrderedDict[Tuple[str, Union[int, Tuple[int, int]]], CompiledVersion]" = (
+            collections.OrderedDict()
+        )
+
+    def get(self, key: Union[int, Tuple[int, int]]) -> Optional[CompiledVersion]:
+        key = (tenant_or_default(), key)
+        compiled = self._entries.get(key)
+        if compiled is not None:
+            self._entries.move_to_end(key)
+        TEMPLATE_VERSION_CACHE.labels("hit" if compiled is not None else "miss").inc()
+        return compiled
+
+    def put(self, compiled: CompiledVersion) -> None:
+        # Версия доступна и по ID, и по номеру в пределах шаблона
+        for key in ((compiled.tenant_id, compiled.id), (compiled.tenant_id, (compiled.template_id, compiled.version))):
+            self._entries[key] = compiled
+            self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+compiled_versions = CompiledVersionCache(settings.TEMPLATE_VERSION_CACHE_SIZE)
+
+
+def _compile(version: WorkflowTemplateVersion) -> CompiledVersion:
+    read = WorkflowTemplateVersionRead.model_validate(version)
+    return CompiledVersion(
+        id=version.id,
+        tenant_id=version.tenant_id,
+        template_id=version.template_id,
+        version=version.version,
+        step_ids=tuple(step.id for step in read.steps),
+        assignees={step.id: step.assignee_id for step in read.steps},
+        assignee_roles={step.id: step.assignee_role_id for step in read.steps},
+        manager_levels={step.id: step.assignee_manager_level for step in read.steps},
+        body=read.model_dump_json().encode(),
+    )
+
+
+async def _load_and_compile(db: AsyncSession, *criteria, cache: bool = True) -> Optional[CompiledVersion]:
+    result = await db.execute(
+        select(WorkflowTemplateVersion).options(selectinload(WorkflowTemplateVersion.steps)).where(*criteria)
+    )
+    version = result.scalar_one_or_none()
+    if version is None:
+        return None
+    compiled = _compile(version)
+    if cache:
+        compiled_versions.put(compiled)
+    return compiled
+
+
+async def get_compiled_version(db: AsyncSession, version_id: int) -> Optional[CompiledVersion]:
+    compiled = compiled_versions.get(version_id)
+    if compiled is None:
+        compiled = await _load_and_compile(db, WorkflowTemplateVersion.id == version_id)
+    return compiled
+
+
+async def get_compiled_version_by_number(db: AsyncSession, template_id: int, version: int) -> Optional[CompiledVersion]:
+    compiled = compiled_versions.get((template_id, version))
+    if compiled is None:
+        compiled = await _load_and_compile(
+            db, WorkflowTemplateVersion.template_id == template_id, WorkflowTemplateVersion.version == version
+        )
+    return compiled
+
+
+async def get_latest_version(db: AsyncSession, template_id: int) -> Optional[CompiledVersion]:
+    """
+    Последняя опубликованная версия шаблона. Номер последней версии меняется
+    при публикации, поэтому он читается из базы, а сама версия — из кэша.
+    """
+    latest = (await db.execute(
+        select(func.max(WorkflowTemplateVersion.version)).where(WorkflowTemplateVersion.template_id == template_id)
+    )).scalar_one()
+    if latest is None:
+        return None
+    return await get_compiled_version_by_number(db, template_id, latest)
+
+
+async def list_template_versions(db: AsyncSession, template_id: int) -> List[WorkflowTemplateVersion]:
+    result = await db.execute(
+        select(WorkflowTemplateVersion)
+        .where(WorkflowTemplateVersion.template_id == template_id)
+        .order_by(WorkflowTemplateVersion.version)
+    )
+    return result.scalars().all()
+
+
+async def publish_template_version(
+    db: AsyncSession, template_id: int, published_by_id: uuid.UUID, only_if_unpublished: bool = False,
+    commit: bool = True,
+) -> Optional[CompiledVersion]:
+    """
+    Публикует черновик шаблона как следующую версию: копирует шаги в
+    неизменяемые строки, принадлежащие версии.
+
+    Args:
+        db (AsyncSession): Асинхронная сессия базы данных.
+        template_id (int): ID шаблона.
+        published_by_id (uuid.UUID): Кто публикует.
+        only_if_unpublished (bool): Не публиковать, если у шаблона уже есть
+            версии, а вернуть последнюю (неявная публикация при первом запуске).
+        commit (bool): False — версия только записывается в транзакцию
+            вызывающего, коммит и откат за ним.
+
+    Returns:
+        Optional[CompiledVersion]: Опубликованная версия; None, если шаблона нет.
+
+    Raises:
+        ValueError: Если в черновике нет шагов.
+    """
+    # Блокировка строки шаблона упорядочивает конкурентные публикации:
+    # номера версий идут без пропусков и конфликтов уникальности
+    template = (await db.execute(
+        select(WorkflowTemplate).where(WorkflowTemplate.id == template_id).with_for_update()
+    )).scalar_one_or_none()
+    if template is None:
+        return None
+
+    latest = (await db.execute(
+        select(func.max(WorkflowTemplateVersion.version)).where(WorkflowTemplateVersion.template_id == template_id)
+    )).scalar_one()
+    if latest is not None and only_if_unpublished:
+        if commit:
+            await db.commit()
+        return await get_compiled_version_by_number(db, template_id, latest)
+
+    draft_steps = (await db.execute(
+        select(WorkflowStep)
+        .where(WorkflowStep.template_id == template_id, WorkflowStep.version_id.is_(None))
+        .order_by(WorkflowStep.order, WorkflowStep.id)
+    )).scalars().all()
+    if not draft_steps:
+        if commit:
+            await db.rollback()
+        raise ValueError("Шаблон без шагов нельзя опубликовать.")
+
+    version = WorkflowTemplateVersion(
+        template_id=template_id,
+        version=(latest or 0) + 1,
+        name=template.name,
+        description=template.description,
+        published_by_id=published_by_id,
+    )
+    db.add(version)
+    await db.flush()
+
+    frozen_steps = [
+        WorkflowStep(
+            name=step.name,
+            description=step.description,
+            order=step.order,
+            assignee_id=step.assignee_id,
+            assignee_role_id=step.assignee_role_id,
+            assignee_manager_level=step.assignee_manager_level,
+            template_id=template_id,
+            version_id=version.id,
+        )
+        for step in draft_steps
+    ]
+    db.add_all(frozen_steps)
+    await db.flush()
+    for step in frozen_steps:
+        step.reference_id = f"STEP-{step.id:06d}"
+    version_id = version.id
+    if not commit:
+        await db.flush()
+        # До коммита версия может откатиться, а ее номер — достаться
+        # следующей публикации, поэтому в кэш она не попадает
+        return await _load_and_compile(db, WorkflowTemplateVersion.id == version_id, cache=False)
+    await db.commit()
+
+    return await get_compiled_version(db, version_id)
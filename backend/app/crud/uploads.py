@@ -0,0 +1,238 @@
+import asyncio
+import logging
+import math
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.dialects.postgresql import insert
+
+from app.core.config import settings
+from app.db.sharding import shard_scope
+from app.models.upload import UploadPart, UploadSession
+from app.schemas.upload import UploadSessionCreate, UploadSessionRead
+
+logger = logging.getLogger(__name__)
+
+# Ограничение S3 на число частей одной загрузки
+MAX_PARTS = 10_000
+MEBIBYTE = 1024 * 1024
+
+
+def chunk_size_for(size: int) -> int:
+    """
+    Размер части для файла: UPLOAD_CHUNK_SIZE, а для очень больших файлов —
+    больше, чтобы уложиться в 10 000 частей.
+    """
+    chunk_size = settings.UPLOAD_CHUNK_SIZE
+    if size > chunk_size * MAX_PARTS:
+        chunk_size = math.ceil(size / MAX_PARTS / MEBIBYTE) * MEBIBYTE
+    return chunk_size
+
+
+def _expires_at() -> datetime:
+    return datetime.now(timezone.utc) + timedelta(seconds=settings.UPLOAD_SESSION_TTL_SECONDS)
+
+
+async def create_upload_session(
+    db: AsyncSession, storage, session_in: UploadSessionCreate, created_by_id: uuid.UUID
+) -> UploadSession:
+    """
+    Начинает multipart upload в хранилище и сохраняет сессию.
+
+    Raises:
+        ValueError: Если файл больше UPLOAD_MAX_SIZE.
+    """
+    if session_in.size > settings.UPLOAD_MAX_SIZE:
+        raise ValueError(f"Файл больше {settings.UPLOAD_MAX_SIZE} байт.")
+    object_name = f"{uuid.uuid4()}/{session_in.filename}"
+    upload_id = await storage.create_multipart_upload(object_name, session_in.content_type)
+    upload = UploadSession(
+        object_name=object_name,
+        upload_id=upload_id,
+        filename=session_in.filename,
+        content_type=session_in.content_type,
+        size=session_in.size,
+        chunk_size=chunk_size_for(session_in.size),
+        instance_id=session_in.instance_id,
+        created_by_id=created_by_id,
+        expires_at=_expires_at(),
+    )
+    db.add(upload)
+    await db.commit()
+    return upload
+
+
+async def get_upload_session(db: AsyncSession, session_id: uuid.UUID, user_id: uuid.UUID) -> Optional[UploadSession]:
+    """
+    Действующая сессия пользователя; чужие и истекшие сессии не видны.
+    """
+    result = await db.execute(
+        select(UploadSession).where(
+            UploadSession.id == session_id,
+            UploadSession.created_by_id == user_id,
+            UploadSession.expires_at > func.now(),
+        )
+    )
+    return result.scalar_one_or_none()
+
+
+async def get_received_parts(db: AsyncSession, session_id: uuid.UUID) -> Dict[int, int]:
+    """
+    Returns:
+        Dict[int, int]: Номер принятой части -> ее размер.
+    """
+    result = await db.execute(
+        select(UploadPart.part_number, UploadPart.size).where(UploadPart.session_id == session_id)
+    )
+    return dict(result.tuples().all())
+
+
+def part_count(upload: UploadSession) -> int:
+    return math.ceil(upload.size / upload.chunk_size)
+
+
+def expected_part_size(upload: UploadSession, part_number: int) -> int:
+    return min(upload.chunk_size, upload.size - (part_number - 1) * upload.chunk_size)
+
+
+def describe_upload(upload: UploadSession, parts: Dict[int, int]) -> UploadSessionRead:
+    missing = [number for number in range(1, part_count(upload) + 1) if number not in parts]
+    # Непрерывно принятый префикс: до первой недостающей части
+    offset = (missing[0] - 1) * upload.chunk_size if missing else upload.size
+    return UploadSessionRead(
+        id=upload.id,
+        filename=upload.filename,
+        content_type=upload.content_type,
+        size=upload.size,
+        chunk_size=upload.chunk_size,
+        offset=offset,
+        missing_offsets=[(number - 1) * upload.chunk_size for number in missing],
+        expires_at=upload.expires_at,
+    )
+
+
+async def put_part(db: AsyncSession, storage, upload: UploadSession, offset: int, data: bytes) -> None:
+    """
+    Принимает часть, начинающуюся со смещения `offset`. Части независимы:
+    их можно отправлять параллельно и в любом порядке, повторная отправка
+    части заменяет ее.
+
+    Raises:
+        ValueError: Если смещение не на границе части или размер части не тот.
+    """
+    if offset < 0 or offset >= upload.size or offset % upload.chunk_size:
+        raise ValueError(f"Смещение должно быть кратно {upload.chunk_size} и меньше {upload.size}.")
+    part_number = offset // upload.chunk_size + 1
+    expected = expected_part_size(upload, part_number)
+    if len(data) != expected:
+        raise ValueError(f"Часть со смещением {offset} должна быть размером {expected} байт.")
+
+    etag = await storage.upload_part(upload.object_name, upload.upload_id, part_number, data)
+    statement = insert(UploadPart).values(session_id=upload.id, part_number=part_number, etag=etag, size=len(data))
+    await db.execute(statement.on_conflict_do_update(
+        index_elements=[UploadPart.session_id, UploadPart.part_number],
+        set_={"etag": statement.excluded.etag, "size": statement.excluded.size},
+    ))
+    await db.execute(update(UploadSession).where(UploadSession.id == upload.id).values(expires_at=_expires_at()))
+    await db.commit()
+
+
+async def complete_upload(db: AsyncSession, storage, upload: UploadSession) -> None:
+    """
+    Удаляет сессию, собирает объект из частей в хранилище и коммитит
+    транзакцию вместе с записью о вложении, которую вызывающий добавил до
+    этого. Если хранилище не соберет объект, транзакция откатывается и
+    сессия остается. Если процесс упадет после сборки, но до коммита,
+    сессия истечет, а собранный объект без записи удалит обход бакета.
+
+    Raises:
+        ValueError: Если приняты не все части.
+    """
+    result = await db.execute(
+        select(UploadPart.part_number, UploadPart.etag)
+        .where(UploadPart.session_id == upload.id)
+        .order_by(UploadPart.part_number)
+    )
+    parts = result.tuples().all()
+    if len(parts) != part_count(upload):
+        received = {number for number, _ in parts}
+        missing = [
+            (number - 1) * upload.chunk_size for number in range(1, part_count(upload) + 1) if number not in received
+        ]
+        raise ValueError(f"Не приняты части со смещениями: {', '.join(map(str, missing[:20]))}.")
+
+    await db.delete(upload)
+    await db.flush()
+    await storage.complete_multipart_upload(upload.object_name, upload.upload_id, parts)
+    await db.commit()
+
+
+async def abort_upload(db: AsyncSession, storage, upload: UploadSession) -> None:
+    await storage.abort_multipart_upload(upload.object_name, upload.upload_id)
+    await db.delete(upload)
+    await db.commit()
+
+
+async def remove_abandoned_uploads(db: AsyncSession, storage, batch_size: int = 100) -> int:
+    """
+    Удаляет истекшие сессии вместе с их частями в хранилище, а также
+    multipart upload без сессии (сессия не сохранилась из-за сбоя), начатые
+    дольше UPLOAD_SESSION_TTL_SECONDS назад.
+
+    Returns:
+        int: Сколько загрузок прервано.
+    """
+    # SKIP LOCKED: воркеры, запустившие очистку одновременно, делят сессии между собой
+    expired = (await db.execute(
+        select(UploadSession)
+        .where(UploadSession.expires_at <= func.now())
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )).scalars().all()
+    for upload in expired:
+        # Загрузку, собранную перед сбоем до коммита вложения, прервать уже
+        # нельзя: ее объект не упомянут ни в сессии, ни во вложении, и его
+        # удаляет обход бакета (attachment_gc.remove_orphaned_objects)
+        try:
+            await storage.abort_multipart_upload(upload.object_name, upload.upload_id)
+        except Exception:
+            logger.exception("Failed to abort multipart upload %s", upload.upload_id)
+    if expired:
+        await db.execute(delete(UploadSession).where(UploadSession.id.in_([upload.id for upload in expired])))
+    await db.commit()
+
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=settings.UPLOAD_SESSION_TTL_SECONDS)
+    stale = await storage.list_multipart_uploads(cutoff)
+    orphans = 0
+    if stale:
+        known = set((await db.execute(
+            select(UploadSession.upload_id).where(UploadSession.upload_id.in_([upload_id for _, upload_id in stale]))
+        )).scalars())
+        for object_name, upload_id in stale:
+            if upload_id not in known:
+                await storage.abort_multipart_upload(object_name, upload_id)
+                orphans += 1
+    return len(expired) + orphans
+
+
+async def purge_expired_uploads(interval: float) -> None:
+    """
+    Фоновая задача: прерывает брошенные загрузки.
+    """
+    from app.core.minio_client import minio_client
+    from app.db.session import shard_router
+
+    while True:
+        await asyncio.sleep(interval)
+        for shard in shard_router.shards.values():
+            try:
+                with shard_scope(shard):
+                    async with shard.session_factory() as db:
+                        removed = await remove_abandoned_uploads(db, minio_client)
+                if removed:
+                    logger.info("Aborted %s abandoned uploads in shard %s", removed, shard.name)
+            except Exception:
+                logger.exception("Failed to purge abandoned uploads in shard %s", shard.name)
@@ -1,8 +1,9 @@
-from typing import List, Optional
+from datetime import datetime
+from typing import Iterable, List, Optional, Tuple
 import uuid
 
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_, delete
+from sqlalchemy import select, and_, delete, func, insert, or_, update
 from sqlalchemy.orm import selectinload
 
 from app.models.workflow import (
@@ -12,7 +13,19 @@ from app.models.workflow import (
     WorkflowHistory,
     Attachment,
 )
+from app.models.role import Role
+from app.models.upload import UploadSession
 from app.models.user import User
+from app.core.tracing import start_span
+from app.crud.changes import record_tombstones
+from app.crud.org import resolve_manager
+from app.crud.permissions import PermissionSet, get_permissions
+from app.crud.template_versions import (
+    get_compiled_version,
+    get_compiled_version_by_number,
+    get_latest_version,
+    publish_template_version,
+)
 from app.schemas.workflow import (
     WorkflowTemplateCreate,
     WorkflowStepCreate,
@@ -22,26 +35,126 @@ from app.schemas.workflow import (
 )
 
 
+# Опции загрузки, покрывающие все вложенные поля схем ответа. Без них Pydantic
+# при сериализации обращается к ленивым связям, что в async-сессии падает с
+# MissingGreenlet, а в синхронной превратилось бы в N+1 запросов.
+TEMPLATE_READ_OPTIONS = (
+    selectinload(WorkflowTemplate.steps).selectinload(WorkflowStep.assignee),
+)
+
+INSTANCE_READ_OPTIONS = (
+    selectinload(WorkflowInstance.template)
+    .selectinload(WorkflowTemplate.steps)
+    .selectinload(WorkflowStep.assignee),
+    selectinload(WorkflowInstance.current_step).selectinload(WorkflowStep.assignee),
+    selectinload(WorkflowInstance.created_by),
+    selectinload(WorkflowInstance.history).selectinload(WorkflowHistory.user),
+    selectinload(WorkflowInstance.history)
+    .selectinload(WorkflowHistory.step)
+    .selectinload(WorkflowStep.assignee),
+    selectinload(WorkflowInstance.attachments).selectinload(Attachment.uploaded_by),
+)
+
+
 # --- CRUD для WorkflowTemplate ---
+def check_step_orders(orders: Iterable[int]) -> None:
+    """
+    Raises:
+        ValueError: Если порядковые номера шагов повторяются.
+    """
+    seen, repeated = set(), set()
+    for order in orders:
+        if order in seen:
+            repeated.add(order)
+        seen.add(order)
+    if repeated:
+        raise ValueError(f"Порядковые номера шагов повторяются: {', '.join(map(str, sorted(repeated)))}.")
+
+
+async def _check_assignees(db: AsyncSession, steps: List[WorkflowStepCreate]) -> None:
+    """
+    Проверяет исполнителей всех шагов: по запросу на пользователей и на роли.
+
+    Raises:
+        ValueError: Если пользователя или роли-исполнителя нет.
+    """
+    requested = {step.assignee_id for step in steps if step.assignee_id}
+    if requested:
+        found = set((await db.execute(select(User.id).where(User.id.in_(requested)))).scalars())
+        missing = sorted(str(user_id) for user_id in requested - found)
+        if missing:
+            raise ValueError(f"Исполнители не найдены: {', '.join(missing)}.")
+    requested_roles = {step.assignee_role_id for step in steps if step.assignee_role_id}
+    if requested_roles:
+        found = set((await db.execute(select(Role.id).where(Role.id.in_(requested_roles)))).scalars())
+        missing = sorted(str(role_id) for role_id in requested_roles - found)
+        if missing:
+            raise ValueError(f"Роли не найдены: {', '.join(missing)}.")
+
+
+async def _allocate_ids(db: AsyncSession, table: str, count: int) -> List[int]:
+    # ID берутся из последовательности заранее, чтобы reference_id вошел в
+    # тот же INSERT, а не дописывался отдельным UPDATE после него
+    if not count:
+        return []
+    result = await db.execute(
+        select(func.nextval(func.pg_get_serial_sequence(table, "id"))).select_from(func.generate_series(1, count))
+    )
+    return sorted(result.scalars())
+
+
+async def insert_templates(db: AsyncSession, templates: List[Tuple[dict, List[dict]]]) -> List[int]:
+    """
+    Вставляет шаблоны с шагами-черновиками двумя многострочными INSERT, без
+    коммита. Данные уже должны быть проверены.
+
+    Args:
+        db (AsyncSession): Асинхронная сессия базы данных.
+        templates (List[Tuple[dict, List[dict]]]): Поля шаблона и поля его шагов.
+
+    Returns:
+        List[int]: ID созданных шаблонов в порядке `templates`.
+    """
+    template_ids = await _allocate_ids(db, "workflow_templates", len(templates))
+    step_ids = iter(await _allocate_ids(db, "workflow_steps", sum(len(steps) for _, steps in templates)))
+
+    template_rows, step_rows = [], []
+    for template_id, (fields, steps) in zip(template_ids, templates):
+        template_rows.append({**fields, "id": template_id, "reference_id": f"TPL-{template_id:06d}"})
+        for step in sorted(steps, key=lambda step: step["order"]):
+            step_id = next(step_ids)
+            step_rows.append({
+                **step, "id": step_id, "reference_id": f"STEP-{step_id:06d}", "template_id": template_id,
+            })
+
+    if template_rows:
+        await db.execute(insert(WorkflowTemplate), template_rows)
+    if step_rows:
+        await db.execute(insert(WorkflowStep), step_rows)
+    return template_ids
+
+
 async def create_workflow_template(
     db: AsyncSession, template_in: WorkflowTemplateCreate
 ) -> WorkflowTemplate:
-    db_template = WorkflowTemplate(**template_in.model_dump())
-    db.add(db_template)
-    await db.commit()
-    await db.refresh(db_template)
-    
-    # Генерируем и сохраняем человеко-читаемый ID
-    db_template.reference_id = f"TPL-{db_template.id:06d}"
-    db.add(db_template)
+    """
+    Создает шаблон вместе с шагами в одной транзакции.
+
+    Raises:
+        ValueError: Если номера шагов повторяются или исполнитель не найден.
+    """
+    check_step_orders(step.order for step in template_in.steps)
+    await _check_assignees(db, template_in.steps)
+    (template_id,) = await insert_templates(db, [(
+        template_in.model_dump(exclude={"steps"}), [step.model_dump() for step in template_in.steps]
+    )])
     await db.commit()
-    await db.refresh(db_template)
 
     # Загружаем шаблон еще раз с шагами для ответа API
     loaded_template = await db.execute(
         select(WorkflowTemplate)
-        .options(selectinload(WorkflowTemplate.steps))
-        .where(WorkflowTemplate.id == db_template.id)
+        .options(*TEMPLATE_READ_OPTIONS)
+        .where(WorkflowTemplate.id == template_id)
     )
     return loaded_template.scalar_one()
 
@@ -52,7 +165,7 @@ async def get_workflow_template(db: AsyncSession, template_id: int) -> Optional[
 
 async def get_workflow_templates(db: AsyncSession, skip: int = 0, limit: int = 100) -> List[WorkflowTemplate]:
     result = await db.execute(
-        select(WorkflowTemplate).offset(skip).limit(limit)
+        select(WorkflowTemplate).options(*TEMPLATE_READ_OPTIONS).offset(skip).limit(limit)
     )
     return result.scalars().all()
 
@@ -68,6 +181,11 @@ async def get_workflow_template_by_name(db: AsyncSession, name: str) -> Optional
 async def create_workflow_step(
     db: AsyncSession, step_in: WorkflowStepCreate, template_id: int
 ) -> WorkflowStep:
+    """
+    Raises:
+        ValueError: Если исполнитель или роль не найдены.
+    """
+    await _check_assignees(db, [step_in])
     db_step = WorkflowStep(**step_in.model_dump(), template_id=template_id)
     db.add(db_step)
     await db.commit()
@@ -90,7 +208,7 @@ async def get_workflow_steps_by_template(
 ) -> List[WorkflowStep]:
     result = await db.execute(
         select(WorkflowStep)
-        .where(WorkflowStep.template_id == template_id)
+        .where(WorkflowStep.template_id == template_id, WorkflowStep.version_id.is_(None))
         .order_by(WorkflowStep.order)
         .offset(skip)
         .limit(limit)
@@ -99,53 +217,85 @@ async def get_workflow_steps_by_template(
 
 
 # --- CRUD для WorkflowInstance ---
+async def _step_assignee(
+    db: AsyncSession,
+    created_by_id: uuid.UUID,
+    assignee_id: Optional[uuid.UUID],
+    assignee_role_id: Optional[int],
+    manager_level: Optional[int],
+) -> Tuple[Optional[uuid.UUID], Optional[int]]:
+    """
+    Исполнитель, которого экземпляр получает при входе на шаг. Шаг «руководитель
+    инициатора N-го уровня» назначается конкретному руководителю по оргструктуре.
+
+    Raises:
+        ValueError: Если у инициатора нет руководителя.
+    """
+    if manager_level is None:
+        return assignee_id, assignee_role_id
+    manager_id = await resolve_manager(db, created_by_id, manager_level)
+    if manager_id is None:
+        raise ValueError("У инициатора нет руководителя, которому назначен шаг.")
+    return manager_id, None
+
+
 async def create_workflow_instance(
-    db: AsyncSession, instance_in: WorkflowInstanceCreate, created_by_id: uuid.UUID
+    db: AsyncSession, instance_in: WorkflowInstanceCreate, created_by_id: uuid.UUID, commit: bool = True
 ) -> WorkflowInstance:
-    first_step_result = await db.execute(
-        select(WorkflowStep)
-        .where(WorkflowStep.template_id == instance_in.template_id)
-        .order_by(WorkflowStep.order)
-        .limit(1)
+    # Экземпляр закрепляет опубликованную версию. Шаблон, который ни разу не
+    # публиковали, публикуется при первом запуске. С commit=False экземпляр
+    # только записывается в транзакцию вызывающего, коммит и откат — за ним.
+    if instance_in.template_version is not None:
+        version = await get_compiled_version_by_number(db, instance_in.template_id, instance_in.template_version)
+        if version is None:
+            raise LookupError("Версия шаблона не найдена.")
+    else:
+        version = await get_latest_version(db, instance_in.template_id)
+        if version is None:
+            version = await publish_template_version(
+                db, instance_in.template_id, published_by_id=created_by_id, only_if_unpublished=True,
+                commit=commit,
+            )
+
+    first_step_id = version.first_step_id()
+    assignee_id, assignee_role_id = await _step_assignee(
+        db, created_by_id, version.assignees.get(first_step_id),
+        version.assignee_roles.get(first_step_id), version.manager_levels.get(first_step_id),
     )
-    first_step = first_step_result.scalar_one_or_none()
-    if not first_step:
-        raise ValueError("Workflow template must have at least one step.")
-
     db_instance = WorkflowInstance(
         template_id=instance_in.template_id,
+        template_version_id=version.id,
         created_by_id=created_by_id,
-        current_step_id=first_step.id,
+        current_step_id=first_step_id,
+        assignee_id=assignee_id,
+        assignee_role_id=assignee_role_id,
         status="in_progress",
     )
     db.add(db_instance)
-    await db.commit()
-    await db.refresh(db_instance)
+    await db.flush()
 
-    # Генерируем и сохраняем человеко-читаемый ID
+    # Генерируем человеко-читаемый ID
     db_instance.reference_id = f"INST-{db_instance.id:06d}"
-    db.add(db_instance)
-    await db.commit()
-    await db.refresh(db_instance)
-    
+
+    # Вложения привязываются одним UPDATE; все в одной транзакции с экземпляром
     if instance_in.attachment_ids:
-        for att_id in instance_in.attachment_ids:
-            att = await db.get(Attachment, att_id)
-            if att:
-                att.instance_id = db_instance.id
-                db.add(att)
+        attachment_ids = set(instance_in.attachment_ids)
+        attached = await db.execute(
+            update(Attachment)
+            .where(Attachment.id.in_(attachment_ids))
+            .values(instance_id=db_instance.id)
+            .execution_options(synchronize_session=False)
+        )
+        if attached.rowcount != len(attachment_ids):
+            if commit:
+                await db.rollback()
+            raise LookupError("Вложение не найдено.")
+    if commit:
         await db.commit()
-        await db.refresh(db_instance)
 
     loaded_instance = await db.execute(
         select(WorkflowInstance)
-        .options(
-            selectinload(WorkflowInstance.template),
-            selectinload(WorkflowInstance.current_step),
-            selectinload(WorkflowInstance.created_by),
-            selectinload(WorkflowInstance.history),
-            selectinload(WorkflowInstance.attachments),
-        )
+        .options(*INSTANCE_READ_OPTIONS)
         .where(WorkflowInstance.id == db_instance.id)
     )
     return loaded_instance.scalar_one()
@@ -155,6 +305,61 @@ async def get_workflow_instance(db: AsyncSession, instance_id: int) -> Optional[
     return await db.get(WorkflowInstance, instance_id)
 
 
+async def delete_workflow_instance(db: AsyncSession, instance_id: int) -> bool:
+    """
+    Удаляет экземпляр с историей и записями о вложениях (файлы без записей
+    убирает обход бакета). Отметки об удалении для ленты изменений пишутся в
+    той же транзакции.
+
+    Returns:
+        bool: False, если экземпляра нет.
+    """
+    history_ids = (await db.execute(
+        delete(WorkflowHistory).where(WorkflowHistory.instance_id == instance_id).returning(WorkflowHistory.id)
+    )).scalars().all()
+    await db.execute(delete(Attachment).where(Attachment.instance_id == instance_id))
+    await db.execute(update(UploadSession).where(UploadSession.instance_id == instance_id).values(instance_id=None))
+    deleted = (await db.execute(
+        delete(WorkflowInstance).where(WorkflowInstance.id == instance_id).returning(WorkflowInstance.id)
+    )).scalar_one_or_none()
+    if deleted is None:
+        await db.rollback()
+        return False
+    await record_tombstones(db, "history", history_ids)
+    await record_tombstones(db, "instance", [deleted])
+    await db.commit()
+    return True
+
+
+async def get_inbox(
+    db: AsyncSession, permissions: PermissionSet, skip: int = 0, limit: int = 100
+) -> List[WorkflowInstance]:
+    """
+    Экземпляры в работе, текущий шаг которых ждет пользователя, одну из его
+    ролей или коллегу, которого он сейчас замещает. Условие строится из
+    набора прав по колонкам исполнителя экземпляра, поэтому соединений с
+    шагами, ролями и замещениями нет.
+    """
+    assigned = [WorkflowInstance.assignee_id == permissions.user_id]
+    if permissions.role_ids:
+        assigned.append(WorkflowInstance.assignee_role_id.in_(permissions.role_ids))
+    for grant in permissions.active_delegations():
+        if grant.template_id is None:
+            assigned.append(WorkflowInstance.assignee_id == grant.delegator_id)
+        else:
+            assigned.append(and_(
+                WorkflowInstance.assignee_id == grant.delegator_id, WorkflowInstance.template_id == grant.template_id
+            ))
+    result = await db.execute(
+        select(WorkflowInstance)
+        .where(WorkflowInstance.status == "in_progress", or_(*assigned))
+        .order_by(WorkflowInstance.updated_at, WorkflowInstance.id)
+        .offset(skip)
+        .limit(limit)
+    )
+    return result.scalars().all()
+
+
 # --- CRUD для WorkflowHistory ---
 async def create_workflow_history_entry(
     db: AsyncSession,
@@ -195,22 +400,25 @@ async def create_attachment(
     s3_path: str,
     uploaded_by_id: uuid.UUID,
     instance_id: Optional[int] = None,
+    preview_status: Optional[str] = None,
+    commit: bool = True,
 ) -> Attachment:
+    # С commit=False вложение только записывается в транзакцию вызывающего
     db_attachment = Attachment(
         **attachment_in.model_dump(),
         s3_path=s3_path,
         uploaded_by_id=uploaded_by_id,
         instance_id=instance_id,
+        preview_status=preview_status,
     )
     db.add(db_attachment)
-    await db.commit()
-    await db.refresh(db_attachment)
-    
-    # Генерируем и сохраняем человеко-читаемый ID
+    await db.flush()
+
+    # Генерируем человеко-читаемый ID
     db_attachment.reference_id = f"ATT-{db_attachment.id:06d}"
-    db.add(db_attachment)
-    await db.commit()
-    await db.refresh(db_attachment)
+    if commit:
+        await db.commit()
+        await db.refresh(db_attachment)
     return db_attachment
 
 
@@ -231,7 +439,24 @@ async def get_attachments_for_instance(
     return result.scalars().all()
 
 
+async def get_attachment_files(db: AsyncSession, instance_id: int) -> List[Tuple[str, str, datetime]]:
+    """
+    Имя, путь в хранилище и время загрузки всех вложений экземпляра — без
+    ORM-объектов, этого достаточно для сборки архива.
+    """
+    result = await db.execute(
+        select(Attachment.filename, Attachment.s3_path, Attachment.uploaded_at)
+        .where(Attachment.instance_id == instance_id)
+        .order_by(Attachment.uploaded_at, Attachment.id)
+    )
+    return result.tuples().all()
+
+
 async def delete_attachment(db: AsyncSession, attachment_id: int) -> bool:
+    """
+    Удаляет запись о вложении. Файл в хранилище удалит сборка мусора
+    (`app.crud.attachment_gc`), когда на него не останется ссылок.
+    """
     result = await db.execute(
         delete(Attachment).where(Attachment.id == attachment_id)
     )
@@ -250,59 +475,92 @@ async def advance_workflow_instance(
     """
     Основная логика для продвижения рабочего процесса.
     """
+    # Шаги закрепленной версии неизменяемы и берутся из кэша процесса;
+    # экземпляры без версии (созданные до версионирования) идут по черновику
+    version = None
+    if instance.template_version_id is not None:
+        version = await get_compiled_version(db, instance.template_version_id)
+
     # Шаг 1: Проверка разрешений
-    # Убедимся, что текущий шаг назначен этому пользователю (или пока никому не назначен)
-    current_step = await db.get(WorkflowStep, instance.current_step_id)
-    if not current_step:
-        raise ValueError("Экземпляр находится на неверном шаге.")
-    
-    if current_step.assignee_id and current_step.assignee_id != user.id:
+    # Убедимся, что текущий шаг назначен этому пользователю, его роли, замещаемому им коллеге (или пока никому не назначен)
+    if version is not None:
+        if instance.current_step_id not in version.assignees:
+            raise ValueError("Экземпляр находится на неверном шаге.")
+    else:
+        current_step = await db.get(WorkflowStep, instance.current_step_id)
+        if not current_step:
+            raise ValueError("Экземпляр находится на неверном шаге.")
+
+    # Исполнитель скопирован в экземпляр при переходе на шаг; роли и замещения
+    # пользователя нужны, только если шаг назначен не ему, и берутся из кэша прав
+    if instance.assignee_role_id is None and instance.assignee_id in (None, user.id):
+        allowed = True
+    else:
+        allowed = (await get_permissions(db, user)).can_act(
+            instance.assignee_id, instance.assignee_role_id, instance.template_id
+        )
+    if not allowed:
         raise PermissionError("Пользователь не является исполнителем текущего шага.")
 
-    # Шаг 2: Запись в историю
+    # Шаг 2: Логика переходов. Следующий исполнитель определяется до записи в
+    # историю: если его нет в оргструктуре, действие отклоняется целиком
+    next_step_id, next_assignee = None, (None, None)
+    if action == "approve":
+        # Ищем следующий шаг
+        with start_span("workflow.step_scan"):
+            if version is not None:
+                next_step_id = version.next_step_id(instance.current_step_id)
+                if next_step_id:
+                    next_assignee = await _step_assignee(
+                        db, instance.created_by_id, version.assignees.get(next_step_id),
+                        version.assignee_roles.get(next_step_id), version.manager_levels.get(next_step_id),
+                    )
+            else:
+                all_steps = await get_workflow_steps_by_template(db, template_id=instance.template_id)
+                for i, step in enumerate(all_steps):
+                    if step.id == instance.current_step_id:
+                        if i + 1 < len(all_steps):
+                            next_step = all_steps[i+1]
+                            next_step_id = next_step.id
+                            next_assignee = await _step_assignee(
+                                db, instance.created_by_id, next_step.assignee_id,
+                                next_step.assignee_role_id, next_step.assignee_manager_level,
+                            )
+                        break
+
+    # Шаг 3: Запись в историю
     history_entry = WorkflowHistoryCreate(action=action, comment=comment)
-    await create_workflow_history_entry(
-        db, 
-        history_in=history_entry, 
-        instance_id=instance.id, 
-        step_id=instance.current_step_id, 
-        user_id=user.id
-    )
+    with start_span("workflow.history_insert"):
+        await create_workflow_history_entry(
+            db, 
+            history_in=history_entry, 
+            instance_id=instance.id, 
+            step_id=instance.current_step_id, 
+            user_id=user.id
+        )
 
-    # Шаг 3: Логика переходов
     if action == "reject":
         instance.status = "rejected"
+        instance.assignee_id = instance.assignee_role_id = None
     elif action == "approve":
-        # Ищем следующий шаг
-        all_steps = await get_workflow_steps_by_template(db, template_id=instance.template_id)
-        next_step = None
-        for i, step in enumerate(all_steps):
-            if step.id == instance.current_step_id:
-                if i + 1 < len(all_steps):
-                    next_step = all_steps[i+1]
-                break
-        
-        if next_step:
-            instance.current_step_id = next_step.id
+        if next_step_id:
+            instance.current_step_id = next_step_id
+            instance.assignee_id, instance.assignee_role_id = next_assignee
         else:
             # Шагов больше нет, процесс завершен
             instance.status = "approved"
             instance.current_step_id = None
+            instance.assignee_id = instance.assignee_role_id = None
     
     db.add(instance)
     await db.commit()
     await db.refresh(instance)
 
     # Перезагружаем экземпляр со всеми связями для корректного ответа API
-    loaded_instance = await db.execute(
-        select(WorkflowInstance)
-        .options(
-            selectinload(WorkflowInstance.template),
-            selectinload(WorkflowInstance.current_step),
-            selectinload(WorkflowInstance.created_by),
-            selectinload(WorkflowInstance.history).selectinload(WorkflowHistory.user),
-            selectinload(WorkflowInstance.attachments),
+    with start_span("workflow.reload"):
+        loaded_instance = await db.execute(
+            select(WorkflowInstance)
+            .options(*INSTANCE_READ_OPTIONS)
+            .where(WorkflowInstance.id == instance.id)
         )
-        .where(WorkflowInstance.id == instance.id)
-    )
-    return loaded_instance.scalar_one()
+        return loaded_instance.scalar_one()
@@ -0,0 +1,57 @@
+"""
+Применение миграций Alembic под advisory-блокировкой Postgres.
+
+    python -m app.db.migrate
+
+Запускается из entrypoint.sh каждой репликой бэкенда, но миграции выполняет
+только та, что первой взяла блокировку; остальные ждут ее освобождения и
+обнаруживают, что схема уже в `head`.
+"""
+import asyncio
+import logging
+import os
+from pathlib import Path
+
+import asyncpg
+from alembic import command
+from alembic.config import Config
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+BACKEND_DIR = Path(__file__).resolve().parents[2]
+
+# Произвольная, но постоянная для проекта пара ключей pg_advisory_lock
+MIGRATION_LOCK_KEY = (0x736F676C, 1)
+
+
+def alembic_config() -> Config:
+    config = Config(str(BACKEND_DIR / "alembic.ini"))
+    config.set_main_option("script_location", str(BACKEND_DIR / "alembic"))
+    return config
+
+
+async def upgrade_with_lock(database_url: str, revision: str = "head") -> None:
+    """
+    Применяет миграции до `revision`, удерживая сессионную advisory-блокировку.
+
+    Блокировка держится на отдельном соединении и освобождается при его
+    закрытии, в том числе если процесс упал посреди миграции.
+    """
+    conn = await asyncpg.connect(database_url.replace("postgresql+asyncpg://", "postgresql://", 1))
+    try:
+        if not await conn.fetchval("SELECT pg_try_advisory_lock($1, $2)", *MIGRATION_LOCK_KEY):
+            logger.info("Migrations are running in another process, waiting for the lock...")
+            await conn.execute("SELECT pg_advisory_lock($1, $2)", *MIGRATION_LOCK_KEY)
+        # env.py читает адрес базы из окружения
+        os.environ.setdefault("DATABASE_URL", database_url)
+        # env.py запускает свой event loop, поэтому Alembic работает в отдельном потоке
+        await asyncio.to_thread(command.upgrade, alembic_config(), revision)
+    finally:
+        await conn.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(upgrade_with_lock(settings.DATABASE_URL))
@@ -0,0 +1,74 @@
+import math
+import time
+from typing import Optional
+
+from fastapi import Request
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+# Cookie с моментом (unix time), до которого клиент читает с основной базы
+STICKY_COOKIE = "db_primary_until"
+WRITE_METHODS = frozenset({"POST", "PUT", "PATCH", "DELETE"})
+
+
+def wrote_recently(request: Request) -> bool:
+    """
+    Проверяет, не истекло ли окно "прилипания" к основной базе после записи.
+    """
+    value = request.cookies.get(STICKY_COOKIE)
+    if not value:
+        return False
+    try:
+        return float(value) > time.time()
+    except ValueError:
+        return False
+
+
+class SessionRouter:
+    """
+    Выбирает фабрику сессий для запросов на чтение: реплика, если она
+    настроена и клиент недавно ничего не записывал, иначе основная база.
+    """
+    def __init__(
+        self,
+        primary: async_sessionmaker[AsyncSession],
+        replica: Optional[async_sessionmaker[AsyncSession]] = None,
+    ):
+        self.primary = primary
+        self.replica = replica
+
+    def read_factory(self, request: Request) -> async_sessionmaker[AsyncSession]:
+        if self.replica is None or wrote_recently(request):
+            return self.primary
+        return self.replica
+
+
+class ReadYourWritesMiddleware:
+    """
+    ASGI-middleware: после успешного изменяющего запроса выставляет cookie,
+    из-за которой следующие `stickiness` секунд чтения этого клиента идут
+    на основную базу — клиент сразу видит свои изменения, даже если реплика
+    отстает. Cookie, а не память процесса, — чтобы окно работало при
+    нескольких воркерах и инстансах.
+    """
+    def __init__(self, app: ASGIApp, stickiness: float):
+        self.app = app
+        self.stickiness = stickiness
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] not in WRITE_METHODS or self.stickiness <= 0:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_cookie(message: Message) -> None:
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                until = time.time() + self.stickiness
+                cookie = (
+                    f"{STICKY_COOKIE}={until:.3f}; Max-Age={math.ceil(self.stickiness)}; "
+                    "Path=/; HttpOnly; SameSite=Lax"
+                )
+                message["headers"] = list(message.get("headers", [])) + [(b"set-cookie", cookie.encode("latin-1"))]
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookie)
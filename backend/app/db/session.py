@@ -1,13 +1,83 @@
+import os
 from typing import AsyncGenerator
 
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
+from fastapi import Request
+from sqlalchemy import event, exc
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine, async_sessionmaker
 
 from app.core.config import settings
+from app.core.query_stats import instrument_engine
+from app.core.metrics import InstrumentedAsyncQueuePool, instrument_pool
+from app.core.tracing import trace_engine
+from app.db.routing import SessionRouter
+from app.db.sharding import DEFAULT_SHARD, Shard, ShardRouter
 
 
-# Создаем асинхронный движок SQLAlchemy
-# `pool_pre_ping=True` помогает поддерживать соединения активными
-engine = create_async_engine(settings.DATABASE_URL, pool_pre_ping=True)
+def _guard_fork(engine: AsyncEngine) -> None:
+    """
+    Не дает воркеру использовать соединение, открытое в другом процессе
+    (например, если движок был создан в мастере gunicorn до fork): такое
+    соединение отбрасывается пулом, и вместо него открывается новое.
+    """
+    @event.listens_for(engine.sync_engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        connection_record.info["pid"] = os.getpid()
+
+    @event.listens_for(engine.sync_engine, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        if connection_record.info["pid"] != os.getpid():
+            connection_record.dbapi_connection = connection_proxy.dbapi_connection = None
+            raise exc.DisconnectionError(
+                f"Connection record belongs to pid {connection_record.info['pid']}, "
+                f"attempting to check out in pid {os.getpid()}"
+            )
+
+
+def build_engine(url: str, pool_name: str) -> AsyncEngine:
+    """
+    Создает асинхронный движок SQLAlchemy с настройками пула из `Settings`
+    и подключает к нему инструментирование.
+
+    Args:
+        url (str): Адрес базы данных.
+        pool_name (str): Значение метки `pool` в метриках ("primary", "replica", имя шарда).
+    """
+    engine = create_async_engine(
+        url,
+        # `pool_pre_ping=True` помогает поддерживать соединения активными
+        pool_pre_ping=True,
+        poolclass=InstrumentedAsyncQueuePool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        connect_args={
+            # Кэш SQLAlchemy-адаптера и собственный кэш asyncpg
+            "prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+            "statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+        },
+    )
+    _guard_fork(engine)
+    # Считаем запросы, строки и время в БД для каждого HTTP-запроса (заголовок Server-Timing)
+    instrument_engine(engine)
+    # Метрики пула: размер, выданные соединения и время ожидания соединения
+    instrument_pool(engine, pool_name)
+    # Спан на каждый SQL-запрос (только для запросов, попавших в выборку трассировки)
+    trace_engine(engine)
+    return engine
+
+
+def pool_capacity(engine: AsyncEngine) -> int:
+    """
+    Сколько соединений пул движка может выдать одновременно (с переполнением).
+    """
+    return engine.pool.size() + max(engine.pool._max_overflow, 0)
+
+
+engine = build_engine(settings.DATABASE_URL, "primary")
+replica_engine = (
+    build_engine(settings.DATABASE_REPLICA_URL, "replica") if settings.DATABASE_REPLICA_URL else None
+)
 
 # Создаем фабрику сессий. `expire_on_commit=False` предотвращает
 # истечение срока действия объектов после коммита, что удобно для асинхронной работы.
@@ -15,12 +85,52 @@ AsyncSessionLocal = async_sessionmaker(
     bind=engine,
     expire_on_commit=False,
 )
+ReadSessionLocal = (
+    async_sessionmaker(bind=replica_engine, expire_on_commit=False) if replica_engine is not None else None
+)
+
+session_router = SessionRouter(primary=AsyncSessionLocal, replica=ReadSessionLocal)
+
+
+def _build_shard(name: str, config: dict) -> Shard:
+    shard_engine = build_engine(config["database_url"], name)
+    replica = None
+    if config.get("replica_url"):
+        replica = async_sessionmaker(bind=build_engine(config["replica_url"], f"{name}_replica"), expire_on_commit=False)
+    primary = async_sessionmaker(bind=shard_engine, expire_on_commit=False)
+    return Shard(
+        name=name,
+        session_factory=primary,
+        sessions=SessionRouter(primary=primary, replica=replica),
+        bucket=config.get("bucket", settings.MINIO_BUCKET),
+    )
+
+
+shard_router = ShardRouter(
+    [Shard(DEFAULT_SHARD, AsyncSessionLocal, session_router, settings.MINIO_BUCKET)]
+    + [_build_shard(name, config) for name, config in settings.SHARDS.items()],
+    settings.TENANT_SHARDS,
+    hosts=settings.TENANT_HOSTS,
+    require_host=settings.TENANT_REQUIRE_HOST,
+)
 
 
 async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
     """
     Зависимость FastAPI для получения асинхронной сессии базы данных.
     Создает сессию для каждого запроса и гарантирует ее закрытие.
+    Сессия открывается в шарде тенанта запроса (см. `TenantMiddleware`).
+    """
+    async with shard_router.current().session_factory() as session:
+        yield session
+
+
+async def get_read_session(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    """
+    Зависимость FastAPI для обработчиков, которые только читают данные.
+
+    Отдает сессию реплики, если она настроена; сразу после записи того же
+    клиента (см. `ReadYourWritesMiddleware`) — сессию основной базы.
     """
-    async with AsyncSessionLocal() as session:
+    async with shard_router.current().sessions.read_factory(request)() as session:
         yield session
@@ -0,0 +1,141 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional
+
+from jose import jwt  # type: ignore
+from jose.exceptions import JWTError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core.config import settings
+from app.db.routing import SessionRouter
+from app.db.tenancy import DEFAULT_TENANT, TENANT_MAX_LENGTH, tenant_scope
+
+DEFAULT_SHARD = "default"
+
+
+@dataclass
+class Shard:
+    """
+    База данных (с репликой) и бакет, в которых лежат данные группы тенантов.
+    """
+    name: str
+    session_factory: async_sessionmaker[AsyncSession]
+    sessions: SessionRouter
+    bucket: str
+
+    @property
+    def is_default(self) -> bool:
+        return self.name == DEFAULT_SHARD
+
+
+_current_shard: ContextVar[Optional[Shard]] = ContextVar("shard", default=None)
+
+
+def current_shard() -> Optional[Shard]:
+    """
+    Шард текущего запроса (или фоновой задачи, обходящей шарды), иначе None.
+    """
+    return _current_shard.get()
+
+
+@contextmanager
+def shard_scope(shard: Shard) -> Iterator[None]:
+    token = _current_shard.set(shard)
+    try:
+        yield
+    finally:
+        _current_shard.reset(token)
+
+
+class ShardRouter:
+    """
+    Сопоставляет тенантам шарды: большой тенант выносится в свою базу и
+    бакет, не замедляя остальных. Тенанты, не перечисленные в `tenants`,
+    живут в шарде по умолчанию.
+
+    Известны только тенанты из конфигурации: "default", тенанты шардов и
+    тенанты хостов `hosts`, через которые в них регистрируются и входят.
+    """
+    def __init__(self, shards: List[Shard], tenants: Dict[str, str],
+                 hosts: Optional[Dict[str, str]] = None, require_host: bool = False):
+        self.shards = {shard.name: shard for shard in shards}
+        unknown = set(tenants.values()) - set(self.shards)
+        if unknown:
+            raise ValueError(f"Тенанты ссылаются на неизвестные шарды: {', '.join(sorted(unknown))}")
+        self.tenants = tenants
+        self.hosts = {host.lower(): tenant for host, tenant in (hosts or {}).items()}
+        too_long = sorted(t for t in (*tenants, *self.hosts.values()) if len(t) > TENANT_MAX_LENGTH)
+        if too_long:
+            raise ValueError(f"Имена тенантов длиннее {TENANT_MAX_LENGTH} символов: {', '.join(too_long)}")
+        self.require_host = require_host
+        self.default = self.shards[DEFAULT_SHARD]
+
+    def for_tenant(self, tenant: str) -> Shard:
+        return self.shards[self.tenants.get(tenant, DEFAULT_SHARD)]
+
+    def is_known(self, tenant: str) -> bool:
+        return tenant == DEFAULT_TENANT or tenant in self.tenants or tenant in self.hosts.values()
+
+    def for_host(self, host: Optional[str]) -> Optional[str]:
+        """
+        Тенант запроса без токена по хосту; None — хост не обслуживается.
+        """
+        tenant = self.hosts.get((host or "").rsplit(":", 1)[0].lower())
+        if tenant is None and not self.require_host:
+            return DEFAULT_TENANT
+        return tenant
+
+    def current(self) -> Shard:
+        return _current_shard.get() or self.default
+
+
+def _tenant_from_scope(scope: Scope, router: ShardRouter) -> Optional[str]:
+    # Тенант из подписанного токена, без токена — по хосту из конфигурации.
+    # Клиент не выбирает тенант сам, иначе он зарегистрировался бы в чужом
+    host = None
+    for name, value in scope["headers"]:
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() != "bearer":
+                continue
+            try:
+                claims = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+            except JWTError:
+                continue
+            return claims.get("tenant") or DEFAULT_TENANT
+        if name == b"host":
+            host = value.decode("latin-1").strip()
+    return router.for_host(host)
+
+
+class TenantMiddleware:
+    """
+    ASGI-middleware: один раз на запрос определяет тенант (из токена, иначе
+    по хосту из TENANT_HOSTS) и его шард. Сессии БД, хранилище и фильтр ORM
+    берут их из контекста, поэтому обработчики о шардах не знают. Запрос в
+    тенант, которого нет в конфигурации, отклоняется до обработчика.
+    """
+    def __init__(self, app: ASGIApp, router: ShardRouter):
+        self.app = app
+        self.router = router
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        tenant = _tenant_from_scope(scope, self.router)
+        if tenant is None:
+            response = JSONResponse({"detail": "Организация не найдена."}, status_code=404)
+            await response(scope, receive, send)
+            return
+        if not self.router.is_known(tenant):
+            # Токен тенанта, удаленного из конфигурации
+            response = JSONResponse({"detail": "Неизвестная организация."}, status_code=400)
+            await response(scope, receive, send)
+            return
+        scope.setdefault("state", {})["tenant"] = tenant
+        with tenant_scope(tenant), shard_scope(self.router.for_tenant(tenant)):
+            await self.app(scope, receive, send)
@@ -0,0 +1,61 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+from sqlalchemy import Column, String, event
+from sqlalchemy.orm import Session, declared_attr, with_loader_criteria
+
+# Тенант строк, созданных до разделения данных, и запросов без токена
+DEFAULT_TENANT = "default"
+# Длина колонки `tenant_id`
+TENANT_MAX_LENGTH = 64
+
+_current_tenant: ContextVar[Optional[str]] = ContextVar("tenant", default=None)
+
+
+def current_tenant() -> Optional[str]:
+    """
+    Тенант текущего HTTP-запроса или None вне запроса (фоновые задачи,
+    миграции) — тогда запросы не ограничиваются тенантом.
+    """
+    return _current_tenant.get()
+
+
+def tenant_or_default() -> str:
+    return _current_tenant.get() or DEFAULT_TENANT
+
+
+@contextmanager
+def tenant_scope(tenant: Optional[str]) -> Iterator[None]:
+    """
+    Ограничивает запросы ORM внутри блока данными тенанта `tenant`.
+    """
+    token = _current_tenant.set(tenant)
+    try:
+        yield
+    finally:
+        _current_tenant.reset(token)
+
+
+class TenantScoped:
+    """
+    Примесь для таблиц с данными организации. Пока задан тенант, SELECT,
+    UPDATE и DELETE через ORM видят только его строки (включая связанные
+    объекты), а новые строки получают его `tenant_id` — фильтр не нужно
+    повторять в каждом запросе CRUD.
+    """
+    @declared_attr
+    def tenant_id(cls):
+        return Column(String(TENANT_MAX_LENGTH), nullable=False, default=tenant_or_default, server_default=DEFAULT_TENANT)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _restrict_to_tenant(execute_state) -> None:
+    tenant = _current_tenant.get()
+    if tenant is None or execute_state.is_column_load or execute_state.is_relationship_load:
+        # Догрузка колонок и связей наследует условие исходного запроса
+        return
+    if execute_state.is_select or execute_state.is_update or execute_state.is_delete:
+        execute_state.statement = execute_state.statement.options(
+            with_loader_criteria(TenantScoped, lambda cls: cls.tenant_id == tenant, include_aliases=True)
+        )
@@ -1,22 +1,103 @@
-from fastapi import FastAPI, Depends
+import asyncio
+
+from fastapi import FastAPI, Depends, Response, status
+from fastapi.responses import JSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
 from contextlib import asynccontextmanager # NEW
 
-from app.db.session import get_async_session
-from app.api.endpoints import users, auth, workflow # Импортируем наши новые роутеры
+from app.db.session import engine, replica_engine, get_async_session, pool_capacity, shard_router
+from app.api.endpoints import users, auth, workflow, jobs, roles, org, delegations # Импортируем наши новые роутеры
 from app.core.minio_client import minio_client # NEW
+from app.core.query_stats import QueryStatsMiddleware
+from app.core.metrics import MetricsMiddleware, monitor_event_loop_lag, render_metrics
+from app.core.config import settings
+from app.core.tracing import setup_tracing
+from app.core.services import is_ready, log_statuses, services
+from app.core.idempotency import IdempotencyMiddleware, build_store, purge_expired_keys
+from app.core.compression import CompressionMiddleware, build_codecs
+from app.core.admission import AdmissionControlMiddleware, build_limiters
+from app.core.events import build_broker
+from app.core.previews import build_preview_pipeline
+from app.core.jobs import JobWorker
+from app.crud.uploads import purge_expired_uploads
+from app.crud.attachment_gc import collect_attachment_garbage
+from app.db.routing import ReadYourWritesMiddleware
+from app.db.sharding import TenantMiddleware, shard_scope
+
+
+setup_tracing(settings.TRACING_EXPORTER, settings.TRACING_SAMPLE_RATIO)
+
+
+async def _check_database(db_engine) -> None:
+    async with db_engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+
+
+async def _ensure_buckets() -> None:
+    for shard in shard_router.shards.values():
+        with shard_scope(shard):
+            await minio_client.ensure_bucket_exists()
+
+
+services.register("database", check=lambda: _check_database(engine))
+if replica_engine is not None:
+    services.register("database_replica", check=lambda: _check_database(replica_engine))
+for _shard in shard_router.shards.values():
+    if not _shard.is_default:
+        services.register(
+            f"database_{_shard.name}",
+            check=lambda shard=_shard: _check_database(shard.session_factory.kw["bind"]),
+        )
+# Проверка хранилища заодно создает бакеты шардов при первом запуске
+services.register("storage", check=_ensure_buckets)
+if "redis" in (settings.IDEMPOTENCY_BACKEND, settings.EVENTS_BACKEND):
+    def _redis_client():
+        import redis.asyncio as redis
+        return redis.from_url(settings.REDIS_URL)
+
+    services.register("redis", factory=_redis_client, check=lambda: services.get("redis").ping())
+services.register("idempotency_store", factory=build_store)
+services.register("event_broker", factory=build_broker)
+services.register("preview_pipeline", factory=build_preview_pipeline)
+
+
+async def _startup_checks() -> None:
+    log_statuses(await services.check_all(settings.STARTUP_CHECK_TIMEOUT))
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Код, который выполнится при старте приложения
     print("Приложение запускается...")
-    await minio_client.ensure_bucket_exists()
-    print("Бакет в MinIO проверен и готов к работе.")
+    # Зависимости проверяются в фоне и параллельно: сервер начинает принимать
+    # соединения сразу, а пока БД или MinIO недоступны, /health/ready отвечает 503
+    startup_task = asyncio.create_task(_startup_checks())
+    loop_lag_task = asyncio.create_task(monitor_event_loop_lag(settings.EVENT_LOOP_LAG_INTERVAL))
+    purge_task = asyncio.create_task(purge_expired_keys(settings.IDEMPOTENCY_PURGE_INTERVAL))
+    uploads_purge_task = asyncio.create_task(purge_expired_uploads(settings.UPLOAD_PURGE_INTERVAL))
+    attachment_gc_task = asyncio.create_task(collect_attachment_garbage(settings.ATTACHMENT_GC_INTERVAL))
+    # Воркеры всех процессов разбирают общую очередь задач каждого шарда
+    job_workers = [JobWorker(shard) for shard in shard_router.shards.values()] if settings.JOBS_WORKER_ENABLED else []
+    job_worker_tasks = [asyncio.create_task(worker.run()) for worker in job_workers]
     yield
     # Код, который выполнится при остановке приложения
     print("Приложение останавливается...")
+    startup_task.cancel()
+    loop_lag_task.cancel()
+    purge_task.cancel()
+    uploads_purge_task.cancel()
+    attachment_gc_task.cancel()
+    for task in job_worker_tasks:
+        task.cancel()
+    # Прерванные задачи возвращаются в очередь и продолжатся с контрольной точки
+    await asyncio.gather(*(worker.close() for worker in job_workers), return_exceptions=True)
+    # Останавливаем подписку брокера на Redis и закрываем оставшиеся потоки
+    if services.is_created("event_broker"):
+        await services.get("event_broker").close()
+    # Даем начатым превью дописаться и останавливаем процессы рендеринга
+    if services.is_created("preview_pipeline"):
+        await services.get("preview_pipeline").close()
 
 
 app = FastAPI(
@@ -26,10 +107,47 @@ app = FastAPI(
     lifespan=lifespan # NEW
 )
 
+# Порядок: последний добавленный middleware — внешний. Idempotency — самый
+# внутренний, чтобы его SQL попадал в Server-Timing, а повторы — в метрики.
+app.add_middleware(
+    IdempotencyMiddleware,
+    ttl=settings.IDEMPOTENCY_TTL_SECONDS,
+    lock_timeout=settings.IDEMPOTENCY_LOCK_SECONDS,
+    wait_timeout=settings.IDEMPOTENCY_WAIT_SECONDS,
+    max_body_bytes=settings.IDEMPOTENCY_MAX_BODY_BYTES,
+)
+if settings.COMPRESSION_ENABLED:
+    # Снаружи Idempotency: сохраняется несжатый ответ, повтор сжимается под нового клиента
+    app.add_middleware(
+        CompressionMiddleware,
+        codecs=build_codecs(
+            settings.COMPRESSION_GZIP_LEVEL, settings.COMPRESSION_BROTLI_QUALITY, settings.COMPRESSION_ZSTD_LEVEL
+        ),
+        minimum_size=settings.COMPRESSION_MIN_SIZE,
+        offload_size=settings.COMPRESSION_OFFLOAD_SIZE,
+    )
+app.add_middleware(QueryStatsMiddleware)
+if settings.ADMISSION_CONTROL_ENABLED:
+    # Снаружи QueryStats (ожидание в очереди — не время БД), внутри Metrics (отказы видны в метриках)
+    app.add_middleware(
+        AdmissionControlMiddleware,
+        limiters=build_limiters(
+            pool_capacity(engine), pool_capacity(replica_engine) if replica_engine is not None else None
+        ),
+    )
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(ReadYourWritesMiddleware, stickiness=settings.DB_REPLICA_STICKINESS_SECONDS)
+# Самый внешний: все остальные middleware и обработчики работают уже в шарде тенанта
+app.add_middleware(TenantMiddleware, router=shard_router)
+
 # Включаем роутеры в основное приложение
 app.include_router(users.router, prefix="/users", tags=["Пользователи"])
 app.include_router(auth.router, prefix="/auth", tags=["Аутентификация"])
 app.include_router(workflow.router, prefix="/workflow", tags=["Рабочие процессы"]) # Добавил роутер рабочих процессов
+app.include_router(jobs.router, prefix="/jobs", tags=["Фоновые задачи"])
+app.include_router(roles.router, prefix="/roles", tags=["Роли и группы"])
+app.include_router(org.router, prefix="/org", tags=["Оргструктура"])
+app.include_router(delegations.router, prefix="/delegations", tags=["Замещения"])
 
 
 @app.get("/")
@@ -38,6 +156,39 @@ async def read_root():
     return {"status": "ok", "message": "Добро пожаловать в Soglasovach API!"}
 
 
+@app.get("/health/live", include_in_schema=False)
+async def liveness():
+    """Процесс жив и обслуживает event loop. Зависимости не проверяются."""
+    return {"status": "ok"}
+
+
+@app.get("/health/ready", include_in_schema=False)
+async def readiness():
+    """
+    Готовность принимать трафик: все обязательные зависимости доступны.
+    Проверки идут параллельно, ответ не дольше READINESS_CHECK_TIMEOUT.
+    """
+    statuses = await services.check_all(settings.READINESS_CHECK_TIMEOUT)
+    ready = is_ready(statuses)
+    return JSONResponse(
+        status_code=status.HTTP_200_OK if ready else status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={
+            "status": "ok" if ready else "unavailable",
+            "checks": {
+                s.name: {"ok": s.ok, "required": s.required, "duration_ms": s.duration_ms, "error": s.error}
+                for s in statuses
+            },
+        },
+    )
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Метрики в формате Prometheus (при нескольких воркерах агрегируются по всем процессам)."""
+    payload, content_type = render_metrics()
+    return Response(content=payload, media_type=content_type)
+
+
 @app.get("/test-db")
 async def test_db_connection(db: AsyncSession = Depends(get_async_session)):
     """
@@ -0,0 +1,42 @@
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import DateTime, ForeignKey, Index, Integer, Text, func
+from sqlalchemy.dialects.postgresql import TSTZRANGE, Range
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base import Base
+from app.db.tenancy import TenantScoped
+
+
+class Delegation(TenantScoped, Base):
+    """
+    Замещение на время отсутствия: пока `period` содержит текущий момент,
+    `delegate_id` выполняет шаги, назначенные `delegator_id` (только шаблона
+    `template_id`, если он задан). Замещение не передается дальше: заместитель
+    заместителя шаги не получает.
+    """
+    __tablename__ = "delegations"
+    __table_args__ = (
+        # Кто отсутствует в заданный момент или интервал: поиск по пересечению периодов
+        Index("ix_delegations_period", "period", postgresql_using="gist"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    delegator_id = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    delegate_id = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    template_id: Mapped[Optional[int]] = mapped_column(
+        ForeignKey("workflow_templates.id", ondelete="CASCADE"), nullable=True
+    )
+    # Полуоткрытый интервал [начало, конец); без конца — до отмены
+    period: Mapped[Range[datetime]] = mapped_column(TSTZRANGE, nullable=False)
+    comment: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+    @property
+    def starts_at(self) -> datetime:
+        return self.period.lower
+
+    @property
+    def ends_at(self) -> Optional[datetime]:
+        return self.period.upper
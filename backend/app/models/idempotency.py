@@ -0,0 +1,29 @@
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import DateTime, Integer, LargeBinary, String
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base import Base
+
+
+class IdempotencyKey(Base):
+    """
+    Сохраненный ответ на изменяющий запрос с заголовком `Idempotency-Key`.
+
+    Пока запрос выполняется, `status_code` пуст, а `locked_until` ограничивает
+    время, после которого зависшая запись (например, упавший воркер) может
+    быть перехвачена повтором.
+    """
+    __tablename__ = "idempotency_keys"
+
+    # Ключ уникален в пределах пользователя, от которого пришел запрос
+    principal: Mapped[str] = mapped_column(String(64), primary_key=True)
+    key: Mapped[str] = mapped_column(String(255), primary_key=True)
+    request_hash: Mapped[str] = mapped_column(String(64), nullable=False)
+    status_code: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    response_headers: Mapped[Optional[dict]] = mapped_column(JSONB, nullable=True)
+    response_body: Mapped[Optional[bytes]] = mapped_column(LargeBinary, nullable=True)
+    locked_until: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, index=True)
@@ -0,0 +1,45 @@
+import uuid
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import Boolean, DateTime, ForeignKey, Index, Integer, String, Text, text
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base import Base
+from app.db.tenancy import TenantScoped
+
+
+class Job(TenantScoped, Base):
+    """
+    Долгая операция (массовый запуск, выгрузка), которую выполняет фоновый
+    воркер, а не обработчик запроса. Воркер захватывает задачу на
+    `locked_until` и продлевает аренду, пока работает; задачу с истекшей
+    арендой (воркер упал) подхватывает другой и продолжает с `checkpoint`.
+    """
+    __tablename__ = "jobs"
+    __table_args__ = (
+        # Очередь: воркеры выбирают ожидающие задачи в порядке создания
+        Index("ix_jobs_queued", "type", "created_at", postgresql_where=text("status = 'queued'")),
+        Index("ix_jobs_running", "type", "locked_until", postgresql_where=text("status = 'running'")),
+        Index("ix_jobs_tenant_created_by", "tenant_id", "created_by_id", "created_at"),
+    )
+
+    id: Mapped[uuid.UUID] = mapped_column(primary_key=True, default=uuid.uuid4)
+    type: Mapped[str] = mapped_column(String(64), nullable=False)
+    status: Mapped[str] = mapped_column(String(16), nullable=False, default="queued")  # queued, running, succeeded, failed, cancelled
+    params: Mapped[dict] = mapped_column(JSONB, nullable=False, default=dict)
+    processed: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    total: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    # Состояние обработчика, с которого продолжится выполнение после сбоя воркера
+    checkpoint: Mapped[Optional[dict]] = mapped_column(JSONB, nullable=True)
+    result: Mapped[Optional[dict]] = mapped_column(JSONB, nullable=True)
+    error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    cancel_requested: Mapped[bool] = mapped_column(Boolean, nullable=False, default=False)
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    locked_by: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
+    locked_until: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    created_by_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("users.id"), nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=text("now()"))
+    started_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    finished_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
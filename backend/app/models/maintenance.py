@@ -0,0 +1,19 @@
+from datetime import datetime
+
+from sqlalchemy import DateTime, String, text
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base import Base
+
+
+class MaintenanceCursor(Base):
+    """
+    Позиция фоновой задачи, которая обходит большой набор данных частями:
+    после перезапуска обход продолжается с нее, а не с начала. Строка
+    блокируется на время шага, поэтому шаг выполняет только один воркер.
+    """
+    __tablename__ = "maintenance_cursors"
+
+    name: Mapped[str] = mapped_column(String, primary_key=True)
+    value: Mapped[str] = mapped_column(String, nullable=False, server_default="")
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=text("now()"))
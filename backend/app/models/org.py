@@ -0,0 +1,24 @@
+from sqlalchemy import ForeignKey, Index, Integer
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base import Base
+from app.db.tenancy import TenantScoped
+
+
+class OrgClosure(TenantScoped, Base):
+    """
+    Таблица замыкания оргструктуры: строка на каждую пару «руководитель —
+    подчиненный» с расстоянием между ними (1 — непосредственный
+    руководитель). Руководитель N-го уровня — одна строка по первичному
+    ключу, все подчиненные — диапазон индекса по `ancestor_id`; рекурсивных
+    обходов при запросах нет.
+    """
+    __tablename__ = "org_closure"
+    __table_args__ = (
+        Index("ix_org_closure_ancestor_depth", "ancestor_id", "depth"),
+    )
+
+    # У пользователя на каждом уровне ровно один руководитель
+    descendant_id = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    depth: Mapped[int] = mapped_column(Integer, primary_key=True)
+    ancestor_id = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
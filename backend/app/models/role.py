@@ -0,0 +1,30 @@
+from typing import Optional
+
+from sqlalchemy import ForeignKey, Integer, String, Text, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base import Base
+from app.db.tenancy import TenantScoped
+
+
+class Role(TenantScoped, Base):
+    """
+    Роль (юрист, финансовый контролер) или группа пользователей. Шаг,
+    назначенный роли, может выполнить любой ее участник.
+    """
+    __tablename__ = "roles"
+    __table_args__ = (
+        UniqueConstraint("tenant_id", "name", name="uq_roles_tenant_name"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    name: Mapped[str] = mapped_column(String(255), nullable=False)
+    kind: Mapped[str] = mapped_column(String(16), nullable=False, default="role")  # role, group
+    description: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+
+
+class RoleMember(TenantScoped, Base):
+    __tablename__ = "role_members"
+
+    role_id: Mapped[int] = mapped_column(ForeignKey("roles.id", ondelete="CASCADE"), primary_key=True)
+    user_id = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), primary_key=True, index=True)
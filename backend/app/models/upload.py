@@ -0,0 +1,44 @@
+import uuid
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import BigInteger, DateTime, ForeignKey, Integer, String, text
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base import Base
+
+
+class UploadSession(Base):
+    """
+    Возобновляемая загрузка файла по частям. Каждой сессии соответствует
+    multipart upload в объектном хранилище: часть N — байты
+    [(N - 1) * chunk_size, N * chunk_size).
+    """
+    __tablename__ = "upload_sessions"
+
+    id: Mapped[uuid.UUID] = mapped_column(primary_key=True, default=uuid.uuid4)
+    object_name: Mapped[str] = mapped_column(String, nullable=False)
+    upload_id: Mapped[str] = mapped_column(String, nullable=False)  # ID multipart upload в хранилище
+    filename: Mapped[str] = mapped_column(String, nullable=False)
+    content_type: Mapped[str] = mapped_column(String, nullable=False)
+    size: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    chunk_size: Mapped[int] = mapped_column(Integer, nullable=False)
+    instance_id: Mapped[Optional[int]] = mapped_column(ForeignKey("workflow_instances.id"), nullable=True)
+    created_by_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("users.id"), nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=text("now()"))
+    # Продлевается каждой принятой частью; брошенные сессии удаляет фоновая задача
+    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, index=True)
+
+
+class UploadPart(Base):
+    """
+    Принятая часть загрузки. Повторная отправка той же части заменяет запись.
+    """
+    __tablename__ = "upload_parts"
+
+    session_id: Mapped[uuid.UUID] = mapped_column(
+        ForeignKey("upload_sessions.id", ondelete="CASCADE"), primary_key=True
+    )
+    part_number: Mapped[int] = mapped_column(Integer, primary_key=True)
+    etag: Mapped[str] = mapped_column(String, nullable=False)
+    size: Mapped[int] = mapped_column(Integer, nullable=False)
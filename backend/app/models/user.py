@@ -1,19 +1,34 @@
 import uuid
-from sqlalchemy import Boolean, String
+from typing import Optional
+
+from sqlalchemy import Boolean, ForeignKey, Integer, String, UniqueConstraint
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import Mapped, mapped_column
 
 from app.db.base import Base
+from app.db.tenancy import TenantScoped
 
 
-class User(Base):
+class User(TenantScoped, Base):
     __tablename__ = "users"
 
     id: Mapped[uuid.UUID] = mapped_column(
         UUID(as_uuid=True), primary_key=True, default=uuid.uuid4
     )
-    email: Mapped[str] = mapped_column(String(320), unique=True, index=True, nullable=False)
+    # Почта уникальна в пределах тенанта
+    email: Mapped[str] = mapped_column(String(320), index=True, nullable=False)
     hashed_password: Mapped[str] = mapped_column(String(1024), nullable=False)
     is_active: Mapped[bool] = mapped_column(Boolean, default=True, nullable=False)
     is_superuser: Mapped[bool] = mapped_column(Boolean, default=False, nullable=False)
     is_verified: Mapped[bool] = mapped_column(Boolean, default=False, nullable=False)
+    # Растет при каждом изменении ролей пользователя и входит в ключ кэша прав:
+    # пользователь загружается в каждом запросе, поэтому устаревшая запись
+    # кэша не используется ни в одном процессе
+    permissions_version: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+    # Непосредственный руководитель. Цепочки руководителей хранятся в
+    # `org_closure` и меняются только через `app.crud.org`
+    manager_id: Mapped[Optional[uuid.UUID]] = mapped_column(ForeignKey("users.id"), nullable=True)
+
+    __table_args__ = (
+        UniqueConstraint("tenant_id", "email", name="uq_users_tenant_email"),
+    )
@@ -1,23 +1,109 @@
 import sqlalchemy as sa
-from sqlalchemy import Column, String, ForeignKey, Integer, DateTime, Text
-from sqlalchemy.orm import relationship
+from sqlalchemy import (
+    BigInteger, Column, Computed, String, ForeignKey, Integer, DateTime, Text, Index, UniqueConstraint,
+)
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import relationship, deferred
 
 from app.db.base import Base
+from app.db.tenancy import TenantScoped
+from app.models.role import Role  # noqa: F401 - цель связи WorkflowStep.assignee_role
 from app.models.user import User
 
 
-class WorkflowTemplate(Base):
+# Конфигурации полнотекстового поиска: документы и комментарии пишутся
+# на русском и английском, поэтому каждый текст индексируется в обеих.
+SEARCH_CONFIGS = ("russian", "english")
+
+
+def tsvector_expression(*weighted_columns: tuple[str, str]) -> str:
+    """
+    Строит SQL-выражение для генерируемой колонки `search_vector`.
+
+    Дефис между словом и числом (`INST-000123`) заменяется пробелом, иначе
+    парсер Postgres превращает `-000123` в отрицательное число и поиск по
+    номеру перестает находить документ.
+
+    Args:
+        weighted_columns: Пары (имя колонки, вес A-D).
+
+    Returns:
+        str: Выражение для `Computed(...)`.
+    """
+    parts = []
+    for column, weight in weighted_columns:
+        text = f"regexp_replace(coalesce({column}, ''), '(\\w)-(\\d)', '\\1 \\2', 'g')"
+        for config in SEARCH_CONFIGS:
+            parts.append(f"setweight(to_tsvector('{config}'::regconfig, {text}), '{weight}')")
+    return " || ".join(parts)
+
+
+# Номер транзакции (xid8), последней изменившей строку. Лента изменений
+# (`/workflow/changes`) отдает только строки транзакций старше самой старой
+# активной (pg_snapshot_xmin): такие строки уже не изменятся задним числом,
+# поэтому транзакция, закоммиченная позже соседних, не окажется позади
+# выданного клиенту токена. При вставке значение дает DEFAULT, при
+# обновлении — onupdate колонки (его подставляют и ORM, и update()).
+# Триггеры не используются (dev/tech_design_document.md, 3.3).
+CHANGE_SEQ = sa.text("pg_current_xact_id()::text::bigint")
+
+
+class WorkflowTemplate(TenantScoped, Base):
     __tablename__ = "workflow_templates"
 
     id = Column(Integer, primary_key=True, index=True)
     reference_id = Column(String, unique=True, index=True, nullable=True) # e.g., TPL-00001
-    name = Column(String, nullable=False, unique=True)
+    name = Column(String, nullable=False)
+    description = Column(Text)
+    # Поисковый вектор поддерживается самим Postgres (STORED generated column),
+    # поэтому синхронизация при записи не требует триггеров и кода в CRUD.
+    search_vector = deferred(Column(
+        TSVECTOR, Computed(tsvector_expression(("name", "A"), ("description", "B")), persisted=True)
+    ))
+
+    # Черновик: шаги без версии. Опубликованные копии шагов принадлежат версиям.
+    steps = relationship(
+        "WorkflowStep",
+        primaryjoin="and_(WorkflowStep.template_id == WorkflowTemplate.id, WorkflowStep.version_id.is_(None))",
+        back_populates="template",
+        cascade="all, delete-orphan",
+    )
+    versions = relationship("WorkflowTemplateVersion", back_populates="template", order_by="WorkflowTemplateVersion.version")
+
+    __table_args__ = (
+        Index("ix_workflow_templates_search_vector", "search_vector", postgresql_using="gin"),
+        # Названия уникальны в пределах тенанта
+        UniqueConstraint("tenant_id", "name", name="uq_workflow_templates_tenant_name"),
+    )
+
+
+class WorkflowTemplateVersion(TenantScoped, Base):
+    """
+    Опубликованная версия шаблона: снимок названия, описания и шагов.
+
+    Версия неизменяема — ее шаги создаются при публикации и больше не
+    редактируются, поэтому скомпилированное представление кэшируется без
+    инвалидации. Экземпляр закрепляет версию и не зависит от правок черновика.
+    """
+    __tablename__ = "workflow_template_versions"
+
+    id = Column(Integer, primary_key=True, index=True)
+    template_id = Column(Integer, ForeignKey("workflow_templates.id"), nullable=False)
+    version = Column(Integer, nullable=False)  # 1, 2, ... в пределах шаблона
+    name = Column(String, nullable=False)
     description = Column(Text)
+    published_at = Column(DateTime(timezone=True), server_default=sa.text('now()'), nullable=False)
+    published_by_id = Column(ForeignKey("users.id"), nullable=False)
 
-    steps = relationship("WorkflowStep", back_populates="template", cascade="all, delete-orphan")
+    template = relationship("WorkflowTemplate", back_populates="versions")
+    steps = relationship("WorkflowStep", order_by="[WorkflowStep.order, WorkflowStep.id]", viewonly=True)
 
+    __table_args__ = (
+        UniqueConstraint("template_id", "version", name="uq_workflow_template_versions_template_version"),
+    )
 
-class WorkflowStep(Base):
+
+class WorkflowStep(TenantScoped, Base):
     __tablename__ = "workflow_steps"
 
     id = Column(Integer, primary_key=True, index=True)
@@ -28,14 +114,19 @@ class WorkflowStep(Base):
 
     template_id = Column(Integer, ForeignKey("workflow_templates.id"), nullable=False)
     template = relationship("WorkflowTemplate", back_populates="steps")
+    # NULL — шаг черновика шаблона; иначе — неизменяемая копия в опубликованной версии
+    version_id = Column(Integer, ForeignKey("workflow_template_versions.id"), nullable=True, index=True)
 
-    # В реальной системе здесь может быть ссылка на роль (Role)
-    # Для простоты пока оставим assignee_id, который может быть null
+    # Исполнитель — пользователь, роль (любой ее участник) или руководитель
+    # инициатора указанного уровня; без всех трех шаг может выполнить любой
     assignee_id = Column(ForeignKey("users.id"), nullable=True)
     assignee = relationship("User")
+    assignee_role_id = Column(ForeignKey("roles.id"), nullable=True)
+    assignee_role = relationship("Role")
+    assignee_manager_level = Column(Integer, nullable=True)
 
 
-class WorkflowInstance(Base):
+class WorkflowInstance(TenantScoped, Base):
     __tablename__ = "workflow_instances"
 
     id = Column(Integer, primary_key=True, index=True)
@@ -43,22 +134,42 @@ class WorkflowInstance(Base):
     status = Column(String, default="in_progress")
 
     template_id = Column(Integer, ForeignKey("workflow_templates.id"), nullable=False)
+    # Экземпляры, созданные до появления версий, идут по шагам черновика (NULL)
+    template_version_id = Column(Integer, ForeignKey("workflow_template_versions.id"), nullable=True)
     current_step_id = Column(Integer, ForeignKey("workflow_steps.id"), nullable=True)
+    # Исполнитель текущего шага, скопированный из шага при переходе: проверка
+    # прав и «входящие» обходятся без соединения с workflow_steps
+    assignee_id = Column(ForeignKey("users.id"), nullable=True)
+    assignee_role_id = Column(ForeignKey("roles.id"), nullable=True)
     created_by_id = Column(ForeignKey("users.id"), nullable=False)
 
     # Добавлены поля created_at и updated_at
     created_at = Column(DateTime(timezone=True), server_default=sa.text('now()'), nullable=False)
     updated_at = Column(DateTime(timezone=True), onupdate=sa.text('now()'), server_default=sa.text('now()'), nullable=False)
+    search_vector = deferred(Column(
+        TSVECTOR, Computed(tsvector_expression(("reference_id", "A")), persisted=True)
+    ))
+    change_seq = Column(BigInteger, server_default=CHANGE_SEQ, onupdate=CHANGE_SEQ, nullable=False)
 
     template = relationship("WorkflowTemplate")
     current_step = relationship("WorkflowStep")
-    created_by = relationship("User")
+    created_by = relationship("User", foreign_keys=[created_by_id])
 
     history = relationship("WorkflowHistory", back_populates="instance", cascade="all, delete-orphan")
     attachments = relationship("Attachment", back_populates="instance", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        Index("ix_workflow_instances_search_vector", "search_vector", postgresql_using="gin"),
+        Index("ix_workflow_instances_tenant_change_seq", "tenant_id", "change_seq", "id"),
+        # Входящие: экземпляры в работе, ожидающие пользователя или одну из его ролей
+        Index("ix_workflow_instances_tenant_assignee", "tenant_id", "assignee_id",
+              postgresql_where=sa.text("status = 'in_progress' AND assignee_id IS NOT NULL")),
+        Index("ix_workflow_instances_tenant_assignee_role", "tenant_id", "assignee_role_id",
+              postgresql_where=sa.text("status = 'in_progress' AND assignee_role_id IS NOT NULL")),
+    )
+
 
-class WorkflowHistory(Base):
+class WorkflowHistory(TenantScoped, Base):
     __tablename__ = "workflow_history"
 
     id = Column(Integer, primary_key=True, index=True)
@@ -69,13 +180,23 @@ class WorkflowHistory(Base):
     instance_id = Column(Integer, ForeignKey("workflow_instances.id"), nullable=False)
     step_id = Column(Integer, ForeignKey("workflow_steps.id"), nullable=False)
     user_id = Column(ForeignKey("users.id"), nullable=False)
+    search_vector = deferred(Column(
+        TSVECTOR, Computed(tsvector_expression(("comment", "B")), persisted=True)
+    ))
+    change_seq = Column(BigInteger, server_default=CHANGE_SEQ, onupdate=CHANGE_SEQ, nullable=False)
 
     instance = relationship("WorkflowInstance", back_populates="history")
     step = relationship("WorkflowStep")
     user = relationship("User")
 
+    __table_args__ = (
+        Index("ix_workflow_history_search_vector", "search_vector", postgresql_using="gin"),
+        Index("ix_workflow_history_tenant_change_seq", "tenant_id", "change_seq", "id"),
+        Index("ix_workflow_history_tenant_instance", "tenant_id", "instance_id"),
+    )
 
-class Attachment(Base):
+
+class Attachment(TenantScoped, Base):
     __tablename__ = "attachments"
 
     id = Column(Integer, primary_key=True, index=True)
@@ -84,10 +205,41 @@ class Attachment(Base):
     s3_path = Column(String, nullable=False, unique=True)
     content_type = Column(String, nullable=False)
     uploaded_at = Column(DateTime(timezone=True), server_default=sa.text('now()'))
+    # SHA-256 содержимого: по нему превью одинаковых файлов строятся один раз
+    content_hash = Column(String(64), nullable=True, index=True)
+    preview_status = Column(String, nullable=True)  # pending | ready | unsupported | failed
 
     instance_id = Column(Integer, ForeignKey("workflow_instances.id"), nullable=True)
     uploaded_by_id = Column(ForeignKey("users.id"), nullable=False)
+    search_vector = deferred(Column(
+        TSVECTOR, Computed(tsvector_expression(("filename", "A")), persisted=True)
+    ))
 
     instance = relationship("WorkflowInstance", back_populates="attachments")
     uploaded_by = relationship("User")
 
+    __table_args__ = (
+        Index("ix_attachments_search_vector", "search_vector", postgresql_using="gin"),
+        Index("ix_attachments_tenant_instance", "tenant_id", "instance_id"),
+        # Для сборки мусора: непривязанные вложения по возрасту
+        Index("ix_attachments_unlinked_uploaded_at", "uploaded_at", postgresql_where=sa.text("instance_id IS NULL")),
+    )
+
+
+
+class WorkflowTombstone(TenantScoped, Base):
+    """
+    Запись об удалении экземпляра или записи истории для ленты изменений.
+    Пишется CRUD-функцией удаления в той же транзакции, что и DELETE.
+    """
+    __tablename__ = "workflow_tombstones"
+
+    id = Column(BigInteger, primary_key=True)
+    entity = Column(String, nullable=False)  # instance | history
+    entity_id = Column(Integer, nullable=False)
+    change_seq = Column(BigInteger, server_default=CHANGE_SEQ, nullable=False)
+    deleted_at = Column(DateTime(timezone=True), server_default=sa.text('now()'), nullable=False)
+
+    __table_args__ = (
+        Index("ix_workflow_tombstones_tenant_change_seq", "tenant_id", "change_seq", "id"),
+    )
@@ -0,0 +1,36 @@
+import uuid
+from datetime import datetime
+from typing import Optional
+
+from pydantic import AwareDatetime, BaseModel, ConfigDict, Field, model_validator
+
+
+class DelegationCreate(BaseModel):
+    delegate_id: uuid.UUID = Field(..., description="Кто выполняет шаги на время отсутствия")
+    delegator_id: Optional[uuid.UUID] = Field(
+        None,
+        description="Кого замещают; по умолчанию — текущий пользователь. Замещение другого сотрудника заводит администратор",
+    )
+    template_id: Optional[int] = Field(None, description="Только шаги этого шаблона; без него — все шаги")
+    starts_at: AwareDatetime = Field(..., description="Начало отсутствия")
+    ends_at: Optional[AwareDatetime] = Field(None, description="Конец отсутствия (не включительно); без него — до отмены")
+    comment: Optional[str] = Field(None, description="Причина: отпуск, командировка")
+
+    @model_validator(mode="after")
+    def check_period(self):
+        if self.ends_at is not None and self.ends_at <= self.starts_at:
+            raise ValueError("Конец замещения должен быть позже начала.")
+        return self
+
+
+class DelegationRead(BaseModel):
+    id: int
+    delegator_id: uuid.UUID
+    delegate_id: uuid.UUID
+    template_id: Optional[int] = None
+    starts_at: datetime
+    ends_at: Optional[datetime] = None
+    comment: Optional[str] = None
+    created_at: datetime
+
+    model_config = ConfigDict(from_attributes=True)
@@ -0,0 +1,27 @@
+import uuid
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from pydantic import BaseModel, ConfigDict, Field
+
+
+class JobCreate(BaseModel):
+    type: str = Field(..., description="Тип задачи: bulk_launch, template_export")
+    params: Dict[str, Any] = Field(default_factory=dict, description="Параметры; схема зависит от типа задачи")
+
+
+class JobRead(BaseModel):
+    id: uuid.UUID
+    type: str
+    status: str = Field(..., description="Статус: queued, running, succeeded, failed, cancelled")
+    processed: int = Field(..., description="Сколько единиц работы выполнено")
+    total: Optional[int] = Field(None, description="Сколько всего единиц работы, если известно")
+    result: Optional[Dict[str, Any]] = Field(None, description="Результат успешно завершенной задачи")
+    error: Optional[str] = Field(None, description="Причина неудачи")
+    cancel_requested: bool = Field(..., description="Запрошена отмена; выполняющаяся задача остановится в ближайшее время")
+    attempts: int = Field(..., description="Сколько раз воркеры брались за задачу")
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    model_config = ConfigDict(from_attributes=True)
@@ -0,0 +1,32 @@
+import uuid
+from typing import List, Optional
+
+from pydantic import BaseModel, Field
+
+
+class ManagerAssign(BaseModel):
+    manager_id: Optional[uuid.UUID] = Field(None, description="Непосредственный руководитель; null — вершина структуры")
+
+
+class ManagerMove(ManagerAssign):
+    user_id: uuid.UUID
+
+
+class OrgReorganization(BaseModel):
+    moves: List[ManagerMove] = Field(
+        ..., min_length=1, max_length=100_000, description="Новые руководители; применяются в одной транзакции"
+    )
+
+
+class OrgReorganizationResult(BaseModel):
+    moved: int = Field(..., description="Сколько пользователей сменили руководителя")
+
+
+class OrgManagers(BaseModel):
+    user_id: uuid.UUID
+    manager_ids: List[uuid.UUID] = Field(..., description="Руководители снизу вверх: первый — непосредственный")
+
+
+class OrgSubordinate(BaseModel):
+    user_id: uuid.UUID
+    depth: int = Field(..., description="Уровень подчинения: 1 — прямой подчиненный")
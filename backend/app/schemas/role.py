@@ -0,0 +1,20 @@
+import uuid
+from typing import List, Literal, Optional
+
+from pydantic import BaseModel, ConfigDict, Field
+
+
+class RoleCreate(BaseModel):
+    name: str = Field(..., min_length=1, max_length=255, description="Название роли или группы")
+    kind: Literal["role", "group"] = Field("role", description="role — должность или полномочие, group — группа")
+    description: Optional[str] = Field(None, description="Описание")
+
+
+class RoleRead(RoleCreate):
+    id: int
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class RoleMembers(BaseModel):
+    user_ids: List[uuid.UUID] = Field(..., description="Участники роли")
@@ -0,0 +1,23 @@
+import uuid
+from datetime import datetime
+from typing import List, Optional
+
+from pydantic import BaseModel, Field
+
+
+class UploadSessionCreate(BaseModel):
+    filename: str = Field(..., description="Имя файла")
+    content_type: str = Field("application/octet-stream", description="Тип контента файла (MIME-тип)")
+    size: int = Field(..., gt=0, description="Полный размер файла в байтах")
+    instance_id: Optional[int] = Field(None, description="ID экземпляра, к которому относится вложение")
+
+
+class UploadSessionRead(BaseModel):
+    id: uuid.UUID
+    filename: str
+    content_type: str
+    size: int
+    chunk_size: int = Field(..., description="Размер части; все части, кроме последней, ровно такого размера")
+    offset: int = Field(..., description="Сколько байт от начала файла принято без пропусков")
+    missing_offsets: List[int] = Field(..., description="Смещения частей, которые еще не приняты")
+    expires_at: datetime = Field(..., description="Когда сессия будет удалена, если не придут новые части")
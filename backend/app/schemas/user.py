@@ -28,6 +28,7 @@ class UserRead(UserBase):
     is_active: bool = Field(default=..., example=True, description="Активен ли пользователь")
     is_superuser: bool = Field(default=..., example=False, description="Является ли пользователь суперадмином")
     is_verified: bool = Field(default=..., example=False, description="Подтвердил ли пользователь свою почту")
+    tenant_id: str = Field(default=..., example="default", description="Организация (тенант) пользователя")
 
     model_config = ConfigDict(from_attributes=True)
 
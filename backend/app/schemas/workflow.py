@@ -1,9 +1,13 @@
+import uuid
 from datetime import datetime
-from typing import Optional, List
-from pydantic import BaseModel, Field, ConfigDict
+from typing import Literal, Optional, List
+from pydantic import BaseModel, Field, ConfigDict, model_validator
 
 from app.schemas.user import UserRead
 
+# Глубже в оргструктуре согласующих не ищут
+MAX_MANAGER_LEVEL = 10
+
 
 # --- WorkflowTemplate Schemas ---
 class WorkflowTemplateBase(BaseModel):
@@ -12,7 +16,9 @@ class WorkflowTemplateBase(BaseModel):
 
 
 class WorkflowTemplateCreate(WorkflowTemplateBase):
-    pass
+    steps: List["WorkflowStepCreate"] = Field(
+        default_factory=list, description="Шаги шаблона: создаются вместе с ним в одной транзакции"
+    )
 
 
 class WorkflowTemplateRead(WorkflowTemplateBase):
@@ -28,14 +34,23 @@ class WorkflowStepBase(BaseModel):
     name: str = Field(..., description="Название шага рабочего процесса")
     description: Optional[str] = Field(None, description="Описание шага")
     order: int = Field(..., ge=0, description="Порядковый номер шага в шаблоне")
-    # `assignee_id` теперь int, так как ID пользователя в `User` - UUID.
-    # Это нужно будет учесть при реализации ролей, а пока оставим так.
-    # В реальном приложении здесь была бы ссылка на `role_id` (int).
-    assignee_id: Optional[str] = Field(None, description="ID пользователя, ответственного за шаг")
+    assignee_id: Optional[uuid.UUID] = Field(None, description="ID пользователя, ответственного за шаг")
+    assignee_role_id: Optional[int] = Field(
+        None, description="ID роли или группы: шаг может выполнить любой ее участник"
+    )
+    assignee_manager_level: Optional[int] = Field(
+        None, ge=1, le=MAX_MANAGER_LEVEL,
+        description="Шаг выполняет руководитель инициатора этого уровня: 1 — непосредственный",
+    )
 
 
 class WorkflowStepCreate(WorkflowStepBase):
-    pass
+    @model_validator(mode="after")
+    def check_single_assignee(self):
+        assignees = (self.assignee_id, self.assignee_role_id, self.assignee_manager_level)
+        if sum(assignee is not None for assignee in assignees) > 1:
+            raise ValueError("У шага может быть только один исполнитель: пользователь, роль или руководитель.")
+        return self
 
 
 class WorkflowStepRead(WorkflowStepBase):
@@ -47,6 +62,64 @@ class WorkflowStepRead(WorkflowStepBase):
     model_config = ConfigDict(from_attributes=True)
 
 
+# --- Template Catalog Schemas ---
+class CatalogStep(BaseModel):
+    """Шаг в переносимом каталоге: исполнитель задается почтой, а не ID, — ID в разных окружениях разные."""
+    name: str
+    description: Optional[str] = None
+    order: int = Field(..., ge=0)
+    assignee_email: Optional[str] = Field(None, description="Почта пользователя, ответственного за шаг")
+    assignee_role: Optional[str] = Field(None, description="Название роли, ответственной за шаг")
+    assignee_manager_level: Optional[int] = Field(
+        None, ge=1, le=MAX_MANAGER_LEVEL, description="Уровень руководителя инициатора, ответственного за шаг"
+    )
+
+
+class CatalogTemplate(WorkflowTemplateBase):
+    steps: List[CatalogStep] = []
+
+
+class TemplateCatalog(BaseModel):
+    format_version: Literal[1] = Field(1, description="Версия формата каталога")
+    templates: List[CatalogTemplate] = []
+
+
+class TemplateCatalogImportResult(BaseModel):
+    created: List[str] = Field(..., description="Названия созданных шаблонов")
+    skipped: List[str] = Field(..., description="Названия шаблонов, которые уже были в каталоге")
+
+
+# --- WorkflowTemplateVersion Schemas ---
+class TemplateVersionStepRead(BaseModel):
+    """Шаг опубликованной версии. Исполнитель — только ID: версия кэшируется навсегда, а данные пользователя меняются."""
+    id: int
+    reference_id: Optional[str] = None
+    name: str
+    description: Optional[str] = None
+    order: int
+    assignee_id: Optional[uuid.UUID] = None
+    assignee_role_id: Optional[int] = None
+    assignee_manager_level: Optional[int] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class WorkflowTemplateVersionInfo(BaseModel):
+    id: int
+    template_id: int
+    version: int = Field(..., description="Номер версии в пределах шаблона")
+    name: str
+    description: Optional[str] = None
+    published_at: datetime
+    published_by_id: uuid.UUID
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class WorkflowTemplateVersionRead(WorkflowTemplateVersionInfo):
+    steps: List[TemplateVersionStepRead] = []
+
+
 # --- Attachment Schemas ---
 class AttachmentBase(BaseModel):
     filename: str = Field(..., description="Имя файла")
@@ -63,6 +136,9 @@ class AttachmentRead(AttachmentBase):
     s3_path: str = Field(..., description="Путь к файлу в S3-совместимом хранилище (MinIO)")
     uploaded_at: datetime = Field(..., description="Дата и время загрузки файла")
     instance_id: Optional[int] = Field(None, description="ID экземпляра рабочего процесса, к которому относится вложение")
+    preview_status: Optional[str] = Field(
+        None, description="Готовность превью: pending, ready, unsupported, failed"
+    )
     uploaded_by: UserRead
 
     model_config = ConfigDict(from_attributes=True)
@@ -75,13 +151,34 @@ class WorkflowInstanceBase(BaseModel):
 
 class WorkflowInstanceCreate(WorkflowInstanceBase):
     attachment_ids: Optional[List[int]] = Field(None, description="Список ID вложений для прикрепления")
+    template_version: Optional[int] = Field(
+        None, ge=1, description="Номер версии шаблона; по умолчанию — последняя опубликованная"
+    )
+
+
+class WorkflowInstanceSummary(WorkflowInstanceBase):
+    """Экземпляр без вложенных объектов — для списков."""
+    id: int
+    reference_id: Optional[str] = None
+    status: str
+    current_step_id: Optional[int] = None
+    assignee_id: Optional[uuid.UUID] = None
+    assignee_role_id: Optional[int] = None
+    created_by_id: uuid.UUID
+    created_at: datetime
+    updated_at: datetime
+
+    model_config = ConfigDict(from_attributes=True)
 
 
 class WorkflowInstanceRead(WorkflowInstanceBase):
     id: int
     reference_id: Optional[str] = None
+    template_version_id: Optional[int] = Field(None, description="ID закрепленной версии шаблона")
     status: str = Field(..., description="Текущий статус экземпляра")
     current_step_id: Optional[int] = Field(None, description="ID текущего шага экземпляра")
+    assignee_id: Optional[uuid.UUID] = Field(None, description="Кто должен выполнить текущий шаг")
+    assignee_role_id: Optional[int] = Field(None, description="Роль, участник которой должен выполнить текущий шаг")
     created_at: datetime = Field(..., description="Дата и время создания экземпляра")
     updated_at: datetime = Field(..., description="Дата и время последнего обновления экземпляра")
     created_by: UserRead
@@ -114,7 +211,70 @@ class WorkflowHistoryRead(WorkflowHistoryBase):
     model_config = ConfigDict(from_attributes=True)
 
 
+# --- Search Schemas ---
+class SearchHit(BaseModel):
+    kind: Literal["template", "instance", "comment", "attachment"] = Field(..., description="Тип найденного объекта")
+    id: int = Field(..., description="ID найденного объекта")
+    instance_id: Optional[int] = Field(None, description="ID экземпляра, к которому относится объект")
+    template_id: Optional[int] = Field(None, description="ID шаблона, к которому относится объект")
+    title: Optional[str] = Field(None, description="Название, номер, комментарий или имя файла")
+    rank: float = Field(..., description="Релевантность (ts_rank)")
+
+
+class SearchPage(BaseModel):
+    items: List[SearchHit] = []
+    next_cursor: Optional[str] = Field(None, description="Курсор следующей страницы; None, если страниц больше нет")
+
+
+# --- Change Feed Schemas ---
+class InstanceChange(BaseModel):
+    """Экземпляр без вложенного графа: только его собственные поля."""
+    id: int
+    reference_id: Optional[str] = None
+    template_id: int
+    template_version_id: Optional[int] = None
+    status: str
+    current_step_id: Optional[int] = None
+    created_by_id: uuid.UUID
+    created_at: datetime
+    updated_at: datetime
+    change_seq: int
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class HistoryChange(BaseModel):
+    id: int
+    instance_id: int
+    step_id: int
+    user_id: uuid.UUID
+    action: str
+    comment: Optional[str] = None
+    timestamp: datetime
+    change_seq: int
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class Tombstone(BaseModel):
+    entity: Literal["instance", "history"] = Field(..., description="Тип удаленного объекта")
+    id: int = Field(..., validation_alias="entity_id", description="ID удаленного объекта")
+    change_seq: int
+    deleted_at: datetime
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class ChangesPage(BaseModel):
+    instances: List[InstanceChange] = []
+    history: List[HistoryChange] = []
+    deleted: List[Tombstone] = []
+    next_token: str = Field(..., description="Токен для следующего запроса `since`")
+    has_more: bool = Field(..., description="Есть ли еще изменения: запросите следующую страницу сразу")
+
+
 # Update forward refs
+WorkflowTemplateCreate.update_forward_refs()
 WorkflowTemplateRead.update_forward_refs()
 WorkflowStepRead.update_forward_refs()
 WorkflowInstanceRead.update_forward_refs()
@@ -0,0 +1,327 @@
+"""
+Bulk synthetic dataset for production-scale benchmarks.
+
+Rows are written straight into the schema with Postgres COPY
+(asyncpg `copy_records_to_table`), bypassing the ORM and the CRUD layer.
+IDs are assigned client-side and sequences are advanced afterwards, so
+parent/child rows can be streamed without reading anything back.
+
+Most of the load time is spent by Postgres computing the generated
+`search_vector` columns, so history and attachments are written in fixed-size
+chunks over several connections (`jobs`). Every chunk has its own RNG and ID
+range, so the output is fully determined by `DatasetConfig.seed` regardless
+of `jobs`.
+"""
+import asyncio
+import random
+import time
+import uuid
+from array import array
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Iterator, Optional
+
+import asyncpg
+
+from app.core.security import get_password_hash
+
+PASSWORD = "Bench-Pa$$w0rd"
+
+WORDS_RU = ["договор", "поставка", "счет", "акт", "служебная", "записка", "командировка", "закупка",
+            "оплата", "аренда", "лимит", "бюджет", "подрядчик", "услуги", "согласовано", "замечания"]
+WORDS_EN = ["contract", "invoice", "supply", "approval", "budget", "vendor", "payment", "review"]
+CONTENT_TYPES = ["application/pdf", "image/png", "image/jpeg",
+                 "application/vnd.openxmlformats-officedocument.wordprocessingml.document"]
+EXTENSIONS = {"application/pdf": "pdf", "image/png": "png", "image/jpeg": "jpg"}
+
+# Instances per chunk of history/attachment rows (unit of parallel COPY)
+CHUNK_SIZE = 50_000
+
+# Indexes dropped for the load and rebuilt afterwards: one sort-based build
+# is much cheaper than maintaining a GIN index row by row. The ix_*_id btrees
+# duplicate primary keys but are part of the schema, so they are rebuilt too.
+DEFERRED_INDEXES = {
+    "ix_workflow_history_id": "CREATE INDEX ix_workflow_history_id ON workflow_history (id)",
+    "ix_workflow_history_change_seq": "CREATE INDEX ix_workflow_history_change_seq "
+                                      "ON workflow_history (change_seq, id)",
+    "ix_attachments_id": "CREATE INDEX ix_attachments_id ON attachments (id)",
+    "ix_workflow_history_search_vector": "CREATE INDEX ix_workflow_history_search_vector "
+                                         "ON workflow_history USING gin (search_vector)",
+    "ix_attachments_search_vector": "CREATE INDEX ix_attachments_search_vector "
+                                    "ON attachments USING gin (search_vector)",
+    "ix_workflow_instances_search_vector": "CREATE INDEX ix_workflow_instances_search_vector "
+                                           "ON workflow_instances USING gin (search_vector)",
+}
+
+
+@dataclass
+class DatasetConfig:
+    users: int = 10_000
+    templates: int = 500
+    instances: int = 1_000_000
+    min_steps: int = 2
+    max_steps: int = 12
+    completion_rate: float = 0.7  # доля экземпляров, дошедших до конца маршрута
+    rejection_rate: float = 0.08  # вероятность отклонения на каждом шаге
+    comment_rate: float = 0.6
+    attachments_per_instance: float = 1.5
+    seed: int = 42
+    jobs: int = 4  # параллельные соединения для COPY истории и вложений
+
+
+@dataclass
+class InstancePlan:
+    """Compact per-instance plan shared by the instance, history and attachment passes."""
+    template: array  # индекс шаблона
+    progressed: array  # сколько шагов пройдено (строк истории)
+    rejected: array  # 1, если последний шаг отклонен
+    attachments: array  # число вложений
+
+
+def plan_instances(config: DatasetConfig, steps_per_template: list, rng: random.Random) -> InstancePlan:
+    """
+    Decides how far each instance went through its template and how it ended.
+    """
+    plan = InstancePlan(array("i"), array("i"), array("b"), array("b"))
+    for _ in range(config.instances):
+        template = rng.randrange(config.templates)
+        steps = steps_per_template[template]
+        target = steps if rng.random() < config.completion_rate else rng.randrange(steps)
+        progressed, rejected = 0, 0
+        while progressed < target:
+            progressed += 1
+            if rng.random() < config.rejection_rate:
+                rejected = 1
+                break
+        plan.template.append(template)
+        plan.progressed.append(progressed)
+        plan.rejected.append(rejected)
+        plan.attachments.append(int(config.attachments_per_instance) + (
+            1 if rng.random() < config.attachments_per_instance % 1 else 0
+        ))
+    return plan
+
+
+def _text(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS_RU if rng.random() < 0.8 else WORDS_EN) for _ in range(words))
+
+
+async def _next_id(conn: asyncpg.Connection, table: str) -> int:
+    return (await conn.fetchval(f"SELECT coalesce(max(id), 0) FROM {table}")) + 1
+
+
+async def _copy(conn: asyncpg.Connection, table: str, columns: list, records: Iterator[tuple],
+                quiet: bool = False) -> int:
+    started = time.perf_counter()
+    result = await conn.copy_records_to_table(table, columns=columns, records=records)
+    count = int(result.split()[-1])
+    if not quiet:
+        print(f"  {table:<20} {count:>12,} rows in {time.perf_counter() - started:7.1f} s")
+    return count
+
+
+async def _copy_chunks(dsn: str, jobs: int, table: str, columns: list, chunks: list) -> None:
+    """
+    COPY'ит независимые чанки строк через `jobs` соединений.
+
+    Args:
+        chunks (list): Функции без аргументов, возвращающие итератор записей чанка.
+    """
+    started = time.perf_counter()
+    queue: asyncio.Queue = asyncio.Queue()
+    for make_records in chunks:
+        queue.put_nowait(make_records)
+    total = 0
+
+    async def worker() -> None:
+        nonlocal total
+        conn = await asyncpg.connect(dsn)
+        try:
+            await conn.execute("SET synchronous_commit = off")
+            while not queue.empty():
+                make_records = queue.get_nowait()
+                count = await _copy(conn, table, columns, make_records(), quiet=True)
+                total += count
+        finally:
+            await conn.close()
+
+    await asyncio.gather(*(worker() for _ in range(max(1, min(jobs, len(chunks))))))
+    print(f"  {table:<20} {total:>12,} rows in {time.perf_counter() - started:7.1f} s")
+
+
+async def generate(dsn: str, config: DatasetConfig, truncate: bool = False) -> None:
+    """
+    Fills an already migrated database (`alembic upgrade head`) with synthetic data.
+    """
+    rng = random.Random(config.seed)
+    conn = await asyncpg.connect(dsn)
+    try:
+        # Данные синтетические: потеря последних транзакций при сбое не страшна
+        await conn.execute("SET synchronous_commit = off")
+        if truncate:
+            await conn.execute(
+                "TRUNCATE workflow_history, attachments, workflow_instances, workflow_steps, "
+                "workflow_template_versions, workflow_templates, workflow_tombstones, users "
+                "RESTART IDENTITY CASCADE"
+            )
+        for name in DEFERRED_INDEXES:
+            await conn.execute(f"DROP INDEX IF EXISTS {name}")
+
+        # --- users ---
+        hashed = get_password_hash(PASSWORD)
+        user_ids = [uuid.UUID(int=rng.getrandbits(128), version=4) for _ in range(config.users)]
+        await _copy(conn, "users", ["id", "email", "hashed_password", "is_active", "is_superuser", "is_verified"], (
+            (user_id, f"user-{config.seed}-{i}@example.com", hashed, True, False, True)
+            for i, user_id in enumerate(user_ids)
+        ))
+
+        # --- templates, published versions and steps ---
+        # Каждый шаблон опубликован один раз: экземпляры идут по шагам версии 1,
+        # а черновик шаблона — копия тех же шагов, как сразу после публикации
+        first_template = await _next_id(conn, "workflow_templates")
+        first_version = await _next_id(conn, "workflow_template_versions")
+        first_step = await _next_id(conn, "workflow_steps")
+        steps_per_template = [rng.randint(config.min_steps, config.max_steps) for _ in range(config.templates)]
+        first_step_of = []
+        step_id = first_step
+        for count in steps_per_template:
+            first_step_of.append(step_id)
+            step_id += count
+        first_draft_step = step_id
+
+        templates = [(f"{_text(rng, 3)} #{config.seed}-{i}", _text(rng, 12)) for i in range(config.templates)]
+        await _copy(conn, "workflow_templates", ["id", "reference_id", "name", "description"], (
+            (first_template + i, f"TPL-{first_template + i:06d}", name, description)
+            for i, (name, description) in enumerate(templates)
+        ))
+        await _copy(conn, "workflow_template_versions",
+                    ["id", "template_id", "version", "name", "description", "published_by_id"], (
+                        (first_version + i, first_template + i, 1, name, description, user_ids[0])
+                        for i, (name, description) in enumerate(templates)
+                    ))
+
+        steps = []
+        for t, count in enumerate(steps_per_template):
+            for order in range(count):
+                assignee = rng.choice(user_ids) if rng.random() < 0.5 else None
+                steps.append((t, order, f"Этап {order + 1}", _text(rng, 6), assignee))
+
+        def step_records():
+            for t, order, name, description, assignee in steps:
+                sid = first_step_of[t] + order
+                yield (sid, f"STEP-{sid:06d}", name, description, order, first_template + t, assignee,
+                       first_version + t)
+            for offset, (t, order, name, description, assignee) in enumerate(steps):
+                sid = first_draft_step + offset
+                yield (sid, f"STEP-{sid:06d}", name, description, order, first_template + t, assignee, None)
+
+        await _copy(conn, "workflow_steps",
+                    ["id", "reference_id", "name", "description", "order", "template_id", "assignee_id",
+                     "version_id"],
+                    step_records())
+
+        # --- instances, history, attachments ---
+        plan = plan_instances(config, steps_per_template, rng)
+        first_instance = await _next_id(conn, "workflow_instances")
+        epoch = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        span_seconds = 2 * 365 * 24 * 3600
+
+        def started_at(i: int) -> datetime:
+            # Равномерно по двум годам, монотонно по id — как в реальной таблице
+            return epoch + timedelta(seconds=i * span_seconds // max(config.instances, 1))
+
+        def instance_records():
+            for i in range(config.instances):
+                t, progressed = plan.template[i], plan.progressed[i]
+                steps = steps_per_template[t]
+                current_step: Optional[int]
+                if plan.rejected[i]:
+                    status, current_step = "rejected", first_step_of[t] + progressed - 1
+                elif progressed == steps:
+                    status, current_step = "approved", None
+                else:
+                    status, current_step = "in_progress", first_step_of[t] + progressed
+                created = started_at(i)
+                updated = created + timedelta(hours=6 * progressed)
+                iid = first_instance + i
+                yield (iid, f"INST-{iid:06d}", status, first_template + t, first_version + t, current_step,
+                       user_ids[rng.randrange(config.users)], created, updated)
+
+        await _copy(conn, "workflow_instances",
+                    ["id", "reference_id", "status", "template_id", "template_version_id", "current_step_id",
+                     "created_by_id", "created_at", "updated_at"],
+                    instance_records())
+
+        # История и вложения пишутся чанками по CHUNK_SIZE экземпляров; id
+        # каждого чанка вычисляются из плана заранее, а случайные данные берутся
+        # из собственного RNG чанка, поэтому результат не зависит от jobs.
+        bounds = [(start, min(start + CHUNK_SIZE, config.instances))
+                  for start in range(0, config.instances, CHUNK_SIZE)]
+        first_history = await _next_id(conn, "workflow_history")
+        first_attachment = await _next_id(conn, "attachments")
+        history_offsets, attachment_offsets = [], []
+        hid, aid = first_history, first_attachment
+        for start, end in bounds:
+            history_offsets.append(hid)
+            attachment_offsets.append(aid)
+            hid += sum(plan.progressed[start:end])
+            aid += sum(plan.attachments[start:end])
+
+        def history_chunk(chunk: int):
+            def records():
+                chunk_rng = random.Random(f"{config.seed}:history:{chunk}")
+                hid = history_offsets[chunk]
+                start, end = bounds[chunk]
+                for i in range(start, end):
+                    t, progressed = plan.template[i], plan.progressed[i]
+                    created = started_at(i)
+                    for order in range(progressed):
+                        rejected = plan.rejected[i] and order == progressed - 1
+                        comment = (_text(chunk_rng, chunk_rng.randint(3, 15))
+                                   if chunk_rng.random() < config.comment_rate else None)
+                        yield (hid, "reject" if rejected else "approve", comment,
+                               created + timedelta(hours=6 * (order + 1)), first_instance + i,
+                               first_step_of[t] + order, user_ids[chunk_rng.randrange(config.users)])
+                        hid += 1
+            return records
+
+        await _copy_chunks(dsn, config.jobs, "workflow_history",
+                           ["id", "action", "comment", "timestamp", "instance_id", "step_id", "user_id"],
+                           [history_chunk(chunk) for chunk in range(len(bounds))])
+
+        def attachment_chunk(chunk: int):
+            def records():
+                chunk_rng = random.Random(f"{config.seed}:attachments:{chunk}")
+                aid = attachment_offsets[chunk]
+                start, end = bounds[chunk]
+                for i in range(start, end):
+                    for _ in range(plan.attachments[i]):
+                        content_type = chunk_rng.choice(CONTENT_TYPES)
+                        filename = (f"{_text(chunk_rng, 2).replace(' ', '_')}_{aid}."
+                                    f"{EXTENSIONS.get(content_type, 'docx')}")
+                        yield (aid, f"ATT-{aid:06d}", filename, f"seed-{config.seed}/{aid}/{filename}",
+                               content_type, started_at(i), first_instance + i,
+                               user_ids[chunk_rng.randrange(config.users)])
+                        aid += 1
+            return records
+
+        await _copy_chunks(dsn, config.jobs, "attachments",
+                           ["id", "reference_id", "filename", "s3_path", "content_type", "uploaded_at",
+                            "instance_id", "uploaded_by_id"],
+                           [attachment_chunk(chunk) for chunk in range(len(bounds))])
+
+        # Последовательности не знают о явно заданных id
+        for table in ("workflow_templates", "workflow_template_versions", "workflow_steps", "workflow_instances",
+                      "workflow_history", "attachments"):
+            await conn.execute(
+                f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT coalesce(max(id), 1) FROM {table}))"
+            )
+
+        started = time.perf_counter()
+        await conn.execute("SET maintenance_work_mem = '1GB'")
+        for ddl in DEFERRED_INDEXES.values():
+            await conn.execute(ddl)
+        await conn.execute("ANALYZE")
+        print(f"  indexes + ANALYZE     {time.perf_counter() - started:24.1f} s")
+    finally:
+        await conn.close()
@@ -0,0 +1,129 @@
+import json
+import math
+import platform
+import time
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import AsyncIterator, Dict, List, Optional
+
+from httpx import Response
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """
+    Percentile using the nearest-rank method (what load tools usually report).
+    """
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(q / 100 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+@dataclass
+class EndpointStats:
+    latencies: List[float] = field(default_factory=list)
+    errors: int = 0
+    bytes: int = 0
+
+    def summary(self, elapsed: float) -> dict:
+        values = sorted(self.latencies)
+        return {
+            "requests": len(values),
+            "errors": self.errors,
+            "throughput_rps": round(len(values) / elapsed, 2) if elapsed else 0.0,
+            "p50_ms": round(percentile(values, 50) * 1000, 3),
+            "p95_ms": round(percentile(values, 95) * 1000, 3),
+            "p99_ms": round(percentile(values, 99) * 1000, 3),
+            "max_ms": round(values[-1] * 1000, 3) if values else 0.0,
+            "avg_bytes": round(self.bytes / len(values)) if values else 0,
+        }
+
+
+class Recorder:
+    """
+    Collects per-endpoint latencies. Endpoints are keyed by route template
+    (`POST /workflow/workflow_instances/{instance_id}/approve`) so results
+    are comparable between runs regardless of generated IDs.
+    """
+
+    def __init__(self):
+        self.endpoints: Dict[str, EndpointStats] = defaultdict(EndpointStats)
+        self.started = time.perf_counter()
+        self.finished: Optional[float] = None
+
+    @asynccontextmanager
+    async def measure(self, endpoint: str) -> AsyncIterator[dict]:
+        holder: dict = {}
+        started = time.perf_counter()
+        try:
+            yield holder
+        finally:
+            stats = self.endpoints[endpoint]
+            stats.latencies.append(time.perf_counter() - started)
+            response: Optional[Response] = holder.get("response")
+            if response is None or response.status_code >= 400:
+                stats.errors += 1
+            else:
+                # Bytes on the wire, i.e. after Content-Encoding (httpx decodes `content`)
+                stats.bytes += response.num_bytes_downloaded
+
+    def stop(self) -> None:
+        self.finished = time.perf_counter()
+
+    def report(self, config: dict) -> dict:
+        elapsed = (self.finished or time.perf_counter()) - self.started
+        total = sum(len(stats.latencies) for stats in self.endpoints.values())
+        return {
+            "meta": {
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                **config,
+            },
+            "elapsed_s": round(elapsed, 3),
+            "total_requests": total,
+            "throughput_rps": round(total / elapsed, 2) if elapsed else 0.0,
+            "endpoints": {name: stats.summary(elapsed) for name, stats in sorted(self.endpoints.items())},
+        }
+
+
+def write_report(report: dict, path: str) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2, sort_keys=True)
+
+
+def compare_reports(baseline: dict, current: dict, metric: str = "p95_ms", threshold: float = 0.10) -> List[dict]:
+    """
+    Lists endpoints whose `metric` grew by more than `threshold` (relative).
+    """
+    regressions = []
+    for name, current_stats in current["endpoints"].items():
+        base_stats = baseline["endpoints"].get(name)
+        if not base_stats or not base_stats.get(metric):
+            continue
+        change = (current_stats[metric] - base_stats[metric]) / base_stats[metric]
+        if change > threshold:
+            regressions.append({
+                "endpoint": name,
+                "metric": metric,
+                "baseline": base_stats[metric],
+                "current": current_stats[metric],
+                "change": round(change, 3),
+            })
+    return regressions
+
+
+def format_report(report: dict) -> str:
+    header = (f"{'endpoint':<62} {'req':>6} {'err':>4} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8} "
+              f"{'bytes':>8}")
+    lines = [header, "-" * len(header)]
+    for name, s in report["endpoints"].items():
+        lines.append(
+            f"{name:<62} {s['requests']:>6} {s['errors']:>4} {s['throughput_rps']:>8} "
+            f"{s['p50_ms']:>8} {s['p95_ms']:>8} {s['p99_ms']:>8} {s.get('avg_bytes', 0):>8}"
+        )
+    lines.append(f"total: {report['total_requests']} requests in {report['elapsed_s']} s "
+                 f"({report['throughput_rps']} rps)")
+    return "\n".join(lines)
@@ -0,0 +1,168 @@
+import asyncio
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List
+
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.core.security import get_password_hash
+from app.models.user import User
+from app.models.workflow import WorkflowTemplate, WorkflowStep
+from benchmarks.harness import Recorder
+
+PASSWORD = "Bench-Pa$$w0rd"
+
+COMMENTS = [
+    "Согласовано без замечаний",
+    "Проверил договор поставки, ок",
+    "Approved, see attached invoice",
+    "Сумма в пределах лимита",
+]
+
+
+@dataclass
+class Dataset:
+    emails: List[str]
+    template_ids: List[int]
+    steps_per_template: Dict[int, int]
+    instance_ids: List[int] = field(default_factory=list)
+    attachment_ids: List[int] = field(default_factory=list)
+
+
+async def seed(session_factory: async_sessionmaker[AsyncSession], users: int, templates: int,
+               steps: int, rng: random.Random) -> Dataset:
+    """
+    Writes the base dataset straight through the ORM (one transaction):
+    going through the API would make seeding dominate the run time.
+    """
+    # Hashing is deliberately slow; every bench user shares one hash.
+    hashed = get_password_hash(PASSWORD)
+    emails = [f"bench-{i}@example.com" for i in range(users)]
+    async with session_factory() as db:
+        db.add_all(User(email=email, hashed_password=hashed) for email in emails)
+        db_templates = [
+            WorkflowTemplate(name=f"Шаблон {i}", description=rng.choice(COMMENTS))
+            for i in range(templates)
+        ]
+        db.add_all(db_templates)
+        await db.flush()
+        steps_per_template = {}
+        for template in db_templates:
+            count = rng.randint(1, steps)
+            steps_per_template[template.id] = count
+            db.add_all(
+                WorkflowStep(name=f"Этап {order}", order=order, template_id=template.id)
+                for order in range(count)
+            )
+        await db.commit()
+    return Dataset(emails=emails, template_ids=list(steps_per_template), steps_per_template=steps_per_template)
+
+
+class VirtualUser:
+    """
+    One simulated client. Each flow is a realistic sequence of API calls;
+    every call is timed under its route template.
+    """
+
+    def __init__(self, client: AsyncClient, recorder: Recorder, dataset: Dataset, rng: random.Random, email: str):
+        self.client = client
+        self.recorder = recorder
+        self.dataset = dataset
+        self.rng = rng
+        self.email = email
+        self.headers: Dict[str, str] = {}
+
+    async def _call(self, endpoint: str, method: str, url: str, **kwargs):
+        async with self.recorder.measure(endpoint) as holder:
+            holder["response"] = await self.client.request(method, url, headers=self.headers, **kwargs)
+        return holder["response"]
+
+    async def login(self) -> None:
+        response = await self._call(
+            "POST /auth/token", "POST", "/auth/token", data={"username": self.email, "password": PASSWORD}
+        )
+        self.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    async def browse(self) -> None:
+        await self._call("GET /workflow/workflow_templates/", "GET", "/workflow/workflow_templates/")
+        template_id = self.rng.choice(self.dataset.template_ids)
+        await self._call(
+            "GET /workflow/workflow_templates/{template_id}", "GET", f"/workflow/workflow_templates/{template_id}"
+        )
+        if self.dataset.instance_ids:
+            instance_id = self.rng.choice(self.dataset.instance_ids)
+            await self._call(
+                "GET /workflow/workflow_instances/{instance_id}", "GET", f"/workflow/workflow_instances/{instance_id}"
+            )
+
+    async def approve_chain(self) -> None:
+        template_id = self.rng.choice(self.dataset.template_ids)
+        response = await self._call(
+            "POST /workflow/workflow_instances/", "POST", "/workflow/workflow_instances/",
+            json={"template_id": template_id},
+        )
+        if response.status_code != 201:
+            return
+        instance_id = response.json()["id"]
+        self.dataset.instance_ids.append(instance_id)
+        for _ in range(self.dataset.steps_per_template[template_id]):
+            action = "reject" if self.rng.random() < 0.05 else "approve"
+            await self._call(
+                f"POST /workflow/workflow_instances/{{instance_id}}/{action}", "POST",
+                f"/workflow/workflow_instances/{instance_id}/{action}",
+                json={"comment": self.rng.choice(COMMENTS)},
+            )
+            if action == "reject":
+                break
+
+    async def upload_download(self) -> None:
+        size = self.rng.choice((16 * 1024, 256 * 1024, 1024 * 1024))
+        response = await self._call(
+            "POST /workflow/attachments/upload", "POST", "/workflow/attachments/upload",
+            files={"file": ("scan.pdf", self.rng.randbytes(size), "application/pdf")},
+        )
+        if response.status_code != 200:
+            return
+        attachment_id = response.json()["id"]
+        self.dataset.attachment_ids.append(attachment_id)
+        await self._call(
+            "GET /workflow/attachments/{attachment_id}/download", "GET",
+            f"/workflow/attachments/{attachment_id}/download",
+        )
+
+    async def search(self) -> None:
+        await self._call(
+            "GET /workflow/search", "GET", "/workflow/search", params={"q": self.rng.choice(("договор", "invoice"))}
+        )
+
+
+# Relative weights of flows in the default mix: reads dominate, as in production.
+DEFAULT_MIX: Dict[str, int] = {
+    "browse": 10,
+    "approve_chain": 3,
+    "upload_download": 1,
+    "search": 2,
+    "login": 1,
+}
+
+
+async def run_load(client: AsyncClient, recorder: Recorder, dataset: Dataset, concurrency: int,
+                   duration: float, mix: Dict[str, int], seed: int) -> None:
+    """
+    Runs `concurrency` virtual users for `duration` seconds.
+    """
+    deadline = time.perf_counter() + duration
+    flows = [name for name, weight in mix.items() if weight > 0]
+    weights = [mix[name] for name in flows]
+
+    async def worker(index: int) -> None:
+        rng = random.Random(seed * 1000 + index)
+        user = VirtualUser(client, recorder, dataset, rng, dataset.emails[index % len(dataset.emails)])
+        await user.login()
+        while time.perf_counter() < deadline:
+            flow: Callable[[], Awaitable[None]] = getattr(user, rng.choices(flows, weights)[0])
+            await flow()
+
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
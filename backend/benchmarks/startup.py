@@ -0,0 +1,89 @@
+"""
+Cold-start benchmark: how long a fresh process takes to import the app and
+to answer its first request. Every sample is a new interpreter, so nothing
+is shared with previous runs except the OS page cache.
+"""
+import os
+import platform
+import socket
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import httpx
+
+from benchmarks.harness import EndpointStats
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+
+IMPORT_SNIPPET = "import time; t = time.perf_counter(); import app.main; print(time.perf_counter() - t)"
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_import(env: dict) -> float:
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET], cwd=BACKEND_DIR, env=env, check=True,
+        capture_output=True, text=True,
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def measure_first_response(env: dict, path: str, timeout: float = 30.0) -> float:
+    """
+    Seconds from spawning uvicorn to the first 200 on `path`.
+    """
+    port = _free_port()
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        with httpx.Client(timeout=1.0) as client:
+            while time.perf_counter() - started < timeout:
+                try:
+                    if client.get(f"http://127.0.0.1:{port}{path}").status_code == 200:
+                        return time.perf_counter() - started
+                except httpx.TransportError:
+                    pass
+                if process.poll() is not None:
+                    raise RuntimeError(f"uvicorn exited with code {process.returncode}")
+                time.sleep(0.005)
+        raise TimeoutError(f"no 200 from {path} within {timeout} s")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def run_startup(database_url: str, samples: int, path: str = "/health/live") -> dict:
+    """
+    Report in the same format as the load benchmark, so `compare` works on it.
+    """
+    env = {**os.environ, "DATABASE_URL": database_url, "TRACING_EXPORTER": "none"}
+    stats = {"startup: import app.main": EndpointStats(), f"startup: first 200 {path}": EndpointStats()}
+    started = time.perf_counter()
+    for _ in range(samples):
+        stats["startup: import app.main"].latencies.append(measure_import(env))
+        stats[f"startup: first 200 {path}"].latencies.append(measure_first_response(env, path))
+    elapsed = time.perf_counter() - started
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "samples": samples,
+            "path": path,
+        },
+        "elapsed_s": round(elapsed, 3),
+        "total_requests": samples,
+        "throughput_rps": 0.0,
+        "endpoints": {name: s.summary(elapsed) for name, s in stats.items()},
+    }
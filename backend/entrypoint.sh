@@ -5,10 +5,27 @@ set -e
 # В Docker это не требуется, так как зависимости установлены глобально в контейнере
 # . .venv/bin/activate
 
-# Применяем миграции Alembic
-echo "Applying database migrations..."
-alembic upgrade head
+# Применяем миграции Alembic под advisory-блокировкой: при одновременном старте
+# нескольких реплик миграции выполняет только одна. RUN_MIGRATIONS=0 — если
+# миграции запускаются отдельной задачей деплоя.
+if [ "${RUN_MIGRATIONS:-1}" = "1" ]; then
+    echo "Applying database migrations..."
+    python -m app.db.migrate
+fi
 
-# Запускаем Uvicorn сервер
-echo "Starting Uvicorn server..."
-exec uvicorn app.main:app --host 0.0.0.0 --port 8000
+# Каталог метрик Prometheus для нескольких воркеров: файлы прошлого запуска
+# искажают счетчики, поэтому перед стартом каталог очищается
+if [ -n "$PROMETHEUS_MULTIPROC_DIR" ]; then
+    rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+    mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+fi
+
+# SERVER_MODE=development — один процесс uvicorn с перезагрузкой по изменениям кода.
+# По умолчанию — gunicorn с воркерами uvicorn (см. gunicorn.conf.py).
+if [ "$SERVER_MODE" = "development" ]; then
+    echo "Starting Uvicorn server (development, auto-reload)..."
+    exec uvicorn app.main:app --host 0.0.0.0 --port 8000 --reload
+fi
+
+echo "Starting Gunicorn with Uvicorn workers..."
+exec gunicorn app.main:app -c gunicorn.conf.py
@@ -0,0 +1,84 @@
+"""
+Конфигурация gunicorn для продакшен-режима (см. entrypoint.sh).
+
+Мастер-процесс gunicorn только следит за воркерами; каждый воркер —
+отдельный процесс с сервером uvicorn на uvloop и httptools. Параметры
+переопределяются переменными окружения.
+
+Плавная перезагрузка без простоя: `kill -HUP <pid мастера>` — новые воркеры
+стартуют с новым кодом, старые дообслуживают текущие запросы.
+"""
+import multiprocessing
+import os
+import signal
+import threading
+import time
+
+bind = os.environ.get("BIND", "0.0.0.0:8000")
+
+# Асинхронный воркер использует одно ядро, поэтому по умолчанию воркеров
+# столько же, сколько ядер (sched_getaffinity учитывает ограничения контейнера)
+try:
+    _cpus = len(os.sched_getaffinity(0))
+except AttributeError:
+    _cpus = multiprocessing.cpu_count()
+workers = int(os.environ.get("WEB_CONCURRENCY", str(_cpus)))
+
+# loop="auto" и http="auto" выбирают uvloop и httptools из uvicorn[standard]
+worker_class = "uvicorn_worker.UvicornWorker"
+
+# Переработка воркеров: защищает от медленных утечек памяти. Jitter разносит
+# перезапуски, чтобы воркеры не уходили на рестарт одновременно.
+max_requests = int(os.environ.get("MAX_REQUESTS", "10000"))
+max_requests_jitter = int(os.environ.get("MAX_REQUESTS_JITTER", "1000"))
+# Воркер, превысивший этот объем RSS, плавно завершается и заменяется (0 — без ограничения)
+max_worker_memory_mb = int(os.environ.get("MAX_WORKER_MEMORY_MB", "0"))
+memory_check_interval = 10.0
+
+timeout = int(os.environ.get("WORKER_TIMEOUT", "60"))
+graceful_timeout = int(os.environ.get("GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.environ.get("KEEPALIVE", "5"))
+
+# Приложение импортируется в каждом воркере после fork: движок SQLAlchemy,
+# клиент MinIO и метрики не наследуют соединения и файлы мастера.
+preload_app = False
+
+accesslog = "-"
+errorlog = "-"
+forwarded_allow_ips = os.environ.get("FORWARDED_ALLOW_IPS", "127.0.0.1")
+
+
+def _rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except OSError:
+        # Не Linux: пиковое значение вместо текущего, для разработки достаточно
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def post_worker_init(worker):
+    if not max_worker_memory_mb:
+        return
+
+    def watch_memory():
+        while True:
+            time.sleep(memory_check_interval)
+            rss = _rss_mb()
+            if rss > max_worker_memory_mb:
+                worker.log.warning(
+                    "Worker %s uses %.0f MiB (limit %s MiB), restarting", worker.pid, rss, max_worker_memory_mb
+                )
+                # uvicorn обрабатывает SIGTERM как плавную остановку, мастер запустит замену
+                os.kill(worker.pid, signal.SIGTERM)
+                return
+
+    threading.Thread(target=watch_memory, name="memory-watchdog", daemon=True).start()
+
+
+def child_exit(server, worker):
+    # Убираем livesum-гейджи завершившегося воркера из агрегированных метрик
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,80 @@
+import hashlib
+import uuid
+from datetime import datetime, timezone
+
+from fastapi import UploadFile
+
+
+class InMemoryMinioClient:
+    """
+    In-memory stand-in for `MinioClient` with the same async interface.
+    Used by tests and benchmarks so they do not need a running MinIO.
+    """
+
+    def __init__(self):
+        self.bucket_name = "test-bucket"
+        self.objects: dict[str, tuple[bytes, str | None]] = {}
+        self.modified: dict[str, datetime] = {}
+        self.remove_requests = 0
+        # upload_id -> (object_name, content_type, initiated, {part_number: data})
+        self.multipart: dict[str, tuple[str, str, datetime, dict[int, bytes]]] = {}
+
+    async def ensure_bucket_exists(self):
+        return None
+
+    async def upload_file(self, file: UploadFile) -> str:
+        object_name = f"{uuid.uuid4()}/{file.filename}"
+        try:
+            self.objects[object_name] = (await file.read(), file.content_type)
+            self.modified[object_name] = datetime.now(timezone.utc)
+        finally:
+            await file.close()
+        return object_name
+
+    async def upload_bytes(self, object_name: str, data: bytes, content_type: str) -> None:
+        self.objects[object_name] = (data, content_type)
+        self.modified[object_name] = datetime.now(timezone.utc)
+
+    async def stream_file(self, object_name: str, chunk_size: int = 64 * 1024):
+        content = self.objects[object_name][0]
+        for offset in range(0, len(content), chunk_size):
+            yield content[offset:offset + chunk_size]
+
+    async def create_multipart_upload(self, object_name: str, content_type: str) -> str:
+        upload_id = uuid.uuid4().hex
+        self.multipart[upload_id] = (object_name, content_type, datetime.now(timezone.utc), {})
+        return upload_id
+
+    async def upload_part(self, object_name: str, upload_id: str, part_number: int, data: bytes) -> str:
+        self.multipart[upload_id][3][part_number] = data
+        return hashlib.md5(data).hexdigest()
+
+    async def complete_multipart_upload(self, object_name: str, upload_id: str, parts) -> None:
+        _, content_type, _, uploaded = self.multipart.pop(upload_id)
+        assert [n for n, _ in parts] == sorted(uploaded)
+        self.objects[object_name] = (b"".join(uploaded[n] for n, _ in parts), content_type)
+        self.modified[object_name] = datetime.now(timezone.utc)
+
+    async def abort_multipart_upload(self, object_name: str, upload_id: str) -> None:
+        self.multipart.pop(upload_id, None)
+
+    async def list_multipart_uploads(self, initiated_before: datetime):
+        return [
+            (object_name, upload_id)
+            for upload_id, (object_name, _, initiated, _) in self.multipart.items()
+            if initiated < initiated_before
+        ]
+
+    async def list_objects(self, start_after, limit: int):
+        names = sorted(name for name in self.objects if not start_after or name > start_after)
+        return [(name, self.modified[name]) for name in names[:limit]]
+
+    async def remove_objects(self, object_names) -> list[str]:
+        self.remove_requests += 1
+        for name in object_names:
+            self.objects.pop(name, None)
+            self.modified.pop(name, None)
+        return []
+
+    async def download_file(self, object_name: str) -> bytes:
+        return self.objects[object_name][0]
@@ -0,0 +1,106 @@
+import asyncio
+
+import pytest
+from httpx import AsyncClient, ASGITransport
+
+from app.core.admission import AdaptiveLimiter, AdmissionControlMiddleware, Overloaded, build_limiters, classify
+
+
+def _limiter(**kwargs) -> AdaptiveLimiter:
+    params = dict(initial_limit=1, min_limit=1, max_limit=10, max_wait=1.0)
+    params.update(kwargs)
+    return AdaptiveLimiter("test", **params)
+
+
+@pytest.mark.asyncio
+async def test_queued_request_is_admitted_when_slot_frees():
+    limiter = _limiter()
+    await limiter.acquire()
+    waiter = asyncio.create_task(limiter.acquire())
+    await asyncio.sleep(0)
+    assert limiter.queued == 1 and not waiter.done()
+
+    limiter.release(0.01)
+    await asyncio.wait_for(waiter, 1)
+    assert limiter.in_flight == 1 and limiter.queued == 0
+
+
+@pytest.mark.asyncio
+async def test_sheds_when_predicted_wait_exceeds_budget():
+    limiter = _limiter(max_wait=0.5)
+    limiter.short_rtt = limiter.long_rtt = 2.0  # each request holds the slot for ~2 s
+    await limiter.acquire()
+    with pytest.raises(Overloaded) as excinfo:
+        await limiter.acquire()
+    assert excinfo.value.retry_after >= 2.0
+
+
+@pytest.mark.asyncio
+async def test_limit_follows_latency():
+    limiter = _limiter(initial_limit=8, max_limit=32)
+    for _ in range(50):
+        limiter.in_flight = 1
+        limiter.release(0.01)
+    grown = limiter.limit
+    assert grown > 8
+
+    # The database slows down 10x: the limit backs off instead of piling more work on it
+    for _ in range(50):
+        limiter.in_flight = 1
+        limiter.release(0.1)
+    assert limiter.limit < grown / 2
+
+
+def test_sustained_slowdown_backs_off_to_min_limit():
+    limiter = _limiter(initial_limit=8, min_limit=2, max_limit=32)
+    for _ in range(50):
+        limiter.in_flight = 1
+        limiter.release(0.01)
+
+    # Queueing that does not go away must not settle at a floor above min_limit
+    for _ in range(200):
+        limiter.in_flight = 1
+        limiter.release(0.1)
+    assert limiter.limit == limiter.min_limit
+
+
+@pytest.mark.asyncio
+async def test_middleware_answers_503_with_retry_after():
+    release = asyncio.Event()
+
+    async def slow_app(scope, receive, send):
+        await release.wait()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    limiter = AdaptiveLimiter("writes", initial_limit=1, min_limit=1, max_limit=1, max_wait=0.05)
+    app = AdmissionControlMiddleware(slow_app, {"writes": limiter})
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        first = asyncio.create_task(ac.post("/workflow/workflow_instances/"))
+        await asyncio.sleep(0.01)
+        shed = await ac.post("/workflow/workflow_instances/")
+        release.set()
+        assert (await first).status_code == 200
+
+    assert shed.status_code == 503
+    assert int(shed.headers["retry-after"]) >= 1
+
+
+def test_route_classes():
+    def scope(method, path):
+        return {"type": "http", "method": method, "path": path}
+
+    assert classify(scope("POST", "/auth/token")) == "auth"
+    assert classify(scope("POST", "/workflow/attachments/upload")) == "uploads"
+    assert classify(scope("POST", "/workflow/workflow_instances/1/approve")) == "writes"
+    assert classify(scope("GET", "/workflow/workflow_instances/1")) == "reads"
+    assert classify(scope("GET", "/health/ready")) is None
+
+
+def test_limits_never_exceed_the_pools():
+    without_replica = build_limiters(20)
+    assert sum(limiter.max_limit for limiter in without_replica.values()) <= 20
+
+    with_replica = build_limiters(20, replica_capacity=30)
+    assert with_replica["reads"].max_limit == 30
+    assert sum(limiter.max_limit for name, limiter in with_replica.items() if name != "reads") <= 20
@@ -0,0 +1,86 @@
+import asyncio
+import io
+import zipfile
+from datetime import datetime, timezone
+
+import pytest
+
+from app.core.archive import ArchiveMember, stream_zip, unique_member_names
+from tests.conftest import requires_db
+
+
+async def _upload(client, headers, filename, content):
+    response = await client.post(
+        "/workflow/attachments/upload", files={"file": (filename, content, "application/pdf")}, headers=headers
+    )
+    return response.json()["id"]
+
+
+@pytest.mark.asyncio
+@requires_db
+async def test_instance_attachments_zip(client, auth_headers):
+    response = await client.post(
+        "/workflow/workflow_templates/",
+        json={"name": "Аудит", "steps": [{"name": "Проверка", "order": 0}]},
+        headers=auth_headers,
+    )
+    template_id = response.json()["id"]
+    attachment_ids = [
+        await _upload(client, auth_headers, "акт.pdf", b"first"),
+        await _upload(client, auth_headers, "акт.pdf", b"second"),
+        await _upload(client, auth_headers, "счет.pdf", b"x" * 200_000),
+    ]
+    response = await client.post(
+        "/workflow/workflow_instances/",
+        json={"template_id": template_id, "attachment_ids": attachment_ids},
+        headers=auth_headers,
+    )
+    instance = response.json()
+
+    response = await client.get(f"/workflow/workflow_instances/{instance['id']}/attachments.zip", headers=auth_headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/zip"
+    assert f'filename="{instance["reference_id"]}.zip"' in response.headers["content-disposition"]
+
+    with zipfile.ZipFile(io.BytesIO(response.content)) as archive:
+        assert archive.testzip() is None
+        assert archive.namelist() == ["акт.pdf", "акт (2).pdf", "счет.pdf"]
+        assert archive.read("акт (2).pdf") == b"second"
+        assert archive.read("счет.pdf") == b"x" * 200_000
+
+    response = await client.get("/workflow/workflow_instances/999999/attachments.zip", headers=auth_headers)
+    assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_archive_reads_ahead_in_bounded_memory():
+    produced = {"chunks": 0}
+
+    async def open_stream(object_name):
+        for _ in range(50):
+            produced["chunks"] += 1
+            yield object_name.encode() * 1000
+            await asyncio.sleep(0)
+
+    members = [
+        ArchiveMember(name=f"{i}.bin", object_name=str(i), modified=datetime(2025, 1, 1, tzinfo=timezone.utc))
+        for i in range(6)
+    ]
+    output, consumed, max_ahead = io.BytesIO(), 0, 0
+    async for part in stream_zip(members, open_stream, prefetch=3):
+        output.write(part)
+        consumed += 1 if part else 0
+        await asyncio.sleep(0)
+        max_ahead = max(max_ahead, produced["chunks"] - consumed)
+
+    # Never more than `prefetch` members, each with a small buffer, are read ahead of the writer
+    assert max_ahead <= 3 * 4
+    with zipfile.ZipFile(output) as archive:
+        assert archive.testzip() is None
+        assert archive.read("5.bin") == b"5" * 1000 * 50
+
+
+def test_member_names_are_flat_and_unique():
+    assert unique_member_names(["../etc/passwd", "Акт.pdf", "акт.pdf", "..", "README"]) == [
+        ".._etc_passwd", "Акт.pdf", "акт (2).pdf", "file", "README",
+    ]
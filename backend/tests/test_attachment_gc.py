@@ -0,0 +1,105 @@
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.crud.attachment_gc import OBJECTS_CURSOR, RateLimiter, collect_garbage, remove_orphaned_objects
+from tests.conftest import requires_db
+
+pytestmark = pytest.mark.asyncio
+
+LONG_AGO = datetime.now(timezone.utc) - timedelta(days=30)
+
+
+async def _upload(client, headers, filename):
+    response = await client.post(
+        "/workflow/attachments/upload", files={"file": (filename, b"data", "text/plain")}, headers=headers
+    )
+    return response.json()
+
+
+@requires_db
+async def test_unlinked_attachments_and_orphaned_objects_are_removed(client, auth_headers, storage, db_engine):
+    linked = await _upload(client, auth_headers, "linked.txt")
+    stale = await _upload(client, auth_headers, "stale.txt")
+    fresh = await _upload(client, auth_headers, "fresh.txt")
+    response = await client.post(
+        "/workflow/workflow_templates/",
+        json={"name": "Договор", "steps": [{"name": "Проверка", "order": 0}]},
+        headers=auth_headers,
+    )
+    await client.post(
+        "/workflow/workflow_instances/",
+        json={"template_id": response.json()["id"], "attachment_ids": [linked["id"]]},
+        headers=auth_headers,
+    )
+    await storage.upload_bytes("stray/scan.pdf", b"lost", "application/pdf")
+    await storage.upload_bytes("previews/deadbeef/thumbnail.jpg", b"jpeg", "image/jpeg")
+    async with db_engine.begin() as conn:
+        await conn.execute(
+            text("UPDATE attachments SET uploaded_at = :at WHERE id IN (:linked, :stale)"),
+            {"at": LONG_AGO, "linked": linked["id"], "stale": stale["id"]},
+        )
+        paths = dict((await conn.execute(text("SELECT id, s3_path FROM attachments"))).tuples().all())
+    for name in storage.objects:
+        storage.modified[name] = LONG_AGO
+    await storage.upload_bytes("stray/just-uploaded.pdf", b"row is on its way", "application/pdf")
+
+    unlinked, orphaned = await collect_garbage(async_sessionmaker(bind=db_engine), storage, batch_size=2, rate=0)
+
+    assert (unlinked, orphaned) == (1, 2)
+    assert set(storage.objects) == {paths[linked["id"]], paths[fresh["id"]], "stray/just-uploaded.pdf"}
+    response = await client.get(f"/workflow/attachments/{stale['id']}/download", headers=auth_headers)
+    assert response.status_code == 404
+
+
+@requires_db
+async def test_instance_with_unknown_attachment_is_not_created(client, auth_headers, storage, db_engine):
+    attachment = await _upload(client, auth_headers, "scan.txt")
+    response = await client.post(
+        "/workflow/workflow_templates/",
+        json={"name": "Договор", "steps": [{"name": "Проверка", "order": 0}]},
+        headers=auth_headers,
+    )
+    response = await client.post(
+        "/workflow/workflow_instances/",
+        json={"template_id": response.json()["id"], "attachment_ids": [attachment["id"], 999_999]},
+        headers=auth_headers,
+    )
+    assert response.status_code == 404
+    async with db_engine.connect() as conn:
+        assert (await conn.execute(text("SELECT count(*) FROM workflow_instances"))).scalar_one() == 0
+        assert (await conn.execute(
+            text("SELECT instance_id FROM attachments WHERE id = :id"), {"id": attachment["id"]}
+        )).scalar_one() is None
+
+
+@requires_db
+async def test_bucket_scan_resumes_from_cursor(storage, db_engine):
+    for name in ("a/1", "b/2", "c/3"):
+        await storage.upload_bytes(name, b"x", "text/plain")
+        storage.modified[name] = LONG_AGO
+    session_factory = async_sessionmaker(bind=db_engine)
+
+    async with session_factory() as db:
+        assert await remove_orphaned_objects(db, storage, batch_size=2) == (2, False)
+    async with db_engine.connect() as conn:
+        cursor = await conn.scalar(text("SELECT value FROM maintenance_cursors WHERE name = :name"),
+                                  {"name": OBJECTS_CURSOR})
+    assert cursor == "b/2"
+    assert storage.remove_requests == 1
+
+    async with session_factory() as db:
+        assert await remove_orphaned_objects(db, storage, batch_size=2) == (1, True)
+    assert storage.objects == {}
+
+
+async def test_rate_limiter_spaces_out_batches():
+    limiter = RateLimiter(rate=1000)
+    started = time.monotonic()
+    await limiter.acquire(100)
+    await limiter.acquire(50)
+    await limiter.acquire(1)
+    assert time.monotonic() - started >= 0.15
@@ -0,0 +1,17 @@
+from benchmarks.harness import compare_reports, percentile
+
+
+def test_percentile_nearest_rank():
+    values = sorted(float(v) for v in range(1, 101))
+    assert percentile(values, 50) == 50.0
+    assert percentile(values, 95) == 95.0
+    assert percentile(values, 99) == 99.0
+    assert percentile([], 95) == 0.0
+
+
+def test_compare_reports_flags_only_regressions_over_threshold():
+    baseline = {"endpoints": {"GET /a": {"p95_ms": 10.0}, "GET /b": {"p95_ms": 10.0}}}
+    current = {"endpoints": {"GET /a": {"p95_ms": 10.5}, "GET /b": {"p95_ms": 15.0}, "GET /new": {"p95_ms": 1.0}}}
+    regressions = compare_reports(baseline, current, threshold=0.10)
+    assert [r["endpoint"] for r in regressions] == ["GET /b"]
+    assert regressions[0]["change"] == 0.5
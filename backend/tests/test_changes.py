@@ -0,0 +1,105 @@
+import pytest
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.crud.workflow import delete_workflow_instance
+from app.models.workflow import WorkflowInstance
+from tests.conftest import requires_db
+
+pytestmark = pytest.mark.asyncio
+
+
+async def _instance(client, headers, name) -> int:
+    response = await client.post(
+        "/workflow/workflow_templates/", json={"name": name, "description": ""}, headers=headers
+    )
+    template_id = response.json()["id"]
+    for order in range(2):
+        await client.post(
+            f"/workflow/workflow_templates/{template_id}/steps/",
+            json={"name": f"Шаг {order}", "order": order},
+            headers=headers,
+        )
+    response = await client.post("/workflow/workflow_instances/", json={"template_id": template_id}, headers=headers)
+    return response.json()["id"]
+
+
+async def _sync(client, headers, token=None, limit=500):
+    params = {"limit": limit}
+    if token:
+        params["since"] = token
+    response = await client.get("/workflow/changes", params=params, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+@requires_db
+async def test_only_changes_since_token_are_returned(client, auth_headers):
+    instance_id = await _instance(client, auth_headers, "Отпуск")
+    first = await _sync(client, auth_headers)
+    assert [i["id"] for i in first["instances"]] == [instance_id]
+    assert "template" not in first["instances"][0]  # compact rows, not the nested graph
+
+    assert await _sync(client, auth_headers, first["next_token"]) == {
+        "instances": [], "history": [], "deleted": [], "next_token": first["next_token"], "has_more": False,
+    }
+
+    await client.post(f"/workflow/workflow_instances/{instance_id}/approve", json={"comment": "ок"}, headers=auth_headers)
+    delta = await _sync(client, auth_headers, first["next_token"])
+    assert [(i["id"], i["current_step_id"] != first["instances"][0]["current_step_id"]) for i in delta["instances"]] == [
+        (instance_id, True)
+    ]
+    assert [h["comment"] for h in delta["history"]] == ["ок"]
+    assert delta["instances"][0]["change_seq"] > first["instances"][0]["change_seq"]
+
+
+@requires_db
+async def test_deletions_arrive_as_tombstones(client, auth_headers, db_engine):
+    instance_id = await _instance(client, auth_headers, "Закупка")
+    token = (await _sync(client, auth_headers))["next_token"]
+
+    await client.post(f"/workflow/workflow_instances/{instance_id}/approve", json={"comment": "ок"}, headers=auth_headers)
+    history_id = (await _sync(client, auth_headers, token))["history"][0]["id"]
+
+    async with async_sessionmaker(bind=db_engine)() as db:
+        assert await delete_workflow_instance(db, instance_id)
+        assert not await delete_workflow_instance(db, instance_id)
+
+    delta = await _sync(client, auth_headers, token)
+    assert delta["instances"] == delta["history"] == []
+    assert sorted((d["entity"], d["id"]) for d in delta["deleted"]) == [("history", history_id), ("instance", instance_id)]
+
+
+@requires_db
+async def test_late_commit_is_not_skipped(client, auth_headers, db_engine):
+    slow_id = await _instance(client, auth_headers, "Долгая транзакция")
+    fast_id = await _instance(client, auth_headers, "Быстрая транзакция")
+    token = (await _sync(client, auth_headers))["next_token"]
+
+    async with db_engine.connect() as slow:
+        # Starts first (lower xid) but commits after a newer transaction
+        # A bulk update() outside the ORM session still bumps change_seq through the column's onupdate
+        await slow.execute(update(WorkflowInstance).where(WorkflowInstance.id == slow_id).values(status="on_hold"))
+        await client.post(f"/workflow/workflow_instances/{fast_id}/approve", json={}, headers=auth_headers)
+
+        # The newer change is held back: handing it out would move the token past the open transaction
+        held = await _sync(client, auth_headers, token)
+        assert held["instances"] == [] and held["next_token"] == token
+        await slow.commit()
+
+    delta = await _sync(client, auth_headers, token)
+    assert {i["id"] for i in delta["instances"]} == {slow_id, fast_id}
+
+
+@requires_db
+async def test_paging_visits_every_change_once(client, auth_headers):
+    for name in ("A", "B", "C"):
+        await _instance(client, auth_headers, name)
+
+    seen, token, has_more = [], None, True
+    while has_more:
+        page = await _sync(client, auth_headers, token, limit=1)
+        seen += [("instance", i["id"]) for i in page["instances"]] + [("history", h["id"]) for h in page["history"]]
+        token, has_more = page["next_token"], page["has_more"]
+
+    assert len(seen) == len(set(seen)) == 3
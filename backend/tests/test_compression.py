@@ -0,0 +1,118 @@
+import asyncio
+import json
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+from app.core import compression
+from app.core.compression import CompressionMiddleware, GzipCodec, negotiate
+
+
+ITEMS = [{"id": i, "name": f"Согласование договора {i}"} for i in range(200)]
+
+
+async def _stream(request):
+    async def lines():
+        for item in ITEMS:
+            yield json.dumps(item) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+def _app(**kwargs):
+    app = Starlette(routes=[
+        Route("/list", lambda request: JSONResponse(ITEMS, headers={"ETag": '"v1"'})),
+        Route("/cached", lambda request: Response(status_code=304, headers={"ETag": '"v1"'})),
+        Route("/small", lambda request: JSONResponse({"status": "ok"})),
+        Route("/scan.pdf", lambda request: Response(b"%PDF" * 1000, media_type="application/pdf")),
+        Route("/encoded", lambda request: Response(
+            b"x" * 5000, media_type="text/plain", headers={"Content-Encoding": "identity"}
+        )),
+        Route("/stream", _stream),
+    ])
+    return CompressionMiddleware(app, codecs=[GzipCodec(6)], **kwargs)
+
+
+async def _get(app, path, accept_encoding="gzip"):
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        return await client.get(path, headers={"Accept-Encoding": accept_encoding})
+
+
+def test_negotiation_honours_q_values():
+    class Codec:
+        def __init__(self, name):
+            self.name = name
+
+    zstd, br, gzip = Codec("zstd"), Codec("br"), Codec("gzip")
+    codecs = [zstd, br, gzip]
+    assert negotiate("gzip, br", codecs) is br
+    assert negotiate("gzip;q=1.0, br;q=0.5", codecs) is gzip
+    assert negotiate("*;q=0.1, zstd;q=0", codecs) is br
+    assert negotiate("deflate", codecs) is None
+    assert negotiate("", codecs) is None
+
+
+@pytest.mark.asyncio
+async def test_large_json_is_compressed():
+    response = await _get(_app(), "/list")
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert int(response.headers["content-length"]) == response.num_bytes_downloaded
+    assert response.num_bytes_downloaded < len(json.dumps(ITEMS, ensure_ascii=False).encode()) / 4
+    assert response.json() == ITEMS
+
+
+@pytest.mark.asyncio
+async def test_compressed_responses_get_weak_etags_and_vary():
+    response = await _get(_app(), "/list")
+    assert response.headers["etag"] == 'W/"v1"'
+
+    response = await _get(_app(), "/list", accept_encoding="identity")
+    assert "content-encoding" not in response.headers
+    assert response.headers["etag"] == '"v1"'
+    assert response.headers["vary"] == "Accept-Encoding"
+
+    response = await _get(_app(), "/cached")
+    assert response.status_code == 304
+    assert response.headers["etag"] == 'W/"v1"'
+    assert response.headers["vary"] == "Accept-Encoding"
+
+
+@pytest.mark.asyncio
+async def test_small_and_incompressible_responses_pass_through():
+    response = await _get(_app(), "/small")
+    assert "content-encoding" not in response.headers
+    assert response.headers["vary"] == "Accept-Encoding"
+
+    response = await _get(_app(), "/scan.pdf")
+    assert "content-encoding" not in response.headers
+    assert response.content == b"%PDF" * 1000
+
+    response = await _get(_app(), "/encoded")
+    assert response.headers["content-encoding"] == "identity"
+
+
+@pytest.mark.asyncio
+async def test_streaming_response_is_compressed_incrementally():
+    response = await _get(_app(), "/stream")
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    assert [json.loads(line) for line in response.text.splitlines()] == ITEMS
+
+
+@pytest.mark.asyncio
+async def test_large_bodies_are_compressed_off_the_event_loop(monkeypatch):
+    offloaded = []
+    to_thread = asyncio.to_thread
+
+    async def spy(func, *args):
+        offloaded.append(len(args[0]))
+        return await to_thread(func, *args)
+
+    monkeypatch.setattr(compression.asyncio, "to_thread", spy)
+    await _get(_app(offload_size=10_000), "/list")
+    await _get(_app(offload_size=10_000), "/small")
+    assert len(offloaded) == 1 and offloaded[0] > 10_000
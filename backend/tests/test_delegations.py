@@ -0,0 +1,103 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import Response
+
+from app.api.endpoints import workflow as workflow_endpoints
+from app.core.events import user_topic
+from app.crud.permissions import DelegationGrant, PermissionSet
+from tests.conftest import requires_db
+
+
+PASSWORD = "Str0ngPa$$w0rd"
+
+
+async def _user(client):
+    email = f"{uuid.uuid4().hex[:12]}@example.com"
+    response = await client.post("/users/register", json={"email": email, "password": PASSWORD})
+    user_id = response.json()["id"]
+    response = await client.post("/auth/token", data={"username": email, "password": PASSWORD})
+    return user_id, {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def _instance(client, headers, approver_id):
+    response = await client.post(
+        "/workflow/workflow_templates/",
+        json={
+            "name": f"Счет {uuid.uuid4().hex[:6]}",
+            "steps": [{"name": "Оплата", "order": 0, "assignee_id": approver_id}],
+        },
+        headers=headers,
+    )
+    template_id = response.json()["id"]
+    response = await client.post("/workflow/workflow_instances/", json={"template_id": template_id}, headers=headers)
+    return template_id, response.json()["id"]
+
+
+@pytest.mark.asyncio
+@requires_db
+async def test_delegate_acts_for_absent_approver(client, monkeypatch):
+    approver_id, approver = await _user(client)
+    delegate_id, delegate = await _user(client)
+    _, outsider = await _user(client)
+    template_id, scoped_instance = await _instance(client, outsider, approver_id)
+    _, other_instance = await _instance(client, outsider, approver_id)
+    now = datetime.now(timezone.utc)
+
+    # The delegate's permission set is cached before the delegation exists
+    assert (await client.get("/workflow/inbox", headers=delegate)).json() == []
+    vacation = {
+        "delegate_id": delegate_id, "template_id": template_id,
+        "starts_at": (now - timedelta(hours=1)).isoformat(), "ends_at": (now + timedelta(days=1)).isoformat(),
+    }
+    response = await client.post("/delegations", json=vacation, headers=approver)
+    assert response.status_code == 201, response.text
+    delegation_id = response.json()["id"]
+    response = await client.post("/delegations", json=vacation, headers=approver)
+    assert response.status_code == 409
+    response = await client.post("/delegations", json={**vacation, "delegator_id": approver_id}, headers=outsider)
+    assert response.status_code == 403
+
+    # A delegation for all templates that starts tomorrow is not active yet
+    response = await client.post("/delegations", json={
+        "delegate_id": delegate_id, "starts_at": (now + timedelta(days=1)).isoformat(),
+    }, headers=approver)
+    assert response.status_code == 201, response.text
+
+    assert [i["id"] for i in (await client.get("/workflow/inbox", headers=delegate)).json()] == [scoped_instance]
+    response = await client.post(f"/workflow/workflow_instances/{other_instance}/approve", json={}, headers=delegate)
+    assert response.status_code == 403
+    response = await client.post(f"/workflow/workflow_instances/{scoped_instance}/approve", json={}, headers=delegate)
+    assert response.status_code == 200, response.text
+    assert response.json()["status"] == "approved"
+
+    topics = []
+    monkeypatch.setattr(
+        workflow_endpoints, "EventStreamResponse", lambda broker, subscribed, ping: topics.extend(subscribed) or Response()
+    )
+    await client.get("/workflow/events", headers=delegate)
+    assert topics == [user_topic(delegate_id), user_topic(approver_id)]
+
+    response = await client.get("/delegations", params={"active_at": now.isoformat()}, headers=delegate)
+    assert [d["id"] for d in response.json()] == [delegation_id]
+    response = await client.delete(f"/delegations/{delegation_id}", headers=delegate)
+    assert response.status_code == 403
+    response = await client.delete(f"/delegations/{delegation_id}", headers=approver)
+    assert response.status_code == 204
+    assert len((await client.get("/delegations", headers=approver)).json()) == 1
+
+
+def test_delegation_grants_apply_only_within_their_period():
+    delegator_id = uuid.uuid4()
+    start = datetime(2026, 7, 1, tzinfo=timezone.utc)
+    permissions = PermissionSet(
+        user_id=uuid.uuid4(),
+        role_ids=frozenset(),
+        delegations=(DelegationGrant(delegator_id, template_id=7, starts_at=start, ends_at=start + timedelta(days=14)),),
+    )
+    assert permissions.can_act(delegator_id, None, template_id=7, at=start)
+    assert not permissions.can_act(delegator_id, None, template_id=8, at=start)
+    assert not permissions.can_act(delegator_id, None, template_id=7, at=start + timedelta(days=14))
+    assert not permissions.can_act(delegator_id, None, template_id=7, at=start - timedelta(seconds=1))
+    assert permissions.active_delegations(at=start + timedelta(days=20)) == []
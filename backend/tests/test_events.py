@@ -0,0 +1,111 @@
+import asyncio
+import json
+
+import pytest
+
+from app.core.events import (
+    RESYNC_FRAME,
+    EventStreamResponse,
+    InProcessBroker,
+    RedisBroker,
+    encode_frame,
+    user_topic,
+)
+from app.core.services import services
+from tests.conftest import requires_db
+
+pytestmark = pytest.mark.asyncio
+
+
+def _payloads(frames):
+    return [json.loads(frame.decode().split("data: ", 1)[1]) for frame in frames]
+
+
+async def test_fan_out_and_overflow():
+    broker = InProcessBroker(max_pending=2)
+    both = broker.subscribe(["instance:1", "user:a"])
+    other = broker.subscribe(["instance:2"])
+
+    await broker.publish(["instance:1", "user:a"], encode_frame("instance", {"id": 1}))
+    assert _payloads(await both.wait()) == [{"id": 1}]  # delivered once despite two matching topics
+    assert not other._wakeup.is_set()
+
+    for i in range(5):
+        await broker.publish(["instance:2"], encode_frame("instance", {"id": i}))
+    # A subscriber that falls behind gets a single resync instead of an unbounded backlog
+    assert await other.wait() == [RESYNC_FRAME]
+
+    broker.unsubscribe(both)
+    broker.unsubscribe(other)
+    assert broker._by_topic == {}
+
+
+async def test_stream_sends_events_and_ends_on_disconnect():
+    broker = InProcessBroker()
+    disconnected = asyncio.Event()
+    sent = []
+
+    async def receive():
+        await disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    response = EventStreamResponse(broker, ["user:a"], ping_interval=0.05)
+    stream = asyncio.create_task(response({"type": "http"}, receive, send))
+    await asyncio.sleep(0.01)
+    await broker.publish(["user:a"], encode_frame("instance", {"id": 7}))
+    await asyncio.sleep(0.1)
+    disconnected.set()
+    await asyncio.wait_for(stream, 1)
+
+    headers = dict(sent[0]["headers"])
+    assert headers[b"content-type"].startswith(b"text/event-stream")
+    assert b"content-length" not in headers
+    body = b"".join(m.get("body", b"") for m in sent[1:])
+    assert body.startswith(b"retry: ")
+    assert b'event: instance\ndata: {"id":7}\n\n' in body
+    assert b": ping\n\n" in body
+    assert broker._by_topic == {}
+
+
+async def test_redis_broker_delivers_across_processes():
+    fakeredis = pytest.importorskip("fakeredis")
+    server = fakeredis.FakeServer()
+    worker_a = RedisBroker(fakeredis.FakeAsyncRedis(server=server))
+    worker_b = RedisBroker(fakeredis.FakeAsyncRedis(server=server))
+    subscription = worker_b.subscribe(["user:a"])
+    await asyncio.sleep(0.05)  # let the listener subscribe
+
+    await worker_a.publish(["user:a"], encode_frame("instance", {"id": 3}))
+    frames = await asyncio.wait_for(subscription.wait(), 1)
+    assert _payloads(frames) == [{"id": 3}]
+
+    await worker_a.close()
+    await worker_b.close()
+
+
+@requires_db
+async def test_approve_notifies_author(client, auth_headers):
+    broker = InProcessBroker()
+    services.override("event_broker", broker)
+    user_id = (await client.get("/auth/me", headers=auth_headers)).json()["id"]
+    subscription = broker.subscribe([user_topic(user_id)])
+
+    response = await client.post(
+        "/workflow/workflow_templates/", json={"name": "Отпуск", "description": ""}, headers=auth_headers
+    )
+    template_id = response.json()["id"]
+    await client.post(
+        f"/workflow/workflow_templates/{template_id}/steps/", json={"name": "Шаг", "order": 0}, headers=auth_headers
+    )
+    response = await client.post("/workflow/workflow_instances/", json={"template_id": template_id}, headers=auth_headers)
+    instance_id = response.json()["id"]
+    await client.post(f"/workflow/workflow_instances/{instance_id}/approve", json={}, headers=auth_headers)
+
+    events = _payloads(await subscription.wait())
+    assert [(e["id"], e["action"], e["status"]) for e in events] == [
+        (instance_id, "create", "in_progress"),
+        (instance_id, "approve", "approved"),
+    ]
@@ -0,0 +1,14 @@
+import os
+
+from app.core.minio_client import MinioClient
+
+
+def test_minio_client_is_recreated_after_fork(monkeypatch):
+    storage = MinioClient()
+    first = storage.client
+    assert storage.client is first
+
+    # A gunicorn worker sees the same object under a different pid
+    parent_pid = os.getpid()
+    monkeypatch.setattr(os, "getpid", lambda: parent_pid + 1)
+    assert storage.client is not first
@@ -0,0 +1,65 @@
+import asyncio
+import time
+
+import pytest
+from httpx import AsyncClient, ASGITransport
+
+import app.main as main_module
+from app.core.services import ServiceRegistry
+from app.main import app
+
+pytestmark = pytest.mark.asyncio
+
+
+async def _ok():
+    await asyncio.sleep(0.2)
+
+
+async def _hangs():
+    await asyncio.sleep(60)
+
+
+async def _fails():
+    raise ConnectionError("connection refused")
+
+
+async def test_checks_run_concurrently_and_time_out():
+    registry = ServiceRegistry()
+    registry.register("a", check=_ok)
+    registry.register("b", check=_ok)
+    registry.register("slow", check=_hangs)
+
+    started = time.perf_counter()
+    statuses = {s.name: s for s in await registry.check_all(timeout=0.5)}
+    assert time.perf_counter() - started < 1.0
+    assert statuses["a"].ok and statuses["b"].ok
+    assert not statuses["slow"].ok and "timed out" in statuses["slow"].error
+
+
+async def test_clients_are_built_on_first_use():
+    registry = ServiceRegistry()
+    built = []
+    registry.register("cache", factory=lambda: built.append(1) or object())
+    assert built == []
+    assert registry.get("cache") is registry.get("cache")
+    assert built == [1]
+
+
+async def test_liveness_does_not_depend_on_readiness(monkeypatch):
+    registry = ServiceRegistry()
+    registry.register("database", check=_fails)
+    registry.register("search_cache", check=_fails, required=False)
+    monkeypatch.setattr(main_module, "services", registry)
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        assert (await ac.get("/health/live")).status_code == 200
+        response = await ac.get("/health/ready")
+    assert response.status_code == 503
+    assert response.json()["checks"]["database"]["error"] == "ConnectionError: connection refused"
+
+    registry.register("database", check=_ok)
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        response = await ac.get("/health/ready")
+    # An optional dependency being down does not take the instance out of rotation
+    assert response.status_code == 200
+    assert response.json()["checks"]["search_cache"]["ok"] is False
@@ -0,0 +1,14 @@
+from app.core.http_cache import etag_matches
+
+
+def test_if_none_match_uses_weak_comparison_over_lists():
+    assert etag_matches('"abc"', '"abc"')
+    assert etag_matches('W/"abc"', '"abc"')
+    assert etag_matches('"abc"', 'W/"abc"')
+    assert etag_matches('"old", W/"abc"', '"abc"')
+    assert etag_matches("*", '"abc"')
+    assert etag_matches('"a,b"', '"a,b"')
+    assert not etag_matches('"a,b"', '"a"')
+    assert not etag_matches('"abcd"', '"abc"')
+    assert not etag_matches("", '"abc"')
+    assert not etag_matches(None, '"abc"')
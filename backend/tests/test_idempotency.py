@@ -0,0 +1,135 @@
+import asyncio
+
+import pytest
+from sqlalchemy import func, select
+
+from app.core.idempotency import IdempotencyMiddleware, RedisIdempotencyStore, StoredResponse
+from app.main import app
+from app.models.workflow import Attachment, WorkflowHistory, WorkflowInstance
+from tests.conftest import requires_db
+
+pytestmark = pytest.mark.asyncio
+
+
+async def _template(client, headers, steps=2) -> int:
+    response = await client.post(
+        "/workflow/workflow_templates/", json={"name": "Командировка", "description": "Согласование"}, headers=headers
+    )
+    template_id = response.json()["id"]
+    for order in range(steps):
+        await client.post(
+            f"/workflow/workflow_templates/{template_id}/steps/",
+            json={"name": f"Шаг {order}", "order": order},
+            headers=headers,
+        )
+    return template_id
+
+
+async def _count(db_engine, model) -> int:
+    async with db_engine.connect() as conn:
+        return (await conn.execute(select(func.count()).select_from(model))).scalar_one()
+
+
+@requires_db
+async def test_retry_replays_stored_response(client, auth_headers, db_engine):
+    template_id = await _template(client, auth_headers)
+    headers = {**auth_headers, "Idempotency-Key": "create-1"}
+
+    first = await client.post("/workflow/workflow_instances/", json={"template_id": template_id}, headers=headers)
+    retry = await client.post("/workflow/workflow_instances/", json={"template_id": template_id}, headers=headers)
+
+    assert first.status_code == retry.status_code == 201
+    assert retry.json() == first.json()
+    assert retry.headers["idempotent-replayed"] == "true"
+    assert "idempotent-replayed" not in first.headers
+    assert await _count(db_engine, WorkflowInstance) == 1
+
+
+@requires_db
+async def test_concurrent_duplicates_execute_once(client, auth_headers, db_engine):
+    template_id = await _template(client, auth_headers)
+    response = await client.post("/workflow/workflow_instances/", json={"template_id": template_id}, headers=auth_headers)
+    instance_id = response.json()["id"]
+
+    headers = {**auth_headers, "Idempotency-Key": "approve-1"}
+    responses = await asyncio.gather(*(
+        client.post(f"/workflow/workflow_instances/{instance_id}/approve", json={"comment": "ок"}, headers=headers)
+        for _ in range(3)
+    ))
+
+    assert [r.status_code for r in responses] == [200, 200, 200]
+    assert len({r.text for r in responses}) == 1
+    assert await _count(db_engine, WorkflowHistory) == 1
+
+
+@requires_db
+async def test_key_reuse_with_different_payload_is_rejected(client, auth_headers):
+    template_id = await _template(client, auth_headers)
+    headers = {**auth_headers, "Idempotency-Key": "create-2"}
+    await client.post("/workflow/workflow_instances/", json={"template_id": template_id}, headers=headers)
+
+    response = await client.post("/workflow/workflow_instances/", json={"template_id": template_id + 1}, headers=headers)
+    assert response.status_code == 422
+
+
+@requires_db
+async def test_large_bodies_are_not_buffered(client, auth_headers, monkeypatch):
+    middleware = next(m for m in app.user_middleware if m.cls is IdempotencyMiddleware)
+    monkeypatch.setitem(middleware.kwargs, "max_body_bytes", 64)
+    app.middleware_stack = app.build_middleware_stack()
+    try:
+        headers = {**auth_headers, "Idempotency-Key": "big-1"}
+        response = await client.post("/workflow/workflow_templates/", json={"name": "x" * 100}, headers=headers)
+        assert response.status_code == 413
+    finally:
+        app.middleware_stack = None
+
+
+@requires_db
+async def test_keyed_uploads_are_replayed_without_buffering(client, auth_headers, db_engine):
+    # Files are not buffered, yet the key still holds: the body is hashed as it streams.
+    # A retry resends the same bytes, multipart boundary included
+    headers = {**auth_headers, "Idempotency-Key": "upload-1", "Content-Type": "multipart/form-data; boundary=b1"}
+    upload = {"file": ("a.txt", b"a" * 100, "text/plain")}
+    responses = [
+        await client.post("/workflow/attachments/upload", files=upload, headers=headers) for _ in range(2)
+    ]
+    assert [r.status_code for r in responses] == [200, 200]
+    assert responses[1].headers["idempotent-replayed"] == "true"
+    assert responses[0].json()["id"] == responses[1].json()["id"]
+    assert await _count(db_engine, Attachment) == 1
+
+    response = await client.post(
+        "/workflow/attachments/upload", files={"file": ("a.txt", b"b" * 100, "text/plain")}, headers=headers
+    )
+    assert response.status_code == 422
+    assert await _count(db_engine, Attachment) == 1
+
+
+async def test_claim_gives_up_on_a_key_that_keeps_vanishing():
+    class VanishingRedis:
+        async def set(self, *args, **kwargs):
+            return False
+
+        async def get(self, name):
+            return None
+
+    record = await RedisIdempotencyStore(VanishingRedis()).claim("user", "k", "hash", lock_seconds=5, ttl_seconds=60)
+    assert record.request_hash == "hash" and record.response is None
+
+
+async def test_redis_store_round_trip():
+    fakeredis = pytest.importorskip("fakeredis")
+    store = RedisIdempotencyStore(fakeredis.FakeAsyncRedis())
+
+    assert await store.claim("user", "k", "hash", lock_seconds=5, ttl_seconds=60) is None
+    pending = await store.claim("user", "k", "hash", lock_seconds=5, ttl_seconds=60)
+    assert pending.request_hash == "hash" and pending.response is None
+
+    await store.complete("user", "k", StoredResponse(201, [("content-type", "application/json")], b"{}"), 60)
+    record = await store.claim("user", "k", "hash", lock_seconds=5, ttl_seconds=60)
+    assert record.response == StoredResponse(201, [("content-type", "application/json")], b"{}")
+
+    # A failed request frees the key for the next retry
+    await store.release("user", "k")
+    assert await store.claim("user", "k", "hash", lock_seconds=5, ttl_seconds=60) is None
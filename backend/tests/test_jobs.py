@@ -0,0 +1,217 @@
+import asyncio
+import uuid
+
+import pytest
+from pydantic import BaseModel
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.core.jobs import JobRegistry, JobWorker
+from app.crud import job_handlers
+from app.db.routing import SessionRouter
+from app.db.sharding import DEFAULT_SHARD, Shard
+from app.models.job import Job
+from app.models.user import User
+from tests.conftest import requires_db
+
+pytestmark = pytest.mark.asyncio
+
+
+class NoParams(BaseModel):
+    pass
+
+
+def _shard(db_engine) -> Shard:
+    factory = async_sessionmaker(bind=db_engine, expire_on_commit=False)
+    return Shard(DEFAULT_SHARD, factory, SessionRouter(primary=factory), "bucket")
+
+
+async def _drain(worker: JobWorker) -> None:
+    await asyncio.gather(*(task for task, _ in list(worker._running.values())))
+
+
+async def _enqueue(shard: Shard, job_type: str, count: int = 1):
+    async with shard.session_factory() as db:
+        user = User(email=f"{uuid.uuid4().hex[:12]}@example.com", hashed_password="x")
+        db.add(user)
+        await db.flush()
+        jobs = [Job(type=job_type, status="queued", params={}, created_by_id=user.id) for _ in range(count)]
+        db.add_all(jobs)
+        await db.commit()
+    return [job.id for job in jobs]
+
+
+async def _job(shard: Shard, job_id) -> Job:
+    async with shard.session_factory() as db:
+        return await db.scalar(select(Job).where(Job.id == job_id))
+
+
+@requires_db
+async def test_bulk_launch_runs_in_background(client, auth_headers, db_engine):
+    response = await client.post(
+        "/workflow/workflow_templates/",
+        json={"name": "Отпуск", "steps": [{"name": "Руководитель", "order": 0}]},
+        headers=auth_headers,
+    )
+    template_id = response.json()["id"]
+    instances = [{"template_id": template_id}] * 3 + [{"template_id": template_id + 100}]
+
+    response = await client.post(
+        "/jobs", json={"type": "bulk_launch", "params": {"instances": instances}}, headers=auth_headers
+    )
+    assert response.status_code == 202, response.text
+    assert response.json()["status"] == "queued"
+    location = response.headers["location"]
+
+    worker = JobWorker(_shard(db_engine))
+    assert await worker.run_once() == 1
+    await _drain(worker)
+
+    job = (await client.get(location, headers=auth_headers)).json()
+    assert (job["status"], job["processed"], job["total"], job["attempts"]) == ("succeeded", 4, 4, 1)
+    assert len(job["result"]["instance_ids"]) == 3
+    assert job["result"]["errors"] == [{"index": 3, "detail": "Шаблон рабочего процесса не найден."}]
+    response = await client.get("/jobs", params={"status": "succeeded"}, headers=auth_headers)
+    assert [j["id"] for j in response.json()] == [job["id"]]
+
+    response = await client.post(f"{location}/cancel", headers=auth_headers)
+    assert response.status_code == 409
+
+
+@requires_db
+async def test_bulk_launch_resume_does_not_repeat_launches(client, auth_headers, db_engine, monkeypatch):
+    response = await client.post(
+        "/workflow/workflow_templates/",
+        json={"name": "Отпуск", "steps": [{"name": "Руководитель", "order": 0}]},
+        headers=auth_headers,
+    )
+    instances = [{"template_id": response.json()["id"]}] * 3
+    response = await client.post(
+        "/jobs", json={"type": "bulk_launch", "params": {"instances": instances}}, headers=auth_headers
+    )
+    location = response.headers["location"]
+    published = []
+
+    async def steal_lease(instance, **kwargs):
+        # After the first launch another worker takes the job over
+        published.append(instance.id)
+        if len(published) == 1:
+            async with db_engine.begin() as conn:
+                await conn.execute(text(
+                    "UPDATE jobs SET locked_by = gen_random_uuid(), locked_until = now() - interval '1 second'"
+                ))
+
+    monkeypatch.setattr(job_handlers, "publish_instance_event", steal_lease)
+    first = JobWorker(_shard(db_engine))
+    await first.run_once()
+    await _drain(first)
+    second = JobWorker(_shard(db_engine))
+    assert await second.run_once() == 1
+    await _drain(second)
+
+    job = (await client.get(location, headers=auth_headers)).json()
+    assert (job["status"], job["attempts"]) == ("succeeded", 2)
+    assert sorted(job["result"]["instance_ids"]) == sorted(published)
+    async with db_engine.connect() as conn:
+        assert (await conn.execute(text("SELECT count(*) FROM workflow_instances"))).scalar_one() == 3
+
+
+@requires_db
+async def test_invalid_jobs_are_rejected(client, auth_headers):
+    response = await client.post("/jobs", json={"type": "reindex"}, headers=auth_headers)
+    assert response.status_code == 422
+    response = await client.post(
+        "/jobs", json={"type": "bulk_launch", "params": {"instances": []}}, headers=auth_headers
+    )
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["loc"] == ["instances"]
+
+
+@requires_db
+async def test_cancel_queued_and_running_jobs(client, auth_headers, db_engine):
+    response = await client.post("/jobs", json={"type": "template_export"}, headers=auth_headers)
+    response = await client.post(f"/jobs/{response.json()['id']}/cancel", headers=auth_headers)
+    assert response.json()["status"] == "cancelled"
+
+    registry = JobRegistry()
+    steps = []
+
+    @registry.register("endless", NoParams)
+    async def endless(context):
+        while True:
+            steps.append(context.processed)
+            await context.report(context.processed + 1)
+            await asyncio.sleep(0.01)
+
+    shard = _shard(db_engine)
+    [job_id] = await _enqueue(shard, "endless")
+    worker = JobWorker(shard, registry=registry)
+    await worker.run_once()
+    while len(steps) < 3:
+        await asyncio.sleep(0.01)
+    async with db_engine.begin() as conn:
+        await conn.execute(text("UPDATE jobs SET cancel_requested = true WHERE id = :id"), {"id": job_id})
+    await _drain(worker)
+
+    job = await _job(shard, job_id)
+    assert job.status == "cancelled"
+    assert job.processed >= 3 and job.locked_by is None
+
+
+@requires_db
+async def test_type_concurrency_is_shared_by_workers(db_engine):
+    registry = JobRegistry()
+    release = asyncio.Event()
+
+    @registry.register("export", NoParams, max_concurrency=2)
+    async def export(context):
+        await release.wait()
+        return {"ok": True}
+
+    shard = _shard(db_engine)
+    await _enqueue(shard, "export", count=4)
+    workers = [JobWorker(shard, registry=registry, concurrency=5) for _ in range(3)]
+    assert sum([await worker.run_once() for worker in workers]) == 2
+
+    release.set()
+    for worker in workers:
+        await _drain(worker)
+    assert sum([await worker.run_once() for worker in workers]) == 2
+
+
+@requires_db
+async def test_expired_lease_resumes_from_checkpoint(db_engine):
+    registry = JobRegistry()
+    started_from = []
+    crash = asyncio.Event()
+
+    @registry.register("count", NoParams)
+    async def count(context):
+        position = (context.checkpoint or {}).get("next", 0)
+        started_from.append(position)
+        for i in range(position, 10):
+            await context.report(i + 1, 10, checkpoint={"next": i + 1} if (i + 1) % 5 == 0 else None)
+            if i == 6 and len(started_from) == 1:
+                await crash.wait()  # The first worker hangs without renewing its lease
+        return {"counted": 10}
+
+    shard = _shard(db_engine)
+    [job_id] = await _enqueue(shard, "count")
+    first = JobWorker(shard, registry=registry)
+    await first.run_once()
+    while (await _job(shard, job_id)).processed < 7:
+        await asyncio.sleep(0.01)
+    async with db_engine.begin() as conn:
+        await conn.execute(text("UPDATE jobs SET locked_until = now() - interval '1 second' WHERE id = :id"),
+                           {"id": job_id})
+
+    second = JobWorker(shard, registry=registry)
+    assert await second.run_once() == 1
+    await _drain(second)
+    # The stale worker wakes up, loses the lease and does not overwrite the result
+    crash.set()
+    await _drain(first)
+
+    job = await _job(shard, job_id)
+    assert started_from == [0, 5]
+    assert (job.status, job.result, job.attempts) == ("succeeded", {"counted": 10}, 2)
@@ -0,0 +1,21 @@
+import pytest
+from httpx import AsyncClient, ASGITransport
+
+from app.main import app
+
+
+@pytest.mark.asyncio
+async def test_metrics_labels_requests_by_route_template():
+    """
+    Request latency is recorded per route template, not per concrete URL.
+    """
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        await ac.get("/")
+        await ac.get("/no-such-page")
+        response = await ac.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    assert 'http_request_duration_seconds_count{method="GET",route="/",status="200"}' in body
+    assert 'route="unmatched",status="404"' in body
+    assert "db_pool_checkout_wait_seconds" in body
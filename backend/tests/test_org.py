@@ -0,0 +1,110 @@
+import uuid
+
+import pytest
+from sqlalchemy import text
+
+from app.core.config import settings
+from tests.conftest import requires_db
+
+pytestmark = pytest.mark.asyncio
+
+PASSWORD = "Str0ngPa$$w0rd"
+
+
+async def _user(client):
+    email = f"{uuid.uuid4().hex[:12]}@example.com"
+    response = await client.post("/users/register", json={"email": email, "password": PASSWORD})
+    user_id = response.json()["id"]
+    response = await client.post("/auth/token", data={"username": email, "password": PASSWORD})
+    return user_id, {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def _admin(client, db_engine):
+    admin_id, admin = await _user(client)
+    async with db_engine.begin() as conn:
+        await conn.execute(text("UPDATE users SET is_superuser = true WHERE id = :id"), {"id": admin_id})
+    return admin_id, admin
+
+
+async def _closure(db_engine):
+    async with db_engine.connect() as conn:
+        result = await conn.execute(text("SELECT ancestor_id, descendant_id, depth FROM org_closure"))
+        return sorted((str(a), str(d), depth) for a, d, depth in result)
+
+
+@requires_db
+async def test_manager_steps_follow_the_org_chart(client, db_engine):
+    ceo_id, admin = await _admin(client, db_engine)
+    head_id, _ = await _user(client)
+    lead_id, lead = await _user(client)
+    employee_id, employee = await _user(client)
+    for user_id, manager_id in ((head_id, ceo_id), (lead_id, head_id), (employee_id, lead_id)):
+        response = await client.put(f"/org/users/{user_id}/manager", json={"manager_id": manager_id}, headers=admin)
+        assert response.status_code == 200, response.text
+    assert response.json()["manager_ids"] == [lead_id, head_id, ceo_id]
+
+    response = await client.get(f"/org/users/{ceo_id}/subordinates", headers=employee)
+    assert response.json() == [
+        {"user_id": head_id, "depth": 1}, {"user_id": lead_id, "depth": 2}, {"user_id": employee_id, "depth": 3},
+    ]
+    response = await client.put(f"/org/users/{ceo_id}/manager", json={"manager_id": lead_id}, headers=admin)
+    assert response.status_code == 422
+    response = await client.put(f"/org/users/{lead_id}/manager", json={"manager_id": None}, headers=employee)
+    assert response.status_code == 403
+
+    response = await client.post(
+        "/workflow/workflow_templates/",
+        json={"name": "Командировка", "steps": [
+            {"name": "Руководитель", "order": 0, "assignee_manager_level": 1},
+            {"name": "Директор департамента", "order": 1, "assignee_manager_level": 2},
+        ]},
+        headers=employee,
+    )
+    template_id = response.json()["id"]
+    response = await client.post("/workflow/workflow_instances/", json={"template_id": template_id}, headers=employee)
+    instance = response.json()
+    assert instance["assignee_id"] == lead_id
+
+    # Reorganization moves the lead's whole team directly under the CEO
+    response = await client.put(f"/org/users/{lead_id}/manager", json={"manager_id": ceo_id}, headers=admin)
+    assert response.json()["manager_ids"] == [ceo_id]
+    response = await client.get(f"/org/users/{employee_id}/managers", headers=employee)
+    assert response.json()["manager_ids"] == [lead_id, ceo_id]
+
+    response = await client.post(f"/workflow/workflow_instances/{instance['id']}/approve", json={}, headers=lead)
+    assert response.status_code == 200, response.text
+    assert response.json()["assignee_id"] == ceo_id
+
+    # The CEO has no manager, so a manager step cannot be started by them
+    response = await client.post("/workflow/workflow_instances/", json={"template_id": template_id}, headers=admin)
+    assert response.status_code == 422
+
+
+@requires_db
+async def test_bulk_reorganization_matches_incremental_moves(client, db_engine, monkeypatch):
+    _, admin = await _admin(client, db_engine)
+    users = [(await _user(client))[0] for _ in range(6)]
+    # A chain 0 <- 1 <- 2 <- 3, a separate pair 4 <- 5, then 3's branch moves under 5 and 4 joins 0
+    first = [{"user_id": users[i], "manager_id": users[i - 1]} for i in (1, 2, 3)]
+    first.append({"user_id": users[5], "manager_id": users[4]})
+    second = [{"user_id": users[2], "manager_id": users[5]}, {"user_id": users[4], "manager_id": users[0]}]
+
+    for moves in (first, second):
+        response = await client.post("/org/reorganize", json={"moves": moves}, headers=admin)
+        assert response.json() == {"moved": len(moves)}
+    incremental = await _closure(db_engine)
+    assert (users[0], users[3], 4) in incremental
+
+    monkeypatch.setattr(settings, "ORG_REBUILD_THRESHOLD", 1)
+    async with db_engine.begin() as conn:
+        await conn.execute(text("DELETE FROM org_closure"))
+        await conn.execute(text("UPDATE users SET manager_id = NULL"))
+    for moves in (first, second):
+        response = await client.post("/org/reorganize", json={"moves": moves}, headers=admin)
+        assert response.json() == {"moved": len(moves)}
+    assert await _closure(db_engine) == incremental
+
+    cycle = [{"user_id": users[0], "manager_id": users[3]}]
+    response = await client.post("/org/reorganize", json={"moves": cycle}, headers=admin)
+    assert response.status_code == 422
+    assert await _closure(db_engine) == incremental
@@ -0,0 +1,90 @@
+import io
+
+import pytest
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.core.preview_render import PreviewUnsupported, render_previews
+from app.core.previews import PreviewPipeline
+from app.core.services import services
+from tests.conftest import requires_db
+
+pytestmark = pytest.mark.asyncio
+
+
+@pytest.fixture
+def renders(db_engine, storage):
+    """Replaces the process pool with an in-loop renderer that records its calls."""
+    calls = []
+
+    async def render(content: bytes, content_type: str):
+        calls.append(content)
+        if content == b"broken":
+            raise PreviewUnsupported("not an image")
+        return {"preview": b"P:" + content, "thumbnail": b"T:" + content}
+
+    pipeline = PreviewPipeline(async_sessionmaker(bind=db_engine, expire_on_commit=False), storage, render=render)
+    services.override("preview_pipeline", pipeline)
+    return pipeline, calls
+
+
+async def _upload(client, headers, content: bytes, content_type="image/png"):
+    response = await client.post(
+        "/workflow/attachments/upload", files={"file": ("scan.png", content, content_type)}, headers=headers
+    )
+    assert response.status_code == 200
+    return response.json()
+
+
+@requires_db
+async def test_identical_files_are_rendered_once(client, auth_headers, renders):
+    pipeline, calls = renders
+    first = await _upload(client, auth_headers, b"png-1")
+    assert first["preview_status"] == "pending"  # the upload does not wait for rendering
+    await pipeline.drain()
+    second = await _upload(client, auth_headers, b"png-1")
+    await _upload(client, auth_headers, b"png-2")
+    await pipeline.drain()
+    assert calls == [b"png-1", b"png-2"]
+
+    for attachment in (first, second):
+        response = await client.get(
+            f"/workflow/attachments/{attachment['id']}/preview", params={"kind": "thumbnail"}, headers=auth_headers
+        )
+        assert response.status_code == 200
+        assert response.content == b"T:png-1"
+        assert response.headers["content-type"] == "image/jpeg"
+        assert "immutable" in response.headers["cache-control"]
+
+    response = await client.get(
+        f"/workflow/attachments/{first['id']}/preview",
+        params={"kind": "preview"},
+        headers={**auth_headers, "If-None-Match": response.headers["etag"].replace("thumbnail", "preview")},
+    )
+    assert response.status_code == 304
+
+
+@requires_db
+async def test_files_without_preview(client, auth_headers, renders):
+    pipeline, calls = renders
+    text = await _upload(client, auth_headers, b"hello", content_type="text/plain")
+    broken = await _upload(client, auth_headers, b"broken")
+    await pipeline.drain()
+
+    assert text["preview_status"] == "unsupported"
+    assert calls == [b"broken"]  # unsupported types are not even downloaded
+    for attachment in (text, broken):
+        response = await client.get(f"/workflow/attachments/{attachment['id']}/preview", headers=auth_headers)
+        assert response.status_code == 404
+
+
+async def test_render_previews_fits_sizes():
+    Image = pytest.importorskip("PIL.Image")
+    source = io.BytesIO()
+    Image.new("RGBA", (2000, 1000), (255, 0, 0, 128)).save(source, format="PNG")
+
+    renders = render_previews(source.getvalue(), "image/png", {"preview": (1024, 1024), "thumbnail": (256, 256)})
+    sizes = {kind: Image.open(io.BytesIO(data)).size for kind, data in renders.items()}
+    assert sizes == {"preview": (1024, 512), "thumbnail": (256, 128)}
+
+    with pytest.raises(PreviewUnsupported):
+        render_previews(b"plain text", "text/plain", {"thumbnail": (256, 256)})
@@ -0,0 +1,154 @@
+import pytest
+
+from tests.conftest import assert_query_budget, requires_db
+
+pytestmark = [pytest.mark.asyncio, requires_db]
+
+# Baseline budgets: the number of SQL statements each endpoint issues today.
+# Lower a budget when an endpoint gets cheaper; raising one needs a reason.
+QUERY_BUDGETS = {
+    "register": 3,
+    "login": 1,
+    "me": 1,
+    "create_template": 6,
+    "create_template_with_steps": 8,  # independent of the number of steps
+    "get_template": 3,
+    "list_templates": 3,
+    "add_step": 6,
+    "publish": 9,
+    "get_step": 2,
+    "upload_attachment": 5,
+    "download_attachment": 2,
+    "create_instance": 14,  # attachments are linked with one UPDATE
+    "get_instance": 9,
+    "approve": 16,  # steps of the pinned version come from the in-process cache
+    "reject": 16,
+    "search": 2,
+}
+
+
+async def _create_template(client, headers, name="Договор поставки", steps=2):
+    response = await client.post(
+        "/workflow/workflow_templates/", json={"name": name, "description": "Согласование"}, headers=headers
+    )
+    assert response.status_code == 201
+    template_id = response.json()["id"]
+    for order in range(steps):
+        response = await client.post(
+            f"/workflow/workflow_templates/{template_id}/steps/",
+            json={"name": f"Шаг {order}", "order": order},
+            headers=headers,
+        )
+        assert response.status_code == 201
+    return template_id
+
+
+async def test_auth_endpoints_budget(client):
+    response = await client.post("/users/register", json={"email": "budget@example.com", "password": "Str0ngPa$$w0rd"})
+    assert response.status_code == 201
+    assert_query_budget(response, QUERY_BUDGETS["register"])
+
+    response = await client.post("/auth/token", data={"username": "budget@example.com", "password": "Str0ngPa$$w0rd"})
+    assert response.status_code == 200
+    assert_query_budget(response, QUERY_BUDGETS["login"])
+
+    response = await client.get("/auth/me", headers={"Authorization": f"Bearer {response.json()['access_token']}"})
+    assert response.status_code == 200
+    assert_query_budget(response, QUERY_BUDGETS["me"])
+
+
+async def test_template_endpoints_budget(client, auth_headers):
+    response = await client.post(
+        "/workflow/workflow_templates/", json={"name": "Командировка"}, headers=auth_headers
+    )
+    assert response.status_code == 201
+    assert_query_budget(response, QUERY_BUDGETS["create_template"])
+    template_id = response.json()["id"]
+
+    response = await client.post(
+        f"/workflow/workflow_templates/{template_id}/steps/",
+        json={"name": "Руководитель", "order": 0},
+        headers=auth_headers,
+    )
+    assert response.status_code == 201
+    assert_query_budget(response, QUERY_BUDGETS["add_step"])
+    step_id = response.json()["id"]
+
+    response = await client.get(f"/workflow/workflow_steps/{step_id}", headers=auth_headers)
+    assert response.status_code == 200
+    assert_query_budget(response, QUERY_BUDGETS["get_step"])
+
+    response = await client.get(f"/workflow/workflow_templates/{template_id}", headers=auth_headers)
+    assert response.status_code == 200
+    assert_query_budget(response, QUERY_BUDGETS["get_template"])
+
+    response = await client.post(
+        "/workflow/workflow_templates/",
+        json={"name": "Закупка", "steps": [{"name": f"Шаг {order}", "order": order} for order in range(15)]},
+        headers=auth_headers,
+    )
+    assert response.status_code == 201
+    assert len(response.json()["steps"]) == 15
+    assert_query_budget(response, QUERY_BUDGETS["create_template_with_steps"])
+
+    for i in range(4):
+        await _create_template(client, auth_headers, name=f"Шаблон {i}", steps=2)
+    # The list must not grow with the number of templates (no N+1 on steps).
+    response = await client.get("/workflow/workflow_templates/", headers=auth_headers)
+    assert response.status_code == 200
+    assert len(response.json()) == 6
+    assert_query_budget(response, QUERY_BUDGETS["list_templates"])
+
+
+async def test_instance_endpoints_budget(client, auth_headers):
+    template_id = await _create_template(client, auth_headers)
+    response = await client.post(f"/workflow/workflow_templates/{template_id}/publish", headers=auth_headers)
+    assert response.status_code == 201
+    assert_query_budget(response, QUERY_BUDGETS["publish"])
+
+    attachment_ids = []
+    for i in range(3):
+        response = await client.post(
+            "/workflow/attachments/upload",
+            files={"file": (f"договор-{i}.pdf", b"%PDF-1.4", "application/pdf")},
+            headers=auth_headers,
+        )
+        assert response.status_code == 200
+        assert_query_budget(response, QUERY_BUDGETS["upload_attachment"])
+        attachment_ids.append(response.json()["id"])
+
+    response = await client.get(f"/workflow/attachments/{attachment_ids[0]}/download", headers=auth_headers)
+    assert response.status_code == 200
+    assert response.content == b"%PDF-1.4"
+    assert_query_budget(response, QUERY_BUDGETS["download_attachment"])
+
+    response = await client.post(
+        "/workflow/workflow_instances/",
+        json={"template_id": template_id, "attachment_ids": attachment_ids},
+        headers=auth_headers,
+    )
+    assert response.status_code == 201
+    assert_query_budget(response, QUERY_BUDGETS["create_instance"])
+    instance_id = response.json()["id"]
+
+    response = await client.get(f"/workflow/workflow_instances/{instance_id}", headers=auth_headers)
+    assert response.status_code == 200
+    assert_query_budget(response, QUERY_BUDGETS["get_instance"])
+
+    response = await client.post(
+        f"/workflow/workflow_instances/{instance_id}/approve", json={"comment": "ок"}, headers=auth_headers
+    )
+    assert response.status_code == 200
+    assert_query_budget(response, QUERY_BUDGETS["approve"])
+
+    response = await client.post(
+        f"/workflow/workflow_instances/{instance_id}/reject", json={"comment": "нет"}, headers=auth_headers
+    )
+    assert response.status_code == 200
+    assert response.json()["status"] == "rejected"
+    assert_query_budget(response, QUERY_BUDGETS["reject"])
+
+    response = await client.get("/workflow/search", params={"q": "договор"}, headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json()["items"]
+    assert_query_budget(response, QUERY_BUDGETS["search"])
@@ -0,0 +1,84 @@
+import time
+
+import pytest
+import pytest_asyncio
+from fastapi import FastAPI, HTTPException, Request
+from httpx import AsyncClient, ASGITransport
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.main import app
+from app.db.routing import STICKY_COOKIE, ReadYourWritesMiddleware, SessionRouter, wrote_recently
+from app.db.session import get_async_session, get_read_session
+
+pytestmark = pytest.mark.asyncio
+
+
+@pytest_asyncio.fixture
+async def routed_client(db_engine, replica_engine, storage):
+    primary = async_sessionmaker(bind=db_engine, expire_on_commit=False)
+    replica = async_sessionmaker(bind=replica_engine, expire_on_commit=False)
+    router = SessionRouter(primary=primary, replica=replica)
+
+    async def override_get_async_session():
+        async with primary() as session:
+            yield session
+
+    async def override_get_read_session(request: Request):
+        async with router.read_factory(request)() as session:
+            yield session
+
+    app.dependency_overrides[get_async_session] = override_get_async_session
+    app.dependency_overrides[get_read_session] = override_get_read_session
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        yield ac
+    app.dependency_overrides.clear()
+
+
+async def test_reads_stick_to_primary_after_write(routed_client):
+    email, password = "replica@example.com", "Str0ngPa$$w0rd"
+    await routed_client.post("/users/register", json={"email": email, "password": password})
+    response = await routed_client.post("/auth/token", data={"username": email, "password": password})
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    response = await routed_client.post(
+        "/workflow/workflow_templates/", json={"name": "Договор", "description": "Согласование"}, headers=headers
+    )
+    assert response.status_code == 201
+    assert STICKY_COOKIE in response.cookies
+    template_id = response.json()["id"]
+
+    # Within the stickiness window the client reads its own write from the primary
+    response = await routed_client.get(f"/workflow/workflow_templates/{template_id}", headers=headers)
+    assert response.status_code == 200
+
+    # Without the cookie the read goes to the replica, which never saw the row
+    routed_client.cookies.clear()
+    response = await routed_client.get(f"/workflow/workflow_templates/{template_id}", headers=headers)
+    assert response.status_code == 404
+
+
+async def test_cookie_only_after_successful_writes():
+    inner = FastAPI()
+
+    @inner.post("/ok")
+    async def ok():
+        return {}
+
+    @inner.post("/fail")
+    async def fail():
+        raise HTTPException(status_code=409)
+
+    @inner.get("/read")
+    async def read(request: Request):
+        return {"primary": wrote_recently(request)}
+
+    wrapped = ReadYourWritesMiddleware(inner, stickiness=5.0)
+    async with AsyncClient(transport=ASGITransport(app=wrapped), base_url="http://test") as ac:
+        assert (await ac.get("/read")).json() == {"primary": False}
+        assert STICKY_COOKIE not in (await ac.post("/fail")).cookies
+        response = await ac.post("/ok")
+        assert float(response.cookies[STICKY_COOKIE]) > time.time()
+        assert (await ac.get("/read")).json() == {"primary": True}
+
+        ac.cookies.set(STICKY_COOKIE, f"{time.time() - 1:.3f}")
+        assert (await ac.get("/read")).json() == {"primary": False}
@@ -0,0 +1,83 @@
+import uuid
+
+import pytest
+from sqlalchemy import text
+
+from app.crud.permissions import PermissionCache, PermissionSet
+from app.models.user import User
+from tests.conftest import requires_db
+
+
+PASSWORD = "Str0ngPa$$w0rd"
+
+
+async def _user(client):
+    email = f"{uuid.uuid4().hex[:12]}@example.com"
+    response = await client.post("/users/register", json={"email": email, "password": PASSWORD})
+    user_id = response.json()["id"]
+    response = await client.post("/auth/token", data={"username": email, "password": PASSWORD})
+    return user_id, {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.mark.asyncio
+@requires_db
+async def test_any_role_member_can_act_on_role_step(client, db_engine):
+    admin_id, admin = await _user(client)
+    lawyer_id, lawyer = await _user(client)
+    _, outsider = await _user(client)
+    async with db_engine.begin() as conn:
+        await conn.execute(text("UPDATE users SET is_superuser = true WHERE id = :id"), {"id": admin_id})
+
+    response = await client.post("/roles", json={"name": "Юристы"}, headers=outsider)
+    assert response.status_code == 403
+    response = await client.post("/roles", json={"name": "Юристы"}, headers=admin)
+    assert response.status_code == 201, response.text
+    role_id = response.json()["id"]
+
+    response = await client.post(
+        "/workflow/workflow_templates/",
+        json={"name": "Договор", "steps": [
+            {"name": "Юридическая проверка", "order": 0, "assignee_role_id": role_id},
+            {"name": "Подпись", "order": 1, "assignee_id": admin_id},
+        ]},
+        headers=admin,
+    )
+    response = await client.post(
+        "/workflow/workflow_instances/", json={"template_id": response.json()["id"]}, headers=admin
+    )
+    instance = response.json()
+    assert (instance["assignee_id"], instance["assignee_role_id"]) == (None, role_id)
+
+    # The lawyer's permission set is cached before they join the role
+    assert (await client.get("/workflow/inbox", headers=lawyer)).json() == []
+    response = await client.post(f"/roles/{role_id}/members", json={"user_ids": [lawyer_id]}, headers=admin)
+    assert response.json() == {"user_ids": [lawyer_id]}
+
+    response = await client.get("/workflow/inbox", headers=lawyer)
+    assert [i["id"] for i in response.json()] == [instance["id"]]
+    assert (await client.get("/workflow/inbox", headers=outsider)).json() == []
+    response = await client.post(f"/workflow/workflow_instances/{instance['id']}/approve", json={}, headers=outsider)
+    assert response.status_code == 403
+
+    response = await client.post(f"/workflow/workflow_instances/{instance['id']}/approve", json={}, headers=lawyer)
+    assert response.status_code == 200, response.text
+    assert (response.json()["assignee_id"], response.json()["assignee_role_id"]) == (admin_id, None)
+    assert [i["id"] for i in (await client.get("/workflow/inbox", headers=admin)).json()] == [instance["id"]]
+
+    response = await client.delete(f"/roles/{role_id}/members/{lawyer_id}", headers=admin)
+    assert response.status_code == 204
+    response = await client.delete(f"/roles/{role_id}", headers=admin)
+    assert response.status_code == 409
+
+
+def test_permission_cache_is_keyed_by_permissions_version():
+    cache = PermissionCache(max_size=2)
+    user = User(id=uuid.uuid4(), permissions_version=1)
+    permissions = PermissionSet(user_id=user.id, role_ids=frozenset({1, 2}))
+    cache.put(user, permissions)
+    assert cache.get(user) is permissions
+    assert permissions.can_act(None, 2) and permissions.can_act(user.id, None) and permissions.can_act(None, None)
+    assert not permissions.can_act(uuid.uuid4(), None)
+
+    user.permissions_version = 2
+    assert cache.get(user) is None
@@ -0,0 +1,74 @@
+import pytest
+
+from tests.conftest import requires_db
+
+pytestmark = [pytest.mark.asyncio, requires_db]
+
+
+async def _me(client, headers):
+    return (await client.get("/auth/me", headers=headers)).json()
+
+
+async def test_template_is_created_with_its_steps(client, auth_headers):
+    me = await _me(client, auth_headers)
+    steps = [
+        {"name": "Бухгалтерия", "order": 1},
+        {"name": "Руководитель", "order": 0, "assignee_id": me["id"]},
+    ]
+    response = await client.post(
+        "/workflow/workflow_templates/", json={"name": "Оплата счета", "steps": steps}, headers=auth_headers
+    )
+    assert response.status_code == 201, response.text
+    body = response.json()
+    assert [(s["order"], s["name"]) for s in body["steps"]] == [(0, "Руководитель"), (1, "Бухгалтерия")]
+    assert body["steps"][0]["assignee"]["email"] == me["email"]
+    assert all(s["reference_id"] == f"STEP-{s['id']:06d}" for s in body["steps"])
+    assert body["reference_id"] == f"TPL-{body['id']:06d}"
+
+
+@pytest.mark.parametrize("steps", [
+    [{"name": "A", "order": 0}, {"name": "B", "order": 0}],
+    [{"name": "A", "order": 0, "assignee_id": "00000000-0000-4000-8000-000000000000"}],
+    [{"name": "A", "order": 0, "assignee_id": "not-a-uuid"}],
+    [{"name": "A", "order": 0, "assignee_role_id": 1}],
+    [{"name": "A", "order": 0, "assignee_id": "00000000-0000-4000-8000-000000000000", "assignee_role_id": 1}],
+])
+async def test_invalid_steps_create_nothing(client, auth_headers, steps):
+    response = await client.post(
+        "/workflow/workflow_templates/", json={"name": "Командировка", "steps": steps}, headers=auth_headers
+    )
+    assert response.status_code == 422
+    response = await client.get("/workflow/workflow_templates/", headers=auth_headers)
+    assert response.json() == []
+
+
+async def test_catalog_round_trip(client, auth_headers):
+    me = await _me(client, auth_headers)
+    await client.post(
+        "/workflow/workflow_templates/",
+        json={"name": "Отпуск", "steps": [{"name": "Руководитель", "order": 0, "assignee_id": me["id"]}]},
+        headers=auth_headers,
+    )
+    catalog = (await client.get("/workflow/workflow_templates/export", headers=auth_headers)).json()
+    assert catalog["templates"] == [{
+        "name": "Отпуск", "description": None,
+        "steps": [{
+            "name": "Руководитель", "description": None, "order": 0,
+            "assignee_email": me["email"], "assignee_role": None, "assignee_manager_level": None,
+        }],
+    }]
+
+    catalog["templates"].append({"name": "Закупка", "steps": [{"name": "Снабжение", "order": 0}]})
+    response = await client.post("/workflow/workflow_templates/import", json=catalog, headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json() == {"created": ["Закупка"], "skipped": ["Отпуск"]}
+
+    # An unknown assignee rejects the whole catalog
+    catalog["templates"] = [
+        {"name": "Аренда", "steps": [{"name": "Юрист", "order": 0}]},
+        {"name": "Командировка", "steps": [{"name": "Бухгалтерия", "order": 0, "assignee_email": "nobody@example.com"}]},
+    ]
+    response = await client.post("/workflow/workflow_templates/import", json=catalog, headers=auth_headers)
+    assert response.status_code == 422
+    names = [t["name"] for t in (await client.get("/workflow/workflow_templates/", headers=auth_headers)).json()]
+    assert sorted(names) == ["Закупка", "Отпуск"]
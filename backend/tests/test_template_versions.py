@@ -0,0 +1,134 @@
+import uuid
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.crud.template_versions import compiled_versions
+from app.crud.workflow import create_workflow_instance
+from app.models.user import User
+from app.models.workflow import WorkflowInstance, WorkflowTemplateVersion
+from app.schemas.workflow import WorkflowInstanceCreate
+from tests.conftest import requires_db
+
+pytestmark = [pytest.mark.asyncio, requires_db]
+
+
+async def _template(client, headers, steps=2) -> int:
+    response = await client.post(
+        "/workflow/workflow_templates/", json={"name": "Договор", "description": "Согласование"}, headers=headers
+    )
+    template_id = response.json()["id"]
+    for order in range(steps):
+        await _add_step(client, headers, template_id, order)
+    return template_id
+
+
+async def _add_step(client, headers, template_id, order):
+    response = await client.post(
+        f"/workflow/workflow_templates/{template_id}/steps/", json={"name": f"Шаг {order}", "order": order}, headers=headers
+    )
+    assert response.status_code == 201
+
+
+async def _start(client, headers, template_id, **extra):
+    response = await client.post(
+        "/workflow/workflow_instances/", json={"template_id": template_id, **extra}, headers=headers
+    )
+    assert response.status_code == 201, response.text
+    return response.json()
+
+
+async def test_draft_edits_do_not_touch_running_instances(client, auth_headers):
+    template_id = await _template(client, auth_headers, steps=2)
+    running = await _start(client, auth_headers, template_id)  # first start publishes v1
+
+    await _add_step(client, auth_headers, template_id, order=2)
+    for _ in range(2):
+        response = await client.post(
+            f"/workflow/workflow_instances/{running['id']}/approve", json={}, headers=auth_headers
+        )
+    # Still two steps: the instance follows the version it was started with
+    assert response.json()["status"] == "approved"
+
+    # Unpublished draft changes do not reach new instances either
+    assert (await _start(client, auth_headers, template_id))["template_version_id"] == running["template_version_id"]
+
+    response = await client.post(f"/workflow/workflow_templates/{template_id}/publish", headers=auth_headers)
+    assert response.status_code == 201
+    v2 = response.json()
+    assert v2["version"] == 2 and [s["order"] for s in v2["steps"]] == [0, 1, 2]
+
+    latest = await _start(client, auth_headers, template_id)
+    assert latest["template_version_id"] == v2["id"]
+    assert latest["current_step_id"] == v2["steps"][0]["id"]
+    pinned = await _start(client, auth_headers, template_id, template_version=1)
+    assert pinned["template_version_id"] == running["template_version_id"]
+
+
+async def test_published_version_is_served_as_immutable(client, auth_headers):
+    template_id = await _template(client, auth_headers)
+    await client.post(f"/workflow/workflow_templates/{template_id}/publish", headers=auth_headers)
+
+    response = await client.get(f"/workflow/workflow_templates/{template_id}/versions/1", headers=auth_headers)
+    assert response.status_code == 200
+    assert "immutable" in response.headers["cache-control"]
+    assert [s["name"] for s in response.json()["steps"]] == ["Шаг 0", "Шаг 1"]
+
+    etag = response.headers["etag"]
+    response = await client.get(
+        f"/workflow/workflow_templates/{template_id}/versions/1", headers={**auth_headers, "If-None-Match": etag}
+    )
+    assert response.status_code == 304
+    response = await client.get(
+        f"/workflow/workflow_templates/{template_id}/versions/1",
+        headers={**auth_headers, "If-None-Match": f'"stale", W/{etag}'},
+    )
+    assert response.status_code == 304
+
+    response = await client.get(f"/workflow/workflow_templates/{template_id}/versions", headers=auth_headers)
+    assert [v["version"] for v in response.json()] == [1]
+    response = await client.get(f"/workflow/workflow_templates/{template_id}/versions/2", headers=auth_headers)
+    assert response.status_code == 404
+
+
+async def test_template_without_steps_cannot_be_published(client, auth_headers):
+    template_id = await _template(client, auth_headers, steps=0)
+    response = await client.post(f"/workflow/workflow_templates/{template_id}/publish", headers=auth_headers)
+    assert response.status_code == 422
+    response = await client.post("/workflow/workflow_instances/", json={"template_id": template_id}, headers=auth_headers)
+    assert response.status_code == 422
+
+
+async def test_caller_owned_launch_rolls_back_implicit_publish(client, auth_headers, db_engine):
+    template_id = await _template(client, auth_headers)
+    factory = async_sessionmaker(bind=db_engine, expire_on_commit=False)
+    async with factory() as db:
+        user = User(email=f"{uuid.uuid4().hex[:12]}@example.com", hashed_password="x")
+        db.add(user)
+        await db.commit()
+        user_id = user.id
+
+        instance = await create_workflow_instance(
+            db, WorkflowInstanceCreate(template_id=template_id), created_by_id=user_id, commit=False
+        )
+        assert instance.template_version_id is not None
+        await db.rollback()
+
+        with pytest.raises(LookupError):
+            await create_workflow_instance(
+                db, WorkflowInstanceCreate(template_id=template_id, attachment_ids=[999_999]),
+                created_by_id=user_id, commit=False,
+            )
+        await db.rollback()
+
+    async with factory() as db:
+        versions = await db.scalar(
+            select(func.count()).select_from(WorkflowTemplateVersion)
+            .where(WorkflowTemplateVersion.template_id == template_id)
+        )
+        instances = await db.scalar(
+            select(func.count()).select_from(WorkflowInstance).where(WorkflowInstance.template_id == template_id)
+        )
+    assert (versions, instances) == (0, 0)
+    assert compiled_versions.get((template_id, 1)) is None
@@ -0,0 +1,127 @@
+import uuid
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.api.endpoints.auth import create_access_token
+from app.db.routing import SessionRouter
+from app.db.session import get_async_session, get_read_session, shard_router
+from app.db.sharding import DEFAULT_SHARD, Shard, ShardRouter
+from app.main import app
+from tests.conftest import requires_db
+
+
+PASSWORD = "Str0ngPa$$w0rd"
+
+
+@pytest.fixture(autouse=True)
+def tenant_hosts(monkeypatch):
+    hosts = {f"{tenant}.example.com": tenant for tenant in ("acme", "globex", "bigcorp", "smallco")}
+    monkeypatch.setattr(shard_router, "hosts", hosts)
+    return hosts
+
+
+async def _login(client, tenant, email="clerk@example.com"):
+    host = {"Host": f"{tenant}.example.com"}
+    response = await client.post("/users/register", json={"email": email, "password": PASSWORD}, headers=host)
+    assert response.status_code == 201, response.text
+    assert response.json()["tenant_id"] == tenant
+    response = await client.post("/auth/token", data={"username": email, "password": PASSWORD}, headers=host)
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def _instance(client, headers, name):
+    response = await client.post(
+        "/workflow/workflow_templates/",
+        json={"name": name, "steps": [{"name": "Проверка", "order": 0}]},
+        headers=headers,
+    )
+    assert response.status_code == 201, response.text
+    template_id = response.json()["id"]
+    response = await client.post("/workflow/workflow_instances/", json={"template_id": template_id}, headers=headers)
+    return template_id, response.json()["id"]
+
+
+@pytest.mark.asyncio
+@requires_db
+async def test_tenants_only_see_their_own_data(client, db_engine):
+    # The same email and template name are independent in every tenant
+    acme = await _login(client, "acme")
+    globex = await _login(client, "globex")
+    acme_template, _ = await _instance(client, acme, "Договор")
+    globex_template, globex_instance = await _instance(client, globex, "Договор")
+
+    response = await client.get("/workflow/workflow_templates/", headers=acme)
+    assert [t["id"] for t in response.json()] == [acme_template]
+    response = await client.get(f"/workflow/workflow_templates/{globex_template}", headers=acme)
+    assert response.status_code == 404
+    response = await client.get(f"/workflow/workflow_instances/{globex_instance}", headers=acme)
+    assert response.status_code == 404
+    response = await client.get("/workflow/changes", headers=globex)
+    assert [i["id"] for i in response.json()["instances"]] == [globex_instance]
+
+    # The signed tenant claim wins over the host
+    response = await client.get("/workflow/workflow_templates/", headers={**acme, "Host": "globex.example.com"})
+    assert [t["id"] for t in response.json()] == [acme_template]
+
+    async with db_engine.connect() as conn:
+        rows = (await conn.execute(text(
+            "SELECT s.tenant_id, t.tenant_id FROM workflow_steps s JOIN workflow_templates t ON t.id = s.template_id"
+        ))).all()
+    assert set(rows) == {("acme", "acme"), ("globex", "globex")}
+
+
+@pytest.mark.asyncio
+@requires_db
+async def test_big_tenant_is_routed_to_its_shard(client, db_engine, replica_engine, monkeypatch):
+    # Exercise the real session dependencies instead of the fixture overrides
+    app.dependency_overrides.pop(get_async_session)
+    app.dependency_overrides.pop(get_read_session)
+    shards = {}
+    for name, engine in ((DEFAULT_SHARD, db_engine), ("big", replica_engine)):
+        factory = async_sessionmaker(bind=engine, expire_on_commit=False)
+        shards[name] = Shard(name, factory, SessionRouter(primary=factory), f"{name}-bucket")
+    monkeypatch.setattr(shard_router, "shards", shards)
+    monkeypatch.setattr(shard_router, "default", shards[DEFAULT_SHARD])
+    monkeypatch.setattr(shard_router, "tenants", {"bigcorp": "big"})
+
+    big = await _login(client, "bigcorp")
+    small = await _login(client, "smallco")
+    await _instance(client, big, "Закупка")
+    await _instance(client, small, "Отпуск")
+
+    for engine, expected in ((replica_engine, ["Закупка"]), (db_engine, ["Отпуск"])):
+        async with engine.connect() as conn:
+            assert (await conn.scalars(text("SELECT name FROM workflow_templates"))).all() == expected
+
+
+@pytest.mark.asyncio
+@requires_db
+async def test_anonymous_callers_cannot_choose_a_tenant(client, monkeypatch):
+    # A header naming a tenant is ignored: the user lands in the default tenant
+    response = await client.post(
+        "/users/register", json={"email": "intruder@example.com", "password": PASSWORD}, headers={"X-Tenant": "acme"}
+    )
+    assert response.json()["tenant_id"] == "default"
+
+    monkeypatch.setattr(shard_router, "require_host", True)
+    response = await client.post(
+        "/users/register", json={"email": "intruder@example.com", "password": PASSWORD},
+        headers={"Host": "unknown.example.com"},
+    )
+    assert response.status_code == 404
+
+    token = create_access_token({"sub": str(uuid.uuid4()), "tenant": "x" * 100})
+    response = await client.get("/workflow/workflow_templates/", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 400
+
+
+def test_router_rejects_unknown_shards():
+    default = Shard(DEFAULT_SHARD, None, None, "bucket")
+    router = ShardRouter([default], {})
+    assert router.for_tenant("anyone") is default
+    with pytest.raises(ValueError):
+        ShardRouter([default], {"bigcorp": "big"})
+    with pytest.raises(ValueError):
+        ShardRouter([default], {}, hosts={"long.example.com": "x" * 100})
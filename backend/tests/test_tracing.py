@@ -0,0 +1,46 @@
+import pytest
+
+from tests.conftest import requires_db
+
+pytestmark = pytest.mark.asyncio
+
+PARENT_TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+
+
+async def test_request_continues_incoming_trace(spans):
+    from httpx import AsyncClient, ASGITransport
+    from app.main import app
+
+    traceparent = f"00-{PARENT_TRACE_ID}-00f067aa0ba902b7-01"
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        await ac.get("/", headers={"traceparent": traceparent})
+
+    (root,) = [span for span in spans.get_finished_spans() if span.name == "GET /"]
+    assert format(root.context.trace_id, "032x") == PARENT_TRACE_ID
+    assert root.attributes["http.route"] == "/"
+    assert root.attributes["http.response.status_code"] == 200
+
+
+@requires_db
+async def test_approve_is_broken_down_into_spans(client, auth_headers, spans):
+    response = await client.post("/workflow/workflow_templates/", json={"name": "Трассировка"}, headers=auth_headers)
+    template_id = response.json()["id"]
+    await client.post(
+        f"/workflow/workflow_templates/{template_id}/steps/", json={"name": "Шаг", "order": 0}, headers=auth_headers
+    )
+    response = await client.post("/workflow/workflow_instances/", json={"template_id": template_id}, headers=auth_headers)
+    instance_id = response.json()["id"]
+    spans.clear()
+
+    response = await client.post(
+        f"/workflow/workflow_instances/{instance_id}/approve", json={"comment": "ок"}, headers=auth_headers
+    )
+    assert response.status_code == 200
+
+    finished = spans.get_finished_spans()
+    (root,) = [span for span in finished if span.name == "POST /workflow/workflow_instances/{instance_id}/approve"]
+    names = {span.name for span in finished}
+    assert {"auth.get_current_user", "workflow.history_insert", "workflow.step_scan", "workflow.reload"} <= names
+    assert {"SELECT", "INSERT", "UPDATE"} <= names
+    # Everything belongs to the request's trace
+    assert {span.context.trace_id for span in finished} == {root.context.trace_id}
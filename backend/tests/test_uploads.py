@@ -0,0 +1,114 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.core.config import settings
+from app.crud.attachment_gc import remove_orphaned_objects
+from app.crud.uploads import remove_abandoned_uploads
+from tests.conftest import requires_db
+
+pytestmark = [pytest.mark.asyncio, requires_db]
+
+CONTENT = b"0123456789"
+
+
+@pytest.fixture(autouse=True)
+def small_chunks(monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_CHUNK_SIZE", 4)
+
+
+async def _start(client, headers, size=len(CONTENT)):
+    response = await client.post(
+        "/workflow/uploads", json={"filename": "скан.pdf", "content_type": "application/pdf", "size": size},
+        headers=headers,
+    )
+    assert response.status_code == 201
+    return response.json()
+
+
+async def _patch(client, headers, upload_id, offset, data):
+    return await client.patch(
+        f"/workflow/uploads/{upload_id}", content=data, headers={**headers, "Upload-Offset": str(offset)}
+    )
+
+
+async def test_chunks_resume_in_any_order(client, auth_headers, storage):
+    upload = await _start(client, auth_headers)
+    assert (upload["chunk_size"], upload["missing_offsets"]) == (4, [0, 4, 8])
+
+    assert (await _patch(client, auth_headers, upload["id"], 8, CONTENT[8:])).status_code == 204
+    assert (await _patch(client, auth_headers, upload["id"], 0, CONTENT[:4])).status_code == 204
+
+    response = await client.get(f"/workflow/uploads/{upload['id']}", headers=auth_headers)
+    assert response.headers["upload-offset"] == "4"
+    assert response.json()["missing_offsets"] == [4]
+    response = await client.post(f"/workflow/uploads/{upload['id']}/complete", headers=auth_headers)
+    assert response.status_code == 409
+
+    assert (await _patch(client, auth_headers, upload["id"], 3, CONTENT[3:7])).status_code == 409
+    assert (await _patch(client, auth_headers, upload["id"], 4, CONTENT[4:9])).status_code == 413
+    assert (await _patch(client, auth_headers, upload["id"], 4, CONTENT[4:8])).status_code == 204
+
+    response = await client.post(f"/workflow/uploads/{upload['id']}/complete", headers=auth_headers)
+    assert response.status_code == 201
+    attachment = response.json()
+    assert attachment["filename"] == "скан.pdf"
+    response = await client.get(f"/workflow/attachments/{attachment['id']}/download", headers=auth_headers)
+    assert response.content == CONTENT
+
+    response = await client.get(f"/workflow/uploads/{upload['id']}", headers=auth_headers)
+    assert response.status_code == 404
+    assert storage.multipart == {}
+
+
+async def test_abandoned_and_orphaned_uploads_are_aborted(client, auth_headers, storage, db_engine):
+    abandoned = await _start(client, auth_headers)
+    await _patch(client, auth_headers, abandoned["id"], 0, CONTENT[:4])
+    active = await _start(client, auth_headers)
+    orphan_id = await storage.create_multipart_upload("orphan/scan.pdf", "application/pdf")
+
+    async with db_engine.begin() as conn:
+        await conn.execute(
+            text("UPDATE upload_sessions SET expires_at = now() - interval '1 second' WHERE id = :id"),
+            {"id": abandoned["id"]},
+        )
+    # The orphan's session was never saved; it is only reclaimed once older than the session TTL
+    name, content_type, _, parts = storage.multipart[orphan_id]
+    storage.multipart[orphan_id] = (name, content_type, datetime.now(timezone.utc) - timedelta(days=2), parts)
+
+    async with async_sessionmaker(bind=db_engine)() as db:
+        assert await remove_abandoned_uploads(db, storage) == 2
+
+    assert len(storage.multipart) == 1
+    response = await client.get(f"/workflow/uploads/{abandoned['id']}", headers=auth_headers)
+    assert response.status_code == 404
+    response = await client.get(f"/workflow/uploads/{active['id']}", headers=auth_headers)
+    assert response.status_code == 200
+
+
+async def test_upload_assembled_before_a_crash_is_collected(client, auth_headers, storage, db_engine):
+    upload = await _start(client, auth_headers)
+    for offset in (0, 4, 8):
+        await _patch(client, auth_headers, upload["id"], offset, CONTENT[offset:offset + 4])
+    # The worker assembled the object and died before committing the attachment
+    async with db_engine.begin() as conn:
+        object_name, upload_id = (await conn.execute(
+            text("UPDATE upload_sessions SET expires_at = now() - interval '1 second' WHERE id = :id "
+                 "RETURNING object_name, upload_id"),
+            {"id": upload["id"]},
+        )).one()
+        parts = (await conn.execute(
+            text("SELECT part_number, etag FROM upload_parts WHERE session_id = :id ORDER BY part_number"),
+            {"id": upload["id"]},
+        )).tuples().all()
+    await storage.complete_multipart_upload(object_name, upload_id, parts)
+
+    sessions = async_sessionmaker(bind=db_engine)
+    async with sessions() as db:
+        assert await remove_abandoned_uploads(db, storage) == 1
+    storage.modified[object_name] = datetime.now(timezone.utc) - timedelta(days=30)
+    async with sessions() as db:
+        assert await remove_orphaned_objects(db, storage, batch_size=10) == (1, True)
+    assert object_name not in storage.objects